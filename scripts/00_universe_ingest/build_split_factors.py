@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+build_split_factors.py
+
+Precalcula factores ACUMULADOS de ajuste por split por ticker a partir de la
+tabla de splits que mantiene ingest_splits_dividends.py.
+
+Con esto los stores OHLCV (daily, minute) se guardan SIN ajustar una sola vez
+(--unadjusted en los ingestores) y el ajuste se aplica en lectura
+(scripts/utils/split_adjust.py). Un split nuevo solo requiere regenerar esta
+tabla (KB), no re-descargar el histórico del ticker.
+
+Convención Polygon: ratio = split_from / split_to
+  - Forward 2-for-1  (from=1,  to=2) -> ratio 0.5
+  - Reverse 1-for-10 (from=10, to=1) -> ratio 10
+
+Para una fecha d: price_factor(d) = producto de ratio de todos los splits con
+execution_date > d. Cada fila cubre las fechas hasta adj_until
+(execution_date - 1 día) y se aplica con join_asof(strategy="forward").
+
+Uso:
+  python scripts/00_universe_ingest/build_split_factors.py \
+      --splits-dir raw/polygon/reference/splits \
+      --output raw/polygon/reference/split_factors/split_factors.parquet
+
+Output:
+  split_factors.parquet
+    ticker, execution_date, adj_until, ratio, price_factor, volume_factor
+"""
+
+import argparse
+import datetime as dt
+from pathlib import Path
+
+import polars as pl
+
+def log(msg: str):
+    """Log con timestamp"""
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def compute_split_factors(splits: pl.DataFrame) -> pl.DataFrame:
+    """
+    Calcula factores acumulados por ticker
+
+    Args:
+        splits: DataFrame con ticker, execution_date, split_from, split_to
+
+    Returns:
+        DataFrame ordenado por (ticker, adj_until) con price_factor/volume_factor
+    """
+    schema = {"ticker": pl.Utf8, "execution_date": pl.Date, "adj_until": pl.Date,
+              "ratio": pl.Float64, "price_factor": pl.Float64, "volume_factor": pl.Float64}
+
+    if splits.height == 0:
+        return pl.DataFrame(schema=schema)
+
+    df = splits.select([
+        pl.col("ticker").cast(pl.Utf8),
+        pl.col("execution_date").cast(pl.Utf8).str.to_date("%Y-%m-%d", strict=False),
+        (pl.col("split_from").cast(pl.Float64) / pl.col("split_to").cast(pl.Float64)).alias("ratio"),
+    ]).filter(
+        pl.col("ticker").is_not_null() &
+        pl.col("execution_date").is_not_null() &
+        pl.col("ratio").is_finite() &
+        (pl.col("ratio") > 0)
+    )
+
+    # Duplicados del mismo día: un solo evento
+    df = df.unique(subset=["ticker", "execution_date"], keep="last")
+
+    # Producto acumulado desde el split más reciente hacia atrás
+    df = df.sort(["ticker", "execution_date"], descending=[False, True]).with_columns(
+        pl.col("ratio").cum_prod().over("ticker").alias("price_factor")
+    )
+
+    return df.with_columns([
+        (pl.col("execution_date") - pl.duration(days=1)).alias("adj_until"),
+        (1.0 / pl.col("price_factor")).alias("volume_factor"),
+    ]).select(list(schema.keys())).sort(["ticker", "adj_until"])
+
+def write_split_factors(splits: pl.DataFrame, output: Path) -> pl.DataFrame:
+    """Calcula y guarda la tabla de factores (escritura atómica)"""
+    factors = compute_split_factors(splits)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(".parquet.tmp")
+    factors.write_parquet(tmp)
+    tmp.replace(output)
+    return factors
+
+def main():
+    ap = argparse.ArgumentParser(description="Calcula factores acumulados de split por ticker")
+    ap.add_argument("--splits-dir", type=str, required=True,
+                    help="Directorio splits particionado (raw/polygon/reference/splits)")
+    ap.add_argument("--output", type=str, required=True,
+                    help="Parquet de salida (raw/polygon/reference/split_factors/split_factors.parquet)")
+    args = ap.parse_args()
+
+    splits_dir = Path(args.splits_dir)
+    files = sorted(splits_dir.glob("year=*/splits.parquet"))
+    if not files:
+        log(f"ERROR: no hay splits en {splits_dir}")
+        return
+
+    splits = pl.concat([pl.read_parquet(f) for f in files], how="diagonal_relaxed")
+    log(f"Splits leídos: {splits.height:,} ({len(files)} años)")
+
+    factors = write_split_factors(splits, Path(args.output))
+
+    log(f"Factores guardados en {args.output}")
+    log(f"   Filas: {factors.height:,}")
+    log(f"   Tickers con splits: {factors['ticker'].n_unique():,}")
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,8 @@ Output:
   raw/polygon/reference/
   ├── splits/
   │   └── year=*/splits.parquet
+  ├── split_factors/
+  │   └── split_factors.parquet   (factores acumulados para ajuste en lectura)
   └── dividends/
       └── year=*/dividends.parquet
 """
@@ -37,6 +39,8 @@ import requests
 import polars as pl
 from dotenv import load_dotenv
 
+from build_split_factors import write_split_factors
+
 # Configuración
 BASE_URL = "https://api.polygon.io"
 LIMIT = 1000
@@ -271,6 +275,11 @@ def main():
             log(f"   Total splits: {len(df_splits):,}")
             log(f"   Tickers únicos: {n_tickers:,}")
             log(f"   Período: {min_year}-{max_year}")
+
+            # Factores acumulados: un split nuevo solo refresca esta tabla
+            factors_file = base_dir / "split_factors" / "split_factors.parquet"
+            factors = write_split_factors(df_splits, factors_file)
+            log(f"   Factores de ajuste: {factors.height:,} filas -> {factors_file}")
     else:
         log("No se descargaron splits")
 
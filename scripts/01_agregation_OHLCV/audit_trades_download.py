@@ -22,6 +22,10 @@ from collections import defaultdict
 from datetime import datetime
 import sys
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from hive_layout import ticker_dir as hive_ticker_dir  # noqa: E402
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Auditoría completa de trades tick-level")
     parser.add_argument("--data-dir", required=True, help="Directorio con datos de trades")
@@ -66,7 +70,7 @@ def audit_ticker_coverage(data_dir: Path, expected_tickers: set[str],
     audit_results = {}
 
     for ticker in sorted(expected_tickers):
-        ticker_dir = data_dir / ticker
+        ticker_dir = hive_ticker_dir(data_dir, ticker)  # TICKER/ o ticker=TICKER/
 
         if not ticker_dir.exists():
             audit_results[ticker] = {
@@ -27,13 +27,20 @@ Uso:
     --resume
 """
 from __future__ import annotations
-import os, sys, time, argparse, subprocess
+import os, sys, time, argparse, subprocess, queue
 from pathlib import Path
-from typing import List, Set, Tuple
+from typing import List, Optional, Set, Tuple
 from datetime import datetime
 import polars as pl
 from concurrent.futures import ThreadPoolExecutor, as_completed  # lanzamos SUBPROCESOS (IO-bound)
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from dataset_catalog import catalog_tickers, default_catalog_dir  # noqa: E402
+from minute_cache import MinuteHotCache, default_cache_dir  # noqa: E402
+from hive_layout import ticker_name  # noqa: E402
+from ingest_metrics import slot_env  # noqa: E402
+
 def log(msg: str) -> None:
     print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
 
@@ -72,23 +79,28 @@ def load_tickers(path: str) -> List[str]:
 
     return tickers
 
-def get_completed_tickers(outdir: Path) -> Set[str]:
+def get_completed_tickers(outdir: Path, catalog_dir: Optional[Path] = None) -> Set[str]:
+    if catalog_dir is not None:
+        # Catálogo de ficheros (utils/dataset_catalog.py): una consulta en vez de recorrer el árbol
+        return catalog_tickers(catalog_dir, "ohlcv_1m", outdir, files=["minute.parquet"])
     if not outdir.exists():
         return set()
     done = set()
     for tdir in outdir.iterdir():
         if not tdir.is_dir(): continue
         if tdir.name == '_batch_temp': continue
-        # si existe cualquier year=*/month=*/minute.parquet, lo damos por iniciado/completado
-        any_parquet = any((y.is_dir() and any(m.glob("minute.parquet") for m in y.glob("month=*"))) for y in tdir.glob("year=*"))
+        # si existe cualquier year=*/month=*/minute.parquet (o el TICKER/minute.parquet
+        # compactado por compact_small_files.py), lo damos por iniciado/completado
+        any_parquet = (tdir / "minute.parquet").exists() or any((y.is_dir() and any(m.glob("minute.parquet") for m in y.glob("month=*"))) for y in tdir.glob("year=*"))
         if any_parquet:
-            done.add(tdir.name)
+            done.add(ticker_name(tdir.name))
     return done
 
 def chunk_list(lst: List[str], size: int) -> List[List[str]]:
     return [lst[i:i+size] for i in range(0, len(lst), size)]
 
-def run_batch(batch_id: int, tickers: List[str], args, script_path: Path, temp_dir: Path, tries: int = 2) -> Tuple[int, str, float]:
+def run_batch(batch_id: int, tickers: List[str], args, script_path: Path, temp_dir: Path,
+              slots: "queue.Queue[int]", tries: int = 2) -> Tuple[int, str, float]:
     """
     Lanza un subproceso del ingestor "streaming" procesando este batch.
     Reintenta hasta 'tries' veces si el exit code != 0.
@@ -109,23 +121,33 @@ def run_batch(batch_id: int, tickers: List[str], args, script_path: Path, temp_d
         "--max-tickers-per-process", str(len(tickers)),
         "--max-workers", "1",  # ignorado por el ingestor streaming; mantenido por compatibilidad
     ]
+    if args.hive_layout:
+        cmd.append("--hive-layout")
 
     # Heredar variables TLS si las configuraste (Windows)
     env = os.environ.copy()
+    if args.catalog_dir:
+        env["TSIS_CATALOG_DIR"] = str(Path(args.catalog_dir).resolve())
     # p.ej. env["SSL_CERT_FILE"] = "..." ; env["REQUESTS_CA_BUNDLE"] = "..."
+    # Métricas (utils/ingest_metrics.py): el batch publica con la etiqueta de su slot
+    slot = slots.get()
+    env = slot_env(env, slot, args.metrics_dir, args.metrics_port_base)
 
     attempt = 0
     rc = 1
-    while attempt < tries:
-        attempt += 1
-        with open(log_path, "a", encoding="utf-8") as lf:
-            lf.write(f"== BATCH {batch_id:04d} attempt {attempt}/{tries} ==\n")
-            lf.flush()
-            proc = subprocess.run(cmd, stdout=lf, stderr=subprocess.STDOUT, text=True, env=env)
-            rc = proc.returncode
-        if rc == 0:
-            break
-        time.sleep(3)
+    try:
+        while attempt < tries:
+            attempt += 1
+            with open(log_path, "a", encoding="utf-8") as lf:
+                lf.write(f"== BATCH {batch_id:04d} attempt {attempt}/{tries} ==\n")
+                lf.flush()
+                proc = subprocess.run(cmd, stdout=lf, stderr=subprocess.STDOUT, text=True, env=env)
+                rc = proc.returncode
+            if rc == 0:
+                break
+            time.sleep(3)
+    finally:
+        slots.put(slot)
 
     elapsed = time.time() - start
     # limpieza del CSV temporal (conservamos log)
@@ -147,6 +169,21 @@ def main():
     ap.add_argument("--rate-limit", type=float, default=0.20)
     ap.add_argument("--ingest-script", required=True, help="Ruta al ingest_ohlcv_intraday_minute.py (versión streaming)")
     ap.add_argument("--resume", action="store_true")
+    ap.add_argument("--catalog", action="store_true",
+                    help="--resume desde el catálogo de ficheros en vez de recorrer outdir "
+                         "(requiere un 'dataset_catalog.py build' previo del store)")
+    ap.add_argument("--catalog-dir", default=None,
+                    help="Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog); "
+                         "se pasa a los ingestores vía TSIS_CATALOG_DIR")
+    ap.add_argument("--hot-cache-dir", default=None,
+                    help="Caché 1m de los últimos días a mantener al día (default: <outdir>/../minute_hot_cache si existe)")
+    ap.add_argument("--no-hot-cache", action="store_true", help="No actualizar la caché 1m al terminar")
+    ap.add_argument("--hive-layout", action="store_true",
+                    help="Los ingestores escriben en layout Hive ticker=X/... (automático si outdir ya está migrado)")
+    ap.add_argument("--metrics-dir", default=None,
+                    help="Textfiles .prom de los ingestores, uno por slot (default: TSIS_METRICS_DIR)")
+    ap.add_argument("--metrics-port-base", type=int, default=None,
+                    help="Endpoint /metrics por slot en PORT_BASE + slot (default: sin HTTP)")
     args = ap.parse_args()
 
     if not os.getenv("POLYGON_API_KEY"):
@@ -163,7 +200,9 @@ def main():
     all_tickers = load_tickers(args.tickers_csv)
 
     if args.resume:
-        completed = get_completed_tickers(outdir)
+        catalog_dir = (Path(args.catalog_dir) if args.catalog_dir else default_catalog_dir(outdir)) \
+            if args.catalog else None
+        completed = get_completed_tickers(outdir, catalog_dir)
         tickers = [t for t in all_tickers if t not in completed]
         log(f"--resume: {len(completed):,} tickers ya con datos | pendientes: {len(tickers):,}")
     else:
@@ -187,7 +226,11 @@ def main():
 
     # IMPORTANTE: usamos ThreadPoolExecutor para lanzar SUBPROCESOS (no hacemos trabajo CPU-bound aquí)
     with ThreadPoolExecutor(max_workers=args.max_concurrent) as ex:
-        futs = {ex.submit(run_batch, i, b, args, script_path, temp_dir): i for i, b in enumerate(batches)}
+        # Un slot por subproceso concurrente: etiqueta worker estable entre batches
+        slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(args.max_concurrent):
+            slots.put(slot)
+        futs = {ex.submit(run_batch, i, b, args, script_path, temp_dir, slots): i for i, b in enumerate(batches)}
         for fut in as_completed(futs):
             bid, status, elapsed = fut.result()
             results.append((bid, status, elapsed))
@@ -203,5 +246,14 @@ def main():
     log(f"Tiempo total: {elapsed_all/3600:.2f} h")
     log(f"Logs por batch: {temp_dir}/")
 
+    # Caché caliente (utils/minute_cache.py): solo se recargan los tickers con meses reescritos
+    cache_dir = Path(args.hot_cache_dir) if args.hot_cache_dir else default_cache_dir(outdir)
+    if not args.no_hot_cache and (args.hot_cache_dir or cache_dir.exists()):
+        try:
+            n = MinuteHotCache(cache_dir).update(outdir, workers=os.cpu_count() or 4, catalog_dir=args.catalog_dir)
+            log(f"Caché 1m: {n:,} tickers actualizados ({cache_dir})")
+        except Exception as e:
+            log(f"Caché 1m no actualizada: {e}")
+
 if __name__ == "__main__":
     main()
@@ -22,9 +22,9 @@ Uso:
     --resume
 """
 from __future__ import annotations
-import os, sys, time, argparse, subprocess
+import os, sys, time, argparse, subprocess, queue
 from pathlib import Path
-from typing import List, Set, Tuple
+from typing import List, Optional, Set, Tuple
 from datetime import datetime
 import polars as pl
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -33,6 +33,12 @@ from dotenv import load_dotenv
 # Cargar variables de entorno desde .env
 load_dotenv(Path(__file__).parent.parent.parent / ".env")
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from dataset_catalog import catalog_tickers, default_catalog_dir  # noqa: E402
+from hive_layout import ticker_name  # noqa: E402
+from ingest_metrics import slot_env  # noqa: E402
+
 def log(msg: str) -> None:
     print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
 
@@ -61,7 +67,11 @@ def load_tickers(path: str) -> List[str]:
 
     return tickers
 
-def get_completed_tickers(outdir: Path) -> Set[str]:
+def get_completed_tickers(outdir: Path, catalog_dir: Optional[Path] = None) -> Set[str]:
+    if catalog_dir is not None:
+        # Catálogo de ficheros (utils/dataset_catalog.py): una consulta en vez de recorrer el árbol
+        return catalog_tickers(catalog_dir, "trades", outdir,
+                               files=["premarket.parquet", "market.parquet", "trades.parquet"])
     if not outdir.exists():
         return set()
     done = set()
@@ -69,23 +79,26 @@ def get_completed_tickers(outdir: Path) -> Set[str]:
         if not tdir.is_dir(): continue
         if tdir.name == '_batch_temp': continue
         # Si existe cualquier year=*/month=*/day=*/premarket.parquet o market.parquet
+        # (o el trades.parquet del mes ya compactado por compact_small_files.py)
         any_parquet = any(
             (y.is_dir() and
              any(m.is_dir() and
-                 any(d.is_dir() and
-                     (any(f.name in ["premarket.parquet", "market.parquet"]
-                          for f in d.glob("*.parquet")))
-                     for d in m.glob("day=*"))
+                 ((m / "trades.parquet").exists() or
+                  any(d.is_dir() and
+                      (any(f.name in ["premarket.parquet", "market.parquet"]
+                           for f in d.glob("*.parquet")))
+                      for d in m.glob("day=*")))
                  for m in y.glob("month=*")))
             for y in tdir.glob("year=*"))
         if any_parquet:
-            done.add(tdir.name)
+            done.add(ticker_name(tdir.name))
     return done
 
 def chunk_list(lst: List[str], size: int) -> List[List[str]]:
     return [lst[i:i+size] for i in range(0, len(lst), size)]
 
-def run_batch(batch_id: int, tickers: List[str], args, script_path: Path, temp_dir: Path, tries: int = 2) -> Tuple[int, str, float]:
+def run_batch(batch_id: int, tickers: List[str], args, script_path: Path, temp_dir: Path,
+              slots: "queue.Queue[int]", tries: int = 2) -> Tuple[int, str, float]:
     """Lanza un subproceso del ingestor procesando este batch"""
     start = time.time()
     csv_path = temp_dir / f"batch_{batch_id:04d}.csv"
@@ -102,21 +115,31 @@ def run_batch(batch_id: int, tickers: List[str], args, script_path: Path, temp_d
         "--max-tickers-per-process", str(len(tickers)),
         #"--max-workers", "1",
     ]
+    if args.hive_layout:
+        cmd.append("--hive-layout")
 
     env = os.environ.copy()
+    if args.catalog_dir:
+        env["TSIS_CATALOG_DIR"] = str(Path(args.catalog_dir).resolve())
+    # Métricas (utils/ingest_metrics.py): el batch publica con la etiqueta de su slot
+    slot = slots.get()
+    env = slot_env(env, slot, args.metrics_dir, args.metrics_port_base)
 
     attempt = 0
     rc = 1
-    while attempt < tries:
-        attempt += 1
-        with open(log_path, "a", encoding="utf-8") as lf:
-            lf.write(f"== BATCH {batch_id:04d} attempt {attempt}/{tries} ==\n")
-            lf.flush()
-            proc = subprocess.run(cmd, stdout=lf, stderr=subprocess.STDOUT, text=True, env=env)
-            rc = proc.returncode
-        if rc == 0:
-            break
-        time.sleep(3)
+    try:
+        while attempt < tries:
+            attempt += 1
+            with open(log_path, "a", encoding="utf-8") as lf:
+                lf.write(f"== BATCH {batch_id:04d} attempt {attempt}/{tries} ==\n")
+                lf.flush()
+                proc = subprocess.run(cmd, stdout=lf, stderr=subprocess.STDOUT, text=True, env=env)
+                rc = proc.returncode
+            if rc == 0:
+                break
+            time.sleep(3)
+    finally:
+        slots.put(slot)
 
     elapsed = time.time() - start
     try:
@@ -138,6 +161,18 @@ def main():
     ap.add_argument("--rate-limit", type=float, default=0.10)
     ap.add_argument("--ingest-script", required=True, help="Ruta al ingest_trades_ticks.py")
     ap.add_argument("--resume", action="store_true")
+    ap.add_argument("--catalog", action="store_true",
+                    help="--resume desde el catálogo de ficheros en vez de recorrer outdir "
+                         "(requiere un 'dataset_catalog.py build' previo del store)")
+    ap.add_argument("--catalog-dir", default=None,
+                    help="Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog); "
+                         "se pasa a los ingestores vía TSIS_CATALOG_DIR")
+    ap.add_argument("--hive-layout", action="store_true",
+                    help="Los ingestores escriben en layout Hive ticker=X/... (automático si outdir ya está migrado)")
+    ap.add_argument("--metrics-dir", default=None,
+                    help="Textfiles .prom de los ingestores, uno por slot (default: TSIS_METRICS_DIR)")
+    ap.add_argument("--metrics-port-base", type=int, default=None,
+                    help="Endpoint /metrics por slot en PORT_BASE + slot (default: sin HTTP)")
     args = ap.parse_args()
 
     if not os.getenv("POLYGON_API_KEY"):
@@ -153,7 +188,9 @@ def main():
     all_tickers = load_tickers(args.tickers_csv)
 
     if args.resume:
-        completed = get_completed_tickers(outdir)
+        catalog_dir = (Path(args.catalog_dir) if args.catalog_dir else default_catalog_dir(outdir)) \
+            if args.catalog else None
+        completed = get_completed_tickers(outdir, catalog_dir)
         tickers = [t for t in all_tickers if t not in completed]
         log(f"--resume: {len(completed):,} tickers ya con datos | pendientes: {len(tickers):,}")
     else:
@@ -181,7 +218,11 @@ def main():
     log(f"Iniciando ThreadPoolExecutor con {args.max_concurrent} workers...")
     with ThreadPoolExecutor(max_workers=args.max_concurrent) as ex:
         log(f"Submitting {len(batches)} batches...")
-        futs = {ex.submit(run_batch, i, b, args, script_path, temp_dir): i for i, b in enumerate(batches)}
+        # Un slot por subproceso concurrente: etiqueta worker estable entre batches
+        slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(args.max_concurrent):
+            slots.put(slot)
+        futs = {ex.submit(run_batch, i, b, args, script_path, temp_dir, slots): i for i, b in enumerate(batches)}
         log(f"Batches submitted. Waiting for completion...")
         for fut in as_completed(futs):
             bid, status, elapsed = fut.result()
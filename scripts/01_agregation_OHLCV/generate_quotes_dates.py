@@ -10,6 +10,13 @@ import argparse
 from pathlib import Path
 from datetime import datetime
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from hive_layout import ticker_dir  # noqa: E402
+from store_query import compacted_days, load as load_store  # noqa: E402
+
+LOAD_BATCH = 500  # tickers por lectura de store_query
+
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {msg}", flush=True)
@@ -38,58 +45,40 @@ def main():
     if args.year_min or args.year_max:
         log(f"Filtrando años: {args.year_min or 'inicio'} - {args.year_max or 'fin'}")
 
-    # Recolectar todas las fechas
+    # Recolectar todas las fechas (store_query: year=*, TICKER/daily.parquet compactado y layout Hive)
     log("Recolectando fechas de daily...")
     all_dates = []
-
-    for i, ticker in enumerate(tickers_with_data):
-        if (i + 1) % 500 == 0:
-            log(f"  Progreso: {i+1}/{len(tickers_with_data)} ({(i+1)/len(tickers_with_data)*100:.1f}%)")
-
-        ticker_path = Path(args.daily_root) / ticker
-        if not ticker_path.exists():
+    start = f"{args.year_min}-01-01" if args.year_min is not None else None
+    end = f"{args.year_max}-12-31" if args.year_max is not None else None
+    done = 0
+
+    for df in load_store("ohlcv_daily", tickers_with_data, start, end, columns=["ticker", "date"],
+                         root=args.daily_root, batch_size=LOAD_BATCH):
+        done = min(done + LOAD_BATCH, len(tickers_with_data))
+        log(f"  Progreso: {done}/{len(tickers_with_data)} ({done/len(tickers_with_data)*100:.1f}%)")
+        if df.is_empty():
             continue
 
-        year_dirs = [d for d in ticker_path.iterdir() if d.is_dir() and d.name.startswith('year=')]
-
-        for year_dir in sorted(year_dirs):
-            try:
-                year_str = year_dir.name.replace('year=', '')
-                year_int = int(year_str)
-
-                # Filtrar por rango de años
-                if args.year_min is not None and year_int < args.year_min:
-                    continue
-                if args.year_max is not None and year_int > args.year_max:
-                    continue
-
-                daily_file = year_dir / 'daily.parquet'
-
-                # Intentar leer directamente (evita problemas con exists() en archivos corruptos)
-                df = pl.read_parquet(daily_file)
-                dates = df.select('date').to_series().to_list()
-
-                for date_str in dates:
-                    # Verificar si quote ya existe (si se especifica quotes-root)
-                    if args.quotes_root:
-                        y, m, _ = date_str.split('-')
-                        quotes_file = Path(args.quotes_root) / ticker / f'year={y}' / f'month={m}' / f'day={date_str}' / 'quotes.parquet'
-                        try:
-                            if quotes_file.exists():
-                                continue
-                        except (PermissionError, OSError):
-                            pass  # Si no podemos verificar, lo añadimos
-
-                    all_dates.append({
-                        'ticker': ticker,
-                        'date': date_str
-                    })
-
-            except (PermissionError, OSError, Exception) as e:
-                # Archivo corrupto (CRC error) u otro problema - skip
-                continue
-
-    log(f"  Progreso: {len(tickers_with_data)}/{len(tickers_with_data)} (100.0%)")
+        df = df.select([pl.col("ticker").cast(pl.Utf8),
+                        pl.col("date").cast(pl.Utf8).str.slice(0, 10)]).unique().sort(["ticker", "date"])
+        for ticker, date_str in df.iter_rows():
+            # Verificar si quote ya existe (si se especifica quotes-root)
+            if args.quotes_root:
+                y, m, _ = date_str.split('-')
+                month_dir = ticker_dir(args.quotes_root, ticker) / f'year={y}' / f'month={m}'
+                quotes_file = month_dir / f'day={date_str}' / 'quotes.parquet'
+                try:
+                    # Suelto o ya fusionado en el quotes.parquet del mes (compact_small_files.py)
+                    if quotes_file.exists() or date_str in compacted_days(month_dir):
+                        continue
+                except (PermissionError, OSError):
+                    pass  # Si no podemos verificar, lo añadimos
+
+            all_dates.append({
+                'ticker': ticker,
+                'date': date_str
+            })
+
 
     # Crear DataFrame y guardar
     log("")
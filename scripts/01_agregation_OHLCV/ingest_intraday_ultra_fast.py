@@ -16,17 +16,36 @@ import polars as pl
 from pathlib import Path
 import os
 import sys
-import json
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Set, Optional, Tuple
 import time
+import threading
 from concurrent.futures import ThreadPoolExecutor
 import backoff
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from state_store import StateStore, default_state_db, DONE, EMPTY, ERROR  # noqa: E402
+from dataset_catalog import CatalogWriter, default_catalog_dir  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from minute_cache import MinuteHotCache, default_cache_dir  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from store_query import load as load_store, packed_files, packed_months  # noqa: E402
+from split_adjust import mark_unadjusted  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
+DATASET = "intraday_1m"
+LOW_VOLUME = "low_volume"
+ENDPOINT = "v2/aggs"
+
 class UltraFastIntradayDownloader:
-    def __init__(self, api_key: str, outdir: Path, daily_dir: Path = None, max_concurrent: int = 50):
+    def __init__(self, api_key: str, outdir: Path, daily_dir: Path = None, max_concurrent: int = 50,
+                 adjusted: bool = True, state_db: Path = None, catalog_dir: Path = None,
+                 catalog: bool = True, hive: bool = False, metrics: IngestMetrics = None):
         self.api_key = api_key
         self.outdir = outdir
+        self.hive = use_hive(outdir, hive)  # layout ticker=X/... (utils/hive_layout.py)
+        self.adjusted = adjusted  # False -> ajuste por split en lectura (utils/split_adjust.py)
         self.daily_dir = daily_dir  # Para skip inteligente
         self.base_url = "https://api.polygon.io"
         self.max_concurrent = max_concurrent
@@ -35,12 +54,27 @@ class UltraFastIntradayDownloader:
         # Sesión HTTP
         self.session = None
         
-        # Cache y checkpoint
-        self.cache_file = outdir / ".cache_intraday.json"
-        self.empty_months_cache = self.load_cache()
+        # Estado por (ticker, YYYY-MM) en SQLite (antes .cache_intraday.json)
+        self.state = StateStore(state_db or default_state_db(outdir))
+        self.import_legacy_cache(outdir / ".cache_intraday.json")
+        self.skip_months = self.state.keys(DATASET, [EMPTY, LOW_VOLUME])
+
+        # Por ticker en curso: (años, meses YYYY-MM) del daily y meses ya en
+        # TICKER/minute.parquet compactado (utils/compact_small_files.py)
+        self.daily_calendar: Dict[str, Tuple[Set[int], Set[str]]] = {}
+        self.packed_months: Dict[str, Set[str]] = {}
+
+        # Catálogo de ficheros (utils/dataset_catalog.py)
+        self.catalog = CatalogWriter(catalog_dir or default_catalog_dir(outdir), "ohlcv_1m", outdir) \
+            if catalog else None
         
         # Thread pool para compresión
         self.compression_executor = ThreadPoolExecutor(max_workers=8)  # Más threads
+        self.pending_saves = 0  # meses enviados al pool sin escribir (writer backlog)
+        self.pending_lock = threading.Lock()
+
+        # Métricas en vivo (utils/ingest_metrics.py)
+        self.metrics = metrics
         
         # Métricas
         self.stats = {
@@ -51,74 +85,75 @@ class UltraFastIntradayDownloader:
             'start_time': None
         }
     
-    def load_cache(self) -> Dict:
-        """Carga cache con metadata"""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    data = json.load(f)
-                    # Convertir listas a sets
-                    return {
-                        'empty': set(data.get('empty', [])),
-                        'low_volume': set(data.get('low_volume', []))
-                    }
-            except:
-                return {'empty': set(), 'low_volume': set()}
-        return {'empty': set(), 'low_volume': set()}
+    def import_legacy_cache(self, cache_file: Path):
+        """Importa una sola vez el .cache_intraday.json (claves TICKER_YYYY_MM)"""
+        def to_records(data):
+            for status in (EMPTY, LOW_VOLUME):
+                for key in data.get(status, []):
+                    ticker, year, month = key.rsplit('_', 2)
+                    yield {'dataset': DATASET, 'ticker': ticker,
+                           'period': f"{year}-{month}", 'status': status}
+        n = self.state.import_legacy_json(cache_file, to_records)
+        if n:
+            print(f"Importados {n:,} meses de {cache_file} al state store")
     
-    def save_cache(self):
-        """Guarda cache"""
-        cache_data = {
-            'empty': list(self.empty_months_cache.get('empty', set())),
-            'low_volume': list(self.empty_months_cache.get('low_volume', set())),
-            'timestamp': datetime.now().isoformat()
-        }
-        with open(self.cache_file, 'w') as f:
-            json.dump(cache_data, f)
+    def mark_month(self, ticker: str, year: int, month: int, status: str, **kwargs):
+        """Registra el resultado del mes en el state store"""
+        period = f"{year:04d}-{month:02d}"
+        self.state.mark(DATASET, ticker, period, status, **kwargs)
+        if status in (EMPTY, LOW_VOLUME):
+            self.skip_months.add((ticker, period))
     
     def should_skip_month(self, ticker: str, year: int, month: int) -> bool:
         """
         Determina si debemos saltar un mes basado en:
-        1. Cache de meses vacíos
+        1. Meses vacíos en el state store
         2. Volumen daily (si disponible)
         """
-        cache_key = f"{ticker}_{year:04d}_{month:02d}"
-        
-        # Check cache
-        if cache_key in self.empty_months_cache.get('empty', set()):
+        # Meses vacíos / bajo volumen ya registrados
+        if (ticker, f"{year:04d}-{month:02d}") in self.skip_months:
             self.stats['skipped_months'] += 1
             return True
         
-        if cache_key in self.empty_months_cache.get('low_volume', set()):
-            self.stats['skipped_months'] += 1
-            return True
-        
-        # Check volumen daily si tenemos acceso
-        if self.daily_dir:
-            daily_file = self.daily_dir / ticker / f"year={year}" / "daily.parquet"
-            if daily_file.exists():
-                try:
-                    df = pl.read_parquet(daily_file)
-                    # Filtrar días del mes
-                    month_str = f"{year:04d}-{month:02d}"
-                    df_month = df.filter(pl.col('date').str.starts_with(month_str))
-                    
-                    if df_month.is_empty():
-                        self.empty_months_cache.setdefault('empty', set()).add(cache_key)
-                        return True
+        # Check daily (year=*/daily.parquet, TICKER/daily.parquet o Hive vía store_query)
+        calendar = self.daily_calendar.get(ticker)
+        if calendar is not None:
+            years, months = calendar
+            # Sin daily ese año no sabemos nada: no se salta
+            if year in years and f"{year:04d}-{month:02d}" not in months:
+                self.mark_month(ticker, year, month, EMPTY, rows=0)
+                return True
 
-                    # DESACTIVADO: Skip por volumen bajo
-                    # Descargamos TODO sin filtrar por volumen
-                    # vol_col = 'volume' if 'volume' in df.columns else 'v'
-                    # avg_volume = df_month[vol_col].mean()
-                    # if avg_volume < 1000:
-                    #     self.empty_months_cache.setdefault('low_volume', set()).add(cache_key)
-                    #     return True
-                except:
-                    pass
+            # DESACTIVADO: Skip por volumen bajo
+            # Descargamos TODO sin filtrar por volumen
+            # (calendario sin volumen: si se reactiva, cargar también la columna v)
+            # if avg_volume < 1000:
+            #     self.mark_month(ticker, year, month, LOW_VOLUME)
+            #     return True
         
         return False
     
+    def prepare_ticker(self, ticker: str):
+        """Carga una vez por ticker el calendario daily y los meses ya compactados"""
+        if self.daily_dir:
+            try:
+                df = load_store("ohlcv_daily", [ticker], columns=["date"], root=self.daily_dir)
+                months = set(df["date"].cast(pl.Utf8).str.slice(0, 7).drop_nulls().to_list()) \
+                    if not df.is_empty() else set()
+                self.daily_calendar[ticker] = ({int(m[:4]) for m in months}, months)
+            except Exception:
+                pass
+        packed = packed_files("ohlcv_1m", self.outdir, [ticker]).get(ticker)
+        if packed:
+            try:
+                self.packed_months[ticker] = packed_months(packed[0])
+            except Exception:
+                pass
+
+    def release_ticker(self, ticker: str):
+        self.daily_calendar.pop(ticker, None)
+        self.packed_months.pop(ticker, None)
+
     async def init_session(self):
         """Sesión con configuración ultra-agresiva"""
         connector = aiohttp.TCPConnector(
@@ -160,8 +195,8 @@ class UltraFastIntradayDownloader:
             return None
         
         # Check si ya existe
-        output_file = self.outdir / ticker / f"year={year}" / f"month={month:02d}" / "minute.parquet"
-        if output_file.exists():
+        output_file = partition_dir(self.outdir, ticker, year, f"{month:02d}", hive=self.hive) / "minute.parquet"
+        if output_file.exists() or f"{year:04d}-{month:02d}" in self.packed_months.get(ticker, ()):
             return None
         
         # Rango del mes
@@ -177,7 +212,7 @@ class UltraFastIntradayDownloader:
         
         url = f"{self.base_url}/v2/aggs/ticker/{ticker}/range/1/minute/{from_date}/{to_date_str}"
         params = {
-            'adjusted': 'true',
+            'adjusted': 'true' if self.adjusted else 'false',
             'sort': 'asc',
             'limit': 50000
         }
@@ -193,27 +228,37 @@ class UltraFastIntradayDownloader:
                 if cursor:
                     current_params['cursor'] = cursor
                 
+                t0, observed = time.perf_counter(), False
                 try:
                     async with self.session.get(url, params=current_params) as resp:
+                        if resp.status != 200 and self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, resp.status, time.perf_counter() - t0)
+                            observed = True
                         if resp.status == 429:
+                            if self.metrics is not None:
+                                self.metrics.retry(ENDPOINT, 429)
                             await asyncio.sleep(2)
                             continue
                         
                         if resp.status in [404, 400]:
-                            cache_key = f"{ticker}_{year:04d}_{month:02d}"
-                            self.empty_months_cache.setdefault('empty', set()).add(cache_key)
+                            self.mark_month(ticker, year, month, EMPTY, pages=0, rows=0)
                             return None
                         
                         if resp.status != 200:
                             self.stats['errors'] += 1
+                            self.mark_month(ticker, year, month, ERROR, pages=pages,
+                                            error=f"HTTP {resp.status}")
                             return all_results if all_results else None
                         
                         data = await resp.json()
                         results = data.get('results', [])
+                        if self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, resp.status, time.perf_counter() - t0)
+                            self.metrics.add_rows(len(results))
+                            observed = True
                         
                         if not results and pages == 0:
-                            cache_key = f"{ticker}_{year:04d}_{month:02d}"
-                            self.empty_months_cache.setdefault('empty', set()).add(cache_key)
+                            self.mark_month(ticker, year, month, EMPTY, pages=1, rows=0)
                             return None
                         
                         all_results.extend(results)
@@ -232,7 +277,10 @@ class UltraFastIntradayDownloader:
                             break
                             
                 except Exception as e:
+                    if self.metrics is not None and not observed:
+                        self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
                     self.stats['errors'] += 1
+                    self.mark_month(ticker, year, month, ERROR, pages=pages, error=repr(e))
                     if pages == 0:
                         return None
                     break
@@ -269,22 +317,34 @@ class UltraFastIntradayDownloader:
                     df = df.rename({old: new})
             
             # Guardar
-            output_dir = self.outdir / ticker / f"year={year}" / f"month={month:02d}"
+            output_dir = partition_dir(self.outdir, ticker, year, f"{month:02d}", hive=self.hive)
             output_dir.mkdir(parents=True, exist_ok=True)
             output_file = output_dir / "minute.parquet"
             
-            df.sort('timestamp').write_parquet(
-                output_file,
-                compression='zstd',
-                compression_level=1,  # Más rápido
-                statistics=False,  # Menos overhead
-                row_group_size=200000
-            )
+            write_parquet(df.sort('timestamp'), output_file, "ohlcv_1m")
+            if self.catalog is not None:
+                self.catalog.record(output_file, df)
+            size = output_file.stat().st_size
+            self.mark_month(ticker, year, month, DONE, rows=df.height, bytes=size)
+            if self.metrics is not None:
+                self.metrics.add_bytes(size)
         except Exception as e:
+            self.mark_month(ticker, year, month, ERROR, error=repr(e))
             print(f"Error guardando {ticker} {year}-{month}: {e}")
+        finally:
+            self._saved(-1)
+
+    def _saved(self, delta: int):
+        """Actualiza los meses pendientes de escribir en el pool"""
+        with self.pending_lock:
+            self.pending_saves += delta
+            pending = self.pending_saves
+        if self.metrics is not None:
+            self.metrics.writer_backlog(pending)
     
     async def process_ticker_ultra_fast(self, ticker: str, start_year: int, end_year: int):
         """Procesa ticker con todas las optimizaciones"""
+        self.prepare_ticker(ticker)
         
         # Generar tareas priorizadas (meses recientes primero)
         tasks = []
@@ -315,6 +375,7 @@ class UltraFastIntradayDownloader:
         save_futures = []
         for (year, month), result in zip(tasks, results):
             if isinstance(result, list) and result:
+                self._saved(+1)
                 future = self.compression_executor.submit(
                     self.save_month_data_sync, result, ticker, year, month
                 )
@@ -326,6 +387,7 @@ class UltraFastIntradayDownloader:
                 future.result(timeout=30)
             except:
                 pass
+        self.release_ticker(ticker)
     
     async def download_all_ultra_fast(self, tickers: List[str], start_year: int, end_year: int):
         """Descarga masiva ultra-rápida"""
@@ -346,6 +408,8 @@ class UltraFastIntradayDownloader:
         
         for i in range(0, len(tickers), batch_size):
             batch = tickers[i:i + batch_size]
+            if self.metrics is not None:
+                self.metrics.queue_depth("tickers", total - i)
             
             tasks = [
                 self.process_ticker_ultra_fast(t, start_year, end_year)
@@ -354,10 +418,6 @@ class UltraFastIntradayDownloader:
             
             await asyncio.gather(*tasks, return_exceptions=True)
             
-            # Save cache cada 50 tickers
-            if (i + batch_size) % 50 == 0:
-                self.save_cache()
-            
             # Progress
             done = min(i + batch_size, total)
             elapsed = time.time() - self.stats['start_time']
@@ -365,17 +425,27 @@ class UltraFastIntradayDownloader:
             eta = (total - done) / rate if rate > 0 else 0
             
             if done % 20 == 0 or done == total:
+                mb_s = self.metrics.rates()['mb_s'] if self.metrics is not None else 0.0
                 print(f"[{datetime.now():%H:%M:%S}] {done}/{total} "
                       f"({done/total*100:.1f}%) | "
                       f"{rate:.2f} tickers/s | "
+                      f"{mb_s:.2f} MB/s | "
                       f"ETA: {eta/60:.1f}m | "
                       f"Rows: {self.stats['total_rows']/1e6:.1f}M | "
                       f"Skip: {self.stats['skipped_months']}")
+        if self.metrics is not None:
+            self.metrics.queue_depth("tickers", 0)
     
     async def close(self):
         if self.session:
             await self.session.close()
         self.compression_executor.shutdown(wait=False)  # No esperar
+        if self.catalog is not None:
+            # Escrituras aún en vuelo quedan fuera: dataset_catalog.py build las reconcilia
+            self.catalog.close()
+        self.state.close()
+        if self.metrics is not None:
+            self.metrics.close()
 
 async def main():
     import argparse
@@ -388,7 +458,18 @@ async def main():
     parser.add_argument('--end-year', type=int, default=2025)
     parser.add_argument('--concurrent', type=int, default=50)
     parser.add_argument('--api-key', help='Polygon API key')
+    parser.add_argument('--unadjusted', action='store_true',
+                        help='Descargar adjusted=false (ajuste por split en lectura)')
+    parser.add_argument('--state-db', help='SQLite de estado (default: TSIS_STATE_DB o <outdir>/_state.sqlite)')
+    parser.add_argument('--catalog-dir', help='Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog)')
+    parser.add_argument('--no-catalog', action='store_true', help='No registrar ficheros en el catálogo')
+    parser.add_argument('--hot-cache-dir',
+                        help='Caché 1m de los últimos días a mantener al día (default: <outdir>/../minute_hot_cache si existe)')
+    parser.add_argument('--no-hot-cache', action='store_true', help='No actualizar la caché 1m al terminar')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/year=/month=MM (automático si outdir ya está migrado)')
     
+    add_metrics_args(parser)
     args = parser.parse_args()
     
     api_key = args.api_key or os.getenv('POLYGON_API_KEY')
@@ -413,9 +494,19 @@ async def main():
         api_key=api_key,
         outdir=Path(args.outdir),
         daily_dir=daily_dir,
-        max_concurrent=args.concurrent
+        max_concurrent=args.concurrent,
+        adjusted=not args.unadjusted,
+        state_db=Path(args.state_db) if args.state_db else None,
+        catalog_dir=Path(args.catalog_dir) if args.catalog_dir else None,
+        catalog=not args.no_catalog,
+        hive=args.hive_layout,
+        metrics=metrics_from_args(args, "ohlcv_1m")
     )
     
+    # Marcador leído por utils/split_adjust.py: store sin ajustar
+    if args.unadjusted:
+        mark_unadjusted(args.outdir)
+    
     try:
         await downloader.init_session()
         await downloader.download_all_ultra_fast(
@@ -434,5 +525,15 @@ async def main():
     finally:
         await downloader.close()
 
+    # Caché caliente (utils/minute_cache.py): solo se recargan los tickers con meses reescritos
+    cache_dir = Path(args.hot_cache_dir) if args.hot_cache_dir else default_cache_dir(args.outdir)
+    if not args.no_hot_cache and (args.hot_cache_dir or cache_dir.exists()):
+        try:
+            n = MinuteHotCache(cache_dir).update(args.outdir, workers=os.cpu_count() or 4,
+                                                 catalog_dir=args.catalog_dir)
+            print(f"Caché 1m: {n:,} tickers actualizados ({cache_dir})")
+        except Exception as e:
+            print(f"Caché 1m no actualizada: {e}")
+
 if __name__ == '__main__':
     asyncio.run(main())
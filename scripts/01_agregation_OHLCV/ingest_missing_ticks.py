@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """
 Descarga ticks faltantes desde Polygon usando el CSV de fechas faltantes.
-Input: CSV con columnas ticker,missing_date
+Input: CSV o parquet con columnas ticker,missing_date
+(p.ej. <prefix>_missing_dates.parquet de verify_ticks_vs_daily.py)
+
+Con --queue consume la cola 'trades' del state store (ticker, YYYY-MM-DD) que
+llena utils/repair_planner.py, por lotes reclamados con lease; cada día
+queda done / error en el state store.
 """
 
 import polars as pl
@@ -15,11 +20,23 @@ from polygon import RESTClient
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from state_store import StateStore, default_state_db, DONE, ERROR  # noqa: E402
+from ingest_metrics import add_metrics_args, metrics_from_args  # noqa: E402
+from store_query import compacted_days  # noqa: E402
+
+DATASET = "trades"
+# RESTClient pagina por dentro: cada día cuenta como un request (latencia del día completo)
+ENDPOINT = "v3/trades"
+
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {msg}", flush=True)
 
-def download_ticks_for_date(client, ticker, date, outdir, max_retries=3):
+def download_ticks_for_date(client, ticker, date, outdir, max_retries=3, hive=False, metrics=None):
     """
     Descarga ticks (market) para un ticker en una fecha específica.
     Retorna True si exitoso, False si error.
@@ -28,14 +45,15 @@ def download_ticks_for_date(client, ticker, date, outdir, max_retries=3):
     year, month, _ = date.split('-')
 
     # Path de salida
-    output_path = Path(outdir) / ticker / f"year={year}" / f"month={month}" / f"day={date}"
+    output_path = partition_dir(outdir, ticker, year, month, date, hive=hive)
     market_file = output_path / "market.parquet"
 
-    # Skip si ya existe
-    if market_file.exists():
+    # Skip si ya existe (suelto o fusionado en el trades.parquet del mes)
+    if market_file.exists() or date in compacted_days(output_path.parent):
         return True
 
     for attempt in range(max_retries):
+        t0 = time.perf_counter()
         try:
             # Descargar trades (market hours: 09:30-16:00 ET)
             # No usar 'date' parameter junto con timestamp_gte/lt
@@ -53,6 +71,9 @@ def download_ticks_for_date(client, ticker, date, outdir, max_retries=3):
                     'exchange': trade.exchange,
                     'conditions': ','.join(str(c) for c in trade.conditions) if trade.conditions else '',
                 })
+            if metrics is not None:
+                metrics.observe_request(ENDPOINT, 200, time.perf_counter() - t0)
+                metrics.add_rows(len(trades))
 
             if not trades:
                 # Sin trades, crear archivo vacío
@@ -65,16 +86,25 @@ def download_ticks_for_date(client, ticker, date, outdir, max_retries=3):
                     'conditions': []
                 })
                 df.write_parquet(market_file)
+                if metrics is not None:
+                    metrics.add_bytes(market_file.stat().st_size)
                 return True
 
             # Guardar
             output_path.mkdir(parents=True, exist_ok=True)
             df = pl.DataFrame(trades)
-            df.write_parquet(market_file)
+            write_parquet(df, market_file, "trades")
+            if metrics is not None:
+                metrics.add_bytes(market_file.stat().st_size)
 
             return True
 
         except Exception as e:
+            if metrics is not None:
+                status = getattr(e, 'status', None) or type(e).__name__
+                metrics.observe_request(ENDPOINT, status, time.perf_counter() - t0)
+                if attempt < max_retries - 1:
+                    metrics.retry(ENDPOINT, status)
             if attempt < max_retries - 1:
                 # Backoff exponencial: 2, 4, 8 segundos
                 wait_time = 2 ** (attempt + 1)
@@ -85,16 +115,80 @@ def download_ticks_for_date(client, ticker, date, outdir, max_retries=3):
 
     return False
 
+def download_from_queue(api_key, outdir, hive, state, workers=10, batch_size=500, delay=0.12,
+                        limit=None, max_attempts=3, metrics=None):
+    """
+    Consume la cola 'trades' del state store por lotes (mayor prioridad primero).
+    Cada día termina done / error; lo reclamado y no resuelto vuelve a la cola.
+    """
+    counts = state.queue_counts(DATASET)
+    log(f"En cola: {counts['pending']:,} (reclamados por otros: {counts['leased']:,})")
+    local = threading.local()
+    done = errors = 0
+    start_time = time.time()
+
+    def work(ticker, date):
+        # Un client por thread
+        if not hasattr(local, 'client'):
+            local.client = RESTClient(api_key)
+        ok = download_ticks_for_date(local.client, ticker, date, outdir, hive=hive, metrics=metrics)
+        time.sleep(delay)
+        return ok
+
+    while limit is None or done + errors < limit:
+        n = batch_size if limit is None else min(batch_size, limit - done - errors)
+        claimed = state.claim(DATASET, n, max_attempts=max_attempts)
+        if metrics is not None:
+            metrics.queue_depth(DATASET, state.queue_counts(DATASET)['pending'])
+        if not claimed:
+            break
+        batch = [(ticker, date) for ticker, date, _ in claimed]
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(work, t, d): (t, d) for t, d in batch}
+                for future in as_completed(futures):
+                    ticker, date = futures[future]
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        ok, err = False, repr(e)
+                    else:
+                        err = None if ok else 'descarga fallida'
+                    if ok:
+                        done += 1
+                        state.mark(DATASET, ticker, date, DONE)
+                    else:
+                        errors += 1
+                        state.mark(DATASET, ticker, date, ERROR, error=err)
+        finally:
+            state.release(DATASET, batch)
+
+        elapsed = time.time() - start_time
+        mb_s = metrics.rates()['mb_s'] if metrics is not None else 0.0
+        log(f"  Completados: {done:,} | Errores: {errors:,} | "
+            f"Rate: {(done + errors) / elapsed if elapsed > 0 else 0:.1f} días/s | {mb_s:.2f} MB/s | "
+            f"En cola: {state.queue_counts(DATASET)['pending']:,}")
+    return done, errors
+
 def main():
     parser = argparse.ArgumentParser(description='Descargar ticks faltantes desde CSV')
-    parser.add_argument('--missing-csv', required=True, help='CSV con columnas ticker,missing_date')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--missing-csv', help='CSV o parquet con columnas ticker,missing_date')
+    source.add_argument('--queue', action='store_true',
+                        help="Consumir la cola 'trades' del state store (ver utils/repair_planner.py)")
     parser.add_argument('--outdir', required=True, help='Directorio de salida (ej: C:\\TSIS_Data\\trades_ticks_2004_2018)')
     parser.add_argument('--api-key', help='Polygon API key (o usar POLYGON_API_KEY env var)')
     parser.add_argument('--workers', type=int, default=10, help='Número de workers paralelos (default: 10)')
     parser.add_argument('--limit', type=int, help='Limitar a N fechas (para testing)')
     parser.add_argument('--delay', type=float, default=0.12, help='Delay entre requests en segundos (default: 0.12)')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/... (automático si outdir ya está migrado)')
+    parser.add_argument('--state-db', help='SQLite de estado (default: TSIS_STATE_DB o <outdir>/_state.sqlite)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Días reclamados por lote con --queue (default: 500)')
+    add_metrics_args(parser)
 
     args = parser.parse_args()
+    hive = use_hive(args.outdir, args.hive_layout)
 
     # API key
     api_key = args.api_key or os.getenv('POLYGON_API_KEY')
@@ -103,14 +197,32 @@ def main():
         sys.exit(1)
 
     client = RESTClient(api_key)
+    metrics = metrics_from_args(args, DATASET)
 
     log("=" * 80)
     log("DESCARGA DE TICKS FALTANTES")
     log("=" * 80)
 
+    if args.queue:
+        state = StateStore(args.state_db or default_state_db(args.outdir))
+        start_time = time.time()
+        try:
+            done, errors = download_from_queue(api_key, args.outdir, hive, state, args.workers,
+                                               args.batch_size, args.delay, args.limit,
+                                               metrics=metrics)
+        finally:
+            state.close()
+            metrics.close()
+        log(f"Cola terminada: {done:,} días descargados, {errors:,} errores "
+            f"en {(time.time() - start_time)/60:.1f} minutos")
+        return
+
     # Cargar CSV de fechas faltantes
     log(f"Cargando fechas faltantes desde {args.missing_csv}")
-    df = pl.read_csv(args.missing_csv)
+    if args.missing_csv.endswith('.parquet'):
+        df = pl.read_parquet(args.missing_csv, columns=['ticker', 'missing_date'])
+    else:
+        df = pl.read_csv(args.missing_csv)
 
     if args.limit:
         df = df.head(args.limit)
@@ -142,7 +254,7 @@ def main():
         api_key, ticker, date, outdir = task_data
         # Cada worker necesita su propio client
         worker_client = RESTClient(api_key)
-        success = download_ticks_for_date(worker_client, ticker, date, outdir)
+        success = download_ticks_for_date(worker_client, ticker, date, outdir, hive=hive, metrics=metrics)
         return (ticker, date, success)
 
     # Preparar tasks
@@ -162,6 +274,7 @@ def main():
                     success_count += 1
                 else:
                     error_count += 1
+                metrics.queue_depth("days", total_dates - completed_count)
 
                 # Progreso cada 100 completados
                 if completed_count % 100 == 0 or completed_count == 1:
@@ -169,7 +282,7 @@ def main():
                     rate = completed_count / elapsed if elapsed > 0 else 0
                     remaining = (total_dates - completed_count) / rate if rate > 0 else 0
                     log(f"  Progreso: {completed_count}/{total_dates} ({completed_count/total_dates*100:.1f}%) | "
-                        f"Rate: {rate:.1f} req/s | "
+                        f"Rate: {rate:.1f} req/s | {metrics.rates()['mb_s']:.2f} MB/s | "
                         f"ETA: {remaining/60:.1f} min | "
                         f"Success: {success_count} | Errors: {error_count}")
 
@@ -177,6 +290,7 @@ def main():
             time.sleep(args.delay / args.workers)
 
     # Resumen final
+    metrics.close()
     elapsed = time.time() - start_time
     log("")
     log("=" * 80)
@@ -33,6 +33,15 @@ import polars as pl
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from dataset_catalog import CatalogWriter, default_catalog_dir  # noqa: E402
+from daily_panel import DailyPanel, default_panel_dir  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from split_adjust import mark_unadjusted  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
 # Configure UTF-8 encoding for stdout/stderr
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
@@ -47,6 +56,10 @@ RETRY_MAX = 8
 BACKOFF = 1.6
 PAGE_LIMIT = 50000
 ADJUSTED = True
+CATALOG: Optional[CatalogWriter] = None  # utils/dataset_catalog.py (None = desactivado)
+HIVE = False  # layout ticker=X/year=YYYY (utils/hive_layout.py)
+METRICS: Optional[IngestMetrics] = None  # utils/ingest_metrics.py
+ENDPOINT = "v2/aggs"
 
 def log(m):
     """Log con timestamp"""
@@ -103,8 +116,13 @@ def http_get_json(url: str, params: Dict[str, Any], headers: Dict[str, str]) ->
     """GET con reintentos exponenciales y manejo de rate limits"""
     last_error = None
     for attempt in range(1, RETRY_MAX + 1):
+        r, t0 = None, time.perf_counter()
         try:
             r = requests.get(url, params=params, headers=headers, timeout=TIMEOUT)
+            if METRICS is not None:
+                METRICS.observe_response(ENDPOINT, r, time.perf_counter() - t0)
+                if r.status_code == 429 or r.status_code >= 500:
+                    METRICS.retry(ENDPOINT, r.status_code)
 
             if r.status_code == 429:
                 sleep_time = int(r.headers.get("Retry-After", "2"))
@@ -123,6 +141,10 @@ def http_get_json(url: str, params: Dict[str, Any], headers: Dict[str, str]) ->
 
         except Exception as e:
             last_error = e
+            if METRICS is not None:
+                if r is None:
+                    METRICS.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+                METRICS.retry(ENDPOINT, type(e).__name__)
             sleep_time = min(30, BACKOFF ** attempt)
             log(f"GET error {e} -> backoff {sleep_time:.1f}s")
             time.sleep(sleep_time)
@@ -152,6 +174,8 @@ def fetch_daily(api_key: str, ticker: str, from_date: str, to_date: str) -> List
         results = data.get("results") or []
         rows.extend(results)
         pages += 1
+        if METRICS is not None:
+            METRICS.add_rows(len(results))
 
         # Extraer cursor de next_url
         cursor = (parse_next_cursor(data.get("next_url")) or
@@ -213,8 +237,8 @@ def write_by_year(df: pl.DataFrame, outdir: Path, ticker: str) -> int:
         y = year[0]
         part = part.drop("year").sort("date")
 
-        # Crear directorio ticker/year=YYYY
-        pdir = outdir / ticker / f"year={y}"
+        # Crear directorio ticker/year=YYYY (ticker=X/year=YYYY en layout Hive)
+        pdir = partition_dir(outdir, ticker, y, hive=HIVE)
         pdir.mkdir(parents=True, exist_ok=True)
 
         outp = pdir / "daily.parquet"
@@ -225,10 +249,14 @@ def write_by_year(df: pl.DataFrame, outdir: Path, ticker: str) -> int:
             merged = pl.concat([old, part], how="vertical_relaxed")\
                       .unique(subset=["date"], keep="last")\
                       .sort("date")
-            merged.write_parquet(outp)
         else:
-            part.write_parquet(outp)
+            merged = part
+        write_parquet(merged, outp, "ohlcv_daily")
+        if METRICS is not None:
+            METRICS.add_bytes(outp.stat().st_size)
 
+        if CATALOG is not None:
+            CATALOG.record(outp, merged)
         files_written += 1
 
     return files_written
@@ -245,8 +273,22 @@ def main():
                     help="Fecha fin YYYY-MM-DD")
     ap.add_argument("--max-workers", type=int, default=12,
                     help="Workers paralelos (default: 12)")
+    ap.add_argument("--unadjusted", action="store_true",
+                    help="Descargar adjusted=false (ajuste por split en lectura, ver utils/split_adjust.py)")
+    ap.add_argument("--catalog-dir", default=None,
+                    help="Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog)")
+    ap.add_argument("--no-catalog", action="store_true", help="No registrar ficheros en el catálogo")
+    ap.add_argument("--panel-dir", default=None,
+                    help="Panel diario por mes a mantener al día (default: <outdir>/../daily_panel si existe)")
+    ap.add_argument("--no-panel", action="store_true", help="No actualizar el panel diario al terminar")
+    ap.add_argument("--hive-layout", action="store_true",
+                    help="Escribir en layout Hive ticker=X/year=YYYY (automático si outdir ya está migrado)")
+    add_metrics_args(ap)
     args = ap.parse_args()
 
+    global ADJUSTED, CATALOG, HIVE, METRICS
+    ADJUSTED = not args.unadjusted
+
     api_key = os.getenv("POLYGON_API_KEY")
     if not api_key:
         sys.exit("ERROR: variable POLYGON_API_KEY no establecida")
@@ -255,9 +297,18 @@ def main():
     tickers = load_tickers(args.tickers_csv)
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
+    HIVE = use_hive(outdir, args.hive_layout)
+
+    # Marcador leído por utils/split_adjust.py: store sin ajustar
+    if not ADJUSTED:
+        mark_unadjusted(outdir)
+
+    if not args.no_catalog:
+        CATALOG = CatalogWriter(args.catalog_dir or default_catalog_dir(outdir), "ohlcv_daily", outdir)
+    METRICS = metrics_from_args(args, "ohlcv_daily")
 
     log(f"Descargando DAILY para {len(tickers):,} tickers [{args.date_from} → {args.date_to}]")
-    log(f"Workers: {args.max_workers} | Outdir: {outdir}")
+    log(f"Workers: {args.max_workers} | Outdir: {outdir} | adjusted={str(ADJUSTED).lower()} | hive={str(HIVE).lower()}")
 
     results = []
 
@@ -269,6 +320,7 @@ def main():
 
         for i, future in enumerate(as_completed(futures), 1):
             ticker = futures[future]
+            METRICS.queue_depth("tickers", len(tickers) - i)
             try:
                 rows = future.result()
                 df = rows_to_df(rows, ticker)
@@ -278,7 +330,13 @@ def main():
                 results.append(f"{ticker}: ERROR {e}")
 
             if i % 200 == 0:
-                log(f"Progreso {i:,}/{len(tickers):,}")
+                rates = METRICS.rates()
+                log(f"Progreso {i:,}/{len(tickers):,} | {rates['req_s']:.1f} req/s | "
+                    f"{rates['rows_s']:,.0f} rows/s | {rates['mb_s']:.2f} MB/s")
+
+    if CATALOG is not None:
+        CATALOG.close()
+    METRICS.close()
 
     # Guardar log de resultados
     ok = sum("ERROR" not in r for r in results)
@@ -287,6 +345,16 @@ def main():
     log_file = outdir / "daily_download.log"
     log_file.write_text("\n".join(results), encoding="utf-8")
 
+    # Panel transversal (utils/daily_panel.py): solo se re-transponen los tickers reescritos
+    panel_dir = Path(args.panel_dir) if args.panel_dir else default_panel_dir(outdir)
+    if not args.no_panel and (args.panel_dir or panel_dir.exists()):
+        try:
+            n = DailyPanel(panel_dir).update(outdir, workers=min(args.max_workers, os.cpu_count() or 4),
+                                             catalog_dir=args.catalog_dir)
+            log(f"Panel diario: {n:,} tickers actualizados ({panel_dir})")
+        except Exception as e:
+            log(f"Panel diario no actualizado: {e}")
+
     log(f"\n=== COMPLETADO ===")
     log(f"OK: {ok:,} | ERRORES: {err:,}")
     log(f"Log: {log_file}")
@@ -25,6 +25,11 @@ Uso tipico con launcher externo (paralelismo fuera):
     --from 2019-01-01 --to 2025-11-01 \
     --rate-limit 0.20 \
     --max-tickers-per-process 40
+
+Modo cola (reparaciones de utils/repair_planner.py): --queue consume la cola
+'ohlcv_1m' del state store, con una ventana YYYY-MM-DD:YYYY-MM-DD por item;
+cada ventana se descarga entera y se mergea en los ficheros mensuales:
+  python scripts/ingest_ohlcv_intraday_minute.py --queue --outdir raw/polygon/ohlcv_intraday_1m
 """
 import os, sys, io, gc, time, argparse, datetime as dt
 from pathlib import Path
@@ -36,6 +41,15 @@ import polars as pl
 from dotenv import load_dotenv
 import certifi
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from dataset_catalog import CatalogWriter, default_catalog_dir  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from split_adjust import mark_unadjusted  # noqa: E402
+from state_store import StateStore, default_state_db, DONE, ERROR  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
 # stdout/stderr UTF-8
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
@@ -49,6 +63,11 @@ BACKOFF    = 1.6
 # Trabajando por MESES podemos subir el limite sin reventar memoria
 PAGE_LIMIT = 50000
 ADJUSTED   = True
+CATALOG: Optional[CatalogWriter] = None  # utils/dataset_catalog.py (None = desactivado)
+HIVE       = False  # layout ticker=X/year=/month=MM (utils/hive_layout.py)
+QUEUE_DATASET = "ohlcv_1m"  # cola de ventanas de utils/repair_planner.py
+METRICS: Optional[IngestMetrics] = None  # utils/ingest_metrics.py
+ENDPOINT   = "v2/aggs"
 
 def log(m: str) -> None:
     print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {m}", flush=True)
@@ -111,8 +130,13 @@ def build_session() -> requests.Session:
 def http_get_json(session: requests.Session, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
     last_error = None
     for k in range(1, RETRY_MAX + 1):
+        r, t0 = None, time.perf_counter()
         try:
             r = session.get(url, params=params, headers=headers, timeout=TIMEOUT)
+            if METRICS is not None:
+                METRICS.observe_response(ENDPOINT, r, time.perf_counter() - t0)
+                if r.status_code == 429 or r.status_code >= 500:
+                    METRICS.retry(ENDPOINT, r.status_code)
             if r.status_code == 429:
                 sl = int(r.headers.get("Retry-After", "2"))
                 log(f"429 Rate Limit -> sleep {sl}s")
@@ -125,6 +149,10 @@ def http_get_json(session: requests.Session, url: str, params: Dict[str, Any], h
             return r.json()
         except Exception as e:
             last_error = e
+            if METRICS is not None:
+                if r is None:
+                    METRICS.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+                METRICS.retry(ENDPOINT, type(e).__name__)
             msg = str(e).lower()
             if "certificate" in msg or "ssl" in msg:
                 sl = 2  # retry rapido para SSL/TLS
@@ -165,7 +193,7 @@ def write_page_by_month(df: pl.DataFrame, outdir: Path, ticker: str) -> int:
     files = 0
     for ym, part in df.group_by("ym"):
         year, month = ym[0].split("-")
-        pdir = outdir / ticker / f"year={year}" / f"month={month}"
+        pdir = partition_dir(outdir, ticker, year, month, hive=HIVE)
         pdir.mkdir(parents=True, exist_ok=True)
         outp = pdir / "minute.parquet"
         part = part.drop("ym").sort(["date","minute"])
@@ -174,10 +202,18 @@ def write_page_by_month(df: pl.DataFrame, outdir: Path, ticker: str) -> int:
             merged = pl.concat([old, part], how="vertical_relaxed")\
                        .unique(subset=["minute"], keep="last")\
                        .sort(["date","minute"])
-            merged.write_parquet(outp, compression="zstd", compression_level=2, statistics=False)
+            write_parquet(merged, outp, "ohlcv_1m")
+            if METRICS is not None:
+                METRICS.add_bytes(outp.stat().st_size)
+            if CATALOG is not None:
+                CATALOG.record(outp, merged)
             del old, merged
         else:
-            part.write_parquet(outp, compression="zstd", compression_level=2, statistics=False)
+            write_parquet(part, outp, "ohlcv_1m")
+            if METRICS is not None:
+                METRICS.add_bytes(outp.stat().st_size)
+            if CATALOG is not None:
+                CATALOG.record(outp, part)
         files += 1
         del part
     return files
@@ -216,6 +252,8 @@ def fetch_and_stream_write(session: requests.Session, api_key: str, ticker: str,
         results = data.get("results") or []
         pages += 1
         rows_total += len(results)
+        if METRICS is not None:
+            METRICS.add_rows(len(results))
 
         # normaliza y escribe esta pagina directamente
         df_page = normalize_page(results, ticker)
@@ -234,18 +272,63 @@ def fetch_and_stream_write(session: requests.Session, api_key: str, ticker: str,
 
     return f"{ticker}: {rows_total:,} rows, {files_total} files ({pages} pages) [1m]"
 
+def download_from_queue(session: requests.Session, api_key: str, outdir: Path, state: StateStore,
+                        rate_limit: Optional[float], max_windows: int = 0) -> List[str]:
+    """Consume la cola de ventanas (ticker, 'YYYY-MM-DD:YYYY-MM-DD'), una a una"""
+    results = []
+    while not max_windows or len(results) < max_windows:
+        claimed = state.claim(QUEUE_DATASET, 1)
+        if METRICS is not None:
+            METRICS.queue_depth(QUEUE_DATASET, state.queue_counts(QUEUE_DATASET)["pending"])
+        if not claimed:
+            break
+        ticker, period, _ = claimed[0]
+        try:
+            start, end = period.split(":")
+            res = fetch_and_stream_write(session, api_key, ticker, start, end, rate_limit, outdir)
+            rows = int(res.split(":")[1].strip().split()[0].replace(",", ""))
+            state.mark(QUEUE_DATASET, ticker, period, DONE, rows=rows)
+            results.append(res)
+        except Exception as e:
+            state.mark(QUEUE_DATASET, ticker, period, ERROR, error=repr(e))
+            results.append(f"{ticker} {period}: ERROR {e}")
+        if METRICS is not None:
+            rates = METRICS.rates()
+            log(f"{results[-1]} | {rates['req_s']:.1f} req/s | {rates['mb_s']:.2f} MB/s")
+        else:
+            log(results[-1])
+        gc.collect()
+    return results
+
 def main():
     ap = argparse.ArgumentParser(description="Descarga OHLCV 1-min (streaming por pagina, sin acumulacion en RAM)")
-    ap.add_argument("--tickers-csv", required=True, help="CSV o Parquet con columna 'ticker'")
+    ap.add_argument("--tickers-csv", help="CSV o Parquet con columna 'ticker'")
     ap.add_argument("--outdir", required=True, help="raw/polygon/ohlcv_intraday_1m")
-    ap.add_argument("--from", dest="date_from", required=True, help="YYYY-MM-DD")
-    ap.add_argument("--to", dest="date_to", required=True, help="YYYY-MM-DD")
+    ap.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    ap.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+    ap.add_argument("--queue", action="store_true",
+                    help="Consumir la cola de ventanas 'ohlcv_1m' del state store (utils/repair_planner.py)")
+    ap.add_argument("--state-db", default=None,
+                    help="SQLite de estado para --queue (default: TSIS_STATE_DB o <outdir>/_state.sqlite)")
     ap.add_argument("--rate-limit", type=float, default=0.125, help="segundos entre paginas (por proceso)")
     ap.add_argument("--max-tickers-per-process", type=int, default=30,
-                    help="Max. tickers que procesara este proceso antes de salir (libera RAM). 0=sin limite")
+                    help="Max. tickers (ventanas con --queue) que procesara este proceso antes de salir (libera RAM). 0=sin limite")
     # (Compatibilidad) Aceptamos --max-workers pero lo ignoramos adrede:
     ap.add_argument("--max-workers", type=int, default=1, help="(IGNORADO) Paralelismo lo maneja el launcher.")
+    ap.add_argument("--unadjusted", action="store_true",
+                    help="Descargar adjusted=false (ajuste por split en lectura, ver utils/split_adjust.py)")
+    ap.add_argument("--catalog-dir", default=None,
+                    help="Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog)")
+    ap.add_argument("--no-catalog", action="store_true", help="No registrar ficheros en el catálogo")
+    ap.add_argument("--hive-layout", action="store_true",
+                    help="Escribir en layout Hive ticker=X/year=/month=MM (automático si outdir ya está migrado)")
+    add_metrics_args(ap)
     args = ap.parse_args()
+    if not args.queue and not (args.tickers_csv and args.date_from and args.date_to):
+        ap.error("--tickers-csv, --from y --to son obligatorios sin --queue")
+
+    global ADJUSTED, CATALOG, HIVE, METRICS
+    ADJUSTED = not args.unadjusted
 
     api_key = os.getenv("POLYGON_API_KEY")
     if not api_key:
@@ -256,14 +339,35 @@ def main():
     log(f"Running INGESTOR: {__file__}")
     log(f"SSL_CERT_FILE={os.getenv('SSL_CERT_FILE')}")
 
-    # Cargar tickers (CSV o Parquet)
-    tickers = load_tickers(args.tickers_csv)
     outdir = Path(args.outdir); outdir.mkdir(parents=True, exist_ok=True)
+    HIVE = use_hive(outdir, args.hive_layout)
+    # Marcador leído por utils/split_adjust.py: store sin ajustar
+    if not ADJUSTED:
+        mark_unadjusted(outdir)
+    if not args.no_catalog:
+        CATALOG = CatalogWriter(args.catalog_dir or default_catalog_dir(outdir), "ohlcv_1m", outdir)
     rate_limit = args.rate_limit if args.rate_limit and args.rate_limit > 0 else None
 
     session = build_session()
+    METRICS = metrics_from_args(args, "ohlcv_1m")
+
+    if args.queue:
+        state = StateStore(args.state_db or default_state_db(outdir))
+        try:
+            results = download_from_queue(session, api_key, outdir, state, rate_limit,
+                                          args.max_tickers_per_process)
+        finally:
+            state.close()
+            if CATALOG is not None:
+                CATALOG.close()
+            METRICS.close()
+        err = sum("ERROR" in r for r in results)
+        log(f"Cola: {len(results) - err:,} ventanas OK | ERRORES: {err:,}")
+        return
 
-    log(f"Tickers: {len(tickers):,} | {args.date_from} -> {args.date_to} | rate={rate_limit}s/page (adaptativo)")
+    # Cargar tickers (CSV o Parquet)
+    tickers = load_tickers(args.tickers_csv)
+    log(f"Tickers: {len(tickers):,} | {args.date_from} -> {args.date_to} | rate={rate_limit}s/page (adaptativo) | adjusted={str(ADJUSTED).lower()}")
     processed = 0
     results = []
 
@@ -279,7 +383,8 @@ def main():
     df = dt.datetime.strptime(args.date_from, "%Y-%m-%d").date()
     dt0 = dt.datetime.strptime(args.date_to,   "%Y-%m-%d").date()
 
-    for t in tickers:
+    for i, t in enumerate(tickers):
+        METRICS.queue_depth("tickers", len(tickers) - i)
         try:
             pages_sum = 0
             rows_sum  = 0
@@ -312,7 +417,9 @@ def main():
 
         # checkpoint de progreso
         if processed % 25 == 0:
-            log(f"Progreso {processed:,}/{len(tickers):,}")
+            rates = METRICS.rates()
+            log(f"Progreso {processed:,}/{len(tickers):,} | {rates['req_s']:.1f} req/s | "
+                f"{rates['rows_s']:,.0f} rows/s | {rates['mb_s']:.2f} MB/s")
             # flush a archivo de log incremental
             (outdir / "minute_download.partial.log").write_text("\n".join(results), encoding="utf-8")
 
@@ -323,6 +430,11 @@ def main():
 
         gc.collect()
 
+    if CATALOG is not None:
+        CATALOG.close()
+    METRICS.queue_depth("tickers", 0)
+    METRICS.close()
+
     # Log final (de lo procesado en este proceso)
     ok = sum("ERROR" not in r for r in results)
     err = len(results) - ok
@@ -2,6 +2,7 @@
 """
 Descarga quotes (bid/ask NBBO) desde Polygon para todos los tickers.
 Estructura: {outdir}/{TICKER}/year={YYYY}/month={MM}/day={YYYY-MM-DD}/quotes.parquet
+(con --hive-layout: {outdir}/ticker={TICKER}/...)
 """
 
 import polars as pl
@@ -15,11 +16,16 @@ from polygon import RESTClient
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {msg}", flush=True)
 
-def download_quotes_for_date(client, ticker, date, outdir, max_retries=3):
+def download_quotes_for_date(client, ticker, date, outdir, max_retries=3, hive=False):
     """
     Descarga quotes (NBBO bid/ask) para un ticker en una fecha específica.
     Retorna True si exitoso, False si error.
@@ -28,7 +34,7 @@ def download_quotes_for_date(client, ticker, date, outdir, max_retries=3):
     year, month, _ = date.split('-')
 
     # Path de salida
-    output_path = Path(outdir) / ticker / f"year={year}" / f"month={month}" / f"day={date}"
+    output_path = partition_dir(outdir, ticker, year, month, date, hive=hive)
     quotes_file = output_path / "quotes.parquet"
 
     # Skip si ya existe
@@ -75,7 +81,7 @@ def download_quotes_for_date(client, ticker, date, outdir, max_retries=3):
             # Guardar
             output_path.mkdir(parents=True, exist_ok=True)
             df = pl.DataFrame(quotes)
-            df.write_parquet(quotes_file)
+            write_parquet(df, quotes_file, "quotes")
 
             return True
 
@@ -98,8 +104,11 @@ def main():
     parser.add_argument('--workers', type=int, default=10, help='Número de workers paralelos (default: 10)')
     parser.add_argument('--limit', type=int, help='Limitar a N fechas (para testing)')
     parser.add_argument('--delay', type=float, default=0.12, help='Delay entre requests en segundos (default: 0.12)')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/... (automático si outdir ya está migrado)')
 
     args = parser.parse_args()
+    hive = use_hive(args.outdir, args.hive_layout)
 
     # API key
     api_key = args.api_key or os.getenv('POLYGON_API_KEY')
@@ -151,7 +160,7 @@ def main():
         api_key, ticker, date, outdir = task_data
         # Cada worker necesita su propio client
         worker_client = RESTClient(api_key)
-        success = download_quotes_for_date(worker_client, ticker, date, outdir)
+        success = download_quotes_for_date(worker_client, ticker, date, outdir, hive=hive)
         return (ticker, date, success)
 
     # Preparar tasks
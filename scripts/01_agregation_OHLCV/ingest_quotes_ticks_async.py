@@ -21,6 +21,18 @@ import threading
 from concurrent.futures import ThreadPoolExecutor
 import backoff
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from page_checkpoint import PageCheckpoint  # noqa: E402
+from liquidity_summary import LiquidityTable, summarize_quotes  # noqa: E402
+from dataset_catalog import CatalogWriter, default_catalog_dir  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
+DATASET = "quotes"
+ENDPOINT = "v3/quotes"
+
 # ==========================================
 # CONFIGURACIÓN Y LOGGING
 # ==========================================
@@ -47,7 +59,8 @@ class DownloadResult:
 # ==========================================
 
 class PolygonQuotesDownloader:
-    def __init__(self, api_key: str, max_concurrent: int = 50):
+    def __init__(self, api_key: str, max_concurrent: int = 50, liquidity_dir: Optional[Path] = None,
+                 catalog: Optional[CatalogWriter] = None, metrics: Optional[IngestMetrics] = None):
         self.api_key = api_key
         self.max_concurrent = max_concurrent
         self.base_url = "https://api.polygon.io/v3/quotes"
@@ -57,6 +70,15 @@ class PolygonQuotesDownloader:
         self.total_requests = 0
         self.total_quotes = 0
         self.start_time = None
+        
+        # Resumen de liquidez por ticker-día (calculado con los datos aún en memoria)
+        self.liquidity = LiquidityTable(liquidity_dir) if liquidity_dir else None
+
+        # Catálogo de ficheros confirmados (utils/dataset_catalog.py)
+        self.catalog = catalog
+
+        # Métricas en vivo (utils/ingest_metrics.py)
+        self.metrics = metrics
 
     async def fetch_quotes_page(self, session: aiohttp.ClientSession, ticker: str, date: str,
                                 next_url: Optional[str] = None) -> Dict[str, Any]:
@@ -84,70 +106,106 @@ class PolygonQuotesDownloader:
         )
         async def make_request():
             async with self.semaphore:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 429:  # Rate limited
-                        retry_after = int(response.headers.get('X-Polygon-Retry-After', '5'))
-                        await asyncio.sleep(retry_after)
-                        raise aiohttp.ClientError("Rate limited")
-
-                    response.raise_for_status()
-                    self.total_requests += 1
-                    return await response.json()
+                t0, observed = time.perf_counter(), False
+                try:
+                    async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                        if response.status != 200 and self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, response.status, time.perf_counter() - t0)
+                            observed = True
+                        if response.status == 429:  # Rate limited
+                            if self.metrics is not None:
+                                self.metrics.retry(ENDPOINT, 429)
+                            retry_after = int(response.headers.get('X-Polygon-Retry-After', '5'))
+                            await asyncio.sleep(retry_after)
+                            raise aiohttp.ClientError("Rate limited")
+
+                        response.raise_for_status()
+                        self.total_requests += 1
+                        data = await response.json()
+                        if self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, response.status, time.perf_counter() - t0)
+                        return data
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if self.metrics is not None and not observed:
+                        self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+                    raise
 
         return await make_request()
 
-    async def download_all_quotes(self, session: aiohttp.ClientSession, ticker: str, date: str) -> List[Dict]:
-        """Descarga TODAS las páginas de quotes para un ticker/fecha"""
-
-        all_quotes = []
-        next_url = None
-        page = 1
-
-        while True:
+    def normalize_quotes(self, quotes: List[Dict]) -> pl.DataFrame:
+        """Convierte una página de resultados al esquema de quotes.parquet"""
+        processed_quotes = []
+        for q in quotes:
+            processed_quotes.append({
+                'timestamp': q.get('sip_timestamp', q.get('participant_timestamp')),
+                'bid_price': q.get('bid_price', 0),
+                'bid_size': q.get('bid_size', 0),
+                'bid_exchange': q.get('bid_exchange', 0),
+                'ask_price': q.get('ask_price', 0),
+                'ask_size': q.get('ask_size', 0),
+                'ask_exchange': q.get('ask_exchange', 0),
+                'conditions': ','.join(str(c) for c in q.get('conditions', [])),
+                'tape': q.get('tape', ''),
+                'sequence_number': q.get('sequence_number', 0)
+            })
+        return pl.DataFrame(processed_quotes)
+    
+    async def download_all_quotes(self, session: aiohttp.ClientSession, ticker: str, date: str,
+                                  day_dir: Path) -> pl.DataFrame:
+        """
+        Descarga TODAS las páginas de quotes para un ticker/fecha.
+        
+        Cada página se persiste como part file junto a su cursor (utils/page_checkpoint.py).
+        Si una página falla se propaga el error: las páginas previas quedan en disco y el
+        siguiente intento continúa desde ahí en lugar de guardar un día truncado.
+        """
+        
+        ckpt = PageCheckpoint(day_dir)
+        next_url, page = ckpt.resume()
+        if page:
+            log(f"  {ticker} {date}: reanudando desde página {page + 1} ({ckpt.rows:,} quotes)")
+        
+        while not ckpt.is_complete():
+            # Agregar API key a next_url si no está presente
+            if next_url and 'apiKey=' not in next_url:
+                separator = '&' if '?' in next_url else '?'
+                next_url = f"{next_url}{separator}apiKey={self.api_key}"
+            
             try:
                 data = await self.fetch_quotes_page(session, ticker, date, next_url)
-
-                # Extraer quotes de esta página
-                quotes = data.get('results', [])
-                if quotes:
-                    all_quotes.extend(quotes)
-                    self.total_quotes += len(quotes)
-
-                # Verificar si hay más páginas
-                next_url = data.get('next_url')
-                if not next_url:
-                    break
-
-                # Agregar API key a next_url si no está presente
-                if 'apiKey=' not in next_url:
-                    separator = '&' if '?' in next_url else '?'
-                    next_url = f"{next_url}{separator}apiKey={self.api_key}"
-
-                page += 1
-
-                # Log cada 10 páginas
-                if page % 10 == 0:
-                    log(f"  {ticker} {date}: Página {page}, {len(all_quotes):,} quotes hasta ahora")
-
             except Exception as e:
-                log(f"Error descargando {ticker} {date} página {page}: {e}", "ERROR")
-                break
-
-        return all_quotes
-
+                log(f"Error descargando {ticker} {date} página {page + 1}: {e}", "ERROR")
+                raise
+            
+            # Extraer quotes de esta página
+            quotes = data.get('results', [])
+            self.total_quotes += len(quotes)
+            if self.metrics is not None:
+                self.metrics.add_rows(len(quotes))
+            
+            next_url = data.get('next_url')
+            ckpt.write_page(self.normalize_quotes(quotes), next_url)
+            page += 1
+            
+            # Log cada 10 páginas
+            if page % 10 == 0:
+                log(f"  {ticker} {date}: Página {page}, {ckpt.rows:,} quotes hasta ahora")
+        
+        return ckpt.read_all()
+    
     async def process_task(self, session: aiohttp.ClientSession, task: DownloadTask) -> DownloadResult:
         """Procesa una tarea de descarga"""
-
+        
         # Verificar si ya existe
         quotes_file = task.output_path / "quotes.parquet"
         if quotes_file.exists():
             return DownloadResult(task, True, 0)
-
+        
         try:
             # Descargar todos los quotes
-            quotes = await self.download_all_quotes(session, task.ticker, task.date)
-
-            if not quotes:
+            df = await self.download_all_quotes(session, task.ticker, task.date, task.output_path)
+            
+            if df.height == 0:
                 # Sin datos - crear archivo vacío
                 task.output_path.mkdir(parents=True, exist_ok=True)
                 df = pl.DataFrame({
@@ -163,40 +221,42 @@ class PolygonQuotesDownloader:
                     'sequence_number': []
                 })
                 df.write_parquet(quotes_file)
+                PageCheckpoint(task.output_path).clear()
+                if self.metrics is not None:
+                    self.metrics.add_bytes(quotes_file.stat().st_size)
+                if self.catalog:
+                    self.catalog.record(quotes_file, df)
+                if self.liquidity:
+                    self.liquidity.add(summarize_quotes(df, task.ticker, task.date))
                 return DownloadResult(task, True, 0)
-
-            # Convertir a DataFrame
-            processed_quotes = []
-            for q in quotes:
-                processed_quotes.append({
-                    'timestamp': q.get('sip_timestamp', q.get('participant_timestamp')),
-                    'bid_price': q.get('bid_price', 0),
-                    'bid_size': q.get('bid_size', 0),
-                    'bid_exchange': q.get('bid_exchange', 0),
-                    'ask_price': q.get('ask_price', 0),
-                    'ask_size': q.get('ask_size', 0),
-                    'ask_exchange': q.get('ask_exchange', 0),
-                    'conditions': ','.join(str(c) for c in q.get('conditions', [])),
-                    'tape': q.get('tape', ''),
-                    'sequence_number': q.get('sequence_number', 0)
-                })
-
+            
             # Guardar
             task.output_path.mkdir(parents=True, exist_ok=True)
-            df = pl.DataFrame(processed_quotes)
-
+            
             # Ordenar por timestamp
             df = df.sort('timestamp')
-
-            # Guardar con compresión optimizada
-            df.write_parquet(quotes_file, compression='zstd', compression_level=3)
-
-            return DownloadResult(task, True, len(quotes))
-
+            
+            # Guardar con compresión optimizada (tmp + rename: el día aparece completo o no aparece)
+            tmp_file = quotes_file.with_suffix('.parquet.tmp')
+            write_parquet(df, tmp_file, "quotes")
+            os.replace(tmp_file, quotes_file)
+            if self.metrics is not None:
+                self.metrics.add_bytes(quotes_file.stat().st_size)
+            if self.catalog:
+                self.catalog.record(quotes_file, df)
+            
+            # Día confirmado: ya no hacen falta las páginas parciales
+            PageCheckpoint(task.output_path).clear()
+            
+            if self.liquidity:
+                self.liquidity.add(summarize_quotes(df, task.ticker, task.date))
+            
+            return DownloadResult(task, True, df.height)
+            
         except Exception as e:
             log(f"Error procesando {task.ticker} {task.date}: {e}", "ERROR")
             return DownloadResult(task, False, 0, str(e))
-
+    
     async def run_batch(self, tasks: List[DownloadTask]) -> List[DownloadResult]:
         """Ejecuta un batch de tareas"""
 
@@ -216,6 +276,10 @@ class PolygonQuotesDownloader:
                 return_exceptions=True
             )
 
+            # Un part file de liquidez por batch
+            if self.liquidity:
+                self.liquidity.flush()
+            
             # Convertir excepciones a resultados de error
             final_results = []
             for i, result in enumerate(results):
@@ -257,7 +321,7 @@ class ParallelFileWriter:
 
                 df, path = item
                 path.parent.mkdir(parents=True, exist_ok=True)
-                df.write_parquet(path, compression='zstd', compression_level=3)
+                write_parquet(df, path, "quotes")
 
             except queue.Empty:
                 continue
@@ -289,6 +353,12 @@ async def main_async():
     parser.add_argument('--batch-size', type=int, default=1000, help='Tamaño de batch (default: 1000)')
     parser.add_argument('--limit', type=int, help='Limitar a N fechas (para testing)')
     parser.add_argument('--skip-existing', action='store_true', help='Saltar archivos existentes')
+    parser.add_argument('--liquidity-dir', help='Tabla de liquidez diaria (default: <outdir>_liquidity)')
+    parser.add_argument('--catalog-dir', help='Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog)')
+    parser.add_argument('--no-catalog', action='store_true', help='No registrar ficheros en el catálogo')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/... (automático si outdir ya está migrado)')
+    add_metrics_args(parser)
 
     args = parser.parse_args()
 
@@ -323,12 +393,13 @@ async def main_async():
 
     # Crear tareas
     tasks = []
+    hive = use_hive(args.outdir, args.hive_layout)
     for row in df.iter_rows(named=True):
         ticker = row['ticker']
         date = row['date']
         year, month, _ = date.split('-')
 
-        output_path = Path(args.outdir) / ticker / f"year={year}" / f"month={month}" / f"day={date}"
+        output_path = partition_dir(args.outdir, ticker, year, month, date, hive=hive)
 
         # Skip si existe y flag activo
         if args.skip_existing and (output_path / "quotes.parquet").exists():
@@ -343,7 +414,12 @@ async def main_async():
         return
 
     # Inicializar downloader
-    downloader = PolygonQuotesDownloader(api_key, args.concurrent)
+    outdir = Path(args.outdir)
+    liquidity_dir = Path(args.liquidity_dir) if args.liquidity_dir else outdir.parent / f"{outdir.name}_liquidity"
+    catalog = None if args.no_catalog else CatalogWriter(
+        Path(args.catalog_dir) if args.catalog_dir else default_catalog_dir(outdir), "quotes", outdir)
+    metrics = metrics_from_args(args, DATASET)
+    downloader = PolygonQuotesDownloader(api_key, args.concurrent, liquidity_dir, catalog, metrics)
 
     # Procesar en batches
     log("")
@@ -359,6 +435,7 @@ async def main_async():
         total_batches = (len(tasks) + args.batch_size - 1) // args.batch_size
 
         log(f"\nBatch {batch_num}/{total_batches} ({len(batch)} tareas)")
+        metrics.queue_depth("days", len(tasks) - i)
 
         # Procesar batch
         results = await downloader.run_batch(batch)
@@ -376,6 +453,7 @@ async def main_async():
         log(f"  Quotes descargados en batch: {total_quotes:,}")
         log(f"  Total requests: {downloader.total_requests:,} ({rate:.1f} req/s)")
         log(f"  Total quotes: {downloader.total_quotes:,} ({quotes_rate:.0f} quotes/s)")
+        log(f"  Escritura: {metrics.rates()['mb_s']:.2f} MB/s")
 
         # Estimación de tiempo restante
         if i + args.batch_size < len(tasks):
@@ -383,6 +461,14 @@ async def main_async():
             eta_seconds = remaining_tasks * (elapsed / (i + args.batch_size))
             log(f"  ETA: {eta_seconds/60:.1f} minutos")
 
+    # Compactar la tabla de liquidez (tabla + parts de cada batch)
+    n_liq = downloader.liquidity.compact()
+    log(f"Tabla de liquidez: {n_liq:,} ticker-días en {liquidity_dir}")
+    if catalog:
+        catalog.close()
+    metrics.queue_depth("days", 0)
+    metrics.close()
+    
     # Resumen final
     elapsed = time.time() - start_time
     success_count = sum(1 for r in all_results if r.success)
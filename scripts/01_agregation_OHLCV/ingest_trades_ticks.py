@@ -33,6 +33,15 @@ from urllib3.util.retry import Retry
 import logging
 import polars as pl
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from page_checkpoint import PageCheckpoint  # noqa: E402
+from dataset_catalog import CatalogWriter, default_catalog_dir, read_catalog  # noqa: E402
+from store_query import read_manifest  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, ticker_dir, use_hive  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
 # =============================================================================
 # CONFIGURACION Y CONSTANTES
 # =============================================================================
@@ -42,6 +51,10 @@ BATCH_SIZE = 50000  # maximo de resultados por pagina
 MAX_RETRIES = 10
 BACKOFF_FACTOR = 0.8  # factor de backoff exponencial
 TIMEOUT_SECONDS = 45  # timeout para cada request
+CATALOG: Optional[CatalogWriter] = None  # utils/dataset_catalog.py (None = desactivado)
+HIVE = False  # layout ticker=X/year=/month=/day= (utils/hive_layout.py)
+METRICS: Optional[IngestMetrics] = None  # utils/ingest_metrics.py
+ENDPOINT = "v3/trades"
 
 # Configurar logging
 logging.basicConfig(
@@ -127,7 +140,15 @@ def fetch_trades_batch(
         )
 
     # Make request with timeout
-    response = session.get(url, timeout=TIMEOUT_SECONDS)
+    t0 = time.perf_counter()
+    try:
+        response = session.get(url, timeout=TIMEOUT_SECONDS)
+    except requests.exceptions.RequestException as e:
+        if METRICS is not None:
+            METRICS.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+        raise
+    if METRICS is not None:
+        METRICS.observe_response(ENDPOINT, response, time.perf_counter() - t0)
     response.raise_for_status()
 
     return response.json()
@@ -137,7 +158,6 @@ def stream_trades_to_parquet(
     trades: List[Dict],
     file_path: Path,
     is_first_batch: bool = True,
-    compression: str = "snappy",
 ):
     """Streams trades to parquet file"""
     if not trades:
@@ -169,12 +189,12 @@ def stream_trades_to_parquet(
 
     # Write or append to parquet
     if is_first_batch:
-        df.write_parquet(file_path, compression=compression)
+        write_parquet(df, file_path, "trades")
     else:
         # Read existing, concatenate, and write back
         existing_df = pl.read_parquet(file_path)
         combined_df = pl.concat([existing_df, df])
-        combined_df.write_parquet(file_path, compression=compression)
+        write_parquet(combined_df, file_path, "trades")
 
 
 def process_batch_polars(batch: Dict[str, Any]) -> Optional[pl.DataFrame]:
@@ -227,64 +247,51 @@ def fetch_and_stream_write_trades(
     output_dir: Path,
     rate_limit: float,
     stats: Dict[str, int],
-) -> int:
-    """Fetch and write trades for a single day with streaming"""
+) -> Optional[int]:
+    """
+    Fetch and write trades for a single day with per-page checkpoints.
+
+    Each page is persisted under day_dir/_parts together with its cursor
+    (utils/page_checkpoint.py), so a failure on page 40 resumes at page 40.
+    Session files are only written once the last page has arrived.
+
+    Returns the number of trades, or None if the day is still incomplete.
+    """
     # Create directory structure
     date_obj = pd.Timestamp(day)
-    year_dir = output_dir / ticker / f"year={date_obj.year:04d}"
-    month_dir = year_dir / f"month={date_obj.month:02d}"
-    day_dir = month_dir / f"day={day}"
+    day_dir = partition_dir(output_dir, ticker, f"{date_obj.year:04d}", f"{date_obj.month:02d}", day, hive=HIVE)
     day_dir.mkdir(parents=True, exist_ok=True)
 
-    # File paths
-    premarket_fp = day_dir / "premarket.parquet"
-    market_fp = day_dir / "market.parquet"
-    afterhours_fp = day_dir / "afterhours.parquet"
-
-    total_trades = 0
-    next_url = None
-    batch_count = 0
+    ckpt = PageCheckpoint(day_dir)
+    next_url, batch_count = ckpt.resume()
     retry_count = 0
 
-    # Lists to accumulate trades by session
-    premarket_trades = []
-    market_trades = []
-    afterhours_trades = []
+    if batch_count:
+        logger.info(f"  {ticker} {day}: Resuming at batch {batch_count + 1} ({ckpt.rows:,} trades)")
 
-    while True:
+    while not ckpt.is_complete():
         try:
             # Fetch batch
             data = fetch_trades_batch(session, api_key, ticker, day, next_url)
+            results = data.get("results") or []
 
-            if "results" in data and data["results"]:
-                batch_count += 1
-                trades_in_batch = len(data["results"])
-                total_trades += trades_in_batch
-
-                # Split trades by market session
-                for trade in data["results"]:
-                    ts_ns = trade.get("participant_timestamp", 0)
-                    if ts_ns:
-                        # Convert nanoseconds to datetime
-                        ts = pd.Timestamp(ts_ns, tz="America/New_York")
-                        hour = ts.hour
-
-                        if hour < 9 or (hour == 9 and ts.minute < 30):
-                            premarket_trades.append(trade)
-                        elif hour < 16:
-                            market_trades.append(trade)
-                        else:
-                            afterhours_trades.append(trade)
-
-                # Update stats
-                stats["requests"] += 1
-
-                # Progress logging every 5 batches
-                if batch_count % 5 == 0:
-                    logger.info(f"  {ticker} {day}: Batch {batch_count}, Total {total_trades:,} trades")
-
-            # Check for next page
+            # Persist page + cursor before moving on
             next_url = data.get("next_url")
+            ckpt.write_page(trades_to_frame(results), next_url)
+            batch_count += 1
+            retry_count = 0
+
+            # Update stats
+            stats["requests"] += 1
+            if METRICS is not None:
+                METRICS.add_rows(len(results))
+                # Filas en _parts a la espera del commit del día
+                METRICS.writer_backlog(ckpt.rows)
+
+            # Progress logging every 5 batches
+            if batch_count % 5 == 0:
+                logger.info(f"  {ticker} {day}: Batch {batch_count}, Total {ckpt.rows:,} trades")
+
             if not next_url:
                 break
 
@@ -293,35 +300,67 @@ def fetch_and_stream_write_trades(
 
         except requests.exceptions.RequestException as e:
             retry_count += 1
+            if METRICS is not None:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                METRICS.retry(ENDPOINT, status or type(e).__name__)
             if retry_count > MAX_RETRIES:
-                logger.error(f"  {ticker} {day}: Max retries exceeded - {e}")
+                logger.error(f"  {ticker} {day}: Max retries exceeded at batch {batch_count + 1} - {e}")
                 stats["errors"] += 1
-                break
+                return None
 
             backoff = BACKOFF_FACTOR * (2**retry_count)
             logger.warning(f"  {ticker} {day}: Retry {retry_count}/{MAX_RETRIES} after {backoff:.1f}s")
             time.sleep(backoff)
 
-    # Write accumulated trades to parquet files
-    if premarket_trades:
-        write_trades_to_parquet(premarket_trades, premarket_fp)
-        logger.debug(f"  Wrote {len(premarket_trades)} premarket trades")
+    # Commit: split by market session and write final files
+    total_trades = commit_day_sessions(ckpt.read_all(), day_dir)
+    ckpt.clear()
+    if METRICS is not None:
+        METRICS.writer_backlog(0)
+    return total_trades
+
 
-    if market_trades:
-        write_trades_to_parquet(market_trades, market_fp)
-        logger.debug(f"  Wrote {len(market_trades)} market trades")
+def commit_day_sessions(df: pl.DataFrame, day_dir: Path) -> int:
+    """Split a full day by session (ET) and write premarket/market/afterhours atomically"""
+    if df.height == 0:
+        return 0
 
-    if afterhours_trades:
-        write_trades_to_parquet(afterhours_trades, afterhours_fp)
-        logger.debug(f"  Wrote {len(afterhours_trades)} afterhours trades")
+    # Minutes since midnight ET (participant_timestamp in ns)
+    et_minute = (
+        pl.from_epoch(pl.col("t"), time_unit="ns")
+        .dt.replace_time_zone("UTC")
+        .dt.convert_time_zone("America/New_York")
+    )
+    df = df.filter(pl.col("t").is_not_null() & (pl.col("t") > 0)).with_columns(
+        (et_minute.dt.hour().cast(pl.Int32) * 60 + et_minute.dt.minute().cast(pl.Int32)).alias("_m")
+    )
 
-    return total_trades
+    sessions = {
+        "premarket.parquet": pl.col("_m") < 570,
+        "market.parquet": (pl.col("_m") >= 570) & (pl.col("_m") < 960),
+        "afterhours.parquet": pl.col("_m") >= 960,
+    }
+    for name, cond in sessions.items():
+        part = df.filter(cond).drop("_m")
+        if part.height == 0:
+            continue
+        target = day_dir / name
+        tmp = target.with_name(name + ".tmp")
+        write_parquet(part, tmp, "trades")
+        os.replace(tmp, target)
+        if METRICS is not None:
+            METRICS.add_bytes(target.stat().st_size)
+        if CATALOG is not None:
+            CATALOG.record(target, part)
+        logger.debug(f"  Wrote {part.height} trades to {name}")
 
+    return df.height
 
-def write_trades_to_parquet(trades: List[Dict], file_path: Path):
-    """Write trades to parquet file with proper column handling"""
+
+def trades_to_frame(trades: List[Dict]) -> pl.DataFrame:
+    """Convert raw trades to the t/p/s/c/i frame with proper column handling"""
     if not trades:
-        return
+        return pl.DataFrame()
 
     # Extract data from trades
     t_data = [t.get("participant_timestamp") for t in trades]
@@ -354,15 +393,22 @@ def write_trades_to_parquet(trades: List[Dict], file_path: Path):
         "i": i_data
     }
     
-    # Create DataFrame
-    df = pl.DataFrame(df_data)
-    
+    return pl.DataFrame(df_data)
+
+
+def write_trades_to_parquet(trades: List[Dict], file_path: Path):
+    """Write trades to parquet file with proper column handling"""
+    if not trades:
+        return
+
     # Write to parquet
-    df.write_parquet(file_path, compression="snappy")
+    write_parquet(trades_to_frame(trades), file_path, "trades")
 
 
-def count_trades_in_parquet(file_path: Path) -> int:
-    """Count number of trades in a parquet file"""
+def count_trades_in_parquet(file_path: Path, known_rows: Optional[Dict[str, int]] = None) -> int:
+    """Count number of trades in a parquet file (catalog rows first, if given)"""
+    if known_rows and file_path.as_posix() in known_rows:
+        return known_rows[file_path.as_posix()]
     if not file_path.exists():
         return 0
     try:
@@ -393,7 +439,18 @@ def main():
         default=None,
         help="Maximum tickers to process before exiting",
     )
+    parser.add_argument(
+        "--catalog-dir", default=None,
+        help="Catálogo de ficheros (default: TSIS_CATALOG_DIR o <outdir>/_catalog)",
+    )
+    parser.add_argument("--no-catalog", action="store_true", help="No registrar ficheros en el catálogo")
+    parser.add_argument(
+        "--hive-layout", action="store_true",
+        help="Escribir en layout Hive ticker=X/... (automático si outdir ya está migrado)",
+    )
+    add_metrics_args(parser)
     args = parser.parse_args()
+    global CATALOG, HIVE, METRICS
 
     # Load tickers
     tickers = load_tickers(args.tickers_csv)
@@ -407,6 +464,17 @@ def main():
     # Setup paths
     output_dir = Path(args.outdir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    HIVE = use_hive(output_dir, args.hive_layout)
+
+    # Catálogo: registra cada sesión confirmada y da los conteos de días ya completos
+    known_rows: Dict[str, int] = {}
+    if not args.no_catalog:
+        catalog_dir = Path(args.catalog_dir) if args.catalog_dir else default_catalog_dir(output_dir)
+        CATALOG = CatalogWriter(catalog_dir, "trades", output_dir)
+        known_rows = {
+            (output_dir / path).as_posix(): rows
+            for path, rows in read_catalog(catalog_dir, "trades", output_dir).select(["path", "rows"]).collect().iter_rows()
+        }
 
     # Parse dates
     start_date = pd.Timestamp(args.from_date)
@@ -418,10 +486,10 @@ def main():
 
     # Create session
     session = create_session()
+    METRICS = metrics_from_args(args, "trades")
 
     # Stats tracking
     global_stats = {"requests": 0, "errors": 0, "ok": 0}
-    start_time = time.time()
 
     # Log configuration
     logger.info(
@@ -435,9 +503,9 @@ def main():
             break
 
         logger.info(f"Processing {ticker} (ticker {ticker_idx}/{len(tickers)})...")
+        METRICS.queue_depth("tickers", len(tickers) - ticker_idx + 1)
 
-        ticker_dir = output_dir / ticker
-        if args.resume and ticker_dir.exists():
+        if args.resume and ticker_dir(output_dir, ticker, HIVE).exists():
             # Skip if resuming and ticker directory exists
             logger.info(f"  Skipping {ticker} (already exists)")
             continue
@@ -446,14 +514,14 @@ def main():
         ticker_trades = 0
         ticker_days = 0
         days_processed = 0
+        packed = {}  # month_dir -> _COMPACTED.json (días ya fusionados por compact_small_files.py)
 
         for day in date_range:
             day_str = day.strftime("%Y-%m-%d")
 
             # Check if day already has _SUCCESS marker (new checkpointing)
             date_obj = pd.Timestamp(day_str)
-            year_dir = output_dir / ticker / f"year={date_obj.year:04d}"
-            month_dir = year_dir / f"month={date_obj.month:02d}"
+            month_dir = partition_dir(output_dir, ticker, f"{date_obj.year:04d}", f"{date_obj.month:02d}", hive=HIVE)
             day_dir = month_dir / f"day={day_str}"
             success_marker = day_dir / "_SUCCESS"
 
@@ -461,17 +529,25 @@ def main():
             premarket_fp = day_dir / "premarket.parquet"
             market_fp = day_dir / "market.parquet"
 
+            # CASO 0: Dia ya fusionado en el fichero compactado del mes
+            if month_dir not in packed:
+                packed[month_dir] = read_manifest(month_dir)
+            if day_str in packed[month_dir].get("days", ()):
+                ticker_trades += packed[month_dir].get("rows", {}).get(day_str, 0)
+                ticker_days += 1
+                continue
+
             # CASO 1: Dia completo con _SUCCESS
             if success_marker.exists():
                 # Count existing trades but don't re-download
                 trades_count = 0
                 if premarket_fp.exists():
-                    trades_count += count_trades_in_parquet(premarket_fp)
+                    trades_count += count_trades_in_parquet(premarket_fp, known_rows)
                 if market_fp.exists():
-                    trades_count += count_trades_in_parquet(market_fp)
+                    trades_count += count_trades_in_parquet(market_fp, known_rows)
                 afterhours_fp = day_dir / "afterhours.parquet"
                 if afterhours_fp.exists():
-                    trades_count += count_trades_in_parquet(afterhours_fp)
+                    trades_count += count_trades_in_parquet(afterhours_fp, known_rows)
 
                 ticker_trades += trades_count
                 ticker_days += 1
@@ -486,6 +562,10 @@ def main():
                 trades_count = fetch_and_stream_write_trades(
                     session, api_key, ticker, day_str, output_dir, args.rate_limit, global_stats
                 )
+                if trades_count is None:
+                    # Dia incompleto: las paginas quedan en _parts para el siguiente intento
+                    days_processed += 1
+                    continue
 
                 ticker_trades += trades_count
                 if trades_count > 0:
@@ -504,6 +584,10 @@ def main():
             trades_count = fetch_and_stream_write_trades(
                 session, api_key, ticker, day_str, output_dir, args.rate_limit, global_stats
             )
+            if trades_count is None:
+                # Dia incompleto: las paginas quedan en _parts para el siguiente intento
+                days_processed += 1
+                continue
 
             ticker_trades += trades_count
             if trades_count > 0:
@@ -534,14 +618,23 @@ def main():
 
         # Log progress every 10 tickers
         if ticker_idx % 10 == 0:
-            elapsed = time.time() - start_time
-            req_rate = global_stats["requests"] / elapsed if elapsed > 0 else 0
-            logger.info(f"Progreso {ticker_idx}/{len(tickers)} | {req_rate:.1f} req/s | 0.00 MB/s")
+            rates = METRICS.rates()
+            logger.info(f"Progreso {ticker_idx}/{len(tickers)} | {rates['req_s']:.1f} req/s | "
+                        f"{rates['rows_s']:,.0f} trades/s | {rates['mb_s']:.2f} MB/s")
+
+        if CATALOG is not None:
+            CATALOG.flush()
+
+    if CATALOG is not None:
+        CATALOG.close()
+    METRICS.queue_depth("tickers", 0)
 
     # Final stats
-    elapsed = time.time() - start_time
+    rates = METRICS.rates()
+    METRICS.close()
     logger.info(
         f"OK: {global_stats['ok']} | ERRORES: {global_stats['errors']} | "
+        f"{rates['avg_req_s']:.1f} req/s | {rates['avg_mb_s']:.2f} MB/s | "
         f"Log: {output_dir / 'trades_download.log'}"
     )
 
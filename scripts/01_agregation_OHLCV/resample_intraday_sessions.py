@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+resample_intraday_sessions.py - Motor de resampling por sesión sobre el store 1m
+
+Genera, a partir de TICKER/year=YYYY/month=MM/minute.parquet:
+- Barras 5m / 15m / 1h alineadas al inicio de cada sesión
+  (premarket 04:00, regular 09:30, afterhours 16:00 ET)
+- Agregados diarios por sesión (premarket / regular / afterhours); la fila
+  'regular' es el daily de sesión regular
+
+Características:
+- Scan lazy de cada minute.parquet (solo columnas necesarias)
+- Sesiones con calendario NYSE: cierres anticipados a las 13:00 incluidos
+- Incremental: manifest por ticker con mtime/size de cada mes fuente;
+  solo se recalculan los meses cuyo minute.parquet cambió
+- Tickers compactados (TICKER/minute.parquet de compact_small_files.py): los
+  meses se leen con store_query.load (sueltos posteriores incluidos) y su
+  firma combina el fichero compactado con el suelto del mes
+- Paralelo por ticker (ProcessPoolExecutor)
+
+Salida:
+  outdir/
+  ├── 5m/TICKER/year=YYYY/month=MM/bars.parquet
+  ├── 15m/...
+  ├── 1h/...
+  ├── session/TICKER/year=YYYY/month=MM/session.parquet
+  └── _manifest/TICKER.parquet
+  (ticker=TICKER/... con --hive-layout o si la resolución ya está migrada;
+  el store 1m se lee en cualquiera de los dos layouts)
+
+Uso:
+    python scripts/01_agregation_OHLCV/resample_intraday_sessions.py \
+        --minute-root C:\\TSIS_Data\\ohlcv_intraday_1m\\2019_2025 \
+        --outdir C:\\TSIS_Data\\ohlcv_resampled \
+        --workers 8
+"""
+
+import os
+import sys
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from market_calendar import MARKET_TZ, sessions_frame  # noqa: E402
+from hive_layout import partition_dir, ticker_dir, ticker_names, use_hive  # noqa: E402
+from store_query import load, packed_files, packed_months as packed_yms  # noqa: E402
+
+RESOLUTIONS = {"5m": 5, "15m": 15, "1h": 60}
+SESSION_DIR = "session"
+MANIFEST_DIR = "_manifest"
+
+# Los ingestores escriben dos esquemas distintos (o/h/l/c vs open/high/...)
+COLUMN_ALIASES = {
+    "o": "open", "h": "high", "l": "low", "c": "close",
+    "v": "volume", "vw": "vwap", "n": "transactions",
+}
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def normalize_minute(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """t (ms UTC) + open/high/low/close/volume/vwap/transactions"""
+    cols = lf.collect_schema().names()
+
+    exprs = [pl.col("t").cast(pl.Int64)]
+    for short, full in COLUMN_ALIASES.items():
+        # Meses con los dos esquemas mezclados (compactado + suelto): ambas columnas
+        present = [pl.col(c).cast(pl.Float64) for c in (full, short) if c in cols]
+        if present:
+            exprs.append(pl.coalesce(present).alias(full))
+        else:
+            exprs.append(pl.lit(None, dtype=pl.Float64).alias(full))
+
+    return lf.select(exprs)
+
+def scan_minute_month(minute_file: Path) -> pl.LazyFrame:
+    """Scan lazy normalizado de un minute.parquet suelto"""
+    return normalize_minute(pl.scan_parquet(minute_file))
+
+def scan_packed_month(minute_root: Path, ticker: str, year: str, month: str) -> pl.LazyFrame:
+    """Un mes (UTC, como las particiones) de un ticker compactado vía store_query"""
+    y, m = int(year), int(month)
+    start = dt.datetime(y, m, 1, tzinfo=dt.timezone.utc)
+    end = dt.datetime(y + m // 12, m % 12 + 1, 1, tzinfo=dt.timezone.utc) - dt.timedelta(milliseconds=1)
+    df = load("ohlcv_1m", [ticker], start, end, root=minute_root)
+    return normalize_minute(df.lazy())
+
+def label_sessions(lf: pl.LazyFrame, sessions: pl.DataFrame) -> pl.LazyFrame:
+    """Añade date/session/mod (minuto del día ET) y descarta barras fuera de sesión"""
+    ts_et = pl.from_epoch(pl.col("t"), time_unit="ms").dt.replace_time_zone("UTC")\
+              .dt.convert_time_zone(MARKET_TZ)
+
+    lf = lf.with_columns([
+        ts_et.dt.date().alias("date"),
+        (ts_et.dt.hour().cast(pl.Int32) * 60 + ts_et.dt.minute().cast(pl.Int32)).alias("mod"),
+    ]).join(sessions.lazy(), on="date", how="inner")
+
+    session = (
+        pl.when((pl.col("mod") >= pl.col("pre_open")) & (pl.col("mod") < pl.col("reg_open")))
+          .then(pl.lit("premarket"))
+          .when((pl.col("mod") >= pl.col("reg_open")) & (pl.col("mod") < pl.col("reg_close")))
+          .then(pl.lit("regular"))
+          .when((pl.col("mod") >= pl.col("reg_close")) & (pl.col("mod") < pl.col("post_close")))
+          .then(pl.lit("afterhours"))
+          .otherwise(None)
+    )
+    session_start = (
+        pl.when(pl.col("session") == "premarket").then(pl.col("pre_open"))
+          .when(pl.col("session") == "regular").then(pl.col("reg_open"))
+          .otherwise(pl.col("reg_close"))
+    )
+
+    return lf.with_columns(session.alias("session"))\
+             .filter(pl.col("session").is_not_null())\
+             .with_columns(session_start.alias("session_start"))
+
+def vwap_expr() -> pl.Expr:
+    """vwap ponderado solo con las barras que traen vwap (null si ninguna lo trae)"""
+    weight = pl.col("volume").filter(pl.col("vwap").is_not_null()).sum()
+    return pl.when(weight > 0)\
+             .then((pl.col("vwap") * pl.col("volume")).sum() / weight)\
+             .otherwise(None)
+
+def aggregate_bars(lf: pl.LazyFrame, keys: List[str]) -> pl.LazyFrame:
+    """OHLCV + vwap ponderado por volumen para cada grupo"""
+    return lf.sort("t").group_by(keys).agg([
+        pl.col("t").first().alias("t"),
+        pl.col("open").first(),
+        pl.col("high").max(),
+        pl.col("low").min(),
+        pl.col("close").last(),
+        pl.col("volume").sum(),
+        vwap_expr().alias("vwap"),
+        pl.col("transactions").sum(),
+        pl.len().alias("bars"),
+    ])
+
+def resample_month(minute: pl.LazyFrame, ticker: str, sessions: pl.DataFrame,
+                   resolutions: List[str]) -> Dict[str, pl.DataFrame]:
+    """Calcula todas las resoluciones pedidas para un mes (un solo scan del fuente)"""
+    base = label_sessions(minute, sessions).collect()
+    out = {}
+
+    for res in resolutions:
+        if res == SESSION_DIR:
+            df = aggregate_bars(base.lazy(), ["date", "session"]).collect()
+        else:
+            step = RESOLUTIONS[res]
+            bucket = pl.col("session_start") + \
+                     ((pl.col("mod") - pl.col("session_start")) // step) * step
+            df = aggregate_bars(base.lazy().with_columns(bucket.alias("bucket")),
+                                ["date", "session", "bucket"]).collect()
+            # Timestamp de inicio de la barra en hora ET
+            df = df.with_columns(
+                (pl.col("date").cast(pl.Datetime("ms")) + pl.duration(minutes=pl.col("bucket")))
+                .dt.replace_time_zone(MARKET_TZ, ambiguous="earliest")
+                .alias("timestamp")
+            ).with_columns(
+                pl.col("timestamp").dt.epoch(time_unit="ms").alias("t")
+            ).drop("bucket")
+
+        out[res] = df.with_columns(pl.lit(ticker).alias("ticker"))\
+                     .sort("t")\
+                     .select(["ticker", "date", "session"] +
+                             (["timestamp"] if res != SESSION_DIR else []) +
+                             ["t", "open", "high", "low", "close", "volume",
+                              "vwap", "transactions", "bars"])
+    return out
+
+def packed_months(packed_file: str) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """{(year, month): (mtime_ns, size)} de los meses (UTC de t) del fichero compactado"""
+    st = os.stat(packed_file)
+    return {tuple(ym.split("-")): (st.st_mtime_ns, st.st_size) for ym in packed_yms(packed_file)}
+
+def list_source_months(minute_root: Path, ticker: str,
+                       packed_file: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """
+    {(year, month): (mtime_ns, size)} de cada minute.parquet del ticker; con
+    fichero compactado, sus meses cuentan también (mtime máximo, tamaño sumado)
+    """
+    months = packed_months(packed_file) if packed_file else {}
+    tdir = ticker_dir(minute_root, ticker)
+    if not tdir.is_dir():
+        return months
+    for ydir in os.scandir(tdir):
+        if not (ydir.is_dir() and ydir.name.startswith("year=")):
+            continue
+        for mdir in os.scandir(ydir.path):
+            if not (mdir.is_dir() and mdir.name.startswith("month=")):
+                continue
+            f = Path(mdir.path) / "minute.parquet"
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            year = ydir.name.split("=")[1]
+            month = f"{int(mdir.name.split('=')[1]):02d}"
+            mtime, size = months.get((year, month), (0, 0))
+            months[(year, month)] = (max(mtime, st.st_mtime_ns), size + st.st_size)
+    return months
+
+def load_manifest(manifest_file: Path) -> Dict[Tuple[str, str], Tuple[int, int, str]]:
+    if not manifest_file.exists():
+        return {}
+    try:
+        df = pl.read_parquet(manifest_file)
+    except Exception:
+        return {}
+    return {(r["year"], r["month"]): (r["source_mtime_ns"], r["source_size"], r["resolutions"])
+            for r in df.iter_rows(named=True)}
+
+def process_ticker(args_tuple) -> Tuple[str, int, int, Optional[str]]:
+    """Worker: recalcula los meses modificados de un ticker. Retorna (ticker, hechos, saltados, error)"""
+    ticker, minute_root, outdir, resolutions, force, hive = args_tuple
+    minute_root, outdir = Path(minute_root), Path(outdir)
+
+    manifest_file = outdir / MANIFEST_DIR / f"{ticker}.parquet"
+    manifest = {} if force else load_manifest(manifest_file)
+    res_key = ",".join(sorted(resolutions))
+
+    packed = packed_files("ohlcv_1m", minute_root, [ticker]).get(ticker)
+    source = list_source_months(minute_root, ticker, packed[0] if packed else None)
+    todo = [ym for ym, sig in source.items()
+            if manifest.get(ym) != (sig[0], sig[1], res_key)]
+
+    if not todo:
+        return ticker, 0, len(source), None
+
+    years = [int(y) for y, _ in todo]
+    sessions = sessions_frame(dt.date(min(years), 1, 1), dt.date(max(years), 12, 31))
+
+    done = 0
+    error = None
+    tdir = ticker_dir(minute_root, ticker)
+    hive_by_res = {res: use_hive(outdir / res, hive) for res in resolutions}
+    for year, month in sorted(todo):
+        src = tdir / f"year={year}" / f"month={month}"
+        minute_file = src / "minute.parquet"
+        if not minute_file.exists():
+            minute_file = tdir / f"year={year}" / f"month={int(month)}" / "minute.parquet"
+        try:
+            minute = (scan_packed_month(minute_root, ticker, year, month) if packed
+                      else scan_minute_month(minute_file))
+            frames = resample_month(minute, ticker, sessions, resolutions)
+        except Exception as e:
+            error = f"{year}-{month}: {e}"
+            continue
+
+        for res, df in frames.items():
+            name = "session.parquet" if res == SESSION_DIR else "bars.parquet"
+            pdir = partition_dir(outdir / res, ticker, year, month, hive=hive_by_res[res])
+            pdir.mkdir(parents=True, exist_ok=True)
+            tmp = pdir / f".{name}.tmp"
+            df.write_parquet(tmp, compression="zstd", compression_level=3, statistics=True)
+            os.replace(tmp, pdir / name)
+
+        manifest[(year, month)] = (*source[(year, month)], res_key)
+        done += 1
+
+    # Manifest escrito al final: si el worker muere, los meses se recalculan
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    pl.DataFrame(
+        [{"year": y, "month": m, "source_mtime_ns": v[0], "source_size": v[1], "resolutions": v[2]}
+         for (y, m), v in manifest.items() if (y, m) in source],
+        schema={"year": pl.Utf8, "month": pl.Utf8, "source_mtime_ns": pl.Int64,
+                "source_size": pl.Int64, "resolutions": pl.Utf8}
+    ).write_parquet(manifest_file)
+
+    return ticker, done, len(source) - len(todo), error
+
+def load_tickers(minute_root: Path, tickers_csv: Optional[str]) -> List[str]:
+    if tickers_csv:
+        if tickers_csv.endswith(".parquet"):
+            df = pl.read_parquet(tickers_csv)
+        else:
+            df = pl.read_csv(tickers_csv)
+        return df["ticker"].drop_nulls().unique().sort().to_list()
+    return ticker_names(minute_root)
+
+def main():
+    ap = argparse.ArgumentParser(description="Resampling por sesión (5m/15m/1h/session) del store 1m")
+    ap.add_argument("--minute-root", required=True, help="Raíz del store 1m (TICKER/year=/month=/minute.parquet)")
+    ap.add_argument("--outdir", required=True, help="Raíz de salida de las resoluciones")
+    ap.add_argument("--tickers-csv", help="CSV o Parquet con columna 'ticker' (default: todos los del store)")
+    ap.add_argument("--resolutions", default="5m,15m,1h,session",
+                    help="Lista separada por comas de: 5m,15m,1h,session")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                    help="Procesos paralelos (default: cpu_count-1)")
+    ap.add_argument("--force", action="store_true", help="Ignorar manifest y recalcular todo")
+    ap.add_argument("--hive-layout", action="store_true",
+                    help="Escribir en layout Hive ticker=X/year=/month=MM (automático si la resolución ya está migrada)")
+    args = ap.parse_args()
+
+    resolutions = [r.strip() for r in args.resolutions.split(",") if r.strip()]
+    invalid = [r for r in resolutions if r not in RESOLUTIONS and r != SESSION_DIR]
+    if invalid:
+        sys.exit(f"ERROR: resoluciones no soportadas: {invalid}")
+
+    minute_root = Path(args.minute_root)
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    tickers = load_tickers(minute_root, args.tickers_csv)
+
+    log("=" * 80)
+    log("RESAMPLING INTRADAY POR SESIÓN")
+    log("=" * 80)
+    log(f"Tickers: {len(tickers):,} | Resoluciones: {', '.join(resolutions)} | Workers: {args.workers}")
+
+    work = [(t, str(minute_root), str(outdir), resolutions, args.force, args.hive_layout) for t in tickers]
+    months_done = months_skipped = 0
+    errors = []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(process_ticker, w): w[0] for w in work}
+        for i, future in enumerate(as_completed(futures), 1):
+            ticker = futures[future]
+            try:
+                _, done, skipped, error = future.result()
+                months_done += done
+                months_skipped += skipped
+                if error:
+                    errors.append(f"{ticker}: {error}")
+            except Exception as e:
+                errors.append(f"{ticker}: {e}")
+
+            if i % 200 == 0:
+                log(f"Progreso {i:,}/{len(tickers):,} | recalculados {months_done:,} | sin cambios {months_skipped:,}")
+
+    log(f"Meses recalculados: {months_done:,} | Sin cambios: {months_skipped:,} | Errores: {len(errors):,}")
+    if errors:
+        err_file = outdir / "resample_errors.log"
+        err_file.write_text("\n".join(errors), encoding="utf-8")
+        log(f"Errores en {err_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+compact_quotes_nbbo.py - Compactación del store de quotes a NBBO "change-only"
+
+En small caps el NBBO repite el mismo bid/ask durante largos tramos mientras
+los tamaños parpadean. Por cada ticker-día genera, junto al quotes.parquet crudo:
+
+- nbbo.parquet        una fila por cambio de bid_price o ask_price, con
+                      tamaños al entrar y al salir del nivel, nº de updates y
+                      contadores de cambios de tamaño dentro del nivel
+- nbbo_100ms.parquet  snapshot del último quote a intervalos fijos
+- nbbo_1s.parquet     (rejilla desde el primer al último quote del día)
+
+Características:
+- Acepta los dos layouts del store (day=DD y day=YYYY-MM-DD)
+- Meses compactados (month=MM/quotes.parquet de compact_small_files.py): el
+  NBBO se calcula por día desde el fichero del mes y se escribe igual que lo
+  deja la compactación (month=MM/nbbo*.parquet con columna date); los días
+  sueltos ya listados en _COMPACTED.json se ignoran
+- Incremental: solo recompacta días cuyo quotes.parquet es más nuevo que la salida
+- Escritura atómica (tmp + os.replace), zstd con estadísticas para scans rápidos
+- Paralelo por ticker-día (ProcessPoolExecutor)
+
+Uso:
+    python scripts/02_final/compact_quotes_nbbo.py \
+        --quotes-root C:\\TSIS_Data\\quotes \
+        --workers 8 \
+        --intervals 100ms,1s
+"""
+
+import os
+import sys
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from hive_layout import ticker_dirs  # noqa: E402
+from store_query import compacted_days  # noqa: E402
+
+QUOTES_FILE = "quotes.parquet"
+NBBO_FILE = "nbbo.parquet"
+
+INTERVALS_NS = {"100ms": 100_000_000, "1s": 1_000_000_000}
+
+# Columnas mínimas; el resto del quote crudo no interesa para el NBBO
+NBBO_COLUMNS = ["timestamp", "bid_price", "bid_size", "ask_price", "ask_size"]
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def snapshot_file(interval: str) -> str:
+    return f"nbbo_{interval}.parquet"
+
+def find_quote_days(root: Path, tickers: Optional[set] = None) -> List[Path]:
+    """
+    Directorios day=* con quotes.parquet y month=* con quotes.parquet
+    compactado (os.scandir, sin rglob)
+    """
+    days = []
+    for ticker, tpath in ticker_dirs(root):
+        if tickers and ticker not in tickers:
+            continue
+        for y in os.scandir(tpath):
+            if not (y.is_dir() and y.name.startswith("year=")):
+                continue
+            for m in os.scandir(y.path):
+                if not (m.is_dir() and m.name.startswith("month=")):
+                    continue
+                packed = compacted_days(m.path)
+                if packed and os.path.exists(os.path.join(m.path, QUOTES_FILE)):
+                    days.append(Path(m.path))
+                for d in os.scandir(m.path):
+                    if d.is_dir() and d.name.startswith("day=") and \
+                            day_iso(y.name, m.name, d.name) not in packed and \
+                            os.path.exists(os.path.join(d.path, QUOTES_FILE)):
+                        days.append(Path(d.path))
+    return sorted(days)
+
+def day_iso(year_name: str, month_name: str, day_name: str) -> str:
+    """YYYY-MM-DD de year=YYYY / month=M|MM / day=DD|YYYY-MM-DD"""
+    return f"{year_name[5:]}-{int(month_name[6:]):02d}-{day_name[-2:]}"
+
+def is_up_to_date(day_dir: Path, intervals: List[str]) -> bool:
+    src = (day_dir / QUOTES_FILE).stat().st_mtime_ns
+    for name in [NBBO_FILE] + [snapshot_file(i) for i in intervals]:
+        out = day_dir / name
+        if not out.exists() or out.stat().st_mtime_ns < src:
+            return False
+    return True
+
+def load_quotes(path: Path, keys: List[str] = ()) -> pl.DataFrame:
+    """
+    Lee el quote crudo normalizando timestamp (sip_timestamp en el esquema raw);
+    keys: columnas extra que se conservan y encabezan el orden (date en meses compactados)
+    """
+    lf = pl.scan_parquet(path)
+    cols = lf.collect_schema().names()
+    if "timestamp" not in cols:
+        for alt in ("sip_timestamp", "participant_timestamp"):
+            if alt in cols:
+                lf = lf.rename({alt: "timestamp"})
+                break
+    if not all(c in lf.collect_schema().names() for c in NBBO_COLUMNS):
+        return pl.DataFrame()
+
+    keys = list(keys)
+    order = keys + (["timestamp", "sequence_number"] if "sequence_number" in cols else ["timestamp"])
+    return (
+        lf.select(keys + NBBO_COLUMNS + (["sequence_number"] if "sequence_number" in cols else []))
+          .with_columns([
+              pl.col("timestamp").cast(pl.Int64),
+              pl.col("bid_price").cast(pl.Float64),
+              pl.col("ask_price").cast(pl.Float64),
+              pl.col("bid_size").cast(pl.Int64),
+              pl.col("ask_size").cast(pl.Int64),
+          ])
+          .drop_nulls("timestamp")
+          .sort(order)
+          .select(keys + NBBO_COLUMNS)
+          .collect()
+    )
+
+def build_change_only(q: pl.DataFrame) -> pl.DataFrame:
+    """Una fila por cambio de bid/ask price con contadores de cambios de tamaño"""
+    price_changed = (
+        (pl.col("bid_price") != pl.col("bid_price").shift(1)) |
+        (pl.col("ask_price") != pl.col("ask_price").shift(1))
+    ).fill_null(True)
+
+    q = q.with_columns(price_changed.cum_sum().alias("_level"))
+    q = q.with_columns([
+        # Cambio de tamaño dentro del mismo nivel de precio (el primer quote del nivel no cuenta)
+        ((pl.col("bid_size") != pl.col("bid_size").shift(1)).fill_null(False) &
+         (pl.col("_level") == pl.col("_level").shift(1)).fill_null(False)).alias("_bid_sz_chg"),
+        ((pl.col("ask_size") != pl.col("ask_size").shift(1)).fill_null(False) &
+         (pl.col("_level") == pl.col("_level").shift(1)).fill_null(False)).alias("_ask_sz_chg"),
+    ])
+
+    out = (
+        q.group_by("_level", maintain_order=True)
+         .agg([
+             pl.col("timestamp").first(),
+             pl.col("bid_price").first(),
+             pl.col("ask_price").first(),
+             pl.col("bid_size").first(),
+             pl.col("ask_size").first(),
+             pl.col("bid_size").last().alias("bid_size_last"),
+             pl.col("ask_size").last().alias("ask_size_last"),
+             pl.len().cast(pl.UInt32).alias("n_updates"),
+             pl.col("_bid_sz_chg").sum().cast(pl.UInt32).alias("bid_size_changes"),
+             pl.col("_ask_sz_chg").sum().cast(pl.UInt32).alias("ask_size_changes"),
+         ])
+         .drop("_level")
+    )
+    # Tiempo en el nivel hasta el siguiente cambio (null en el último)
+    return out.with_columns(
+        (pl.col("timestamp").shift(-1) - pl.col("timestamp")).alias("duration_ns")
+    )
+
+def build_snapshots(q: pl.DataFrame, step_ns: int) -> pl.DataFrame:
+    """Último quote vigente en cada punto de una rejilla fija (as-of backward)"""
+    start = (q["timestamp"].min() // step_ns + 1) * step_ns
+    end = q["timestamp"].max()
+    if start > end:
+        return q.head(0)
+    grid = pl.DataFrame({"timestamp": pl.int_range(start, end + 1, step_ns, eager=True)})
+    # Un solo quote por timestamp (el último) para el as-of
+    last = q.unique(subset=["timestamp"], keep="last", maintain_order=True)
+    return grid.join_asof(last, on="timestamp", strategy="backward")
+
+def write_atomic(df: pl.DataFrame, target: Path) -> int:
+    tmp = target.with_name(target.name + ".tmp")
+    df.write_parquet(tmp, compression="zstd", compression_level=3, statistics=True)
+    os.replace(tmp, target)
+    return target.stat().st_size
+
+def build_outputs(q: pl.DataFrame, intervals: List[str]) -> Dict[str, pl.DataFrame]:
+    """{fichero: frame} de un día; en meses compactados, por día con columna date"""
+    if "date" not in q.columns:
+        out = {NBBO_FILE: build_change_only(q)}
+        for interval in intervals:
+            out[snapshot_file(interval)] = build_snapshots(q, INTERVALS_NS[interval])
+        return out
+    per_day = [(d, build_outputs(part.drop("date"), intervals))
+               for (d,), part in q.partition_by("date", as_dict=True, maintain_order=True).items()]
+    return {name: pl.concat([frames[name].select(pl.lit(d).alias("date"), pl.all())
+                             for d, frames in per_day])
+            for name in per_day[0][1]}
+
+def compact_day(day_dir: str, intervals: List[str], force: bool) -> Dict:
+    """Worker: compacta un ticker-día (o un ticker-mes compactado)"""
+    day_dir = Path(day_dir)
+    res = {"day_dir": str(day_dir), "status": "ok", "raw_rows": 0, "nbbo_rows": 0,
+           "raw_bytes": 0, "out_bytes": 0, "error": None}
+    try:
+        src = day_dir / QUOTES_FILE
+        res["raw_bytes"] = src.stat().st_size
+        if not force and is_up_to_date(day_dir, intervals):
+            res["status"] = "skipped"
+            return res
+
+        keys = ["date"] if day_dir.name.startswith("month=") else []
+        q = load_quotes(src, keys)
+        res["raw_rows"] = q.height
+        if q.height == 0:
+            # Día vacío o esquema sin bid/ask: salidas vacías para no reintentar
+            empty = pl.DataFrame(schema={**{k: pl.Utf8 for k in keys},
+                                         **{c: (pl.Float64 if c.endswith("_price") else pl.Int64)
+                                            for c in NBBO_COLUMNS}})
+            for name in [NBBO_FILE] + [snapshot_file(i) for i in intervals]:
+                res["out_bytes"] += write_atomic(empty, day_dir / name)
+            res["status"] = "empty"
+            return res
+
+        for name, df in build_outputs(q, intervals).items():
+            if name == NBBO_FILE:
+                res["nbbo_rows"] = df.height
+            res["out_bytes"] += write_atomic(df, day_dir / name)
+    except Exception as e:
+        res["status"] = "error"
+        res["error"] = str(e)
+    return res
+
+def main():
+    ap = argparse.ArgumentParser(description="Compacta quotes crudos a NBBO change-only + snapshots")
+    ap.add_argument("--quotes-root", required=True,
+                    help="Raíz del store de quotes (TICKER/year=/month=/day=/quotes.parquet)")
+    ap.add_argument("--tickers-csv", default=None,
+                    help="CSV/Parquet con columna 'ticker' para limitar el universo")
+    ap.add_argument("--intervals", default="100ms,1s",
+                    help=f"Snapshots a materializar ({','.join(INTERVALS_NS)})")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    ap.add_argument("--force", action="store_true", help="Recompactar aunque la salida esté al día")
+    args = ap.parse_args()
+
+    intervals = [i.strip() for i in args.intervals.split(",") if i.strip()]
+    unknown = [i for i in intervals if i not in INTERVALS_NS]
+    if unknown:
+        sys.exit(f"ERROR: intervalos no soportados: {unknown}")
+
+    root = Path(args.quotes_root)
+    tickers = None
+    if args.tickers_csv:
+        src = args.tickers_csv
+        df = pl.read_parquet(src) if src.endswith(".parquet") else pl.read_csv(src)
+        tickers = set(df["ticker"].drop_nulls().to_list())
+
+    print("=" * 80)
+    print("COMPACTACIÓN NBBO (change-only + snapshots)")
+    print("=" * 80)
+    log(f"Quotes root: {root}")
+    log(f"Intervalos: {', '.join(intervals)} | Workers: {args.workers}")
+
+    days = find_quote_days(root, tickers)
+    log(f"Ticker-días (o ticker-meses compactados) con quotes.parquet: {len(days):,}")
+    if not days:
+        return
+
+    counts = {"ok": 0, "skipped": 0, "empty": 0, "error": 0}
+    raw_rows = nbbo_rows = raw_bytes = out_bytes = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        futures = [ex.submit(compact_day, str(d), intervals, args.force) for d in days]
+        for i, fut in enumerate(as_completed(futures), 1):
+            r = fut.result()
+            counts[r["status"]] += 1
+            if r["status"] == "error":
+                log(f"ERROR {r['day_dir']}: {r['error']}")
+            elif r["status"] == "ok":
+                raw_rows += r["raw_rows"]
+                nbbo_rows += r["nbbo_rows"]
+                raw_bytes += r["raw_bytes"]
+                out_bytes += r["out_bytes"]
+            if i % 1000 == 0:
+                log(f"Progreso {i:,}/{len(days):,}")
+
+    print("\n" + "=" * 80)
+    print("RESUMEN")
+    print("=" * 80)
+    log(f"Compactados: {counts['ok']:,} | Al día: {counts['skipped']:,} | "
+        f"Vacíos: {counts['empty']:,} | Errores: {counts['error']:,}")
+    if raw_rows:
+        log(f"Quotes crudos: {raw_rows:,} -> NBBO change-only: {nbbo_rows:,} "
+            f"({nbbo_rows / raw_rows * 100:.1f}%)")
+    if raw_bytes:
+        log(f"Disco: crudo {raw_bytes / 1024**2:,.1f} MB | NBBO+snapshots {out_bytes / 1024**2:,.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ Download Indices with Auto-Detection - Detecta automáticamente el rango de dato
 
 import os
 import sys
-import json
 import asyncio
 import aiohttp
 import argparse
@@ -14,6 +13,12 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List, Tuple
 import polars as pl
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from state_store import StateStore, default_state_db, DONE, ERROR  # noqa: E402
+
+DATASET = "ticker_range"
+
 # Configuracion
 DEFAULT_CONN_LIMIT = 40
 DEFAULT_TIMEOUT = 60
@@ -34,7 +39,7 @@ def log(msg: str):
     print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}")
 
 class SmartDownloader:
-    def __init__(self, api_key: str, output_dir: Path):
+    def __init__(self, api_key: str, output_dir: Path, state_db: Optional[Path] = None):
         self.api_key = api_key
         self.base_url = "https://api.polygon.io"
         self.output_dir = Path(output_dir)
@@ -42,7 +47,8 @@ class SmartDownloader:
         
         # Cache de rangos de tickers
         self.ticker_ranges = {}
-        self.ranges_file = self.output_dir / "ticker_ranges.json"
+        # Persistidos en el state store (antes ticker_ranges.json)
+        self.state = StateStore(state_db or default_state_db(self.output_dir))
         self.load_ranges_cache()
         
         # Session
@@ -60,20 +66,23 @@ class SmartDownloader:
         }
     
     def load_ranges_cache(self):
-        """Carga cache de rangos de tickers"""
-        if self.ranges_file.exists():
-            try:
-                with open(self.ranges_file, 'r') as f:
-                    self.ticker_ranges = json.load(f)
-                    log(f"Cache de rangos cargado: {len(self.ticker_ranges)} tickers")
-            except:
-                self.ticker_ranges = {}
-    
-    def save_ranges_cache(self):
-        """Guarda cache de rangos"""
-        with open(self.ranges_file, 'w') as f:
-            json.dump(self.ticker_ranges, f, indent=2)
-    
+        """Carga los rangos de tickers del state store (importa ticker_ranges.json una vez)"""
+        self.state.import_legacy_json(
+            self.output_dir / "ticker_ranges.json",
+            lambda data: ({"dataset": DATASET, "ticker": t, "period": "",
+                           "status": DONE if r.get("start") and r.get("end") else ERROR,
+                           "error": r.get("error"), "meta": r} for t, r in data.items())
+        )
+        self.ticker_ranges = {r["ticker"]: r["meta"] or {} for r in self.state.records(DATASET)}
+        if self.ticker_ranges:
+            log(f"Cache de rangos cargado: {len(self.ticker_ranges)} tickers")
+
+    def save_range(self, ticker: str, info: dict):
+        """Guarda el rango de un ticker (una fila, sin reescribir el resto)"""
+        self.ticker_ranges[ticker] = info
+        status = DONE if info.get("start") and info.get("end") else ERROR
+        self.state.mark(DATASET, ticker, "", status, error=info.get("error"), meta=info)
+
     async def init_session(self):
         """Inicializa la sesion HTTP"""
         if not self.session:
@@ -100,6 +109,7 @@ class SmartDownloader:
         """Cierra la sesion"""
         if self.session:
             await self.session.close()
+        self.state.close()
     
     async def ping_ticker(self, ticker: str) -> Tuple[Optional[str], Optional[str]]:
         """
@@ -133,12 +143,12 @@ class SmartDownloader:
                         return await self.get_full_range(ticker)
                 elif resp.status == 403:
                     log(f"    No autorizado para {ticker}")
-                    self.ticker_ranges[ticker] = {"start": None, "end": None, "error": "403"}
+                    self.save_range(ticker, {"start": None, "end": None, "error": "403"})
                 else:
-                    self.ticker_ranges[ticker] = {"start": None, "end": None, "error": str(resp.status)}
+                    self.save_range(ticker, {"start": None, "end": None, "error": str(resp.status)})
         except Exception as e:
             log(f"    Error ping {ticker}: {e}")
-            self.ticker_ranges[ticker] = {"start": None, "end": None, "error": str(e)}
+            self.save_range(ticker, {"start": None, "end": None, "error": str(e)})
         
         return None, None
     
@@ -176,12 +186,11 @@ class SmartDownloader:
             
             if first_date and last_date:
                 log(f"    Rango detectado: {first_date} a {last_date}")
-                self.ticker_ranges[ticker] = {
+                self.save_range(ticker, {
                     "start": first_date,
                     "end": last_date,
                     "detected_at": datetime.now().isoformat()
-                }
-                self.save_ranges_cache()
+                })
                 return first_date, last_date
                 
         except Exception as e:
@@ -384,6 +393,7 @@ async def main():
     parser.add_argument("--force", action="store_true")
     parser.add_argument("--indices-only", action="store_true")
     parser.add_argument("--etfs-only", action="store_true")
+    parser.add_argument("--state-db", help="SQLite de estado (default: TSIS_STATE_DB o <output>/_state.sqlite)")
     
     args = parser.parse_args()
     
@@ -405,12 +415,12 @@ async def main():
     timespan = "minute" if args.minute else "day"
     
     # Downloader
-    downloader = SmartDownloader(api_key, Path(args.output))
+    downloader = SmartDownloader(api_key, Path(args.output),
+                                 Path(args.state_db) if args.state_db else None)
     
     try:
         await downloader.init_session()
         await downloader.download_all(tickers, timespan, args.force)
-        downloader.save_ranges_cache()
     finally:
         await downloader.close()
 
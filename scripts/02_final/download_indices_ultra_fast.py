@@ -10,12 +10,17 @@ import polars as pl
 from pathlib import Path
 import os
 import sys
-import json
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional, Dict
 import time
 import calendar
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from state_store import StateStore, default_state_db, DONE, ERROR  # noqa: E402
+
+DATASET = "ticker_range"
+
 # Configuración
 DEFAULT_CONCURRENT = 50
 BATCH_SIZE = 100
@@ -32,7 +37,8 @@ ETFS = [
 
 
 class UltraFastIndicesDownloader:
-    def __init__(self, api_key: str, output_dir: Path, max_concurrent: int = DEFAULT_CONCURRENT):
+    def __init__(self, api_key: str, output_dir: Path, max_concurrent: int = DEFAULT_CONCURRENT,
+                 state_db: Optional[Path] = None):
         self.api_key = api_key
         self.base_url = "https://api.polygon.io"
         self.output_dir = Path(output_dir)
@@ -44,7 +50,8 @@ class UltraFastIndicesDownloader:
 
         # Cache de rangos de tickers
         self.ticker_ranges: Dict[str, dict] = {}
-        self.ranges_file = self.output_dir / "ticker_ranges.json"
+        # Persistidos en el state store (antes ticker_ranges.json)
+        self.state = StateStore(state_db or default_state_db(self.output_dir))
         self.load_ranges_cache()
 
         # Stats
@@ -58,19 +65,22 @@ class UltraFastIndicesDownloader:
         }
 
     def load_ranges_cache(self):
-        """Carga cache de rangos de tickers"""
-        if self.ranges_file.exists():
-            try:
-                with open(self.ranges_file, 'r') as f:
-                    self.ticker_ranges = json.load(f)
-                    print(f"Cache de rangos cargado: {len(self.ticker_ranges)} tickers")
-            except:
-                self.ticker_ranges = {}
+        """Carga los rangos de tickers del state store (importa ticker_ranges.json una vez)"""
+        self.state.import_legacy_json(
+            self.output_dir / "ticker_ranges.json",
+            lambda data: ({"dataset": DATASET, "ticker": t, "period": "",
+                           "status": DONE if r.get("start") and r.get("end") else ERROR,
+                           "error": r.get("error"), "meta": r} for t, r in data.items())
+        )
+        self.ticker_ranges = {r["ticker"]: r["meta"] or {} for r in self.state.records(DATASET)}
+        if self.ticker_ranges:
+            print(f"Cache de rangos cargado: {len(self.ticker_ranges)} tickers")
 
-    def save_ranges_cache(self):
-        """Guarda cache de rangos"""
-        with open(self.ranges_file, 'w') as f:
-            json.dump(self.ticker_ranges, f, indent=2)
+    def save_range(self, ticker: str, info: dict):
+        """Guarda el rango de un ticker (una fila, sin reescribir el resto)"""
+        self.ticker_ranges[ticker] = info
+        status = DONE if info.get("start") and info.get("end") else ERROR
+        self.state.mark(DATASET, ticker, "", status, error=info.get("error"), meta=info)
 
     async def init_session(self):
         """Session optimizada para alta concurrencia"""
@@ -140,21 +150,19 @@ class UltraFastIndicesDownloader:
 
             if first_date and last_date:
                 print(f"    {ticker}: {first_date} -> {last_date}")
-                self.ticker_ranges[ticker] = {
+                self.save_range(ticker, {
                     "start": first_date,
                     "end": last_date,
                     "detected_at": datetime.now().isoformat()
-                }
-                self.save_ranges_cache()
+                })
                 return first_date, last_date
             else:
                 print(f"    {ticker}: Sin datos disponibles")
-                self.ticker_ranges[ticker] = {"start": None, "end": None, "error": "no_data"}
-                self.save_ranges_cache()
+                self.save_range(ticker, {"start": None, "end": None, "error": "no_data"})
 
         except Exception as e:
             print(f"    Error detectando rango para {ticker}: {e}")
-            self.ticker_ranges[ticker] = {"start": None, "end": None, "error": str(e)}
+            self.save_range(ticker, {"start": None, "end": None, "error": str(e)})
 
         return None, None
 
@@ -400,6 +408,7 @@ class UltraFastIndicesDownloader:
     async def close(self):
         if self.session:
             await self.session.close()
+        self.state.close()
 
 
 async def main():
@@ -414,6 +423,7 @@ async def main():
     parser.add_argument('--force', action='store_true')
     parser.add_argument('--indices-only', action='store_true')
     parser.add_argument('--etfs-only', action='store_true')
+    parser.add_argument('--state-db', help='SQLite de estado (default: TSIS_STATE_DB o <output>/_state.sqlite)')
 
     args = parser.parse_args()
 
@@ -433,7 +443,8 @@ async def main():
     downloader = UltraFastIndicesDownloader(
         api_key=api_key,
         output_dir=Path(args.output),
-        max_concurrent=args.concurrent
+        max_concurrent=args.concurrent,
+        state_db=Path(args.state_db) if args.state_db else None
     )
 
     try:
@@ -10,13 +10,27 @@ import polars as pl
 from pathlib import Path
 import os
 import sys
-import json
+import time
 from datetime import datetime
 import backoff
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from state_store import StateStore, default_state_db, DONE, EMPTY, ERROR  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from page_checkpoint import PageCheckpoint  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
+DATASET = "quotes"
+ENDPOINT = "v3/quotes"
+MAX_PAGES_PER_RUN = 100  # límite de seguridad por pasada; el resto sigue desde el cursor
+
 class FastQuotesDownloader:
-    def __init__(self, api_key: str, max_concurrent: int = 50):
+    def __init__(self, api_key: str, max_concurrent: int = 50, state_db: Path = None, hive: bool = False,
+                 metrics: IngestMetrics = None):
         self.api_key = api_key
+        self.hive = hive  # layout ticker=X/... (utils/hive_layout.py)
         self.base_url = "https://api.polygon.io/v3/quotes"
         self.max_concurrent = max_concurrent
         self.semaphore = asyncio.Semaphore(max_concurrent)
@@ -25,28 +39,20 @@ class FastQuotesDownloader:
         self.errors = 0
         self.total = 0
         self.start_time = None
-        self.checkpoint_file = Path("quotes_download_checkpoint.json")
+        # Estado por (ticker, día) en SQLite; sustituye el checkpoint posicional
+        # quotes_download_checkpoint.json (que saltaba tareas erróneas si cambiaba el CSV)
+        self.legacy_checkpoint = Path("quotes_download_checkpoint.json")
+        self.state_db = state_db
+        self.state = None
+        self.done_days = set()
+        # Métricas en vivo (utils/ingest_metrics.py)
+        self.metrics = metrics
         
-    def save_checkpoint(self):
-        """Guarda checkpoint para resume capability"""
-        checkpoint = {
-            'completed': self.completed,
-            'errors': self.errors,
-            'elapsed': (datetime.now() - self.start_time).total_seconds() if self.start_time else 0,
-            'timestamp': datetime.now().isoformat()
-        }
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f)
-    
-    def load_checkpoint(self):
-        """Carga checkpoint si existe"""
-        if self.checkpoint_file.exists():
-            try:
-                with open(self.checkpoint_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return None
+    def mark(self, ticker: str, date: str, status: str, **kwargs):
+        """Registra el resultado del día en el state store"""
+        self.state.mark(DATASET, ticker, date, status, **kwargs)
+        if status in (DONE, EMPTY):
+            self.done_days.add((ticker, date))
     
     def format_eta(self, seconds):
         """Formatea ETA de manera legible"""
@@ -68,6 +74,7 @@ class FastQuotesDownloader:
         elapsed = (datetime.now() - self.start_time).total_seconds()
         rate = self.completed / elapsed if elapsed > 0 else 0
         eta = (self.total - self.completed) / rate if rate > 0 else 0
+        mb_s = self.metrics.rates()['mb_s'] if self.metrics is not None else 0.0
         
         # Calcular porcentajes
         progress_pct = (self.completed / self.total * 100) if self.total > 0 else 0
@@ -84,6 +91,7 @@ class FastQuotesDownloader:
               f"Success: {success_count:,} ({success_pct:.1f}%) | "
               f"Errors: {self.errors:,} ({error_pct:.1f}%) | "
               f"Rate: {rate:.1f}/s | "
+              f"{mb_s:.2f} MB/s | "
               f"ETA: {eta_str} | "
               f"Elapsed: {elapsed_str}", 
               end='')
@@ -126,8 +134,13 @@ class FastQuotesDownloader:
         
         # Check si ya existe
         year, month, day = date.split('-')
-        output_file = output_dir / ticker / f"year={year}" / f"month={month}" / f"day={date}" / "quotes.parquet"
+        output_file = partition_dir(output_dir, ticker, year, month, date, hive=self.hive) / "quotes.parquet"
+        if (ticker, date) in self.done_days:
+            self.completed += 1
+            return
         if output_file.exists():
+            # Descargado antes de existir el state store
+            self.mark(ticker, date, DONE, bytes=output_file.stat().st_size)
             self.completed += 1
             return
         
@@ -140,91 +153,132 @@ class FastQuotesDownloader:
             'order': 'asc'
         }
         
-        all_data = []
-        pages_downloaded = 0
+        # Cada página se guarda como part file con su cursor (utils/page_checkpoint.py):
+        # un día cortado (límite de páginas, 429 o error en una página) queda en ERROR
+        # y la siguiente pasada continúa desde la última página confirmada
+        ckpt = PageCheckpoint(output_file.parent)
+        next_url, pages_downloaded = ckpt.resume()
+        pages_this_run = 0
+        t0, observed = time.perf_counter(), True  # request en curso (métricas)
         
         async with self.semaphore:
             try:
-                # Primera página
-                async with self.session.get(url, params=params) as resp:
-                    if resp.status == 429:
-                        retry_after = int(resp.headers.get('X-Polygon-Retry-After', '5'))
-                        await asyncio.sleep(retry_after)
-                        
-                        # Reintentar una vez
-                        async with self.session.get(url, params=params) as resp2:
-                            if resp2.status != 200:
-                                self.errors += 1
-                                self.completed += 1
-                                return
-                            data = await resp2.json()
-                    elif resp.status != 200:
-                        self.errors += 1
-                        self.completed += 1
-                        return
-                    else:
-                        data = await resp.json()
+                if not ckpt.has_progress():
+                    # Primera página
+                    t0, observed = time.perf_counter(), False
+                    async with self.session.get(url, params=params) as resp:
+                        if self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, resp.status, time.perf_counter() - t0)
+                            observed = True
+                        if resp.status == 429:
+                            if self.metrics is not None:
+                                self.metrics.retry(ENDPOINT, 429)
+                            retry_after = int(resp.headers.get('X-Polygon-Retry-After', '5'))
+                            await asyncio.sleep(retry_after)
+
+                            # Reintentar una vez
+                            t0, observed = time.perf_counter(), False
+                            async with self.session.get(url, params=params) as resp2:
+                                if self.metrics is not None:
+                                    self.metrics.observe_request(ENDPOINT, resp2.status, time.perf_counter() - t0)
+                                    observed = True
+                                if resp2.status != 200:
+                                    self.errors += 1
+                                    self.mark(ticker, date, ERROR, error=f"HTTP {resp2.status}")
+                                    self.completed += 1
+                                    return
+                                data = await resp2.json()
+                        elif resp.status != 200:
+                            self.errors += 1
+                            self.mark(ticker, date, ERROR, error=f"HTTP {resp.status}")
+                            self.completed += 1
+                            return
+                        else:
+                            data = await resp.json()
                     
                     results = data.get('results', [])
+                    next_url = data.get('next_url') if results else None
+                    ckpt.write_page(pl.DataFrame(results), next_url)
+                    if self.metrics is not None:
+                        self.metrics.add_rows(len(results))
+                    pages_this_run = 1
+                
+                # Paginación completa (con límite de seguridad por pasada)
+                while not ckpt.is_complete() and pages_this_run < MAX_PAGES_PER_RUN:
+                    if 'apiKey=' not in next_url:
+                        if '?' in next_url:
+                            next_url += f"&apiKey={self.api_key}"
+                        else:
+                            next_url += f"?apiKey={self.api_key}"
                     
-                    if not results:
-                        # Crear archivo vacío
-                        output_file.parent.mkdir(parents=True, exist_ok=True)
-                        pl.DataFrame().write_parquet(output_file)
-                        self.completed += 1
-                        return
-                    
-                    all_data.extend(results)
-                    pages_downloaded = 1
-                    
-                    # Paginación completa
-                    next_url = data.get('next_url')
+                    t0, observed = time.perf_counter(), False
+                    try:
+                        async with self.session.get(next_url) as page_resp:
+                            if self.metrics is not None:
+                                self.metrics.observe_request(ENDPOINT, page_resp.status, time.perf_counter() - t0)
+                                observed = True
+                            if page_resp.status == 429:
+                                if self.metrics is not None:
+                                    self.metrics.retry(ENDPOINT, 429)
+                                await asyncio.sleep(2)
+                                break
+                            if page_resp.status != 200:
+                                break
+                            page_data = await page_resp.json()
+                    except Exception as e:
+                        if self.metrics is not None and not observed:
+                            self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+                        break
                     
-                    # Descargar TODAS las páginas
-                    while next_url and pages_downloaded < 100:
-                        if 'apiKey=' not in next_url:
-                            if '?' in next_url:
-                                next_url += f"&apiKey={self.api_key}"
-                            else:
-                                next_url += f"?apiKey={self.api_key}"
-                        
-                        try:
-                            async with self.session.get(next_url) as page_resp:
-                                if page_resp.status == 429:
-                                    await asyncio.sleep(2)
-                                    break
-                                
-                                if page_resp.status == 200:
-                                    page_data = await page_resp.json()
-                                    page_results = page_data.get('results', [])
-                                    if page_results:
-                                        all_data.extend(page_results)
-                                        pages_downloaded += 1
-                                    next_url = page_data.get('next_url')
-                                else:
-                                    break
-                        except:
-                            break
+                    page_results = page_data.get('results', [])
+                    next_url = page_data.get('next_url') if page_results else None
+                    ckpt.write_page(pl.DataFrame(page_results), next_url)
+                    if self.metrics is not None:
+                        self.metrics.add_rows(len(page_results))
+                    pages_this_run += 1
                 
-                # Guardar datos
-                if all_data:
-                    df = pl.DataFrame(all_data)
+                pages_downloaded = ckpt.pages
+                if not ckpt.is_complete():
+                    # Quedan páginas (next_url pendiente): nunca DONE con un día truncado
+                    self.errors += 1
+                    self.mark(ticker, date, ERROR, pages=ckpt.pages, rows=ckpt.rows,
+                              error=f"incompleto: next_url pendiente tras {ckpt.pages} páginas")
+                elif ckpt.rows == 0:
+                    # Crear archivo vacío
+                    output_file.parent.mkdir(parents=True, exist_ok=True)
+                    pl.DataFrame().write_parquet(output_file)
+                    ckpt.clear()
+                    if self.metrics is not None:
+                        self.metrics.add_bytes(output_file.stat().st_size)
+                    self.mark(ticker, date, EMPTY, pages=pages_downloaded, rows=0,
+                              bytes=output_file.stat().st_size)
+                else:
+                    # Guardar datos
+                    df = ckpt.read_all()
                     
+                    # Mínimo procesamiento
                     if 'sip_timestamp' in df.columns:
                         df = df.rename({'sip_timestamp': 'timestamp'})
                     
-                    output_file.parent.mkdir(parents=True, exist_ok=True)
-                    df.write_parquet(output_file, compression='zstd', compression_level=1)
+                    write_parquet(df, output_file, "quotes")
+                    if self.metrics is not None:
+                        self.metrics.add_bytes(output_file.stat().st_size)
+                    # Día confirmado: ya no hacen falta las páginas parciales
+                    ckpt.clear()
+                    self.mark(ticker, date, DONE, pages=pages_downloaded, rows=df.height,
+                              bytes=output_file.stat().st_size)
                 
                 self.completed += 1
                 
                 # Progress con checkpoint cada 100 tareas
                 if self.completed % 100 == 0:
-                    self.save_checkpoint()
                     self.print_progress(pages_downloaded)
                     
             except Exception as e:
                 self.errors += 1
+                if self.metrics is not None and not observed:
+                    self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+                self.mark(ticker, date, ERROR, pages=pages_downloaded, error=repr(e))
                 self.completed += 1
                 if self.completed % 1000 == 0:
                     print(f"[{datetime.now():%H:%M:%S}] Error en {ticker} {date}: {str(e)[:100]}")
@@ -235,17 +289,21 @@ class FastQuotesDownloader:
         df = pl.read_csv(csv_file)
         tasks_data = df.to_dicts()
         
-        # Check resume
-        skip_count = 0
-        if resume:
-            checkpoint = self.load_checkpoint()
-            if checkpoint:
-                skip_count = checkpoint['completed']
-                self.errors = checkpoint.get('errors', 0)
-                print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Resumiendo desde: {skip_count:,} completados, {self.errors:,} errores previos")
-                tasks_data = tasks_data[skip_count:]
+        output_path = Path(output_dir)
+        self.hive = use_hive(output_path, self.hive)
+        self.state = StateStore(self.state_db or default_state_db(output_path))
+        self.done_days = self.state.done_keys(DATASET)
+        if self.legacy_checkpoint.exists():
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Checkpoint posicional {self.legacy_checkpoint} ignorado: el resume usa el state store")
         
-        self.total = len(tasks_data) + skip_count
+        # Resume por clave (ticker, día), independiente del orden del CSV
+        total_tasks = len(tasks_data)
+        tasks_data = [r for r in tasks_data if (r['ticker'], r['date']) not in self.done_days]
+        skip_count = total_tasks - len(tasks_data)
+        if skip_count:
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Resumiendo: {skip_count:,} días ya completados en {self.state.path}")
+        
+        self.total = total_tasks
         self.completed = skip_count
         self.start_time = datetime.now()
         
@@ -255,8 +313,6 @@ class FastQuotesDownloader:
         print(f"Concurrencia: {self.max_concurrent}")
         print("-" * 80)
         
-        output_path = Path(output_dir)
-        
         # Crear todas las tareas
         tasks = []
         for row in tasks_data:
@@ -267,15 +323,18 @@ class FastQuotesDownloader:
         batch_size = 5000
         for i in range(0, len(tasks), batch_size):
             batch = tasks[i:i+batch_size]
+            if self.metrics is not None:
+                self.metrics.queue_depth("days", len(tasks) - i)
             await asyncio.gather(*batch, return_exceptions=True)
             
-            # Guardar checkpoint después de cada batch
-            self.save_checkpoint()
             
             # Imprimir progreso
             print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Batch {i//batch_size + 1} completado")
             self.print_progress()
         
+        if self.metrics is not None:
+            self.metrics.queue_depth("days", 0)
+        
         # Estadísticas finales
         elapsed = (datetime.now() - self.start_time).total_seconds()
         print("\n" + "="*80)
@@ -295,10 +354,7 @@ class FastQuotesDownloader:
         if elapsed > 0:
             print(f"Velocidad promedio: {self.completed/elapsed:.1f} días/segundo")
         
-        # Limpiar checkpoint si completado exitosamente
-        if self.checkpoint_file.exists() and self.errors == 0:
-            self.checkpoint_file.unlink()
-            print("Checkpoint eliminado (descarga completa)")
+        self.state.close()
 
 async def main():
     import argparse
@@ -308,7 +364,11 @@ async def main():
     parser.add_argument('--output', required=True, help='Directorio de salida')
     parser.add_argument('--concurrent', type=int, default=50, help='Descargas simultáneas')
     parser.add_argument('--api-key', help='Polygon API key')
-    parser.add_argument('--resume', action='store_true', help='Resume desde checkpoint')
+    parser.add_argument('--resume', action='store_true', help='(Compatibilidad) el resume es automático vía state store')
+    parser.add_argument('--state-db', help='SQLite de estado (default: TSIS_STATE_DB o <output>/_state.sqlite)')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/... (automático si output ya está migrado)')
+    add_metrics_args(parser)
     
     args = parser.parse_args()
     
@@ -317,13 +377,17 @@ async def main():
         print("ERROR: Necesitas API key")
         sys.exit(1)
     
-    downloader = FastQuotesDownloader(api_key, args.concurrent)
+    downloader = FastQuotesDownloader(api_key, args.concurrent,
+                                      Path(args.state_db) if args.state_db else None,
+                                      hive=args.hive_layout,
+                                      metrics=metrics_from_args(args, DATASET))
     await downloader.init_session()
     
     try:
         await downloader.download_all(args.csv, args.output, args.resume)
     finally:
         await downloader.session.close()
+        downloader.metrics.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
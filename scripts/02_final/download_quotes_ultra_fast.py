@@ -12,30 +12,53 @@ import os
 import sys
 import json
 from datetime import datetime
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Tuple
 import time
 from collections import defaultdict
 import backoff
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from page_checkpoint import PageCheckpoint  # noqa: E402
+from liquidity_summary import LiquidityTable, summarize_quotes  # noqa: E402
+from state_store import StateStore, default_state_db, DONE, EMPTY, ERROR  # noqa: E402
+from download_budget import DownloadBudget  # noqa: E402
+from dataset_catalog import CatalogWriter, default_catalog_dir  # noqa: E402
+from store_query import compacted_days  # noqa: E402
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
+DATASET = "quotes"
+ENDPOINT = "v3/quotes"
+
 class UltraFastQuotesDownloader:
-    def __init__(self, api_key: str, output_dir: Path, max_concurrent: int = 100):
+    def __init__(self, api_key: str, output_dir: Path, max_concurrent: int = 100,
+                 liquidity_dir: Path = None, state_db: Path = None, budget: DownloadBudget = None,
+                 catalog_dir: Path = None, catalog: bool = True, hive: bool = False,
+                 metrics: IngestMetrics = None):
         self.api_key = api_key
         self.base_url = "https://api.polygon.io/v3/quotes"
         self.output_dir = Path(output_dir)
+        self.hive = use_hive(self.output_dir, hive)  # layout ticker=X/... (utils/hive_layout.py)
         self.max_concurrent = max_concurrent
         self.semaphore = asyncio.Semaphore(max_concurrent)
         
         # Session HTTP
         self.session = None
         
-        # Cache de días vacíos para skip rápido
-        self.cache_file = self.output_dir / ".quotes_cache.json"
-        self.empty_days_cache = self.load_cache()
-        self.completed_cache = set()  # En memoria para velocidad
+        # Estado por (ticker, día) en SQLite: sustituye .quotes_cache.json y el
+        # checkpoint posicional .checkpoint.json (resume correcto aunque cambie el CSV)
+        self.state = StateStore(state_db or default_state_db(self.output_dir))
+        self.import_legacy_cache()
+        self.done_days = self.state.done_keys(DATASET)  # En memoria para skip O(1)
+        self.pages_by_day = {}
         
-        # Checkpoint menos frecuente
-        self.checkpoint_file = self.output_dir / ".checkpoint.json"
-        self.checkpoint_interval = 5000  # Cada 5000 tareas
+        # Límite de requests / GB / horas (sin límites por defecto)
+        self.budget = budget or DownloadBudget()
+
+        # Métricas en vivo (utils/ingest_metrics.py)
+        self.metrics = metrics
         
         # Métricas
         self.stats = {
@@ -48,49 +71,50 @@ class UltraFastQuotesDownloader:
             'total_pages': 0
         }
         
+        # Resumen de liquidez por ticker-día (calculado con los datos aún en memoria)
+        self.liquidity = LiquidityTable(
+            liquidity_dir or self.output_dir.parent / f"{self.output_dir.name}_liquidity"
+        )
+        
+        # Catálogo de ficheros confirmados (utils/dataset_catalog.py)
+        self.catalog = CatalogWriter(catalog_dir or default_catalog_dir(self.output_dir), DATASET,
+                                     self.output_dir) if catalog else None
+        
         # Buffer de escritura para batch saves
         self.write_buffer = defaultdict(list)
         self.buffer_size = 100  # Acumular 100 días antes de escribir
     
-    def load_cache(self) -> Set[str]:
-        """Carga cache de días vacíos"""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return set(json.load(f).get('empty_days', []))
-            except:
-                return set()
-        return set()
-    
-    def save_cache(self):
-        """Guarda cache eficientemente"""
-        cache_data = {
-            'empty_days': list(self.empty_days_cache),
-            'timestamp': datetime.now().isoformat()
-        }
-        with open(self.cache_file, 'w') as f:
-            json.dump(cache_data, f)
+    def import_legacy_cache(self):
+        """Migra una sola vez el .quotes_cache.json antiguo (días vacíos)"""
+        def to_records(data):
+            for key in data.get('empty_days', []):
+                ticker, date = key.rsplit('_', 1)
+                yield {'dataset': DATASET, 'ticker': ticker, 'period': date, 'status': EMPTY, 'rows': 0}
+        n = self.state.import_legacy_json(self.output_dir / ".quotes_cache.json", to_records)
+        if n:
+            print(f"Migrados {n:,} días vacíos de .quotes_cache.json al state store")
     
     def should_skip(self, ticker: str, date: str) -> bool:
         """Check rápido si debemos saltar este día"""
-        # Cache key
-        key = f"{ticker}_{date}"
+        key = (ticker, date)
         
-        # Skip si está en cache de vacíos
-        if key in self.empty_days_cache:
+        # Skip si ya completado o vacío (state store, en memoria)
+        if key in self.done_days:
             self.stats['skipped'] += 1
             return True
         
-        # Skip si ya completado (en memoria)
-        if key in self.completed_cache:
+        # Días descargados antes de existir el state store: registrar y saltar
+        output_file = self.day_dir(ticker, date) / "quotes.parquet"
+        if output_file.exists():
+            self.state.mark(DATASET, ticker, date, DONE, bytes=output_file.stat().st_size)
+            self.done_days.add(key)
             self.stats['skipped'] += 1
             return True
         
-        # Check rápido si archivo existe
-        year, month, day = date.split('-')
-        output_file = self.output_dir / ticker / f"year={year}" / f"month={month}" / f"day={day}" / "quotes.parquet"
-        if output_file.exists():
-            self.completed_cache.add(key)
+        # Días ya fusionados en el quotes.parquet del mes (compact_small_files.py)
+        if date in compacted_days(output_file.parent.parent):
+            self.state.mark(DATASET, ticker, date, DONE)
+            self.done_days.add(key)
             self.stats['skipped'] += 1
             return True
         
@@ -124,8 +148,45 @@ class UltraFastQuotesDownloader:
             json_serialize=json.dumps  # Más rápido que default
         )
     
-    async def fetch_quotes_raw(self, ticker: str, date: str) -> Tuple[str, str, List[dict]]:
-        """Descarga quotes sin procesamiento (más rápido)"""
+    def day_dir(self, ticker: str, date: str) -> Path:
+        year, month, day = date.split('-')
+        return partition_dir(self.output_dir, ticker, year, month, day, hive=self.hive)
+    
+    async def get_page(self, url: str, params: dict = None, max_tries: int = 5) -> dict:
+        """GET de una página; reintenta 429 en vez de devolver un día truncado"""
+        for attempt in range(max_tries):
+            t0, observed = time.perf_counter(), False
+            try:
+                async with self.session.get(url, params=params) as resp:
+                    self.budget.charge(requests=1)
+                    if resp.status != 200 and self.metrics is not None:
+                        self.metrics.observe_request(ENDPOINT, resp.status, time.perf_counter() - t0)
+                        observed = True
+                    if resp.status == 429:
+                        if self.metrics is not None:
+                            self.metrics.retry(ENDPOINT, 429)
+                        await asyncio.sleep(1 + attempt)
+                        continue
+                    resp.raise_for_status()
+                    self.stats['total_pages'] += 1
+                    data = await resp.json()
+                    if self.metrics is not None:
+                        self.metrics.observe_request(ENDPOINT, resp.status, time.perf_counter() - t0)
+                    return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if self.metrics is not None and not observed:
+                    self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
+                raise
+        raise aiohttp.ClientError(f"429 persistente tras {max_tries} intentos")
+    
+    async def fetch_quotes_raw(self, ticker: str, date: str) -> Tuple[str, str, pl.DataFrame]:
+        """
+        Descarga quotes sin procesamiento (más rápido).
+        
+        Cada página se guarda como part file con su cursor (utils/page_checkpoint.py):
+        un fallo a mitad de día se reanuda desde la última página confirmada y el
+        día solo se devuelve completo cuando llega la última página.
+        """
         
         # Skip check
         if self.should_skip(ticker, date):
@@ -142,107 +203,95 @@ class UltraFastQuotesDownloader:
             'order': 'asc'
         }
         
-        all_results = []
-        pages = 0
-        max_pages = 10  # Límite para no atascarse
+        ckpt = PageCheckpoint(self.day_dir(ticker, date))
+        next_url, _ = ckpt.resume()
         
         async with self.semaphore:
             try:
-                # Primera página
-                async with self.session.get(url, params=params) as resp:
-                    if resp.status == 429:
-                        await asyncio.sleep(1)
-                        return (ticker, date, None)
-                    
-                    if resp.status != 200:
-                        self.stats['errors'] += 1
-                        return (ticker, date, None)
-                    
-                    data = await resp.json()
-                    results = data.get('results', [])
-                    
-                    if not results:
-                        # Día vacío - agregar a cache
-                        self.empty_days_cache.add(f"{ticker}_{date}")
-                        self.stats['empty'] += 1
-                        return (ticker, date, [])
-                    
-                    all_results.extend(results)
-                    pages = 1
-                    self.stats['total_pages'] += 1
-                    
-                    # Paginación secuencial pero eficiente (más confiable que paralela)
-                    next_url = data.get('next_url')
-                    
-                    while next_url and pages < max_pages:
+                # Paginación secuencial (más confiable que paralela); sin límite de páginas
+                while not ckpt.is_complete():
+                    if next_url:
                         if 'apiKey=' not in next_url:
                             next_url += f"&apiKey={self.api_key}" if '?' in next_url else f"?apiKey={self.api_key}"
-                        
-                        try:
-                            async with self.session.get(next_url) as page_resp:
-                                if page_resp.status == 429:
-                                    await asyncio.sleep(1)
-                                    break  # Salir si hay rate limit
-                                
-                                if page_resp.status == 200:
-                                    page_data = await page_resp.json()
-                                    page_results = page_data.get('results', [])
-                                    
-                                    if page_results:
-                                        all_results.extend(page_results)
-                                        pages += 1
-                                        self.stats['total_pages'] += 1
-                                        next_url = page_data.get('next_url')
-                                    else:
-                                        break  # No más resultados
-                                else:
-                                    break  # Error en página
-                        except:
-                            break  # Error en request
-                    self.stats['total_quotes'] += len(all_results)
+                        data = await self.get_page(next_url)
+                    else:
+                        data = await self.get_page(url, params)
                     
-                    return (ticker, date, all_results)
+                    results = data.get('results', [])
+                    next_url = data.get('next_url') if results else None
+                    ckpt.write_page(pl.DataFrame(results), next_url)
+                    if self.metrics is not None:
+                        self.metrics.add_rows(len(results))
+                
+                self.pages_by_day[(ticker, date)] = ckpt.pages
+                
+                if ckpt.rows == 0:
+                    # Día vacío (se registra en el state store al guardar)
+                    self.stats['empty'] += 1
+                    return (ticker, date, pl.DataFrame())
+                
+                self.stats['total_quotes'] += ckpt.rows
+                return (ticker, date, ckpt.read_all())
                     
             except asyncio.TimeoutError:
                 self.stats['errors'] += 1
+                self.state.mark(DATASET, ticker, date, ERROR, pages=ckpt.pages, error="timeout")
                 return (ticker, date, None)
-            except Exception:
+            except Exception as e:
                 self.stats['errors'] += 1
+                self.state.mark(DATASET, ticker, date, ERROR, pages=ckpt.pages, error=repr(e))
                 return (ticker, date, None)
     
-    def save_batch(self, batch_data: List[Tuple[str, str, List[dict]]]):
+    def save_batch(self, batch_data: List[Tuple[str, str, pl.DataFrame]]):
         """Guarda un batch de resultados (en thread para no bloquear)"""
-        for ticker, date, results in batch_data:
-            if results is None:
+        for i, (ticker, date, df) in enumerate(batch_data):
+            if self.metrics is not None:
+                self.metrics.writer_backlog(len(batch_data) - i)
+            if df is None:
                 continue
             
-            year, month, day = date.split('-')
-            output_file = self.output_dir / ticker / f"year={year}" / f"month={month}" / f"day={day}" / "quotes.parquet"
+            day_dir = self.day_dir(ticker, date)
+            output_file = day_dir / "quotes.parquet"
             
             try:
-                if results:  # Datos no vacíos
-                    df = pl.DataFrame(results)
-                    
+                if df.height > 0:  # Datos no vacíos
                     # Mínimo procesamiento
                     if 'sip_timestamp' in df.columns:
                         df = df.rename({'sip_timestamp': 'timestamp'})
                     
                     output_file.parent.mkdir(parents=True, exist_ok=True)
-                    df.write_parquet(
-                        output_file,
-                        compression='zstd',
-                        compression_level=1,  # Más rápido
-                        statistics=False  # Skip estadísticas
-                    )
+                    tmp_file = output_file.with_suffix('.parquet.tmp')
+                    write_parquet(df, tmp_file, DATASET)
+                    os.replace(tmp_file, output_file)
+                    self.liquidity.add(summarize_quotes(df, ticker, date))
                 else:  # Día vacío
                     output_file.parent.mkdir(parents=True, exist_ok=True)
                     pl.DataFrame().write_parquet(output_file)
+                    self.liquidity.add(summarize_quotes(df, ticker, date))
+                if self.catalog is not None:
+                    self.catalog.record(output_file, df)
+                
+                # Día confirmado: ya no hacen falta las páginas parciales
+                PageCheckpoint(day_dir).clear()
                 
-                # Marcar como completado
-                self.completed_cache.add(f"{ticker}_{date}")
+                # Marcar como completado (y fuera de la cola de prioridad)
+                size = output_file.stat().st_size
+                self.budget.charge(bytes=size)
+                if self.metrics is not None:
+                    self.metrics.add_bytes(size)
+                self.state.mark(DATASET, ticker, date, DONE if df.height > 0 else EMPTY,
+                                pages=self.pages_by_day.pop((ticker, date), None),
+                                rows=df.height, bytes=size)
+                self.done_days.add((ticker, date))
                 
             except Exception as e:
                 print(f"Error guardando {ticker} {date}: {e}")
+                self.state.mark(DATASET, ticker, date, ERROR, error=f"save: {e!r}")
+        
+        # Un part file de liquidez por batch
+        self.liquidity.flush()
+        if self.metrics is not None:
+            self.metrics.writer_backlog(0)
     
     async def process_batch_ultra_fast(self, tasks_batch: List[Tuple[str, str]]):
         """Procesa un batch completo en paralelo"""
@@ -265,8 +314,8 @@ class UltraFastQuotesDownloader:
         if valid_results:
             self.save_batch(valid_results)
     
-    async def download_all_ultra_fast(self, csv_file: str, resume: bool = False):
-        """Descarga masiva con máxima velocidad"""
+    async def download_all_ultra_fast(self, csv_file: str):
+        """Descarga masiva con máxima velocidad (siempre reanuda según el state store)"""
         
         # Cargar tareas
         print(f"Cargando tareas desde {csv_file}...")
@@ -276,17 +325,13 @@ class UltraFastQuotesDownloader:
         tasks = [(row['ticker'], row['date']) for row in df.to_dicts()]
         total_tasks = len(tasks)
         
-        # Resume logic
-        if resume and self.checkpoint_file.exists():
-            try:
-                with open(self.checkpoint_file, 'r') as f:
-                    checkpoint = json.load(f)
-                    skip = checkpoint.get('completed', 0)
-                    tasks = tasks[skip:]
-                    self.stats['completed'] = skip
-                    print(f"Resumiendo desde tarea {skip:,}")
-            except:
-                pass
+        # Resume por clave (ticker, día), independiente del orden del CSV
+        pending = [t for t in tasks if t not in self.done_days]
+        if len(pending) < total_tasks:
+            self.stats['completed'] = total_tasks - len(pending)
+            self.stats['skipped'] = total_tasks - len(pending)
+            print(f"Resumiendo: {total_tasks - len(pending):,} días ya en el state store")
+        tasks = pending
         
         self.stats['start_time'] = time.time()
         
@@ -303,16 +348,17 @@ class UltraFastQuotesDownloader:
         batch_size = 500  # Batches más grandes
         
         for i in range(0, len(tasks), batch_size):
+            reason = self.budget.exhausted()
+            if reason:
+                print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Presupuesto agotado: {reason}")
+                break
             batch = tasks[i:i + batch_size]
+            if self.metrics is not None:
+                self.metrics.queue_depth("days", len(tasks) - i)
             
             # Procesar batch completo en paralelo
             await self.process_batch_ultra_fast(batch)
             
-            # Checkpoint menos frecuente
-            if self.stats['completed'] % self.checkpoint_interval == 0:
-                self.save_checkpoint()
-                self.save_cache()
-            
             # Progress update
             elapsed = time.time() - self.stats['start_time']
             if elapsed > 0:
@@ -329,10 +375,12 @@ class UltraFastQuotesDownloader:
                 else:
                     eta_str = f"{eta/86400:.1f}d"
                 
+                mb_s = self.metrics.rates()['mb_s'] if self.metrics is not None else 0.0
                 print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] "
                       f"Progress: {self.stats['completed']}/{total_tasks} "
                       f"({self.stats['completed']/total_tasks*100:.1f}%) | "
                       f"Rate: {rate:.1f}/s | "
+                      f"{mb_s:.2f} MB/s | "
                       f"ETA: {eta_str} | "
                       f"Success: {success} | "
                       f"Errors: {self.stats['errors']} | "
@@ -340,17 +388,75 @@ class UltraFastQuotesDownloader:
                       f"Quotes: {self.stats['total_quotes']/1e6:.1f}M")
         
         # Final stats
+        if self.metrics is not None:
+            self.metrics.queue_depth("days", 0)
         self.print_final_stats(total_tasks)
     
-    def save_checkpoint(self):
-        """Guarda checkpoint para resume"""
-        checkpoint = {
-            'completed': self.stats['completed'],
-            'errors': self.stats['errors'],
-            'timestamp': datetime.now().isoformat()
-        }
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f)
+    async def download_from_queue(self, batch_size: int = 500, wait_seconds: float = 0,
+                                  lease_seconds: float = 3600, max_attempts: int = 3):
+        """
+        Consume la cola de prioridad del state store (mayor priority_score primero).
+        
+        Cada batch se reclama justo antes de procesarlo, así que las filas que
+        se encolen durante la descarga (enqueue_quotes.py) entran en el orden
+        correcto. Para al agotar el presupuesto o vaciarse la cola (tras esperar
+        wait_seconds a que lleguen filas nuevas).
+        """
+        self.stats['start_time'] = time.time()
+        counts = self.state.queue_counts(DATASET)
+        
+        print(f"="*60)
+        print(f"DESCARGA DE QUOTES DESDE COLA DE PRIORIDAD")
+        print(f"="*60)
+        print(f"En cola: {counts['pending']:,} (reclamados por otros: {counts['leased']:,})")
+        print(f"Concurrencia: {self.max_concurrent}")
+        print(f"State store: {self.state.path}")
+        print(f"Output: {self.output_dir}")
+        print("="*60)
+        
+        idle_since = None
+        while True:
+            reason = self.budget.exhausted()
+            if reason:
+                print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Presupuesto agotado: {reason}")
+                break
+            
+            # Cada día cuesta al menos un request: no reclamar más de lo que cabe
+            n = batch_size
+            if self.budget.remaining_requests() is not None:
+                n = min(n, self.budget.remaining_requests())
+            claimed = self.state.claim(DATASET, n, lease_seconds=lease_seconds,
+                                       max_attempts=max_attempts)
+            if self.metrics is not None:
+                self.metrics.queue_depth(DATASET, self.state.queue_counts(DATASET)['pending'])
+            if not claimed:
+                idle_since = idle_since or time.time()
+                if time.time() - idle_since >= wait_seconds:
+                    break
+                await asyncio.sleep(min(10, wait_seconds))
+                continue
+            idle_since = None
+            
+            batch = [(ticker, date) for ticker, date, _ in claimed]
+            try:
+                await self.process_batch_ultra_fast(batch)
+            finally:
+                # Lo no resuelto (skip, cancelación) vuelve a estar disponible
+                self.state.release(DATASET, batch)
+            
+            elapsed = time.time() - self.stats['start_time']
+            rate = self.stats['completed'] / elapsed if elapsed > 0 else 0
+            mb_s = self.metrics.rates()['mb_s'] if self.metrics is not None else 0.0
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] "
+                  f"Completados: {self.stats['completed']:,} | "
+                  f"Prioridad: {claimed[0][2]:.0f}-{claimed[-1][2]:.0f} | "
+                  f"Rate: {rate:.1f}/s | "
+                  f"{mb_s:.2f} MB/s | "
+                  f"Errors: {self.stats['errors']} | "
+                  f"En cola: {self.state.queue_counts(DATASET)['pending']:,} | "
+                  f"Budget: {self.budget.summary()}")
+        
+        self.print_final_stats(self.stats['completed'])
     
     def print_final_stats(self, total_tasks: int):
         """Imprime estadísticas finales"""
@@ -367,6 +473,7 @@ class UltraFastQuotesDownloader:
         print(f"Días vacíos: {self.stats['empty']:,}")
         print(f"Total quotes: {self.stats['total_quotes']:,}")
         print(f"Total páginas: {self.stats['total_pages']:,}")
+        print(f"Presupuesto consumido: {self.budget.summary()}")
         
         if elapsed > 0:
             print(f"Velocidad promedio: {self.stats['completed']/elapsed:.1f} tareas/segundo")
@@ -376,22 +483,39 @@ class UltraFastQuotesDownloader:
         """Cierra recursos"""
         if self.session:
             await self.session.close()
-        self.save_cache()
-        
-        # Limpiar checkpoint si completado
-        if self.checkpoint_file.exists():
-            self.checkpoint_file.unlink()
+        self.liquidity.compact()
+        if self.catalog is not None:
+            self.catalog.close()
+        self.state.close()
+        if self.metrics is not None:
+            self.metrics.close()
 
 async def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Download Quotes ULTRA-FAST")
-    parser.add_argument('--csv', required=True, help='CSV con ticker,date')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help='CSV con ticker,date (orden del fichero)')
+    source.add_argument('--queue', action='store_true',
+                        help='Consumir la cola de prioridad del state store (ver enqueue_quotes.py)')
     parser.add_argument('--output', required=True, help='Directorio de salida')
     parser.add_argument('--concurrent', type=int, default=100, help='Conexiones simultáneas')
     parser.add_argument('--api-key', help='Polygon API key')
-    parser.add_argument('--resume', action='store_true', help='Resume desde checkpoint')
+    parser.add_argument('--resume', action='store_true',
+                        help='(Compatibilidad) el resume es automático vía state store')
+    parser.add_argument('--state-db', help='SQLite de estado (default: TSIS_STATE_DB o <output>/_state.sqlite)')
+    parser.add_argument('--liquidity-dir', help='Tabla de liquidez diaria (default: <output>_liquidity)')
+    parser.add_argument('--max-requests', type=int, help='Presupuesto de requests HTTP')
+    parser.add_argument('--max-gb', type=float, help='Presupuesto de GB escritos')
+    parser.add_argument('--max-hours', type=float, help='Presupuesto de horas de reloj')
+    parser.add_argument('--queue-wait', type=float, default=0,
+                        help='Segundos a esperar filas nuevas con la cola vacía (default: 0)')
+    parser.add_argument('--catalog-dir', help='Catálogo de ficheros (default: TSIS_CATALOG_DIR o <output>/_catalog)')
+    parser.add_argument('--no-catalog', action='store_true', help='No registrar ficheros en el catálogo')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/... (automático si output ya está migrado)')
     
+    add_metrics_args(parser)
     args = parser.parse_args()
     
     # API key
@@ -407,7 +531,14 @@ async def main():
     downloader = UltraFastQuotesDownloader(
         api_key=api_key,
         output_dir=output_dir,
-        max_concurrent=args.concurrent
+        max_concurrent=args.concurrent,
+        liquidity_dir=Path(args.liquidity_dir) if args.liquidity_dir else None,
+        state_db=Path(args.state_db) if args.state_db else None,
+        budget=DownloadBudget(args.max_requests, args.max_gb, args.max_hours),
+        catalog_dir=Path(args.catalog_dir) if args.catalog_dir else None,
+        catalog=not args.no_catalog,
+        hive=args.hive_layout,
+        metrics=metrics_from_args(args, DATASET)
     )
     
     try:
@@ -415,7 +546,10 @@ async def main():
         await downloader.init_session()
         
         # Ejecutar descarga
-        await downloader.download_all_ultra_fast(args.csv, args.resume)
+        if args.queue:
+            await downloader.download_from_queue(wait_seconds=args.queue_wait)
+        else:
+            await downloader.download_all_ultra_fast(args.csv)
         
     finally:
         await downloader.close()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+enqueue_quotes.py - Carga CSVs de ticker-días en la cola de prioridad de quotes
+
+Los CSVs de identify_high_priority_quotes.py y quotes_phased_strategy.py traen
+columna priority_score; se encolan todos en la misma cola del state store y
+download_quotes_ultra_fast.py --queue descarga primero los de mayor score,
+mezclando fases. Se puede ejecutar mientras una descarga está en marcha.
+
+- Días ya descargados (done/empty) no se encolan
+- Un día ya en cola conserva la mayor de las prioridades
+- CSV sin priority_score: --priority fija la prioridad de todas sus filas
+
+Uso:
+    python scripts/02_final/enqueue_quotes.py \
+        --output C:\\TSIS_Data\\quotes \
+        --csv high_priority_with_metadata.csv quotes_FASE_1.csv quotes_FASE_2.csv
+
+    python scripts/02_final/enqueue_quotes.py --output C:\\TSIS_Data\\quotes --status
+"""
+
+import sys
+import argparse
+import datetime as dt
+from pathlib import Path
+
+import polars as pl
+
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from state_store import StateStore, default_state_db  # noqa: E402
+
+DATASET = "quotes"
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def read_tasks(path: str, priority_col: str, default_priority: float) -> pl.DataFrame:
+    """ticker, date (YYYY-MM-DD), priority de un CSV/Parquet"""
+    df = pl.read_parquet(path) if path.endswith(".parquet") else pl.read_csv(path, try_parse_dates=False)
+    if priority_col in df.columns:
+        priority = pl.col(priority_col).cast(pl.Float64).fill_null(default_priority)
+    else:
+        priority = pl.lit(default_priority, dtype=pl.Float64)
+    return (
+        df.select([
+            pl.col("ticker").cast(pl.Utf8),
+            pl.col("date").cast(pl.Utf8).str.slice(0, 10),
+            priority.alias("priority"),
+        ])
+        .drop_nulls(["ticker", "date"])
+        # Un ticker-día repetido en el mismo fichero: la mayor prioridad
+        .group_by(["ticker", "date"]).agg(pl.col("priority").max())
+    )
+
+def main():
+    ap = argparse.ArgumentParser(description="Encola ticker-días en la cola de prioridad de quotes")
+    ap.add_argument("--output", help="Directorio de salida de quotes (ubica <output>/_state.sqlite)")
+    ap.add_argument("--state-db", help="SQLite de estado (default: TSIS_STATE_DB o <output>/_state.sqlite)")
+    ap.add_argument("--csv", nargs="*", default=[], help="CSVs/Parquets con ticker,date[,priority_score]")
+    ap.add_argument("--priority-col", default="priority_score")
+    ap.add_argument("--priority", type=float, default=0.0,
+                    help="Prioridad para ficheros sin --priority-col (default: 0)")
+    ap.add_argument("--status", action="store_true", help="Solo mostrar el estado de la cola")
+    args = ap.parse_args()
+
+    if not args.state_db and not args.output:
+        sys.exit("ERROR: indicar --output o --state-db")
+    store = StateStore(Path(args.state_db) if args.state_db else default_state_db(args.output))
+
+    try:
+        for path in args.csv:
+            tasks = read_tasks(path, args.priority_col, args.priority)
+            n = store.enqueue(DATASET, tasks.iter_rows(), source=Path(path).stem)
+            log(f"{path}: {tasks.height:,} ticker-días | encolados/actualizados: {n:,}")
+
+        counts = store.queue_counts(DATASET)
+        log(f"Cola '{DATASET}' en {store.path}: {counts['pending']:,} pendientes, "
+            f"{counts['leased']:,} reclamados")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
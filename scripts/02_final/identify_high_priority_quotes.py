@@ -4,145 +4,136 @@ Identifica días de alto volumen/eventos para descargar quotes selectivamente.
 En lugar de descargar 5.5M de días, descarga solo ~500K días importantes.
 """
 
+import os
+import sys
 import polars as pl
 import numpy as np
 from pathlib import Path
 import argparse
 from datetime import datetime
-from typing import Dict, List, Set
+from typing import List, Optional
+
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from daily_panel import DailyPanel  # noqa: E402
+from store_query import load as load_store  # noqa: E402
 
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {msg}", flush=True)
 
 class SmartQuotesSelector:
-    def __init__(self, daily_root: Path, output_dir: Path):
+    """
+    Selección vectorizada sobre todo el store daily: un solo scan lazy, métricas
+    y score como expresiones, eventos por join y top N por ticker con ventana.
+    """
+
+    # Criterios de día importante
+    HIGH_VOLUME_RATIO = 2.0   # volumen > 2x la media del ticker en el año
+    GAP_PCT = 5.0
+    RANGE_PCT = 5.0
+    CHANGE_PCT = 10.0
+    EVENT_PRIORITY = 500.0    # splits / dividendos
+
+    def __init__(self, daily_root: Path, output_dir: Path,
+                 reference_root: Path = Path("raw/polygon/reference"),
+                 panel: Optional[DailyPanel] = None):
         self.daily_root = daily_root
+        self.reference_root = reference_root
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-    def identify_high_volume_days(self, ticker: str, year_min: int, year_max: int) -> List[Dict]:
+        self.panel = panel  # panel diario por mes (utils/daily_panel.py): un scan sin poda por fichero
+
+    def load_daily(self, tickers: List[str], year_min: int, year_max: int) -> pl.DataFrame:
         """
-        Identifica días con volumen anormal (>2x promedio).
-        Estos días típicamente tienen mayor actividad de quotes.
+        Store daily de los tickers/años pedidos vía store_query (poda por ticker
+        y año; layout Hive y TICKER/daily.parquet compactado incluidos)
         """
-        ticker_path = self.daily_root / ticker
-        if not ticker_path.exists():
-            return []
-        
-        high_volume_days = []
-        
-        for year in range(year_min, year_max + 1):
-            year_file = ticker_path / f"year={year}" / "daily.parquet"
-            if not year_file.exists():
-                continue
-                
-            try:
-                df = pl.read_parquet(year_file)
+        return self._normalize(load_store("ohlcv_daily", tickers, f"{year_min}-01-01", f"{year_max}-12-31",
+                                          root=self.daily_root))
 
-                # La columna puede llamarse 'volume' o 'v'
-                vol_col = 'volume' if 'volume' in df.columns else 'v'
+    @staticmethod
+    def _normalize(df: pl.DataFrame) -> pl.DataFrame:
+        """ticker, date, o/h/l/c y volumen (store_query ya renombra 'volume' a 'v')"""
+        if df.is_empty():
+            return pl.DataFrame()
+        return df.select([
+            pl.col("ticker").cast(pl.Utf8),
+            pl.col("date").cast(pl.Utf8).str.slice(0, 10),
+            pl.col("o").cast(pl.Float64),
+            pl.col("h").cast(pl.Float64),
+            pl.col("l").cast(pl.Float64),
+            pl.col("c").cast(pl.Float64),
+            pl.col("v").cast(pl.Float64).alias("volume"),
+        ])
 
-                # Calcular estadísticas de volumen
-                vol_mean = df[vol_col].mean()
-                vol_std = df[vol_col].std()
-                vol_90p = df[vol_col].quantile(0.90)
-                
-                # Criterios para día de alto volumen
-                df_analysis = df.with_columns([
-                    # Volumen > 2x promedio
-                    (pl.col(vol_col) > vol_mean * 2).alias('high_volume'),
-                    # Volumen > percentil 90
-                    (pl.col(vol_col) > vol_90p).alias('top_decile'),
-                    # Gap > 5% (columnas pueden ser 'open' o 'o', 'close' o 'c', etc.)
-                    ((pl.col('o') - pl.col('c').shift(1)) / pl.col('c').shift(1) * 100).abs().alias('gap_pct'),
-                    # Rango intraday > 5%
-                    ((pl.col('h') - pl.col('l')) / pl.col('o') * 100).alias('range_pct'),
-                    # Cambio diario > 10%
-                    ((pl.col('c') - pl.col('o')) / pl.col('o') * 100).abs().alias('change_pct')
-                ])
-                
-                # Filtrar días importantes
-                important_days = df_analysis.filter(
-                    (pl.col('high_volume') == True) |
-                    (pl.col('gap_pct') > 5) |
-                    (pl.col('range_pct') > 5) |
-                    (pl.col('change_pct') > 10)
-                )
-                
-                for row in important_days.iter_rows(named=True):
-                    high_volume_days.append({
-                        'ticker': ticker,
-                        'date': row['date'],
-                        'volume': row[vol_col],
-                        'volume_ratio': row[vol_col] / vol_mean if vol_mean > 0 else 0,
-                        'gap_pct': row.get('gap_pct', 0),
-                        'range_pct': row['range_pct'],
-                        'change_pct': row['change_pct'],
-                        'priority_score': self._calculate_priority(row, vol_mean)
-                    })
-                    
-            except Exception as e:
-                continue
-                
-        return high_volume_days
-    
-    def _calculate_priority(self, row: Dict, vol_mean: float) -> float:
+    @classmethod
+    def priority_expr(cls) -> pl.Expr:
         """
-        Calcula score de prioridad para determinar qué días descargar primero.
+        Score de prioridad (mismo baremo que la versión por filas):
+        volumen relativo (max 100) + gap (max 100) + rango (max 100) + cambio (max 90)
         """
-        score = 0.0
-        
-        # Peso por volumen relativo
-        if vol_mean > 0:
-            vol_ratio = row['volume'] / vol_mean
-            score += min(vol_ratio, 10) * 10  # Max 100 puntos por volumen
-        
-        # Peso por gap
-        if 'gap_pct' in row and row['gap_pct']:
-            score += min(abs(row['gap_pct']), 20) * 5  # Max 100 puntos por gap
-        
-        # Peso por rango intraday
-        score += min(row['range_pct'], 20) * 5  # Max 100 puntos por rango
-        
-        # Peso por cambio absoluto
-        score += min(abs(row['change_pct']), 30) * 3  # Max 90 puntos por cambio
-        
-        return score
-    
-    def identify_event_days(self, ticker: str) -> Set[str]:
+        return (
+            (pl.col("volume_ratio").clip(upper_bound=10) * 10).fill_null(0) +
+            (pl.col("gap_pct").clip(upper_bound=20) * 5).fill_null(0) +
+            (pl.col("range_pct").clip(upper_bound=20) * 5).fill_null(0) +
+            (pl.col("change_pct").clip(upper_bound=30) * 3).fill_null(0)
+        )
+
+    def score_days(self, daily: pl.LazyFrame) -> pl.LazyFrame:
+        """Métricas por día y filtro de días importantes"""
+        prev_close = pl.col("c").shift(1).over("ticker", order_by="date")
+        vol_mean = pl.col("volume").mean().over("ticker", pl.col("date").str.slice(0, 4))
+        return (
+            daily
+            .with_columns([
+                ((pl.col("o") - prev_close) / prev_close * 100).abs().alias("gap_pct"),
+                ((pl.col("h") - pl.col("l")) / pl.col("o") * 100).alias("range_pct"),
+                ((pl.col("c") - pl.col("o")) / pl.col("o") * 100).abs().alias("change_pct"),
+                vol_mean.alias("_vol_mean"),
+            ])
+            .with_columns(
+                pl.when(pl.col("_vol_mean") > 0)
+                  .then(pl.col("volume") / pl.col("_vol_mean"))
+                  .otherwise(0.0)
+                  .alias("volume_ratio")
+            )
+            .filter(
+                (pl.col("volume") > pl.col("_vol_mean") * self.HIGH_VOLUME_RATIO) |
+                (pl.col("gap_pct") > self.GAP_PCT) |
+                (pl.col("range_pct") > self.RANGE_PCT) |
+                (pl.col("change_pct") > self.CHANGE_PCT)
+            )
+            .with_columns(self.priority_expr().alias("priority_score"))
+            .drop("_vol_mean", "o", "h", "l", "c")
+        )
+
+    def scan_events(self, tickers: List[str], year_min: int, year_max: int) -> pl.LazyFrame:
         """
-        Identifica días con eventos específicos:
-        - Días con splits/dividendos
-        - Días alrededor de earnings (si tuvieras los datos)
-        - Primer y último día del mes (rebalanceos)
-        - Días de vencimiento de opciones (3er viernes)
+        Días con splits/dividendos de las tablas particionadas por año de
+        ingest_splits_dividends.py (splits/year=*/splits.parquet, dividends/...).
         """
-        event_days = set()
-        
-        # Cargar splits si existen
-        splits_file = Path("raw/polygon/reference/splits") / f"{ticker}.parquet"
-        if splits_file.exists():
-            try:
-                splits_df = pl.read_parquet(splits_file)
-                if 'execution_date' in splits_df.columns:
-                    event_days.update(splits_df['execution_date'].to_list())
-            except:
-                pass
-        
-        # Cargar dividendos si existen
-        divs_file = Path("raw/polygon/reference/dividends") / f"{ticker}.parquet"
-        if divs_file.exists():
-            try:
-                divs_df = pl.read_parquet(divs_file)
-                if 'ex_dividend_date' in divs_df.columns:
-                    event_days.update(divs_df['ex_dividend_date'].to_list())
-            except:
-                pass
-        
-        return event_days
-    
-    def generate_smart_quotes_list(self, 
+        sources = []
+        for table, date_col in (("splits", "execution_date"), ("dividends", "ex_dividend_date")):
+            files = [str(self.reference_root / table / f"year={y}" / f"{table}.parquet")
+                     for y in range(year_min, year_max + 1)]
+            files = [f for f in files if os.path.exists(f)]
+            if files:
+                sources.append(
+                    pl.scan_parquet(files).select([
+                        pl.col("ticker").cast(pl.Utf8),
+                        pl.col(date_col).cast(pl.Utf8).str.slice(0, 10).alias("date"),
+                    ])
+                )
+        if not sources:
+            return pl.LazyFrame(schema={"ticker": pl.Utf8, "date": pl.Utf8})
+        return (
+            pl.concat(sources)
+              .filter(pl.col("ticker").is_in(tickers) & pl.col("date").is_not_null())
+              .unique()
+        )
+
+    def generate_smart_quotes_list(self,
                                   tickers: List[str],
                                   year_min: int,
                                   year_max: int,
@@ -150,44 +141,40 @@ class SmartQuotesSelector:
         """
         Genera lista inteligente de días para descargar quotes.
         """
-        all_priority_days = []
-        
-        for i, ticker in enumerate(tickers):
-            if (i + 1) % 100 == 0:
-                log(f"Procesando: {i+1}/{len(tickers)} tickers")
-            
-            # Identificar días de alto volumen
-            high_vol_days = self.identify_high_volume_days(ticker, year_min, year_max)
-            
-            # Identificar días con eventos
-            event_days = self.identify_event_days(ticker)
-            
-            # Combinar y priorizar
-            ticker_days = high_vol_days
-            
-            # Agregar días de eventos
-            for event_date in event_days:
-                # Verificar si ya está en la lista
-                if not any(d['date'] == event_date for d in ticker_days):
-                    ticker_days.append({
-                        'ticker': ticker,
-                        'date': event_date,
-                        'priority_score': 500  # Alta prioridad para eventos
-                    })
-            
-            # Ordenar por prioridad y tomar top N
-            ticker_days.sort(key=lambda x: x.get('priority_score', 0), reverse=True)
-            ticker_days = ticker_days[:max_days_per_ticker]
-            
-            all_priority_days.extend(ticker_days)
-        
-        # Convertir a DataFrame
-        if all_priority_days:
-            df = pl.DataFrame(all_priority_days)
-            return df.sort(['priority_score', 'ticker', 'date'], descending=[True, False, False])
-        
-        return pl.DataFrame()
-    
+        if self.panel is not None:
+            daily = (
+                self.panel.scan(f"{year_min}-01-01", f"{year_max}-12-31", tickers=tickers)
+                    .select(["ticker", "date", "o", "h", "l", "c", pl.col("v").alias("volume")])
+            )
+            log(f"Panel diario: {len(self.panel.files(f'{year_min}-01-01', f'{year_max}-12-31')):,} meses")
+            return self._select(daily, tickers, year_min, year_max, max_days_per_ticker)
+
+        daily = self.load_daily(tickers, year_min, year_max)
+        log(f"Filas daily: {daily.height:,}")
+        if daily.is_empty():
+            return pl.DataFrame()
+        return self._select(daily.lazy(), tickers, year_min, year_max, max_days_per_ticker)
+
+    def _select(self, daily: pl.LazyFrame, tickers: List[str], year_min: int, year_max: int,
+                max_days_per_ticker: int) -> pl.DataFrame:
+        important = self.score_days(daily)
+
+        # Días de evento que no son ya días importantes (estos conservan su score)
+        events = (
+            self.scan_events(tickers, year_min, year_max)
+                .join(important.select(["ticker", "date"]), on=["ticker", "date"], how="anti")
+                .with_columns(pl.lit(self.EVENT_PRIORITY).alias("priority_score"))
+        )
+
+        return (
+            pl.concat([important, events], how="diagonal_relaxed")
+              # Top N por ticker: orden por score y posición dentro del ticker
+              .sort(["ticker", "priority_score", "date"], descending=[False, True, False])
+              .filter(pl.int_range(pl.len()).over("ticker") < max_days_per_ticker)
+              .sort(["priority_score", "ticker", "date"], descending=[True, False, False])
+              .collect()
+        )
+
     def analyze_coverage(self, smart_df: pl.DataFrame, total_possible_days: int):
         """
         Analiza qué porcentaje de días importantes cubrimos.
@@ -231,10 +218,16 @@ def main():
     parser.add_argument('--output-csv', required=True, help='Output CSV file')
     parser.add_argument('--year-min', type=int, required=True, help='Start year')
     parser.add_argument('--year-max', type=int, required=True, help='End year')
+    parser.add_argument('--reference-root', default='raw/polygon/reference',
+                       help='Splits/dividends particionados (default: raw/polygon/reference)')
     parser.add_argument('--max-days-per-ticker', type=int, default=200,
                        help='Max días por ticker (default: 200)')
     parser.add_argument('--min-priority-score', type=float, default=50,
                        help='Score mínimo para incluir (default: 50)')
+    parser.add_argument('--panel-dir',
+                       help='Panel diario por mes (utils/daily_panel.py): se actualiza y se lee en vez del store por ticker')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                       help='Procesos para actualizar el panel')
     
     args = parser.parse_args()
     
@@ -255,9 +248,17 @@ def main():
     log(f"Días totales posibles: {total_possible_days:,}")
     
     # Generar lista inteligente
+    panel = None
+    if args.panel_dir:
+        panel = DailyPanel(args.panel_dir)
+        n = panel.update(args.daily_root, workers=args.workers)
+        log(f"Panel diario: {n:,} tickers actualizados ({panel.root})")
+
     selector = SmartQuotesSelector(
         Path(args.daily_root),
-        Path(args.output_csv).parent
+        Path(args.output_csv).parent,
+        Path(args.reference_root),
+        panel
     )
     
     log("\nIdentificando días de alto volumen y eventos...")
@@ -268,6 +269,11 @@ def main():
         args.max_days_per_ticker
     )
     
+    if smart_df.is_empty():
+        log(f"Sin datos daily para {len(tickers):,} tickers en {args.year_min}-{args.year_max} "
+            f"({args.daily_root}): no se genera {args.output_csv}")
+        return
+
     # Filtrar por score mínimo
     if 'priority_score' in smart_df.columns:
         smart_df = smart_df.filter(pl.col('priority_score') >= args.min_priority_score)
@@ -275,8 +281,8 @@ def main():
     # Análisis de cobertura
     selector.analyze_coverage(smart_df, total_possible_days)
     
-    # Guardar resultado
-    output_df = smart_df.select(['ticker', 'date'])
+    # Guardar resultado (priority_score para la cola de prioridad: enqueue_quotes.py)
+    output_df = smart_df.select([c for c in ['ticker', 'date', 'priority_score'] if c in smart_df.columns])
     output_df.write_csv(args.output_csv)
     log(f"\nGuardado en: {args.output_csv}")
     
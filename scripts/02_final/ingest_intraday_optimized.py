@@ -11,6 +11,7 @@ Mejoras:
 
 import os
 import sys
+import time
 import asyncio
 import aiohttp
 import polars as pl
@@ -23,6 +24,15 @@ import backoff
 from dataclasses import dataclass
 import pickle
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from write_profiles import write_parquet  # noqa: E402
+from hive_layout import partition_dir, use_hive  # noqa: E402
+from split_adjust import mark_unadjusted  # noqa: E402
+from ingest_metrics import IngestMetrics, add_metrics_args, metrics_from_args  # noqa: E402
+
+ENDPOINT = "v2/aggs"
+
 @dataclass
 class DownloadTask:
     ticker: str
@@ -31,9 +41,12 @@ class DownloadTask:
     priority: float  # Para priorizar por volumen/liquidez
 
 class OptimizedIntradayDownloader:
-    def __init__(self, api_key: str, outdir: Path, max_concurrent: int = 20):
+    def __init__(self, api_key: str, outdir: Path, max_concurrent: int = 20, adjusted: bool = True,
+                 hive: bool = False, metrics: IngestMetrics = None):
         self.api_key = api_key
         self.outdir = outdir
+        self.hive = use_hive(outdir, hive)  # layout ticker=X/... (utils/hive_layout.py)
+        self.adjusted = adjusted  # False -> ajuste por split en lectura (utils/split_adjust.py)
         self.max_concurrent = max_concurrent
         self.base_url = "https://api.polygon.io"
         self.semaphore = asyncio.Semaphore(max_concurrent)
@@ -41,6 +54,9 @@ class OptimizedIntradayDownloader:
         self.checkpoint_file = outdir / ".download_checkpoint.pkl"
         self.completed_tasks = self.load_checkpoint()
         
+        # Métricas en vivo (utils/ingest_metrics.py)
+        self.metrics = metrics
+        
         # Métricas
         self.total_downloaded = 0
         self.total_rows = 0
@@ -104,7 +120,7 @@ class OptimizedIntradayDownloader:
         
         url = f"{self.base_url}/v2/aggs/ticker/{task.ticker}/range/1/minute/{start_date}/{end_date}"
         params = {
-            'adjusted': 'true',
+            'adjusted': 'true' if self.adjusted else 'false',
             'sort': 'asc',
             'limit': 50000
         }
@@ -118,9 +134,15 @@ class OptimizedIntradayDownloader:
                 if cursor:
                     current_params['cursor'] = cursor
                 
+                t0, observed = time.perf_counter(), False
                 try:
                     async with self.session.get(url, params=current_params) as response:
+                        if response.status != 200 and self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, response.status, time.perf_counter() - t0)
+                            observed = True
                         if response.status == 429:  # Rate limited
+                            if self.metrics is not None:
+                                self.metrics.retry(ENDPOINT, 429)
                             retry_after = int(response.headers.get('X-Polygon-Retry-After', '5'))
                             await asyncio.sleep(retry_after)
                             raise aiohttp.ClientError("Rate limited")
@@ -132,6 +154,10 @@ class OptimizedIntradayDownloader:
                         data = await response.json()
                         
                         results = data.get('results', [])
+                        if self.metrics is not None:
+                            self.metrics.observe_request(ENDPOINT, response.status, time.perf_counter() - t0)
+                            self.metrics.add_rows(len(results))
+                            observed = True
                         if results:
                             all_results.extend(results)
                             self.total_rows += len(results)
@@ -147,10 +173,14 @@ class OptimizedIntradayDownloader:
                         else:
                             break
                             
-                except asyncio.TimeoutError:
+                except asyncio.TimeoutError as e:
+                    if self.metrics is not None and not observed:
+                        self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
                     print(f"Timeout para {task.ticker} {task.year}-{task.month:02d}")
                     break
                 except Exception as e:
+                    if self.metrics is not None and not observed:
+                        self.metrics.observe_request(ENDPOINT, type(e).__name__, time.perf_counter() - t0)
                     print(f"Error para {task.ticker} {task.year}-{task.month:02d}: {e}")
                     break
         
@@ -199,7 +229,7 @@ class OptimizedIntradayDownloader:
             return
         
         # Path de salida
-        output_dir = self.outdir / task.ticker / f"year={task.year}" / f"month={task.month:02d}"
+        output_dir = partition_dir(self.outdir, task.ticker, task.year, f"{task.month:02d}", hive=self.hive)
         output_dir.mkdir(parents=True, exist_ok=True)
         output_file = output_dir / "minute.parquet"
         
@@ -215,14 +245,10 @@ class OptimizedIntradayDownloader:
             except:
                 pass  # Si falla la lectura, sobrescribir
         
-        # Guardar con compresión optimizada para queries rápidos
-        df.write_parquet(
-            output_file,
-            compression='zstd',
-            compression_level=3,  # Balance entre tamaño y velocidad
-            statistics=True,  # Para queries eficientes
-            row_group_size=50000  # Optimizado para chunks de análisis
-        )
+        # Perfil de escritura del dataset (utils/write_profiles.json)
+        write_parquet(df, output_file, "ohlcv_1m")
+        if self.metrics is not None:
+            self.metrics.add_bytes(output_file.stat().st_size)
         
         # Actualizar checkpoint
         task_id = f"{task.ticker}_{task.year}_{task.month:02d}"
@@ -253,6 +279,8 @@ class OptimizedIntradayDownloader:
         errors = 0
         
         for i, task in enumerate(tasks):
+            if self.metrics is not None:
+                self.metrics.queue_depth("months", len(tasks) - i)
             try:
                 success = await self.process_task(task)
                 if success:
@@ -274,11 +302,14 @@ class OptimizedIntradayDownloader:
                     'errors': errors,
                     'rate': rate,
                     'eta_minutes': eta / 60,
-                    'total_rows': self.total_rows
+                    'total_rows': self.total_rows,
+                    'mb_s': self.metrics.rates()['mb_s'] if self.metrics is not None else 0.0
                 })
         
         # Guardar checkpoint final
         self.save_checkpoint()
+        if self.metrics is not None:
+            self.metrics.queue_depth("months", 0)
         
         return {
             'completed': completed,
@@ -313,6 +344,11 @@ async def main():
     parser.add_argument('--limit', type=int, help='Limitar a N meses (para testing)')
     parser.add_argument('--volume-data', help='JSON con datos de volumen para priorización')
     parser.add_argument('--prioritize-recent', action='store_true', help='Priorizar datos recientes')
+    parser.add_argument('--unadjusted', action='store_true',
+                        help='Descargar adjusted=false (ajuste por split en lectura)')
+    parser.add_argument('--hive-layout', action='store_true',
+                        help='Escribir en layout Hive ticker=X/year=/month=MM (automático si outdir ya está migrado)')
+    add_metrics_args(parser)
     
     args = parser.parse_args()
     
@@ -369,15 +405,23 @@ async def main():
               f"({stats['completed']/stats['total']*100:.1f}%) | "
               f"Rate: {stats['rate']:.1f} tasks/s | "
               f"ETA: {stats['eta_minutes']:.1f} min | "
+              f"{stats['mb_s']:.2f} MB/s | "
               f"Rows: {stats['total_rows']:,}")
     
     # Iniciar descarga
     downloader = OptimizedIntradayDownloader(
         api_key=api_key,
         outdir=Path(args.outdir),
-        max_concurrent=args.concurrent
+        max_concurrent=args.concurrent,
+        adjusted=not args.unadjusted,
+        hive=args.hive_layout,
+        metrics=metrics_from_args(args, "ohlcv_1m")
     )
     
+    # Marcador leído por utils/split_adjust.py: store sin ajustar
+    if args.unadjusted:
+        mark_unadjusted(args.outdir)
+    
     try:
         await downloader.init_session()
         results = await downloader.download_batch(tasks, progress_callback)
@@ -393,6 +437,7 @@ async def main():
         
     finally:
         await downloader.close_session()
+        downloader.metrics.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -7,72 +7,60 @@ Permite descargar quotes en fases según importancia.
 import polars as pl
 from pathlib import Path
 import argparse
+import os
+import sys
 from typing import Dict, Tuple
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from volume_sketch import VolumeSketchStore  # noqa: E402
+from daily_panel import DailyPanel  # noqa: E402
+from store_query import load as load_store  # noqa: E402
+
+GLOBAL_QUANTILES = [0.5, 0.75, 0.90, 0.95, 0.99, 0.999]
+GLOBAL_KEYS = ['p50', 'p75', 'p90', 'p95', 'p99', 'p99_9']
+
+# Tickers por lectura del store daily en generate_phase_csv
+LOAD_BATCH = 500
+
+# Prioridad base por fase para la cola de quotes (enqueue_quotes.py); dentro de
+# la fase se suman hasta 100 puntos por volumen relativo al umbral
+PHASE_PRIORITY = {'P99': 400, 'P95': 300, 'P90': 200, 'P75': 100}  # FASE_1..FASE_4
+
 def analyze_volume_distribution(daily_root: Path, tickers: list,
-                               year_min: int, year_max: int) -> Dict:
+                               year_min: int, year_max: int,
+                               sketch_dir: Path = None, workers: int = 1) -> Dict:
     """
     Analiza distribución de volumen para todos los tickers.
-    """
-    all_volumes = []
-    ticker_stats = {}
-
-    for ticker in tickers:
-        ticker_volumes = []
 
-        for year in range(year_min, year_max + 1):
-            daily_file = daily_root / ticker / f"year={year}" / "daily.parquet"
+    Usa sketches de cuantiles por ticker-año (utils/volume_sketch.py), calculados
+    en paralelo y persistidos en sketch_dir: una re-ejecución solo procesa los
+    daily.parquet nuevos o modificados. Percentiles con error relativo <= 0.5%.
+    """
+    store = VolumeSketchStore(sketch_dir or daily_root.parent / "volume_sketch")
+    updated = store.update(daily_root, tickers, year_min, year_max, workers=workers)
+    print(f"Sketches de volumen: {updated:,} ticker-años recalculados ({store.root})")
 
-            try:
-                # Verificar existencia puede lanzar PermissionError o FileNotFoundError en Windows
-                try:
-                    if not daily_file.exists():
-                        continue
-                except (PermissionError, OSError, FileNotFoundError):
-                    continue
-
-                df = pl.read_parquet(daily_file)
-                # La columna puede llamarse 'volume' o 'v'
-                vol_col = 'volume' if 'volume' in df.columns else 'v'
-                volumes = df[vol_col].to_list()
-                ticker_volumes.extend(volumes)
-                all_volumes.extend(volumes)
-            except (PermissionError, OSError, Exception):
-                # Archivo corrupto (CRC error) u otro problema - skip
-                continue
-        
-        if ticker_volumes:
-            ticker_stats[ticker] = {
-                'mean': sum(ticker_volumes) / len(ticker_volumes),
-                'p50': sorted(ticker_volumes)[len(ticker_volumes)//2],
-                'p90': sorted(ticker_volumes)[int(len(ticker_volumes)*0.9)],
-                'p95': sorted(ticker_volumes)[int(len(ticker_volumes)*0.95)],
-                'p99': sorted(ticker_volumes)[int(len(ticker_volumes)*0.99)],
-                'max': max(ticker_volumes)
-            }
-    
-    # Calcular percentiles globales
-    if not all_volumes:
+    n = store.total_days(year_min, year_max, tickers)
+    if not n:
         print("ERROR: No se encontraron datos de volumen")
         return {}, {}
 
-    all_volumes.sort()
-    n = len(all_volumes)
-
-    global_stats = {
-        'total_days': n,
-        'p50': all_volumes[n//2] if n > 0 else 0,
-        'p75': all_volumes[int(n*0.75)] if n > 0 else 0,
-        'p90': all_volumes[int(n*0.90)] if n > 0 else 0,
-        'p95': all_volumes[int(n*0.95)] if n > 0 else 0,
-        'p99': all_volumes[int(n*0.99)] if n > 0 else 0,
-        'p99_9': all_volumes[int(n*0.999)] if n > 0 else 0
+    global_q = store.global_quantiles(GLOBAL_QUANTILES, year_min, year_max, tickers)
+    global_stats = {'total_days': n}
+    global_stats.update({key: global_q[q] for key, q in zip(GLOBAL_KEYS, GLOBAL_QUANTILES)})
+
+    ticker_df = store.ticker_stats([0.5, 0.9, 0.95, 0.99], year_min, year_max, tickers)
+    ticker_stats = {
+        row['ticker']: {k: row[k] for k in ('mean', 'p50', 'p90', 'p95', 'p99', 'max')}
+        for row in ticker_df.iter_rows(named=True)
     }
 
     return global_stats, ticker_stats
 
 def create_phased_download_strategy(daily_root: Path, ping_file: Path,
-                                   year_min: int, year_max: int) -> Dict:
+                                   year_min: int, year_max: int,
+                                   sketch_dir: Path = None, workers: int = 1) -> Dict:
     """
     Crea estrategia de descarga en fases.
     """
@@ -84,8 +72,12 @@ def create_phased_download_strategy(daily_root: Path, ping_file: Path,
     
     # Analizar distribución de volumen
     global_stats, ticker_stats = analyze_volume_distribution(
-        daily_root, tickers, year_min, year_max  # Todos los tickers
+        daily_root, tickers, year_min, year_max,  # Todos los tickers
+        sketch_dir=sketch_dir, workers=workers
     )
+    if not global_stats:
+        print(f"Sin volumen diario en {daily_root} para {year_min}-{year_max}: no se define estrategia")
+        return {}, {}, {}
     
     print("\n" + "="*60)
     print("DISTRIBUCIÓN GLOBAL DE VOLUMEN")
@@ -149,46 +141,74 @@ def create_phased_download_strategy(daily_root: Path, ping_file: Path,
     
     return phases, global_stats, ticker_stats
 
-def generate_phase_csv(daily_root: Path, output_prefix: str,
-                      phase_threshold: float, tickers: list,
-                      year_min: int, year_max: int, phase_name: str):
+def phase_priority(phase_threshold: float, phase_name: str) -> pl.Expr:
+    """Prioridad base de la fase + hasta 100 puntos por volumen relativo al umbral"""
+    ratio = (pl.col('v') / phase_threshold) if phase_threshold > 0 else pl.lit(1.0)
+    return (PHASE_PRIORITY.get(phase_name, 0) + ratio.clip(upper_bound=10) * 10).alias('priority_score')
+
+def select_phase_days_panel(panel: DailyPanel, phase_threshold: float, tickers: list,
+                            year_min: int, year_max: int, phase_name: str) -> pl.DataFrame:
+    """Días >= umbral con un solo scan del panel diario (utils/daily_panel.py)"""
+    return (
+        panel.scan(f"{year_min}-01-01", f"{year_max}-12-31", ['ticker', 'date', 'v'], tickers)
+             .filter(pl.col('v') >= phase_threshold)
+             .select(['ticker', 'date', pl.col('v').alias('volume'), phase_priority(phase_threshold, phase_name)])
+             .collect()
+    )
+
+def _load_volume(daily_root: Path, tickers: list, year_min: int, year_max: int) -> pl.DataFrame:
     """
-    Genera CSV para una fase específica.
+    ticker, date, v de un lote de tickers vía store_query (layout Hive y
+    TICKER/daily.parquet compactado incluidos). Si el lote falla (fichero
+    corrupto) se reintenta ticker a ticker y se omiten los que fallen.
     """
-    selected_days = []
-
-    for ticker in tickers:
-        for year in range(year_min, year_max + 1):
-            daily_file = daily_root / ticker / f"year={year}" / "daily.parquet"
-
+    def one(batch: list) -> pl.DataFrame:
+        df = load_store('ohlcv_daily', batch, f"{year_min}-01-01", f"{year_max}-12-31", root=daily_root)
+        if df.is_empty():
+            return pl.DataFrame()
+        return df.select([pl.col('ticker').cast(pl.Utf8), pl.col('date').cast(pl.Utf8).str.slice(0, 10),
+                          pl.col('v').cast(pl.Float64)])
+
+    try:
+        return one(tickers)
+    except Exception:
+        frames = []
+        for ticker in tickers:
             try:
-                # Verificar existencia puede lanzar PermissionError o FileNotFoundError en Windows
-                try:
-                    if not daily_file.exists():
-                        continue
-                except (PermissionError, OSError, FileNotFoundError):
-                    continue
-
-                df = pl.read_parquet(daily_file)
-                # La columna puede llamarse 'volume' o 'v'
-                vol_col = 'volume' if 'volume' in df.columns else 'v'
-                # Filtrar por umbral de volumen
-                high_vol_days = df.filter(pl.col(vol_col) >= phase_threshold)
-
-                for row in high_vol_days.iter_rows(named=True):
-                    selected_days.append({
-                        'ticker': ticker,
-                        'date': row['date'],
-                        'volume': row[vol_col]
-                    })
-            except (PermissionError, OSError, Exception):
+                frames.append(one([ticker]))
+            except Exception:
                 # Archivo corrupto (CRC error) u otro problema - skip
                 continue
-    
-    if selected_days:
-        df_phase = pl.DataFrame(selected_days)
+        frames = [f for f in frames if f.height]
+        return pl.concat(frames) if frames else pl.DataFrame()
+
+def generate_phase_csv(daily_root: Path, output_prefix: str,
+                      phase_threshold: float, tickers: list,
+                      year_min: int, year_max: int, phase_name: str,
+                      panel: DailyPanel = None):
+    """
+    Genera CSV para una fase específica.
+    """
+    if panel is not None:
+        df_phase = select_phase_days_panel(panel, phase_threshold, tickers, year_min, year_max, phase_name)
+        if df_phase.height:
+            output_file = f"{output_prefix}_{phase_name}.csv"
+            df_phase.select(['ticker', 'date', 'priority_score']).write_csv(output_file)
+            print(f"Generado: {output_file} ({len(df_phase):,} días)")
+        return df_phase.height
+
+    selected = []
+    for i in range(0, len(tickers), LOAD_BATCH):
+        df = _load_volume(daily_root, tickers[i:i + LOAD_BATCH], year_min, year_max)
+        if df.height:
+            selected.append(df.filter(pl.col('v') >= phase_threshold))
+    selected_days = pl.concat(selected) if selected else pl.DataFrame()
+
+    if selected_days.height:
+        df_phase = selected_days.select(['ticker', 'date', pl.col('v').alias('volume'),
+                                         phase_priority(phase_threshold, phase_name)])
         output_file = f"{output_prefix}_{phase_name}.csv"
-        df_phase.select(['ticker', 'date']).write_csv(output_file)
+        df_phase.select(['ticker', 'date', 'priority_score']).write_csv(output_file)
         print(f"Generado: {output_file} ({len(df_phase):,} días)")
         return len(df_phase)
     
@@ -202,6 +222,10 @@ if __name__ == '__main__':
     parser.add_argument('--year-max', type=int, default=2025, help='End year')
     parser.add_argument('--generate-csv', choices=['P75', 'P90', 'P95', 'P99'], help='Generar CSV para percentil específico')
     parser.add_argument('--output-dir', default='01_daily/01_agregation_OHLCV/files_csv', help='Directorio donde guardar los CSVs generados')
+    parser.add_argument('--sketch-dir', help='Sketches de volumen persistidos (default: <daily-root>/../volume_sketch)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Procesos para los sketches')
+    parser.add_argument('--panel-dir', help='Panel diario por mes (utils/daily_panel.py): se actualiza y '
+                                            'se usa para generar el CSV en vez de leer fichero a fichero')
     parser.add_argument('--download-dir', help='Directorio base para descarga de quotes (opcional, se autodetermina por años si no se especifica)')
 
     args = parser.parse_args()
@@ -211,8 +235,11 @@ if __name__ == '__main__':
     output_dir = Path(args.output_dir)
 
     phases, global_stats, ticker_stats = create_phased_download_strategy(
-        daily_root, ping_file, args.year_min, args.year_max
+        daily_root, ping_file, args.year_min, args.year_max,
+        Path(args.sketch_dir) if args.sketch_dir else None, args.workers
     )
+    if not phases:
+        sys.exit(1)
 
     print("\n" + "="*60)
     print("RECOMENDACIÓN")
@@ -265,9 +292,15 @@ if __name__ == '__main__':
         csv_filename = f"quotes_{args.generate_csv}_{args.year_min}_{args.year_max}_{args.generate_csv}.csv"
         output_prefix = str(output_dir / f"quotes_{args.generate_csv}_{args.year_min}_{args.year_max}")
 
+        panel = None
+        if args.panel_dir:
+            panel = DailyPanel(args.panel_dir)
+            n = panel.update(daily_root, workers=args.workers)
+            print(f"Panel diario: {n:,} tickers actualizados ({panel.root})")
+
         count = generate_phase_csv(
             daily_root, output_prefix, threshold,
-            tickers, args.year_min, args.year_max, args.generate_csv
+            tickers, args.year_min, args.year_max, args.generate_csv, panel
         )
 
         if count > 0:
@@ -293,3 +326,6 @@ if __name__ == '__main__':
             print(f"  --csv {csv_file} \\")
             print(f"  --output \"{download_path}\" \\")
             print(f"  --concurrent 50")
+            print(f"\nO encolar por prioridad (mezcla fases, mayor volumen primero):")
+            print(f"python scripts\\02_final\\enqueue_quotes.py --output \"{download_path}\" --csv {csv_file}")
+            print(f"python scripts\\02_final\\download_quotes_ultra_fast.py --queue --output \"{download_path}\" --max-gb 100")
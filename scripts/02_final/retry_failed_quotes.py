@@ -4,10 +4,15 @@ Reintenta solo los días que fallaron en la descarga de quotes.
 Compara el CSV original con los archivos descargados para identificar faltantes.
 """
 
+import sys
 import polars as pl
 from pathlib import Path
 import argparse
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from hive_layout import is_hive, partition_dir  # noqa: E402
+
 def find_failed_downloads(csv_file: Path, output_dir: Path) -> pl.DataFrame:
     """
     Identifica qué ticker-date combinaciones NO tienen archivo descargado.
@@ -20,7 +25,8 @@ def find_failed_downloads(csv_file: Path, output_dir: Path) -> pl.DataFrame:
     total = len(df_all)
     print(f"  Total tareas en CSV: {total:,}")
 
-    # Verificar cuáles existen
+    # Verificar cuáles existen (layout Hive si el store ya está migrado)
+    hive = is_hive(output_dir)
     missing = []
     for row in df_all.iter_rows(named=True):
         ticker = row['ticker']
@@ -28,7 +34,7 @@ def find_failed_downloads(csv_file: Path, output_dir: Path) -> pl.DataFrame:
 
         # Construir path esperado
         year, month, day = date.split('-')
-        quotes_file = output_dir / ticker / f"year={year}" / f"month={month}" / f"day={day}" / "quotes.parquet"
+        quotes_file = partition_dir(output_dir, ticker, year, month, day, hive=hive) / "quotes.parquet"
 
         if not quotes_file.exists():
             missing.append({'ticker': ticker, 'date': date})
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sign_trades.py - Alineación as-of trades -> NBBO y clasificación del agresor
+
+Para cada ticker-día con trades Y quotes:
+1. Une cada trade con el NBBO vigente (join_asof backward, ordenado por timestamp)
+2. Clasifica el lado (Lee-Ready):
+   - regla de quote: precio > mid -> compra (+1), < mid -> venta (-1)
+   - en el mid o sin quote válido/reciente -> regla del tick (último cambio de precio)
+3. Escribe signed.parquet con bid/ask/mid, lado, regla usada y effective spread
+
+Fuentes:
+- Trades: TICKER/year=/month=/day=YYYY-MM-DD/{premarket,market,afterhours}.parquet
+  (esquema t/p/s/c/i o timestamp/price/size/exchange/conditions)
+- Quotes: usa nbbo.parquet de compact_quotes_nbbo.py si está al día, si no
+  quotes.parquet crudo (layouts day=DD y day=YYYY-MM-DD)
+- Días compactados (listados en _COMPACTED.json del mes): trades.parquet /
+  nbbo.parquet / quotes.parquet del mes filtrados por la columna date
+
+Notas:
+- Trades usan participant_timestamp y quotes sip_timestamp; sin desfase
+  adicional por defecto (--quote-lag-ms para el Lee-Ready clásico)
+- Quotes solo cubren la sesión regular: un quote más viejo que
+  --max-quote-age-s no se usa y el trade cae a la regla del tick
+
+Memoria acotada: pool de procesos 'spawn' con max_tasks_per_child y
+POLARS_MAX_THREADS por worker; cada tarea es un solo ticker-día.
+
+Salida:
+  outdir/TICKER/year=YYYY/month=MM/day=YYYY-MM-DD/signed.parquet
+  (outdir/ticker=TICKER/... con --hive-layout o si outdir ya está migrado;
+  trades y quotes se leen en cualquiera de los dos layouts)
+
+Uso:
+    python scripts/02_final/sign_trades.py \
+        --trades-root C:\\TSIS_Data\\trades_ticks_2019_2025 \
+        --quotes-root C:\\TSIS_Data\\quotes \
+        --outdir C:\\TSIS_Data\\signed_trades \
+        --workers 8
+"""
+
+import os
+import sys
+import argparse
+import datetime as dt
+import multiprocessing as mp
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+from compact_quotes_nbbo import QUOTES_FILE, NBBO_FILE, day_iso, load_quotes
+
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from hive_layout import partition_dir, ticker_dir, ticker_dirs, use_hive  # noqa: E402
+from store_query import compact_names, compacted_days  # noqa: E402
+
+SESSION_FILES = ["premarket", "market", "afterhours"]
+SIGNED_FILE = "signed.parquet"
+PACKED_TRADES = compact_names("trades", None)[0]
+
+# Esquema de ingest_missing_ticks -> esquema corto de ingest_trades_ticks
+TRADE_ALIASES = {"timestamp": "t", "price": "p", "size": "s", "exchange": "i", "conditions": "c"}
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def is_month_dir(path: Path) -> bool:
+    """Tarea de un día compactado: apunta al directorio month= en vez de al day="""
+    return path.name.startswith("month=")
+
+def quotes_day_dir(quotes_root: Path, ticker: str, day: str) -> Optional[Path]:
+    """Directorio de quotes del día en cualquiera de los dos layouts (o el del mes si está compactado)"""
+    year, month, dd = day.split("-")
+    for mname in (f"month={month}", f"month={int(month)}"):
+        base = ticker_dir(quotes_root, ticker) / f"year={year}" / mname
+        if day in compacted_days(base) and (base / QUOTES_FILE).exists():
+            return base
+        for name in (f"day={day}", f"day={dd}"):
+            d = base / name
+            if (d / QUOTES_FILE).exists():
+                return d
+    return None
+
+def find_tasks(trades_root: Path, quotes_root: Path, outdir: Path,
+               tickers: Optional[set], force: bool, hive: bool = False) -> Tuple[List[Tuple[str, str, str, str]], int]:
+    """(ticker, day, trades_dir, quotes_dir) con ambos datasets; cuenta días ya firmados"""
+    tasks, done = [], 0
+    for ticker, tpath in ticker_dirs(trades_root):
+        if tickers and ticker not in tickers:
+            continue
+        if not ticker_dir(quotes_root, ticker).is_dir():
+            continue
+        for y in os.scandir(tpath):
+            if not (y.is_dir() and y.name.startswith("year=")):
+                continue
+            for m in os.scandir(y.path):
+                if not (m.is_dir() and m.name.startswith("month=")):
+                    continue
+                # Días compactados (trades.parquet del mes) + días sueltos no fusionados
+                packed = compacted_days(m.path)
+                days = {day: m.path for day in packed} if os.path.exists(os.path.join(m.path, PACKED_TRADES)) else {}
+                for d in os.scandir(m.path):
+                    if d.is_dir() and d.name.startswith("day="):
+                        day = day_iso(y.name, m.name, d.name)
+                        if day not in packed:
+                            days[day] = d.path
+                for day, tdir in sorted(days.items()):
+                    qdir = quotes_day_dir(quotes_root, ticker, day)
+                    if qdir is None:
+                        continue
+                    out = partition_dir(outdir, ticker, y.name[5:], m.name[6:], day, hive=hive) / SIGNED_FILE
+                    if not force and out.exists():
+                        done += 1
+                        continue
+                    tasks.append((ticker, day, tdir, str(qdir)))
+    return tasks, done
+
+def scan_sessions(trades_dir: Path, day: str) -> List[Tuple[pl.LazyFrame, Optional[str]]]:
+    """(scan, sesión) por fichero; el trades.parquet compactado ya trae date y session"""
+    if is_month_dir(trades_dir):
+        lf = pl.scan_parquet(trades_dir / PACKED_TRADES)
+        return [(lf.filter(pl.col("date").cast(pl.Utf8) == day), None)]
+    out = []
+    for session in SESSION_FILES:
+        f = trades_dir / f"{session}.parquet"
+        if f.exists():
+            out.append((pl.scan_parquet(f), session))
+    return out
+
+def load_trades(trades_dir: Path, day: str) -> pl.DataFrame:
+    frames = []
+    for lf, session in scan_sessions(trades_dir, day):
+        cols = lf.collect_schema().names()
+        lf = lf.rename({k: v for k, v in TRADE_ALIASES.items() if k in cols})
+        cols = lf.collect_schema().names()
+        frames.append(
+            lf.select([c for c in ("t", "p", "s", "i", "c", "session") if c in cols])
+              .with_columns([
+                  pl.col("t").cast(pl.Int64),
+                  pl.col("p").cast(pl.Float64),
+                  pl.col("s").cast(pl.Float64),
+                  (pl.lit(session) if session else pl.col("session")).alias("session"),
+              ])
+        )
+    if not frames:
+        return pl.DataFrame()
+    return pl.concat(frames, how="diagonal_relaxed").drop_nulls(["t", "p"]).sort("t", maintain_order=True).collect()
+
+def load_nbbo(quotes_dir: Path, day: str) -> pl.DataFrame:
+    """NBBO compacto si existe y es más nuevo que el crudo; si no, quotes crudos"""
+    raw = quotes_dir / QUOTES_FILE
+    nbbo = quotes_dir / NBBO_FILE
+    keys = ["date"] if is_month_dir(quotes_dir) else []
+    if nbbo.exists() and nbbo.stat().st_mtime_ns >= raw.stat().st_mtime_ns:
+        q = pl.read_parquet(nbbo, columns=keys + ["timestamp", "bid_price", "ask_price"])
+    else:
+        q = load_quotes(raw, keys)
+        if q.height == 0:
+            return q
+    if keys:
+        q = q.filter(pl.col("date").cast(pl.Utf8) == day)
+    q = q.select(["timestamp", "bid_price", "ask_price"])
+    # Solo quotes utilizables: ambos lados presentes y no cruzados
+    return (
+        q.filter((pl.col("bid_price") > 0) & (pl.col("ask_price") >= pl.col("bid_price")))
+         .unique(subset=["timestamp"], keep="last", maintain_order=True)
+         .sort("timestamp")
+    )
+
+def sign_trades(trades: pl.DataFrame, nbbo: pl.DataFrame,
+                quote_lag_ns: int = 0, max_quote_age_ns: Optional[int] = None) -> pl.DataFrame:
+    """As-of join al NBBO vigente + clasificación Lee-Ready"""
+    # Regla del tick: signo del último cambio de precio (zero-tick hereda el anterior)
+    tick = (
+        (pl.col("p") - pl.col("p").shift(1)).sign()
+        .replace(0, None).forward_fill().cast(pl.Int8)
+    )
+    trades = trades.with_columns([
+        tick.alias("_tick"),
+        (pl.col("t") - quote_lag_ns).alias("_qt"),
+    ])
+
+    quotes = nbbo.rename({"timestamp": "quote_t", "bid_price": "bid", "ask_price": "ask"})
+    if quotes.height:
+        out = trades.join_asof(quotes, left_on="_qt", right_on="quote_t", strategy="backward")
+    else:
+        out = trades.with_columns([
+            pl.lit(None, dtype=pl.Int64).alias("quote_t"),
+            pl.lit(None, dtype=pl.Float64).alias("bid"),
+            pl.lit(None, dtype=pl.Float64).alias("ask"),
+        ])
+
+    out = out.with_columns((pl.col("t") - pl.col("quote_t")).alias("quote_age_ns"))
+    if max_quote_age_ns is not None:
+        stale = pl.col("quote_age_ns") > max_quote_age_ns
+        out = out.with_columns([
+            pl.when(stale).then(None).otherwise(pl.col(c)).alias(c) for c in ("quote_t", "bid", "ask")
+        ]).with_columns(
+            pl.when(pl.col("quote_t").is_null()).then(None).otherwise(pl.col("quote_age_ns")).alias("quote_age_ns")
+        )
+
+    mid = (pl.col("bid") + pl.col("ask")) / 2
+    out = out.with_columns(mid.alias("mid"))
+
+    quote_side = (
+        pl.when(pl.col("p") > pl.col("mid")).then(1)
+          .when(pl.col("p") < pl.col("mid")).then(-1)
+          .otherwise(None)
+          .cast(pl.Int8)
+    )
+    out = out.with_columns(quote_side.alias("_qside"))
+    out = out.with_columns([
+        pl.coalesce(["_qside", "_tick"]).alias("side"),
+        pl.when(pl.col("_qside").is_not_null()).then(pl.lit("quote"))
+          .when(pl.col("_tick").is_not_null()).then(pl.lit("tick"))
+          .otherwise(None)
+          .alias("rule"),
+    ])
+
+    # Effective spread (bps del mid): 2 * side * (p - mid) / mid
+    out = out.with_columns(
+        (2 * pl.col("side") * (pl.col("p") - pl.col("mid")) / pl.col("mid") * 1e4).alias("eff_spread_bps")
+    )
+    return out.drop(["_tick", "_qt", "_qside"])
+
+def process_day(ticker: str, day: str, trades_dir: str, quotes_dir: str, outdir: str,
+                quote_lag_ns: int, max_quote_age_ns: Optional[int], hive: bool = False) -> Dict:
+    """Worker: firma los trades de un ticker-día"""
+    res = {"ticker": ticker, "day": day, "status": "ok", "trades": 0, "by_quote": 0, "error": None}
+    try:
+        trades = load_trades(Path(trades_dir), day)
+        year, month, _ = day.split("-")
+        out_dir = partition_dir(outdir, ticker, year, month, day, hive=hive)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        target = out_dir / SIGNED_FILE
+
+        if trades.height == 0:
+            res["status"] = "empty"
+            signed = trades
+        else:
+            signed = sign_trades(trades, load_nbbo(Path(quotes_dir), day), quote_lag_ns, max_quote_age_ns)
+            res["trades"] = signed.height
+            res["by_quote"] = signed.filter(pl.col("rule") == "quote").height
+
+        tmp = target.with_name(SIGNED_FILE + ".tmp")
+        signed.write_parquet(tmp, compression="zstd", compression_level=3)
+        os.replace(tmp, target)
+    except Exception as e:
+        res["status"] = "error"
+        res["error"] = str(e)
+    return res
+
+def main():
+    ap = argparse.ArgumentParser(description="As-of trades->NBBO y firma Lee-Ready por ticker-día")
+    ap.add_argument("--trades-root", required=True, help="Raíz del store de trades")
+    ap.add_argument("--quotes-root", required=True, help="Raíz del store de quotes")
+    ap.add_argument("--outdir", required=True, help="Salida de signed trades")
+    ap.add_argument("--tickers-csv", default=None, help="CSV/Parquet con columna 'ticker'")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 4) // 2))
+    ap.add_argument("--tasks-per-child", type=int, default=200,
+                    help="Reciclar cada worker tras N ticker-días (memoria acotada)")
+    ap.add_argument("--polars-threads", type=int, default=2, help="Hilos polars por worker")
+    ap.add_argument("--quote-lag-ms", type=float, default=0.0,
+                    help="Usar el quote vigente N ms antes del trade (Lee-Ready clásico: 5000)")
+    ap.add_argument("--max-quote-age-s", type=float, default=300.0,
+                    help="Quotes más viejos no se usan (0 = sin límite)")
+    ap.add_argument("--force", action="store_true", help="Reprocesar días ya firmados")
+    ap.add_argument("--hive-layout", action="store_true",
+                    help="Escribir en layout Hive ticker=X/... (automático si outdir ya está migrado)")
+    args = ap.parse_args()
+
+    trades_root = Path(args.trades_root)
+    quotes_root = Path(args.quotes_root)
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    hive = use_hive(outdir, args.hive_layout)
+
+    tickers = None
+    if args.tickers_csv:
+        src = args.tickers_csv
+        df = pl.read_parquet(src) if src.endswith(".parquet") else pl.read_csv(src)
+        tickers = set(df["ticker"].drop_nulls().to_list())
+
+    quote_lag_ns = int(args.quote_lag_ms * 1e6)
+    max_age_ns = int(args.max_quote_age_s * 1e9) if args.max_quote_age_s > 0 else None
+
+    print("=" * 80)
+    print("SIGNED TRADES (as-of NBBO + Lee-Ready)")
+    print("=" * 80)
+    log(f"Trades: {trades_root} | Quotes: {quotes_root} | Out: {outdir}")
+
+    tasks, done = find_tasks(trades_root, quotes_root, outdir, tickers, args.force, hive)
+    log(f"Ticker-días con trades y quotes: {len(tasks) + done:,} (ya firmados: {done:,}, pendientes: {len(tasks):,})")
+    if not tasks:
+        return
+
+    # Los workers 'spawn' importan polars de cero y respetan POLARS_MAX_THREADS
+    os.environ["POLARS_MAX_THREADS"] = str(args.polars_threads)
+    ctx = mp.get_context("spawn")
+
+    counts = {"ok": 0, "empty": 0, "error": 0}
+    total_trades = total_quote = 0
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                             max_tasks_per_child=args.tasks_per_child) as ex:
+        futures = [ex.submit(process_day, t, d, td, qd, str(outdir), quote_lag_ns, max_age_ns, hive)
+                   for t, d, td, qd in tasks]
+        for i, fut in enumerate(as_completed(futures), 1):
+            r = fut.result()
+            counts[r["status"]] += 1
+            total_trades += r["trades"]
+            total_quote += r["by_quote"]
+            if r["status"] == "error":
+                log(f"ERROR {r['ticker']} {r['day']}: {r['error']}")
+            if i % 500 == 0:
+                log(f"Progreso {i:,}/{len(tasks):,} | {total_trades:,} trades")
+
+    print("\n" + "=" * 80)
+    print("RESUMEN")
+    print("=" * 80)
+    log(f"OK: {counts['ok']:,} | Vacíos: {counts['empty']:,} | Errores: {counts['error']:,}")
+    if total_trades:
+        log(f"Trades firmados: {total_trades:,} | regla de quote: {total_quote / total_trades * 100:.1f}% "
+            f"| regla del tick: {(total_trades - total_quote) / total_trades * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
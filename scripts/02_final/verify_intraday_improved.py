@@ -7,135 +7,143 @@ Mejoras:
 - Detección de gaps intraday (minutos faltantes)
 - Estadísticas de calidad de datos
 - Cache de resultados para re-verificaciones rápidas
+- Calidad por fichero sin leerlo entero (utils/minute_quality.py): filas del
+  footer, min/max de t de las estadísticas, barras regulares por día ET con
+  un scan de solo la columna t y minutos esperados del calendario NYSE
+  (cierres anticipados incluidos); cacheada por checksum en
+  <intraday-root>/_quality/minute_quality.parquet
+- Daily vía store_query y minute.parquet por mes o compactado por ticker
+  (TICKER/minute.parquet, métricas por mes ET de su fila de calidad), en
+  layout plano o Hive (ticker=X/); el mes suelto gana al compactado
 """
 
 import polars as pl
 import sys
 import os
 import argparse
+import multiprocessing as mp
 from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict
 from concurrent.futures import ProcessPoolExecutor, as_completed
-import json
 import hashlib
 
+# Módulos compartidos en scripts/utils
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from state_store import StateStore, default_state_db, DONE  # noqa: E402
+from minute_quality import (QualityIndex, SCHEMA as QUALITY_SCHEMA, check_file,  # noqa: E402
+                            default_cache_path, merge_cache, read_cache, write_cache)
+from hive_layout import ticker_dir  # noqa: E402
+from store_query import load as load_store, packed_files  # noqa: E402
+
+DATASET = "verify_intraday"
+
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {msg}", flush=True)
 
 def get_months_from_daily(ticker, daily_root, year_min=None, year_max=None):
     """
-    Obtiene lista de año-mes únicos desde los datos daily con validación.
+    Obtiene lista de año-mes únicos desde los datos daily (store_query: sueltos,
+    compactados o Hive).
     Retorna dict con metadata adicional: {(year, month): {'trading_days': count, 'volume_total': sum}}
     """
-    ticker_path = Path(daily_root) / ticker
-    if not ticker_path.exists():
+    start = f"{year_min}-01-01" if year_min is not None else None
+    end = f"{year_max}-12-31" if year_max is not None else None
+    try:
+        df = load_store('ohlcv_daily', [ticker], start, end, root=daily_root)
+    except Exception as e:
+        log(f"  WARNING: Error leyendo daily de {ticker}: {e}")
         return {}
 
-    year_dirs = [d for d in ticker_path.iterdir() if d.is_dir() and d.name.startswith('year=')]
-    if not year_dirs:
+    # Validación de integridad
+    if df.is_empty() or 'date' not in df.columns:
         return {}
 
-    months_data = {}
-
-    for year_dir in sorted(year_dirs):
-        year_str = year_dir.name.replace('year=', '')
-        year_int = int(year_str)
+    # Agrupar por mes para obtener estadísticas
+    monthly_stats = df.with_columns(
+        pl.col('date').cast(pl.Utf8).str.slice(0, 7).alias('year_month')
+    ).group_by('year_month').agg([
+        pl.len().alias('trading_days'),
+        pl.col('v').cast(pl.Float64).sum().alias('volume_total') if 'v' in df.columns else pl.lit(0).alias('volume_total')
+    ])
 
-        # Filtrar por rango de años
-        if year_min is not None and year_int < year_min:
-            continue
-        if year_max is not None and year_int > year_max:
-            continue
+    months_data = {}
+    for row in monthly_stats.iter_rows(named=True):
+        y, m = row['year_month'].split('-')
+        months_data[(y, m)] = {
+            'trading_days': row['trading_days'],
+            'volume_total': row['volume_total']
+        }
 
-        daily_file = year_dir / 'daily.parquet'
+    return months_data
 
-        try:
-            if not daily_file.exists():
-                continue
+def verify_intraday_quality(minute_file, expected_days, root=None, index=None, rescan=False):
+    """
+    Verifica la calidad de los datos intraday (footer + scan de la columna t,
+    minutos esperados según market_calendar; ver utils/minute_quality.py).
+    Retorna dict con métricas de calidad y la fila de caché en 'cache_row'.
+    """
+    minute_file = Path(minute_file)
+    row = check_file(root or minute_file.parent, minute_file, index or QualityIndex(), rescan)
 
-            # Leer y validar datos daily
-            df = pl.read_parquet(daily_file)
-            
-            # Validación de integridad
-            if df.is_empty() or 'date' not in df.columns:
-                continue
-            
-            # Agrupar por mes para obtener estadísticas
-            df_with_month = df.with_columns([
-                pl.col('date').str.slice(0, 7).alias('year_month')
-            ])
-            
-            monthly_stats = df_with_month.group_by('year_month').agg([
-                pl.len().alias('trading_days'),
-                pl.col('volume').sum().alias('volume_total') if 'volume' in df.columns else pl.lit(0).alias('volume_total')
-            ])
-            
-            for row in monthly_stats.iter_rows(named=True):
-                year_month = row['year_month']
-                y, m = year_month.split('-')
-                months_data[(y, m)] = {
-                    'trading_days': row['trading_days'],
-                    'volume_total': row['volume_total']
-                }
-
-        except Exception as e:
-            log(f"  WARNING: Error leyendo {ticker}/{year_str}: {e}")
-            continue
+    if row['status'] in ('CORRUPT', 'UNREADABLE'):
+        return {'status': row['status'], 'error': row['error'], 'cache_row': row}
+    if row['status'] == 'EMPTY':
+        return {'status': 'EMPTY', 'rows': 0, 'cache_row': row}
 
-    return months_data
+    trading_days_found = row['days'] - row['off_days']
+    return {
+        'status': 'OK',
+        'rows': row['rows'],
+        'unique_days': row['days'],
+        'expected_days': expected_days,
+        'missing_days': max(0, expected_days - trading_days_found),
+        'completeness_pct': row['completeness_pct'],
+        'file_size_mb': row['bytes'] / (1024 * 1024),
+        'cache_row': row
+    }
 
-def verify_intraday_quality(minute_file, expected_days):
+def packed_month_quality(row, months_data):
     """
-    Verifica la calidad de los datos intraday.
-    Retorna dict con métricas de calidad.
+    Métricas por mes ET de un TICKER/minute.parquet compactado a partir de su
+    fila de calidad (barras por día); solo los meses con barras cuentan como
+    encontrados. Un compactado ilegible marca todos los meses esperados.
     """
-    try:
-        df = pl.read_parquet(minute_file)
-        
-        if df.is_empty():
-            return {'status': 'EMPTY', 'rows': 0}
-        
-        # Contar días únicos
-        unique_days = df.select('date').unique().height if 'date' in df.columns else 0
-        
-        # Detectar gaps (minutos faltantes durante horario de trading)
-        if 'minute' in df.columns:
-            df_time = df.with_columns([
-                pl.col('minute').str.slice(11, 5).alias('time')
-            ])
-            
-            # Filtrar solo horario regular (9:30-16:00 ET)
-            df_regular = df_time.filter(
-                (pl.col('time') >= '09:30') & 
-                (pl.col('time') <= '16:00')
-            )
-            
-            # Minutos esperados por día de trading: 390 (6.5 horas * 60)
-            expected_minutes = unique_days * 390
-            actual_minutes = df_regular.height
-            completeness = (actual_minutes / expected_minutes * 100) if expected_minutes > 0 else 0
-        else:
-            completeness = 0
-        
-        return {
+    if row['status'] in ('CORRUPT', 'UNREADABLE'):
+        return {key: {'status': row['status'], 'error': row['error'], 'cache_row': row} for key in months_data}
+
+    per_month = defaultdict(lambda: {'rows': 0, 'days': 0, 'off_days': 0, 'regular_bars': 0, 'expected_minutes': 0})
+    for day in row['daily'] or []:
+        m = per_month[(f"{day['date'].year:04d}", f"{day['date'].month:02d}")]
+        m['rows'] += day['bars']
+        m['days'] += 1
+        m['off_days'] += int(not day['expected_minutes'])
+        m['regular_bars'] += day['regular_bars']
+        m['expected_minutes'] += day['expected_minutes']
+
+    out = {}
+    for key, m in per_month.items():
+        if key not in months_data:
+            continue
+        expected_days = months_data[key]['trading_days']
+        out[key] = {
             'status': 'OK',
-            'rows': df.height,
-            'unique_days': unique_days,
+            'rows': m['rows'],
+            'unique_days': m['days'],
             'expected_days': expected_days,
-            'completeness_pct': round(completeness, 1),
-            'file_size_mb': minute_file.stat().st_size / (1024 * 1024)
+            'missing_days': max(0, expected_days - (m['days'] - m['off_days'])),
+            'completeness_pct': round(m['regular_bars'] / m['expected_minutes'] * 100, 1) if m['expected_minutes'] else 0.0,
+            'file_size_mb': row['bytes'] / (1024 * 1024),
+            'cache_row': row
         }
-        
-    except Exception as e:
-        return {'status': 'CORRUPT', 'error': str(e)}
+    return out
 
 def verify_ticker_parallel(args):
     """
     Función para verificación paralela de un ticker.
     """
-    ticker, daily_root, intraday_root, year_min, year_max = args
+    ticker, daily_root, intraday_root, year_min, year_max, cached_rows, rescan = args
     
     # Obtener meses esperados con metadata
     months_data = get_months_from_daily(ticker, daily_root, year_min, year_max)
@@ -144,16 +152,29 @@ def verify_ticker_parallel(args):
         return None
     
     # Verificar cada mes
+    index = QualityIndex(pl.DataFrame(cached_rows, schema=QUALITY_SCHEMA))
     found_months = {}
     missing_months = []
     quality_issues = []
-    
+
+    # Compactado por ticker (como repair_planner.minute_gaps): una fila de calidad para todos sus meses
+    packed = packed_files('ohlcv_1m', intraday_root, [ticker]).get(ticker)
+    packed_months = packed_month_quality(check_file(intraday_root, packed[0], index, rescan),
+                                         months_data) if packed else {}
+    base = ticker_dir(intraday_root, ticker)
+
     for (year, month), metadata in months_data.items():
-        minute_file = Path(intraday_root) / ticker / f'year={year}' / f'month={month}' / 'minute.parquet'
+        minute_file = base / f'year={year}' / f'month={month}' / 'minute.parquet'
         
+        quality = None
         if minute_file.exists():
             # Verificar calidad
-            quality = verify_intraday_quality(minute_file, metadata['trading_days'])
+            quality = verify_intraday_quality(minute_file, metadata['trading_days'],
+                                              intraday_root, index, rescan)
+        elif (year, month) in packed_months:
+            quality = packed_months[(year, month)]
+
+        if quality is not None:
             found_months[(year, month)] = quality
             
             # Detectar problemas de calidad
@@ -192,6 +213,9 @@ def verify_ticker_parallel(args):
             if (y, m) in found_months and 'completeness_pct' in found_months[(y, m)]:
                 weighted_completeness += found_months[(y, m)]['completeness_pct'] * weight
     
+    # El compactado aparece en varios meses: tamaño y fila de caché una vez por fichero
+    files = {q['cache_row']['path']: q for q in found_months.values()}
+
     return {
         'ticker': ticker,
         'expected_months': total_months,
@@ -202,20 +226,18 @@ def verify_ticker_parallel(args):
         'missing_months_list': missing_months,
         'quality_issues': quality_issues,
         'weighted_completeness': round(weighted_completeness, 1),
-        'total_size_mb': sum(q.get('file_size_mb', 0) for q in found_months.values())
+        'total_size_mb': sum(q.get('file_size_mb', 0) for q in files.values()),
+        'quality_rows': [q['cache_row'] for q in files.values()]
     }
 
-def load_cache(cache_file):
-    """Carga cache de verificaciones previas."""
-    if cache_file.exists():
-        with open(cache_file, 'r') as f:
-            return json.load(f)
-    return {}
-
-def save_cache(cache_file, cache_data):
-    """Guarda cache de verificaciones."""
-    with open(cache_file, 'w') as f:
-        json.dump(cache_data, f)
+def load_cache(state, legacy_file):
+    """Carga verificaciones previas del state store (importa {prefix}_cache.json una vez)."""
+    state.import_legacy_json(
+        legacy_file,
+        lambda data: ({'dataset': DATASET, 'ticker': t, 'period': '', 'status': DONE, 'meta': c}
+                      for t, c in data.items())
+    )
+    return {r['ticker']: r['meta'] for r in state.records(DATASET) if r['meta']}
 
 def main():
     parser = argparse.ArgumentParser(description='Verificación mejorada de intraday vs daily')
@@ -227,7 +249,10 @@ def main():
     parser.add_argument('--year-max', type=int, help='Año máximo a verificar')
     parser.add_argument('--workers', type=int, default=4, help='Número de workers paralelos (default: 4)')
     parser.add_argument('--use-cache', action='store_true', help='Usar cache para acelerar re-verificaciones')
+    parser.add_argument('--state-db', help='SQLite de estado (default: TSIS_STATE_DB o <dir del prefix>/_state.sqlite)')
     parser.add_argument('--quality-threshold', type=float, default=80.0, help='Umbral de calidad mínima % (default: 80)')
+    parser.add_argument('--quality-cache', help='Caché de calidad por fichero (default: <intraday-root>/_quality/minute_quality.parquet)')
+    parser.add_argument('--rescan', action='store_true', help='Ignorar la caché de calidad y volver a medir todos los ficheros')
 
     args = parser.parse_args()
 
@@ -236,8 +261,11 @@ def main():
     log("=" * 80)
 
     # Cache handling
-    cache_file = Path(f"{args.output_prefix}_cache.json")
-    cache = load_cache(cache_file) if args.use_cache else {}
+    state = None
+    cache = {}
+    if args.use_cache:
+        state = StateStore(args.state_db or default_state_db(Path(args.output_prefix).resolve().parent))
+        cache = load_cache(state, Path(f"{args.output_prefix}_cache.json"))
 
     # Cargar tickers
     log(f"Cargando ping desde {args.ping_range}")
@@ -258,9 +286,18 @@ def main():
     if args.year_min or args.year_max:
         log(f"Filtrando años: {args.year_min or 'inicio'} - {args.year_max or 'fin'}")
 
+    # Caché de calidad por fichero (filas de cada ticker a su worker)
+    quality_path = Path(args.quality_cache) if args.quality_cache else default_cache_path(args.intraday_root)
+    quality_cache = read_cache(quality_path)
+    log(f"Caché de calidad: {quality_path} ({quality_cache.height:,} ficheros)")
+    cached_by_ticker = {k[0]: g.to_dicts() for k, g in
+                        quality_cache.filter(pl.col('ticker').is_not_null()).partition_by('ticker', as_dict=True).items()}
+    quality_rows = []
+
     # Preparar argumentos para procesamiento paralelo
     verify_args = [
-        (ticker, args.daily_root, args.intraday_root, args.year_min, args.year_max)
+        (ticker, args.daily_root, args.intraday_root, args.year_min, args.year_max,
+         cached_by_ticker.get(ticker, []), args.rescan)
         for ticker in tickers_to_verify
     ]
 
@@ -270,7 +307,8 @@ def main():
     missing_months_all = []
     quality_issues_all = []
 
-    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+    # 'spawn': fork con polars ya inicializado puede bloquearse
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as executor:
         futures = {executor.submit(verify_ticker_parallel, arg): arg[0] for arg in verify_args}
         
         completed = 0
@@ -280,14 +318,16 @@ def main():
                 result = future.result()
                 if result:
                     completed += 1
+                    quality_rows.extend(result['quality_rows'])
                     
-                    # Actualizar cache
+                    # Actualizar cache (una fila por ticker, persistida al momento)
                     if args.use_cache:
                         cache[ticker] = {
                             'status': result['status'],
                             'weighted_completeness': result['weighted_completeness'],
                             'timestamp': datetime.now().isoformat()
                         }
+                        state.mark(DATASET, ticker, '', DONE, meta=cache[ticker])
                     
                     # Preparar resultado para DataFrame
                     results.append({
@@ -323,6 +363,10 @@ def main():
             except Exception as e:
                 log(f"  ERROR procesando {ticker}: {e}")
 
+    if quality_rows:
+        write_cache(quality_path, merge_cache(quality_cache, quality_rows))
+        log(f"Caché de calidad actualizada: {len(quality_rows):,} ficheros verificados")
+
     # Agregar resultados del cache
     if args.use_cache:
         for ticker in cached_tickers:
@@ -334,10 +378,13 @@ def main():
                     'completeness_pct': cache_data['weighted_completeness'],
                     'from_cache': True
                 })
-        save_cache(cache_file, cache)
+        state.close()
 
     # Crear DataFrames
     results_df = pl.DataFrame(results)
+    if results_df.is_empty():
+        log(f"Sin tickers con datos daily para verificar en {args.daily_root}: no se generan ficheros")
+        return
 
     # Estadísticas
     log("")
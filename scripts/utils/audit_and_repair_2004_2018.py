@@ -15,8 +15,12 @@ OUTPUT:
 - tickers_missing.csv: Tickers con datos pero no descargados
 - tickers_incomplete.csv: Tickers descargados pero con dias sin _SUCCESS
 - tickers_to_download.csv: Lista combinada para descargar/reparar
+- audit_2004_2018_missing_dates.parquet: Días sin _SUCCESS (ticker, missing_date, state)
 - audit_summary.txt: Resumen ejecutivo
 
+Los días presentes salen de un listado del árbol de cada ticker (tick_coverage.py),
+no de stat() por fecha, y se cruzan con el daily por lotes de tickers en procesos.
+
 USO:
     python scripts/utils/audit_and_repair_2004_2018.py \
         --ping processed/universe/ping_binary_2004_2018.parquet \
@@ -33,12 +37,18 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import sys
 import io
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+
+from daily_panel import _run
+from hive_layout import ticker_names
+from tick_coverage import coverage_batch, summarize
 
 # Force UTF-8 for stdout/stderr
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
 
+TICKERS_PER_TASK = 200
+
 def log(msg):
     print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
 
@@ -84,186 +94,66 @@ def scan_downloaded_tickers(outdir):
         log(f"  Path absoluto: {outdir_path.absolute()}")
         return []
 
-    downloaded = []
-    for item in outdir_path.iterdir():
-        if item.is_dir() and not item.name.startswith("_"):
-            downloaded.append(item.name)
+    downloaded = ticker_names(outdir_path)
 
     log(f"  > {len(downloaded):,} tickers encontrados en disco")
 
     return sorted(downloaded)
 
-def get_expected_days_from_daily(ticker: str, daily_root: Path, start_date: str, end_date: str) -> list:
-    """
-    Obtiene lista de días esperados desde OHLCV daily (fuente de verdad Polygon).
-
-    Si el ticker tiene barras daily en Polygon, esos son los días que DEBEN tener ticks.
-    Esto es más preciso que un calendario genérico porque:
-    - Respeta IPO date (no espera ticks antes del listado)
-    - Respeta delisting date (no espera ticks después de delist)
-    - Usa el calendario real de trading que Polygon conoce
-
-    Args:
-        ticker: Símbolo del ticker
-        daily_root: Ruta al directorio de daily OHLCV (ej: raw/polygon/ohlcv_daily)
-        start_date: Fecha inicio (YYYY-MM-DD)
-        end_date: Fecha fin (YYYY-MM-DD)
-
-    Returns:
-        Lista de fechas (str YYYY-MM-DD) donde se esperan ticks
+def _status(row: dict, downloaded: bool) -> tuple:
+    """(status, issue) de un ticker a partir de sus contadores de días"""
+    if not downloaded:
+        return "MISSING", "TICKER_DIR_MISSING"
+    if row["days_with_success"] == row["days_expected"]:
+        return "COMPLETE", None
+    if row["days_with_parquet_no_success"] > 0:
+        return "INCOMPLETE_NO_SUCCESS", f"{row['days_with_parquet_no_success']} dias sin _SUCCESS"
+    if row["days_with_success"] > 0:
+        return "INCOMPLETE_PARTIAL", f"{row['days_missing']} dias faltantes"
+    return "EMPTY", "Directorio vacio"
+
+def audit_tickers(ranges, outdir, daily_root, downloaded):
     """
-    ticker_dir = daily_root / ticker
-
-    if not ticker_dir.exists():
-        # Si no hay daily, no esperamos ticks (el ticker no tiene datos en Polygon)
-        return []
-
-    # Leer todos los daily.parquet del ticker
-    dfs = []
-    for year_dir in ticker_dir.glob("year=*"):
-        daily_file = year_dir / "daily.parquet"
-        if daily_file.exists():
-            try:
-                df = pl.read_parquet(daily_file, columns=["date"])
-                dfs.append(df)
-            except Exception:
-                continue
-
-    if not dfs:
-        return []
-
-    # Concatenar y filtrar por rango
-    df = pl.concat(dfs, how="vertical_relaxed")
-    df = df.filter(
-        (pl.col("date") >= start_date) &
-        (pl.col("date") <= end_date)
-    )
+    Audita un lote de tickers (worker).
 
-    return sorted(df["date"].unique().to_list())
+    FUENTE DE VERDAD: OHLCV daily de Polygon. Solo esperamos ticks en días
+    donde Polygon tiene barra daily (respeta IPO, delisting y calendario real).
+    ranges: [(ticker, first_day, last_day)] del ping; downloaded: tickers con
+    directorio en outdir. Retorna (filas de auditoría, días sin _SUCCESS).
+    """
+    days = coverage_batch(str(daily_root), str(outdir), ranges)
+    counts = {r["ticker"]: r for r in summarize(days).iter_rows(named=True)}
+    rows = []
+    for ticker, first_day, _ in ranges:
+        c = counts.get(ticker)
+        if c is None and ticker in downloaded:
+            # Sin daily en el rango no podemos auditar confiablemente
+            rows.append({"ticker": ticker, "status": "NO_DAILY_REFERENCE", "days_expected": 0,
+                         "days_with_success": 0, "days_with_parquet_no_success": 0, "days_missing": 0,
+                         "first_day_expected": first_day, "first_day_found": None, "last_day_found": None,
+                         "issue_summary": "Sin OHLCV daily 2004-2018 para auditar"})
+            continue
+        c = c or {"days_expected": 0, "days_with_success": 0, "days_with_parquet_no_success": 0,
+                  "days_missing": 0, "first_day_found": None, "last_day_found": None}
+        status, issue = _status(c, ticker in downloaded)
+        rows.append({"ticker": ticker, "status": status, "days_expected": c["days_expected"],
+                     "days_with_success": c["days_with_success"],
+                     "days_with_parquet_no_success": c["days_with_parquet_no_success"],
+                     "days_missing": c["days_missing"], "first_day_expected": first_day,
+                     "first_day_found": c["first_day_found"], "last_day_found": c["last_day_found"],
+                     "issue_summary": issue})
+    missing = (days.filter(pl.col("daily") & ~pl.col("success"))
+                   .select(["ticker", pl.col("date").alias("missing_date"),
+                            pl.when(pl.col("parquet")).then(pl.lit("no_success"))
+                              .otherwise(pl.lit("missing")).alias("state")]))
+    return rows, missing
 
 def audit_single_ticker(args_tuple):
-    """Audita un ticker individual (para paralelización)"""
+    """Audita un ticker individual"""
     ticker, outdir, daily_root, ticker_first_day, ticker_last_day = args_tuple
-
-    ticker_dir = Path(outdir) / ticker
-
-    # FUENTE DE VERDAD: usar OHLCV daily de Polygon
-    # Solo esperamos ticks en días donde Polygon tiene barra daily
-    trading_days_for_ticker = get_expected_days_from_daily(
-        ticker, daily_root, ticker_first_day, ticker_last_day
-    )
-
-    # Si no hay daily para este rango, no podemos auditar confiablemente
-    if len(trading_days_for_ticker) == 0:
-        return {
-            "ticker": ticker,
-            "status": "NO_DAILY_REFERENCE",
-            "days_expected": 0,
-            "days_with_success": 0,
-            "days_with_parquet_no_success": 0,
-            "days_missing": 0,
-            "first_day_expected": ticker_first_day,
-            "first_day_found": None,
-            "last_day_found": None,
-            "issue_summary": "Sin OHLCV daily 2004-2018 para auditar"
-        }
-
-    # Caso 1: Ticker sin directorio
-    if not ticker_dir.exists():
-        return {
-            "ticker": ticker,
-            "status": "MISSING",
-            "days_expected": len(trading_days_for_ticker),
-            "days_with_success": 0,
-            "days_with_parquet_no_success": 0,
-            "days_missing": len(trading_days_for_ticker),
-            "first_day_expected": ticker_first_day,
-            "first_day_found": None,
-            "last_day_found": None,
-            "issue_summary": "TICKER_DIR_MISSING"
-        }
-
-    # Escanear estructura de días
-    days_with_success = 0
-    days_with_parquet_no_success = 0
-    days_missing = 0
-    first_day_found = None
-    last_day_found = None
-
-    for day_str in trading_days_for_ticker:
-        year = day_str.split("-")[0]
-        month = day_str.split("-")[1]
-
-        day_dir = ticker_dir / f"year={year}" / f"month={month}" / f"day={day_str}"
-        success_marker = day_dir / "_SUCCESS"
-        premarket_fp = day_dir / "premarket.parquet"
-        market_fp = day_dir / "market.parquet"
-
-        # Caso: Día completo con _SUCCESS
-        if success_marker.exists():
-            days_with_success += 1
-            if first_day_found is None:
-                first_day_found = day_str
-            last_day_found = day_str
-
-        # Caso: Día con parquet pero sin _SUCCESS (problema!)
-        elif (premarket_fp.exists() or market_fp.exists()):
-            days_with_parquet_no_success += 1
-            if first_day_found is None:
-                first_day_found = day_str
-            last_day_found = day_str
-
-        # Caso: Día faltante
-        else:
-            days_missing += 1
-
-    # Determinar status
-    if days_with_success == len(trading_days_for_ticker):
-        status = "COMPLETE"
-        issue = None
-    elif days_with_parquet_no_success > 0:
-        status = "INCOMPLETE_NO_SUCCESS"
-        issue = f"{days_with_parquet_no_success} dias sin _SUCCESS"
-    elif days_with_success > 0:
-        status = "INCOMPLETE_PARTIAL"
-        issue = f"{days_missing} dias faltantes"
-    else:
-        status = "EMPTY"
-        issue = "Directorio vacio"
-
-    return {
-        "ticker": ticker,
-        "status": status,
-        "days_expected": len(trading_days_for_ticker),
-        "days_with_success": days_with_success,
-        "days_with_parquet_no_success": days_with_parquet_no_success,
-        "days_missing": days_missing,
-        "first_day_expected": ticker_first_day,
-        "first_day_found": first_day_found,
-        "last_day_found": last_day_found,
-        "issue_summary": issue
-    }
-
-def process_missing_ticker(args_tuple):
-    """Procesa un ticker missing para calcular days_expected (para paralelización)"""
-    ticker, daily_root, ticker_first_day, ticker_last_day = args_tuple
-
-    trading_days = get_expected_days_from_daily(
-        ticker, daily_root, ticker_first_day, ticker_last_day
-    )
-
-    return {
-        "ticker": ticker,
-        "status": "MISSING",
-        "days_expected": len(trading_days),
-        "days_with_success": 0,
-        "days_with_parquet_no_success": 0,
-        "days_missing": len(trading_days),
-        "first_day_expected": ticker_first_day,
-        "first_day_found": None,
-        "last_day_found": None,
-        "issue_summary": "TICKER_DIR_MISSING",
-    }
+    downloaded = {ticker} if ticker in ticker_names(outdir) else set()
+    rows, _ = audit_tickers([(ticker, ticker_first_day, ticker_last_day)], outdir, daily_root, downloaded)
+    return rows[0]
 
 def main():
     args = parse_args()
@@ -306,75 +196,28 @@ def main():
     log(f"  > {len(ticker_first_day_map):,} tickers con first_day/last_day mapeados")
     log("")
 
-    # Paso 5: Auditar tickers descargados (paralelizado)
-    log("Auditando tickers descargados...")
-    log(f"  > Usando {args.workers} workers")
-
-    # Solo auditar tickers que están en la lista de con-datos
-    tickers_to_audit = sorted(downloaded_set & tickers_with_data_set)
+    # Paso 5: Auditar todos los tickers con datos (lotes en paralelo); los no
+    # descargados salen MISSING con sus días esperados del daily
+    tickers_to_audit = sorted(tickers_with_data_set)
+    ranges = [(t, *(str(d)[:10] if d else None for d in (ticker_first_day_map[t], ticker_last_day_map[t])))
+              for t in tickers_to_audit]
+    batches = [ranges[i:i + TICKERS_PER_TASK] for i in range(0, len(ranges), TICKERS_PER_TASK)]
+    log(f"Auditando {len(ranges):,} tickers ({len(batches)} lotes, {args.workers} workers)...")
 
-    # Preparar argumentos con first_day y last_day específico por ticker (del ping)
-    # Convertir daily_root a Path
     daily_root = Path(args.daily_root)
-    audit_args = [
-        (ticker, args.outdir, daily_root, ticker_first_day_map[ticker], ticker_last_day_map[ticker])
-        for ticker in tickers_to_audit
-    ]
-
-    with Pool(processes=args.workers) as pool:
-        results = []
-        total = len(audit_args)
-
-        for i, result in enumerate(pool.imap_unordered(audit_single_ticker, audit_args), 1):
-            results.append(result)
-            if i % 100 == 0 or i == total:
-                log(f"  Progreso: {i}/{total} ({i/total*100:.1f}%)")
+    out = _run(audit_tickers, [(b, args.outdir, str(daily_root), downloaded_set & {t for t, _, _ in b})
+                               for b in batches], args.workers, "lotes")
 
     # Paso 6: Compilar resultados
     log("")
     log("Compilando resultados...")
-
-    # Crear DataFrame con resultados de auditoría
-    audit_df = pl.DataFrame(results)
-
-    # Paso 6: Procesar tickers faltantes (paralelizado)
-    log(f"Procesando {len(missing_tickers):,} tickers faltantes...")
-
-    # Preparar argumentos para paralelización
-    missing_args = [
-        (ticker, daily_root, ticker_first_day_map[ticker], ticker_last_day_map[ticker])
-        for ticker in missing_tickers
-    ]
-
-    # Procesar en paralelo
-    with Pool(processes=args.workers) as pool:
-        missing_data = []
-        total_missing = len(missing_args)
-
-        for i, result in enumerate(pool.imap_unordered(process_missing_ticker, missing_args), 1):
-            missing_data.append(result)
-            if i % 100 == 0 or i == total_missing:
-                log(f"  Progreso missing: {i}/{total_missing} ({i/total_missing*100:.1f}%)")
-
-    missing_df = pl.DataFrame(missing_data)
-    log(f"  > {len(missing_data):,} tickers missing procesados")
-
-    # Combinar resultados - asegurar schemas compatibles
-    # Convertir columnas problemáticas a String explícitamente
-    if audit_df.height > 0:
-        for col in ["first_day_found", "last_day_found", "issue_summary"]:
-            if col in audit_df.columns:
-                audit_df = audit_df.with_columns(pl.col(col).cast(pl.Utf8, strict=False))
-
-    if missing_df.height > 0:
-        for col in ["first_day_found", "last_day_found", "issue_summary"]:
-            if col in missing_df.columns:
-                missing_df = missing_df.with_columns(pl.col(col).cast(pl.Utf8, strict=False))
-
-    full_audit_df = pl.concat([audit_df, missing_df], how="diagonal")
-
-    # Ordenar por ticker
-    full_audit_df = full_audit_df.sort("ticker")
+    audit_schema = {"ticker": pl.Utf8, "status": pl.Utf8, "days_expected": pl.Int64,
+                    "days_with_success": pl.Int64, "days_with_parquet_no_success": pl.Int64,
+                    "days_missing": pl.Int64, "first_day_expected": pl.Utf8, "first_day_found": pl.Utf8,
+                    "last_day_found": pl.Utf8, "issue_summary": pl.Utf8}
+    full_audit_df = pl.DataFrame([r for rows, _ in out for r in rows], schema=audit_schema).sort("ticker")
+    missing_days_df = (pl.concat([m for _, m in out]) if out
+                       else pl.DataFrame(schema={"ticker": pl.Utf8, "missing_date": pl.Utf8, "state": pl.Utf8}))
 
     # Paso 7: Generar estadísticas
     log("")
@@ -468,7 +311,12 @@ def main():
     pl.DataFrame({"ticker": tickers_to_download}).write_csv(download_file)
     log(f"  ✅ {download_file} ({len(tickers_to_download):,} tickers)")
 
-    # 7. Resumen ejecutivo
+    # 7. Días sin _SUCCESS (parquet: pueden ser millones de filas)
+    missing_days_file = f"{args.output_prefix}_missing_dates.parquet"
+    missing_days_df.sort(["ticker", "missing_date"]).write_parquet(missing_days_file, compression="zstd")
+    log(f"  ✅ {missing_days_file} ({missing_days_df.height:,} días)")
+
+    # 8. Resumen ejecutivo
     summary_file = f"{args.output_prefix}_summary.txt"
     with open(summary_file, "w", encoding="utf-8") as f:
         f.write("=" * 80 + "\n")
@@ -529,6 +377,7 @@ def main():
     log(f"  - {incomplete_partial_file}")
     log(f"  - {empty_file}")
     log(f"  - {download_file} ⚡ USAR ESTE PARA DESCARGA")
+    log(f"  - {missing_days_file}")
     log(f"  - {summary_file}")
     log("")
 
@@ -3,7 +3,8 @@
 """
 audit_download_speed.py - Audita velocidad de descarga y progreso
 
-Analiza rapidamente usando os.walk() sin glob para maxima velocidad.
+Analiza rapidamente usando os.walk() sin glob para maxima velocidad, o
+consultando el catalogo de ficheros (--catalog, ver dataset_catalog.py).
 Calcula estadisticas de descarga por ticker/año/mes.
 """
 
@@ -15,6 +16,8 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import polars as pl
 
+from dataset_catalog import default_catalog_dir, read_catalog
+
 def log(msg: str) -> None:
     print(f"[{datetime.now():%H:%M:%S}] {msg}", flush=True)
 
@@ -105,6 +108,45 @@ def scan_directory_fast(data_dir: str) -> dict:
         'scan_time': elapsed
     }
 
+def scan_catalog(catalog_dir: str, data_dir: str = None, dataset: str = None) -> dict:
+    """
+    Misma estructura que scan_directory_fast() a partir del catalogo de
+    ficheros: una consulta en vez de un os.walk() del arbol completo.
+    """
+    log(f"Consultando catalogo: {catalog_dir}" + (f" (dataset={dataset})" if dataset else ""))
+    start = time.time()
+
+    lf = read_catalog(catalog_dir, dataset, data_dir)
+    totals = lf.select([
+        pl.len().alias("files"),
+        pl.col("bytes").sum(),
+        pl.col("mtime_ns").min().alias("oldest"),
+        pl.col("mtime_ns").max().alias("newest"),
+    ]).collect().row(0, named=True)
+    counts = (
+        lf.filter(pl.col("ticker").is_not_null() & pl.col("year").is_not_null() & pl.col("month").is_not_null())
+          .group_by(["ticker", "year", "month"])
+          .agg(pl.len().alias("n"))
+          .collect()
+    )
+
+    structure = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+    for ticker, year, month, n in counts.iter_rows():
+        structure[ticker][str(year)][f"{month:02d}"] = n
+
+    to_dt = lambda ns: datetime.fromtimestamp(ns / 1e9) if ns is not None else None
+    elapsed = time.time() - start
+    log(f"Consulta completa en {elapsed:.2f}s")
+
+    return {
+        'structure': dict(structure),
+        'total_files': totals['files'],
+        'total_size_bytes': totals['bytes'] or 0,
+        'oldest_file': to_dt(totals['oldest']),
+        'newest_file': to_dt(totals['newest']),
+        'scan_time': elapsed
+    }
+
 def calculate_statistics(scan_result: dict, total_tickers: int = None) -> dict:
     """Calcula estadisticas de descarga."""
     structure = scan_result['structure']
@@ -227,10 +269,18 @@ def main():
     parser.add_argument('--data-dir', required=True, help='Directorio de datos (ej: C:\\TSIS_Data\\trades_ticks_2004_2018_v2)')
     parser.add_argument('--total-tickers', type=int, help='Total de tickers esperados (para calcular progreso)')
     parser.add_argument('--export-csv', help='Ruta para exportar resumen por ticker')
+    parser.add_argument('--catalog', action='store_true',
+                        help='Usar el catalogo de ficheros en vez de recorrer --data-dir')
+    parser.add_argument('--catalog-dir', help='Catalogo (default: TSIS_CATALOG_DIR o <data-dir>/_catalog)')
+    parser.add_argument('--dataset', help='Dataset del catalogo (ohlcv_1m, trades, quotes, ...)')
     args = parser.parse_args()
 
-    # Escanear
-    scan_result = scan_directory_fast(args.data_dir)
+    # Escanear (o consultar el catalogo)
+    if args.catalog:
+        scan_result = scan_catalog(args.catalog_dir or default_catalog_dir(args.data_dir),
+                                   args.data_dir, args.dataset)
+    else:
+        scan_result = scan_directory_fast(args.data_dir)
 
     # Calcular stats
     stats = calculate_statistics(scan_result, args.total_tickers)
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+audit_store.py - Auditoría incremental de los stores (tamaño, ficheros y cobertura)
+
+Sustituye a audit_polygon_data*.py y check_download_status.py: un solo
+auditor para todos los stores, con el listado de directorios repartido por
+ticker entre --workers threads (os.scandir suelta el GIL) y una caché
+indexada por mtime que evita volver a listar los subárboles sin cambios.
+
+Caché (<out-dir>/_cache/<store>-<hash>.parquet): una fila por unidad de
+partición (mes en ticks y barras 1m, año en daily) con su mtime y los
+agregados de su subárbol: ficheros, bytes, parquets, temporales, mtime más
+antiguo / más reciente, periodos con datos y días sin _SUCCESS. Crear,
+borrar o renombrar (os.replace) un día cambia el mtime del mes; una unidad
+se reutiliza sin listarla si su mtime coincide y estaba asentada: sin
+ficheros de las últimas --settle-hours, sin días sin _SUCCESS y de un
+periodo ya cerrado (el mes / año en curso se lista siempre). Los niveles por
+encima (ticker, year= en ticks) se listan en cada pasada. Un fichero
+reescrito en su sitio dentro de una unidad asentada no se ve hasta --full.
+
+Tipo de store (por el nombre, o --store NOMBRE=RUTA:TIPO):
+    trades / quotes   cobertura en ticker-días (day=, más los días de los
+                      meses compactados); trades además días sin _SUCCESS
+    ohlcv_1m          ticker-meses (month=)
+    ohlcv_daily       ticker-años (year=)
+    other             solo tamaño y ficheros, sin caché (reference, fundamentals, ...)
+
+Los ficheros compactados por ticker (TICKER/daily.parquet, minute.parquet)
+son una unidad de caché más, indexada por el mtime del fichero: cuentan en
+tamaño y ficheros con su ticker y en cobertura con los años / meses entre el
+min y el max de t de las estadísticas del footer (store_query.packed_span,
+sin leer datos; los huecos intermedios no se ven).
+
+Salida en --out-dir:
+    audit_store.parquet         una fila por store
+    audit_store_years.parquet   una fila por store y año
+    audit_store.md              las dos tablas en markdown
+
+Uso:
+    python scripts/utils/audit_store.py --parent C:/TSIS_Data --parent D:/TSIS_SmallCaps/raw/polygon \
+        --out-dir D:/TSIS_SmallCaps/01_daily/04_data_final/audit --workers 32
+    python scripts/utils/audit_store.py --store trades_2019_2025=C:/TSIS_Data/trades_ticks_2019_2025 \
+        --store ohlcv_daily=D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily --full
+"""
+
+import os
+import sys
+import time
+import json
+import hashlib
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from store_query import MANIFEST, compact_names, packed_span
+from dataset_catalog import parse_partition, root_key
+from hive_layout import ticker_dirs
+
+CACHE_DIR = "_cache"
+SUMMARY_FILE = "audit_store.parquet"
+YEARS_FILE = "audit_store_years.parquet"
+REPORT_FILE = "audit_store.md"
+
+KINDS = ("trades", "quotes", "ohlcv_1m", "ohlcv_daily", "other")
+# Nivel de partición que cuenta como unidad de cobertura
+COVERAGE_LEVEL = {"trades": "day", "quotes": "day", "ohlcv_1m": "month", "ohlcv_daily": "year"}
+# Profundidad bajo el ticker de la unidad de caché (year=1, month=2)
+UNIT_DEPTH = {"trades": 2, "quotes": 2, "ohlcv_1m": 2, "ohlcv_daily": 1, "other": 0}
+SETTLE_HOURS = 6
+# Fichero compactado por ticker (compact_small_files.py) en los stores de barras
+PACKED_FILE = {kind: compact_names(kind, None)[0] for kind in ("ohlcv_1m", "ohlcv_daily")}
+
+UNIT_SCHEMA = {
+    "dir": pl.Utf8, "mtime_ns": pl.Int64, "settled": pl.Boolean,
+    "files": pl.Int64, "bytes": pl.Int64, "parquet": pl.Int64, "tmp": pl.Int64,
+    "oldest_ns": pl.Int64, "newest_ns": pl.Int64,
+    "periods": pl.List(pl.Utf8), "no_success": pl.List(pl.Utf8),
+}
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def format_size(size_bytes: float) -> str:
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.2f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.2f} PB"
+
+def store_kind(name: str) -> str:
+    """Tipo de store a partir de su nombre (trades_ticks_2019_2025 -> trades)"""
+    n = name.lower()
+    if "quote" in n or "nbbo" in n:
+        return "quotes"
+    if "trade" in n or "tick" in n:
+        return "trades"
+    if "daily" in n:
+        return "ohlcv_daily"
+    if "1m" in n or "minute" in n or "intraday" in n:
+        return "ohlcv_1m"
+    return "other"
+
+def cache_file(out_dir: Path, name: str, root: Path) -> Path:
+    digest = hashlib.sha1(root_key(root).encode()).hexdigest()[:8]
+    return out_dir / CACHE_DIR / f"{name}-{digest}.parquet"
+
+def read_cache(path: Path) -> Optional[pl.DataFrame]:
+    if not path.exists():
+        return None
+    try:
+        return pl.read_parquet(path)
+    except Exception as e:
+        log(f"  Caché ilegible ({e}): escaneo completo")
+        return None
+
+def write_cache(path: Path, units: pl.DataFrame) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    units.write_parquet(tmp, compression="zstd")
+    os.replace(tmp, path)
+
+# --------------------------------------------------------------------------
+# Listado incremental
+# --------------------------------------------------------------------------
+
+def _empty_row(rel: str, mtime_ns: Optional[int]) -> Dict:
+    return {"dir": rel, "mtime_ns": mtime_ns, "settled": False, "files": 0, "bytes": 0, "parquet": 0,
+            "tmp": 0, "oldest_ns": None, "newest_ns": None, "periods": [], "no_success": []}
+
+def _list_dir(path: str, row: Dict) -> Tuple[List[Tuple[str, int]], bool, bool, List[str]]:
+    """
+    Suma los ficheros de un directorio a row; devuelve (subdirectorios con su
+    mtime, hay parquets, hay _SUCCESS, días del _COMPACTED.json)
+    """
+    children, parquet, success, packed = [], False, False, []
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return children, parquet, success, packed
+    with it:
+        for e in it:
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    children.append((e.name, e.stat(follow_symlinks=False).st_mtime_ns))
+                    continue
+                st = e.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            name = e.name
+            row["bytes"] += st.st_size
+            if name == "_SUCCESS":
+                success = True
+                continue
+            if name == MANIFEST:
+                try:
+                    with open(e.path, encoding="utf-8") as f:
+                        packed = list(json.load(f).get("days", []))
+                except (OSError, ValueError):
+                    pass
+                continue
+            if name.endswith(".tmp"):
+                row["tmp"] += 1
+                continue
+            if name.startswith(("_", ".")):
+                continue
+            row["files"] += 1
+            if name.endswith(".parquet"):
+                row["parquet"] += 1
+                parquet = True
+            row["oldest_ns"] = min(row["oldest_ns"] or st.st_mtime_ns, st.st_mtime_ns)
+            row["newest_ns"] = max(row["newest_ns"] or 0, st.st_mtime_ns)
+    return children, parquet, success, packed
+
+def _period(rel: str, level: str) -> Optional[str]:
+    """Periodo YYYY / YYYY-MM / YYYY-MM-DD de un directorio si es del nivel de cobertura"""
+    p = parse_partition(f"{rel}/_")
+    if p[level] is None or (level != "day" and p[{"year": "month", "month": "day"}[level]] is not None):
+        return None
+    try:
+        if level == "year":
+            return f"{p['year']:04d}"
+        if level == "month":
+            return f"{p['year']:04d}-{p['month']:02d}"
+        return dt.date(p["year"], p["month"], p["day"]).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def list_unit(root: str, rel: str, mtime_ns: int, kind: str, fresh_ns: int, today: dt.date) -> Dict:
+    """Fila de caché de una unidad: lista su subárbol entero"""
+    row = _empty_row(rel, mtime_ns)
+    level = COVERAGE_LEVEL.get(kind)
+    periods, no_success, done = set(), set(), set()
+    stack = [rel]
+    while stack:
+        d = stack.pop()
+        children, parquet, success, packed = _list_dir(os.path.join(root, d), row)
+        stack.extend(f"{d}/{n}" for n, _ in children)
+        periods.update(packed)
+        done.update(packed)
+        if level and parquet:
+            period = _period(d, level)
+            if period:
+                periods.add(period)
+                (done if success or kind != "trades" else no_success).add(period)
+    # day=DD y day=YYYY-MM-DD del mismo día: con que uno tenga _SUCCESS basta
+    no_success -= done
+    row["periods"], row["no_success"] = sorted(periods), sorted(no_success)
+    p = parse_partition(f"{rel}/_")
+    current = p["year"] is None or (p["year"], p["month"] or 12) >= (today.year, today.month)
+    row["settled"] = (kind != "other" and not no_success and not current
+                      and (row["newest_ns"] or 0) < fresh_ns)
+    return row
+
+def _span_periods(d0: dt.date, d1: dt.date, level: str) -> List[str]:
+    """Años (YYYY) o meses (YYYY-MM) entre dos fechas, inclusive"""
+    if level == "year":
+        return [f"{y:04d}" for y in range(d0.year, d1.year + 1)]
+    out, (y, m) = [], (d0.year, d0.month)
+    while (y, m) <= (d1.year, d1.month):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+def packed_unit(root: str, rel: str, mtime_ns: int, kind: str) -> Dict:
+    """
+    Fila de caché de un TICKER/daily.parquet | minute.parquet compactado: solo
+    cobertura (ficheros y bytes ya cuentan en la fila del ticker), con los
+    periodos entre el min y el max del footer. Footer ilegible: sin asentar,
+    se reintenta en la siguiente pasada.
+    """
+    row = _empty_row(rel, mtime_ns)
+    try:
+        span = packed_span(os.path.join(root, rel))
+    except Exception:
+        return row
+    row["settled"] = True
+    if span:
+        row["periods"] = _span_periods(span[0], span[1], COVERAGE_LEVEL[kind])
+    return row
+
+def walk_ticker(root: str, rel: str, kind: str, cache: Dict[str, Tuple[int, bool, int]], full: bool,
+                fresh_ns: int, today: dt.date) -> Tuple[List[Dict], List[int], int]:
+    """(filas nuevas, índices de filas de caché reutilizadas, directorios listados) de un ticker"""
+    rows, reused, listed = [], [], 0
+    depth_unit = UNIT_DEPTH[kind]
+    try:
+        stack = [(rel, 0, os.stat(os.path.join(root, rel)).st_mtime_ns)]
+    except OSError:
+        return rows, reused, listed
+    while stack:
+        d, depth, mtime_ns = stack.pop()
+        if depth == depth_unit:
+            hit = cache.get(d)
+            if hit is not None and not full and hit[0] == mtime_ns and hit[1]:
+                reused.append(hit[2])
+                continue
+            rows.append(list_unit(root, d, mtime_ns, kind, fresh_ns, today))
+            listed += 1
+            continue
+        # Por encima de la unidad: se lista siempre (ficheros propios, p.ej.
+        # TICKER/daily.parquet compactado, y bajada a los hijos)
+        own = _empty_row(d, mtime_ns)
+        children, _, _, _ = _list_dir(os.path.join(root, d), own)
+        listed += 1
+        if own["files"] or own["tmp"] or own["bytes"]:
+            rows.append(own)
+        if depth == 0 and kind in PACKED_FILE:
+            packed = f"{d}/{PACKED_FILE[kind]}"
+            try:
+                packed_ns = os.stat(os.path.join(root, packed)).st_mtime_ns
+            except OSError:
+                packed_ns = None
+            if packed_ns is not None:
+                hit = cache.get(packed)
+                if hit is not None and not full and hit[0] == packed_ns and hit[1]:
+                    reused.append(hit[2])
+                else:
+                    rows.append(packed_unit(root, packed, packed_ns, kind))
+        stack.extend((f"{d}/{n}", depth + 1, m) for n, m in children)
+    return rows, reused, listed
+
+def scan_store(name: str, root: Path, kind: str, out_dir: Path, workers: int, full: bool,
+               settle_hours: float) -> pl.DataFrame:
+    """Lista un store (reutilizando la caché) y devuelve sus filas de unidad"""
+    cfile = cache_file(out_dir, name, root)
+    old = None if full else read_cache(cfile)
+    cache = {}
+    if old is not None and old.height:
+        cache = dict(zip(old["dir"].to_list(),
+                         zip(old["mtime_ns"].to_list(), old["settled"].to_list(), range(old.height))))
+    tickers = [os.path.basename(p) for _, p in ticker_dirs(root)]
+    now = time.time_ns()
+    fresh_ns = now - int(settle_hours * 3600e9)
+    today = dt.date.today()
+    t0 = time.time()
+    rows: List[Dict] = []
+    reused: List[int] = []
+    listed = 0
+    # Ficheros sueltos en la raíz (reference, fundamentals, ...)
+    top = _empty_row("", None)
+    _list_dir(str(root), top)
+    if top["files"] or top["tmp"]:
+        rows.append(top)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        tasks = ex.map(lambda t: walk_ticker(str(root), t, kind, cache, full, fresh_ns, today), tickers)
+        for i, (r, idx, n) in enumerate(tasks, 1):
+            rows.extend(r)
+            reused.extend(idx)
+            listed += n
+            if i % 2000 == 0:
+                log(f"    {i:,}/{len(tickers):,} tickers")
+    units = pl.DataFrame(rows, schema=UNIT_SCHEMA)
+    if reused:
+        units = pl.concat([old.select(list(UNIT_SCHEMA)).cast(UNIT_SCHEMA)[reused], units])
+    write_cache(cfile, units)
+    log(f"  {name} ({kind}): {len(tickers):,} tickers, {units.height:,} unidades, "
+        f"{len(reused):,} de caché, {listed:,} directorios listados en {time.time() - t0:.1f}s")
+    return units
+
+# --------------------------------------------------------------------------
+# Estadísticas
+# --------------------------------------------------------------------------
+
+def _with_partitions(units: pl.DataFrame) -> pl.DataFrame:
+    parts = [parse_partition(f"{d}/_") if d else {"ticker": None, "year": None}
+             for d in units["dir"].to_list()]
+    return units.with_columns([
+        pl.Series("ticker", [p["ticker"] for p in parts], dtype=pl.Utf8),
+        pl.Series("year", [p["year"] for p in parts], dtype=pl.Int32),
+    ])
+
+def coverage_units(units: pl.DataFrame) -> pl.DataFrame:
+    """
+    Unidades de cobertura con datos: ticker, period (YYYY / YYYY-MM / YYYY-MM-DD),
+    year, success (False = día de trades sin _SUCCESS)
+    """
+    missing = (units.select(["ticker", pl.col("no_success").alias("period")]).explode("period")
+                    .drop_nulls("period").unique().with_columns(pl.lit(False).alias("success")))
+    return (units.select(["ticker", pl.col("periods").alias("period")]).explode("period")
+                 .drop_nulls("period").unique()
+                 .join(missing, on=["ticker", "period"], how="left")
+                 .with_columns([pl.col("success").fill_null(True),
+                                pl.col("period").str.slice(0, 4).cast(pl.Int32).alias("year")]))
+
+def _agg(rows: pl.DataFrame, units: pl.DataFrame, by: List[str]) -> pl.DataFrame:
+    files = rows.group_by(by).agg([
+        pl.col("ticker").filter(pl.col("files") > 0).drop_nulls().n_unique().alias("tickers"),
+        pl.col("files").sum(),
+        pl.col("parquet").sum().alias("parquet_files"),
+        pl.col("bytes").sum(),
+        pl.col("tmp").sum().alias("tmp_files"),
+        pl.col("oldest_ns").min(),
+        pl.col("newest_ns").max(),
+    ])
+    cov = units.group_by(by).agg([
+        pl.col("ticker").n_unique().alias("_cov_tickers"),
+        pl.len().alias("units"),
+        (~pl.col("success")).sum().alias("units_no_success"),
+        pl.col("period").min().alias("first_period"),
+        pl.col("period").max().alias("last_period"),
+    ])
+    # Full join: años cubiertos solo por un compactado por ticker (sin ficheros de ese año)
+    counts = ["files", "parquet_files", "bytes", "tmp_files", "units", "units_no_success"]
+    return (files.join(cov, on=by, how="full", coalesce=True)
+                 .with_columns([pl.col(c).fill_null(0) for c in counts])
+                 .with_columns([pl.max_horizontal(pl.col("tickers").fill_null(0),
+                                                  pl.col("_cov_tickers").fill_null(0)).alias("tickers"),
+                                (pl.col("bytes") / 1024**3).alias("gb"),
+                                pl.from_epoch("oldest_ns", time_unit="ns").alias("oldest_file"),
+                                pl.from_epoch("newest_ns", time_unit="ns").alias("newest_file")])
+                 .drop(["oldest_ns", "newest_ns", "_cov_tickers"]))
+
+def store_stats(name: str, root: Path, kind: str, rows: pl.DataFrame, now_ns: int,
+                recent_hours: float) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    """(fila del store, filas por año) a partir de las filas de unidad"""
+    rows = _with_partitions(rows).with_columns(pl.lit(name).alias("store"))
+    units = coverage_units(rows).with_columns(pl.lit(name).alias("store"))
+    recent = rows.filter(pl.col("newest_ns") >= now_ns - int(recent_hours * 3600e9))
+    summary = _agg(rows, units, ["store"]).with_columns([
+        pl.lit(kind).alias("kind"),
+        pl.lit(root_key(root)).alias("root"),
+        pl.lit(COVERAGE_LEVEL.get(kind), dtype=pl.Utf8).alias("unit"),
+        # Tickers con ficheros escritos en las últimas recent_hours (descargas en curso)
+        pl.lit(recent["ticker"].drop_nulls().n_unique()).alias("tickers_recent"),
+    ])
+    years = _agg(rows.filter(pl.col("year").is_not_null()), units, ["store", "year"]).sort("year")
+    return summary, years
+
+# --------------------------------------------------------------------------
+# Informe
+# --------------------------------------------------------------------------
+
+def _md_table(df: pl.DataFrame, columns: List[Tuple[str, str, str]]) -> List[str]:
+    """Tabla markdown: columns = (columna, cabecera, formato)"""
+    lines = ["| " + " | ".join(h for _, h, _ in columns) + " |",
+             "|" + "|".join("---:" if f else "---" for _, _, f in columns) + "|"]
+    for row in df.iter_rows(named=True):
+        cells = []
+        for col, _, f in columns:
+            v = row[col]
+            cells.append("" if v is None else (format(v, f) if f else str(v)))
+        lines.append("| " + " | ".join(cells) + " |")
+    return lines
+
+def write_report(path: Path, summary: pl.DataFrame, years: pl.DataFrame, elapsed: float) -> None:
+    lines = [
+        "# Auditoría de stores",
+        "",
+        f"Generado: {dt.datetime.now():%Y-%m-%d %H:%M:%S} ({elapsed:.1f}s, audit_store.py)",
+        "",
+        f"Total: {summary['files'].sum():,} ficheros, {format_size(summary['bytes'].sum())}",
+        "",
+        "## Stores",
+        "",
+    ]
+    s = summary.with_columns([pl.col("oldest_file").dt.strftime("%Y-%m-%d %H:%M"),
+                              pl.col("newest_file").dt.strftime("%Y-%m-%d %H:%M")])
+    lines += _md_table(s, [("store", "Store", ""), ("kind", "Tipo", ""), ("tickers", "Tickers", ","),
+                           ("files", "Ficheros", ","), ("gb", "GB", ",.2f"), ("unit", "Unidad", ""),
+                           ("units", "Cobertura", ","), ("units_no_success", "Sin _SUCCESS", ","),
+                           ("first_period", "Desde", ""), ("last_period", "Hasta", ""),
+                           ("tmp_files", ".tmp", ","), ("tickers_recent", "Tickers recientes", ","),
+                           ("newest_file", "Último fichero", "")])
+    for store in summary["store"].to_list():
+        y = years.filter(pl.col("store") == store)
+        if y.height == 0:
+            continue
+        lines += ["", f"## {store}", "", f"`{summary.filter(pl.col('store') == store)['root'][0]}`", ""]
+        lines += _md_table(y, [("year", "Año", ""), ("tickers", "Tickers", ","), ("files", "Ficheros", ","),
+                               ("gb", "GB", ",.2f"), ("units", "Cobertura", ","),
+                               ("units_no_success", "Sin _SUCCESS", ",")])
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+def parse_stores(specs: List[str], parents: List[str]) -> List[Tuple[str, Path, str]]:
+    """(nombre, raíz, tipo) de --store NOMBRE=RUTA[:TIPO] y de los subdirectorios de --parent"""
+    out = []
+    for spec in specs:
+        name, _, rest = spec.partition("=")
+        path, kind = rest, None
+        head, sep, tail = rest.rpartition(":")
+        if sep and tail in KINDS:
+            path, kind = head, tail
+        out.append((name, Path(path), kind or store_kind(name)))
+    for parent in parents:
+        try:
+            with os.scandir(parent) as it:
+                subdirs = sorted(e.name for e in it if e.is_dir() and not e.name.startswith(("_", ".")))
+        except OSError as e:
+            log(f"  WARNING: {parent}: {e}")
+            continue
+        out.extend((n, Path(parent) / n, store_kind(n)) for n in subdirs)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Auditoría incremental de los stores (tamaño, ficheros y cobertura)")
+    ap.add_argument("--store", action="append", default=[],
+                    help="NOMBRE=RUTA[:TIPO] (tipo: " + ", ".join(KINDS) + "; por defecto según el nombre)")
+    ap.add_argument("--parent", action="append", default=[],
+                    help="Directorio cuyos subdirectorios son stores (p.ej. C:/TSIS_Data)")
+    ap.add_argument("--out-dir", default=os.getenv("TSIS_AUDIT_DIR", "audit_store"),
+                    help="Salida y caché (default: TSIS_AUDIT_DIR o ./audit_store)")
+    ap.add_argument("--workers", type=int, default=16, help="Threads de listado (por ticker)")
+    ap.add_argument("--full", action="store_true", help="Ignorar la caché y listarlo todo")
+    ap.add_argument("--settle-hours", type=float, default=SETTLE_HOURS,
+                    help="Unidades con ficheros más recientes se vuelven a listar en la siguiente pasada")
+    ap.add_argument("--recent-hours", type=float, default=24.0,
+                    help="Ventana para 'tickers recientes' (descargas en curso)")
+    args = ap.parse_args()
+
+    stores = parse_stores(args.store, args.parent)
+    if not stores:
+        ap.error("indica al menos un --store o --parent")
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    log("=" * 80)
+    log(f"AUDITORÍA DE STORES ({len(stores)} stores, {args.workers} workers{', completa' if args.full else ''})")
+    log("=" * 80)
+    t0 = time.time()
+    now_ns = time.time_ns()
+    summaries, years = [], []
+    for name, root, kind in stores:
+        if not root.is_dir():
+            log(f"  {name}: {root} no existe")
+            continue
+        dirs = scan_store(name, root, kind, out_dir, args.workers, args.full, args.settle_hours)
+        s, y = store_stats(name, root, kind, dirs, now_ns, args.recent_hours)
+        summaries.append(s)
+        years.append(y)
+    if not summaries:
+        log("Nada que auditar")
+        sys.exit(1)
+
+    cols = ["store", "kind", "root", "tickers", "files", "parquet_files", "bytes", "gb", "tmp_files",
+            "unit", "units", "units_no_success", "first_period", "last_period",
+            "oldest_file", "newest_file", "tickers_recent"]
+    summary = pl.concat([s.select(cols) for s in summaries], how="vertical_relaxed")
+    year_df = pl.concat([y.select(["store", "year"] + cols[3:9] + cols[10:16]) for y in years],
+                        how="vertical_relaxed")
+    elapsed = time.time() - t0
+    summary.write_parquet(out_dir / SUMMARY_FILE, compression="zstd")
+    year_df.write_parquet(out_dir / YEARS_FILE, compression="zstd")
+    write_report(out_dir / REPORT_FILE, summary, year_df, elapsed)
+
+    log("")
+    for row in summary.iter_rows(named=True):
+        cov = f"{row['units']:,} {row['unit']}" if row["unit"] else "-"
+        log(f"  {row['store']:<32} {row['tickers']:>7,} tickers {row['files']:>11,} ficheros "
+            f"{row['gb']:>9.2f} GB  {cov}")
+    log("")
+    log(f"Salida en {out_dir}: {SUMMARY_FILE}, {YEARS_FILE}, {REPORT_FILE} ({elapsed:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,8 @@ import polars as pl
 import argparse
 from datetime import date, timedelta
 
+from hive_layout import ticker_dir as hive_ticker_dir
+
 def daterange(start, end):
     cur = start
     while cur <= end:
@@ -53,7 +55,7 @@ def main():
         checked_tickers += 1
         first_day = date.fromisoformat(first_day_str)
 
-        ticker_dir = OUTDIR / ticker
+        ticker_dir = hive_ticker_dir(OUTDIR, ticker)  # TICKER/ o ticker=TICKER/
         if not ticker_dir.exists():
             rows.append({
                 "ticker": ticker,
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_store_query.py - Benchmark de store_query.load() frente a los loaders a mano
+
+Compara sobre el mismo (dataset, tickers, rango, columnas):
+  manual_polars    rutas construidas a mano + pl.read_parquet fichero a fichero
+                   (verify_all_intraday_1m.py, show_trading_days.py, ...)
+  manual_pyarrow   ds.dataset(TICKER, partitioning='hive') por ticker
+                   (patrón de load_multiple_tickers del antiguo audit_polygon_data_v2.py)
+  load_polars      store_query.load(engine="polars"), poda por scandir
+  load_catalog     store_query.load(engine="polars"), poda por catálogo (si existe)
+  load_duckdb      store_query.load(engine="duckdb")
+
+Uso:
+    python scripts/utils/bench_store_query.py --dataset ohlcv_1m \
+        --root D:/TSIS_SmallCaps/raw/polygon/ohlcv_intraday_1m \
+        --tickers 50 --start 2024-01-01 --end 2024-03-31 --columns ticker date c v --repeat 3
+
+    # Store de trades sintético con layout antiguo (month=5, day=DD) junto al
+    # actual (month=05, day=YYYY-MM-DD): polars y duckdb deben devolver las
+    # mismas filas y ninguna con date nula
+    python scripts/utils/bench_store_query.py --dataset trades --legacy-layout \
+        --start 2024-05-01 --end 2024-05-31
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import datetime as dt
+
+import polars as pl
+
+from store_query import DATASETS, dataset_root, load
+from dataset_catalog import default_catalog_dir
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def manual_polars(dataset, root, tickers, start, end, columns):
+    """Loader típico del repo: glob por ticker, read_parquet entero, filtro en memoria"""
+    spec = DATASETS[dataset]
+    pattern = "/".join(["year=*", "month=*", "day=*"][:len(spec["levels"])]) + "/*.parquet"
+    names = set(spec["files"] or [])
+    dfs = []
+    for ticker in tickers:
+        for f in sorted((root / ticker).glob(pattern)):
+            if names and f.name not in names:
+                continue
+            df = pl.read_parquet(f)
+            if df.width == 0:
+                continue
+            if "ticker" not in df.columns:
+                df = df.with_columns(pl.lit(ticker).alias("ticker"))
+            if spec["date_col"] in df.columns:
+                d = df[spec["date_col"]].cast(pl.Utf8)
+                df = df.filter((d >= start) & (d <= end))
+            else:
+                day = f.parent.name[4:]
+                day = day if len(day) == 10 else f"{f.parents[2].name[5:]}-{f.parents[1].name[6:].zfill(2)}-{day}"
+                if not start <= day <= end:
+                    continue
+            dfs.append(df.select(columns) if columns else df)
+    return pl.concat(dfs, how="diagonal_relaxed") if dfs else pl.DataFrame()
+
+def manual_pyarrow(dataset, root, tickers, start, end, columns):
+    """Un ds.dataset hive por ticker, filtro por year/month y fecha en memoria"""
+    import pyarrow.dataset as ds
+
+    spec = DATASETS[dataset]
+    y0, y1 = int(start[:4]), int(end[:4])
+    names = set(spec["files"] or [])
+    dfs = []
+    for ticker in tickers:
+        path = root / ticker
+        if not path.exists():
+            continue
+        files = [str(f) for f in path.rglob("*.parquet") if not names or f.name in names]
+        files = [f for f in files if os.path.getsize(f) > 0]
+        if not files:
+            continue
+        dataset_ = ds.dataset(files, format="parquet", partitioning="hive",
+                              partition_base_dir=str(path), exclude_invalid_files=True)
+        table = dataset_.to_table(filter=(ds.field("year") >= y0) & (ds.field("year") <= y1))
+        if table.num_rows == 0:
+            continue
+        df = pl.from_arrow(table).drop([c for c in ("year", "month", "day") if c in table.column_names
+                                        and c not in (columns or [])])
+        if "ticker" not in df.columns:
+            df = df.with_columns(pl.lit(ticker).alias("ticker"))
+        if spec["date_col"] in df.columns:
+            d = df[spec["date_col"]].cast(pl.Utf8)
+            df = df.filter((d >= start) & (d <= end))
+        dfs.append(df.select(columns) if columns else df)
+    return pl.concat(dfs, how="diagonal_relaxed") if dfs else pl.DataFrame()
+
+def make_legacy_store(root, start, end, rows=1000):
+    """
+    Ticks sintéticos: LEGA con month=5/day=DD (layout antiguo) y CURR con
+    month=05/day=YYYY-MM-DD, un fichero market.parquet por día laborable
+    """
+    d0, d1 = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+    day = d0
+    while day <= d1:
+        if day.weekday() < 5:
+            t0 = int(dt.datetime(day.year, day.month, day.day, 14, 30, tzinfo=dt.timezone.utc).timestamp()) * 10**9
+            df = pl.DataFrame({"t": [t0 + i * 10**6 for i in range(rows)], "p": [1.0] * rows, "s": [100] * rows})
+            for ticker, month, name in (("LEGA", str(day.month), f"day={day.day:02d}"),
+                                        ("CURR", f"{day.month:02d}", f"day={day.isoformat()}")):
+                out = root / ticker / f"year={day.year}" / f"month={month}" / name
+                out.mkdir(parents=True, exist_ok=True)
+                df.write_parquet(out / "market.parquet")
+        day += dt.timedelta(days=1)
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark store_query.load() vs loaders a mano")
+    ap.add_argument("--dataset", required=True, choices=sorted(DATASETS))
+    ap.add_argument("--root", help="Raíz del store (default: TSIS_ROOT_<DATASET> / DEFAULT_ROOTS)")
+    ap.add_argument("--tickers", type=int, default=50, help="Nº de tickers aleatorios del store")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--columns", nargs="*", default=None)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--skip", nargs="*", default=[], help="Métodos a omitir (p.ej. manual_pyarrow)")
+    ap.add_argument("--legacy-layout", action="store_true",
+                    help="Store de ticks sintético en un directorio temporal con month=5 y month=05 "
+                         "(comprueba que la fecha derivada de la ruta no se pierde)")
+    args = ap.parse_args()
+
+    root = dataset_root(args.dataset, args.root)
+    if args.legacy_layout:
+        if DATASETS[args.dataset]["compact_level"] != "month":
+            ap.error("--legacy-layout solo aplica a ticks (trades, quotes)")
+        root = dataset_root(args.dataset, tempfile.mkdtemp(prefix="bench_store_query_"))
+        make_legacy_store(root, args.start, args.end)
+        # Los loaders a mano no derivan date de la ruta
+        args.skip = list(args.skip) + ["manual_polars", "manual_pyarrow"]
+        args.columns = args.columns or ["ticker", "date", "t", "p", "s"]
+    all_tickers = sorted(e.name for e in os.scandir(root) if e.is_dir() and not e.name.startswith(("_", ".")))
+    random.seed(args.seed)
+    tickers = sorted(random.sample(all_tickers, min(args.tickers, len(all_tickers))))
+    columns = args.columns or None
+
+    print("=" * 80)
+    print(f"BENCHMARK store_query - {args.dataset} | {len(tickers)} tickers | {args.start} -> {args.end}")
+    print(f"Root: {root} | columnas: {columns or 'todas'}")
+    print("=" * 80)
+
+    methods = {
+        "manual_polars": lambda: manual_polars(args.dataset, root, tickers, args.start, args.end, columns),
+        "manual_pyarrow": lambda: manual_pyarrow(args.dataset, root, tickers, args.start, args.end, columns),
+        "load_polars": lambda: load(args.dataset, tickers, args.start, args.end, columns, root=root,
+                                    catalog_dir=root / "_no_catalog"),
+        "load_duckdb": lambda: load(args.dataset, tickers, args.start, args.end, columns, root=root,
+                                    catalog_dir=root / "_no_catalog", engine="duckdb"),
+    }
+    if default_catalog_dir(root).exists():
+        methods["load_catalog"] = lambda: load(args.dataset, tickers, args.start, args.end, columns, root=root)
+
+    results = []
+    for name, fn in methods.items():
+        if name in args.skip:
+            continue
+        times, rows = [], None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            df = fn()
+            times.append(time.perf_counter() - t0)
+            rows = df.height
+            if "date" in df.columns and df["date"].null_count():
+                log(f"AVISO: {name} devuelve {df['date'].null_count():,} filas con date nula")
+                rows = -1
+        results.append({"method": name, "rows": rows, "best_s": min(times),
+                        "median_s": sorted(times)[len(times) // 2]})
+        log(f"{name:<15} {rows:>12,} filas | mejor {min(times):.3f}s")
+
+    df = pl.DataFrame(results)
+    base = df.filter(pl.col("method") == "manual_polars")["best_s"]
+    if base.len():
+        df = df.with_columns((base[0] / pl.col("best_s")).round(1).alias("speedup"))
+    print()
+    print(df)
+    if df["rows"].n_unique() > 1:
+        log("AVISO: los métodos no devuelven el mismo número de filas")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_write_profiles.py - Benchmark de opciones de escritura parquet por dataset
+
+Escribe datos representativos de cada dataset con una matriz de opciones
+    codec (snappy / lz4 / zstd) x nivel zstd x row group x diccionario x estadísticas
+y mide por combinación:
+    write_s / write_mb_s   escritura de todos los ficheros de la muestra
+    bytes / ratio          tamaño en disco y ratio frente a Arrow en memoria
+    read_s                 lectura completa (pl.read_parquet por fichero)
+    pred_s                 lectura con predicado de tiempo (~10% central de
+                           cada fichero) y proyección; aquí pesan row groups
+                           y estadísticas
+
+Datos: sintéticos con la forma de cada store (ficheros de ticker-año en
+daily, ticker-mes en 1m, ticker-día en trades / quotes) y, con --sample N,
+N ficheros reales del store (catálogo si existe, si no os.scandir).
+
+Elección: por dataset, la combinación de menor
+    score = w_bytes * bytes / min + w_write * write_s / min + w_pred * pred_s / min
+(--weights, default 2 0.5 1: el tamaño manda en un store de varios TB y los
+ingestores esperan a la API, no al disco). --from-csv repite la elección
+con otros pesos sobre un --report-csv anterior sin volver a medir. Sin
+estadísticas no hay poda por row group en store_query ni min/max en el
+catálogo (parquet_stats tendría que leer la columna), así que solo compiten
+combinaciones con estadísticas salvo --allow-no-stats. Trades y quotes se
+miden y emiten siempre con el layout de ventanas de tiempo (LAYOUT: índice de
+páginas y páginas de 64 KiB, ver tick_window.py). --emit escribe / actualiza write_profiles.json (lo que leen
+todos los writers vía write_profiles.py) con un perfil con nombre por
+dataset; los datasets no medidos conservan su entrada.
+
+Uso:
+    python scripts/utils/bench_write_profiles.py --datasets trades quotes --sample 20 \
+        --report-csv bench_write.csv
+    python scripts/utils/bench_write_profiles.py --emit scripts/utils/write_profiles.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import itertools
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from store_query import DATASETS, dataset_root
+from dataset_catalog import default_catalog_dir, iter_files, read_catalog
+from write_profiles import DEFAULT_PROFILE, config_path, write_options
+
+CODECS = ["snappy", "lz4", "zstd"]
+ZSTD_LEVELS = [1, 3, 6]
+ROW_GROUPS = [64 * 1024, 256 * 1024, 1024 * 1024]
+
+# Opciones fijas por dataset (no entran en la matriz)
+LAYOUT = {
+    "trades": {"page_index": True, "page_size": 64 * 1024},
+    "quotes": {"page_index": True, "page_size": 64 * 1024},
+}
+
+# Columna para el predicado de tiempo (epoch) y proyección de la lectura filtrada
+READ_SPEC = {
+    "ohlcv_daily": {"time_col": "t", "columns": ["date", "c", "v"]},
+    "ohlcv_1m": {"time_col": "t", "columns": ["t", "c", "v"]},
+    "trades": {"time_col": "t", "columns": ["t", "p", "s"]},
+    "quotes": {"time_col": "timestamp", "columns": ["timestamp", "bid_price", "ask_price"]},
+}
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+# ----------------------------------------------------------------------
+# Datos sintéticos
+# ----------------------------------------------------------------------
+
+def _walk_prices(rng: np.random.Generator, n: int, start: float, vol: float, tick: float = 0.01) -> np.ndarray:
+    p = start * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    return np.maximum(np.round(p / tick) * tick, tick)
+
+def _bars(rng: np.random.Generator, t: np.ndarray, start: float, vol: float) -> pl.DataFrame:
+    n = len(t)
+    c = _walk_prices(rng, n, start, vol, 0.0001)
+    o = np.concatenate([[start], c[:-1]])
+    spread = np.abs(rng.normal(0, vol, n)) * c
+    v = np.round(rng.lognormal(9, 1.5, n))
+    return pl.DataFrame({
+        "t": t.astype(np.int64),
+        "o": o, "h": np.maximum(o, c) + spread, "l": np.maximum(np.minimum(o, c) - spread, 0.0001), "c": c,
+        "v": v, "n": np.maximum(v // 150, 1).astype(np.int64), "vw": (o + c) / 2,
+    })
+
+def synthetic_daily(rng: np.random.Generator, files: int) -> List[pl.DataFrame]:
+    """Un fichero por ticker-año (~252 sesiones)"""
+    days = np.array([d for d in np.arange(np.datetime64("2023-01-02"), np.datetime64("2024-01-01"))
+                     if np.is_busday(d)])
+    t = days.astype("datetime64[ms]").astype(np.int64)
+    out = []
+    for i in range(files):
+        df = _bars(rng, t, rng.uniform(1, 20), 0.05)
+        out.append(df.with_columns([pl.lit(f"T{i:04d}").alias("ticker"),
+                                    pl.Series("date", days.astype(str))]))
+    return out
+
+def synthetic_1m(rng: np.random.Generator, files: int) -> List[pl.DataFrame]:
+    """Un fichero por ticker-mes (04:00-20:00 ET, minutos con actividad)"""
+    days = np.array([d for d in np.arange(np.datetime64("2024-03-01"), np.datetime64("2024-04-01"))
+                     if np.is_busday(d)])
+    out = []
+    for _ in range(files):
+        minutes = []
+        for d in days:
+            base = d.astype("datetime64[ms]").astype(np.int64) + 8 * 3_600_000
+            m = np.sort(rng.choice(960, size=int(rng.integers(200, 960)), replace=False))
+            minutes.append(base + m * 60_000)
+        t = np.concatenate(minutes)
+        df = _bars(rng, t, rng.uniform(1, 20), 0.002)
+        out.append(df.with_columns(
+            pl.from_epoch(pl.col("t"), time_unit="ms").dt.strftime("%Y-%m-%d").alias("date")))
+    return out
+
+def synthetic_trades(rng: np.random.Generator, files: int) -> List[pl.DataFrame]:
+    """Un fichero por ticker-día de sesión regular"""
+    out = []
+    for _ in range(files):
+        n = int(rng.integers(50_000, 300_000))
+        start = np.datetime64("2024-03-04T14:30").astype("datetime64[ns]").astype(np.int64)
+        t = start + np.sort(rng.integers(0, 6 * 3600 * 10**9 + 30 * 60 * 10**9, n))
+        sizes = np.where(rng.random(n) < 0.6, rng.integers(1, 100, n), rng.integers(1, 50, n) * 100)
+        conds = [None if x > 0.3 else [int(rng.choice([12, 37, 41]))] for x in rng.random(n)]
+        out.append(pl.DataFrame({
+            "t": t.astype(np.int64),
+            "p": _walk_prices(rng, n, rng.uniform(1, 20), 0.0005, 0.0001),
+            "s": sizes.astype(np.int64),
+            "c": pl.Series("c", conds, dtype=pl.List(pl.Int64)),
+            "i": rng.choice([4, 8, 10, 11, 12, 15, 19, 21], n).astype(np.int64),
+        }))
+    return out
+
+def synthetic_quotes(rng: np.random.Generator, files: int) -> List[pl.DataFrame]:
+    """Un fichero por ticker-día (NBBO de todas las sesiones)"""
+    out = []
+    for _ in range(files):
+        n = int(rng.integers(200_000, 600_000))
+        start = np.datetime64("2024-03-04T09:00").astype("datetime64[ns]").astype(np.int64)
+        ts = start + np.sort(rng.integers(0, 16 * 3600 * 10**9, n))
+        mid = _walk_prices(rng, n, rng.uniform(1, 20), 0.0003, 0.0001)
+        half = np.round(np.abs(rng.normal(0.01, 0.01, n)), 2) + 0.005
+        out.append(pl.DataFrame({
+            "timestamp": ts.astype(np.int64),
+            "participant_timestamp": (ts - rng.integers(1000, 500_000, n)).astype(np.int64),
+            "sequence_number": np.arange(n, dtype=np.int64) * 7 + 1,
+            "bid_price": np.round(mid - half, 4), "ask_price": np.round(mid + half, 4),
+            "bid_size": (rng.integers(1, 50, n) * 100).astype(np.int64),
+            "ask_size": (rng.integers(1, 50, n) * 100).astype(np.int64),
+            "bid_exchange": rng.choice([4, 8, 11, 12, 19], n).astype(np.int64),
+            "ask_exchange": rng.choice([4, 8, 11, 12, 19], n).astype(np.int64),
+            "tape": np.full(n, 3, dtype=np.int64),
+        }))
+    return out
+
+SYNTHETIC = {
+    "ohlcv_daily": (synthetic_daily, 300),
+    "ohlcv_1m": (synthetic_1m, 40),
+    "trades": (synthetic_trades, 12),
+    "quotes": (synthetic_quotes, 6),
+}
+
+def sample_real(dataset: str, root: Path, n: int, seed: int) -> List[pl.DataFrame]:
+    """n ficheros del store (solo sueltos: los compactados no son la unidad de escritura)"""
+    names = set(DATASETS[dataset]["files"] or ["premarket.parquet", "market.parquet", "afterhours.parquet"])
+    catalog_dir = default_catalog_dir(root)
+    if catalog_dir.exists():
+        paths = [str(root / p) for p in read_catalog(catalog_dir, dataset, root)
+                 .filter(pl.col("file").is_in(list(names)) & (pl.col("rows") > 0))
+                 .select("path").collect()["path"].to_list()]
+    else:
+        paths = []
+        for p in iter_files(root):
+            if os.path.basename(p) in names:
+                paths.append(p)
+                if len(paths) >= 50 * n:
+                    break
+    random.seed(seed)
+    out = []
+    for p in random.sample(paths, min(n, len(paths))):
+        try:
+            df = pl.read_parquet(p)
+        except Exception as e:
+            log(f"  {p}: {e}")
+            continue
+        if df.height:
+            out.append(df)
+    return out
+
+# ----------------------------------------------------------------------
+# Medición
+# ----------------------------------------------------------------------
+
+def matrix(codecs: Sequence[str], levels: Sequence[int], row_groups: Sequence[int],
+           dictionary: Sequence[bool], statistics: Sequence[bool]) -> List[Dict]:
+    combos = []
+    for codec in codecs:
+        for level in (levels if codec == "zstd" else [None]):
+            for rg, d, s in itertools.product(row_groups, dictionary, statistics):
+                combos.append({"compression": codec, "compression_level": level, "row_group_size": rg,
+                               "dictionary": d, "statistics": s})
+    return combos
+
+def profile_key(p: Dict) -> str:
+    codec = f"{p['compression']}{p['compression_level'] or ''}"
+    return (f"{codec}-rg{p['row_group_size'] // 1024}k-{'dict' if p['dictionary'] else 'nodict'}"
+            f"-{'stats' if p['statistics'] else 'nostats'}{'-pidx' if p.get('page_index') else ''}")
+
+def _window(frames: List[pl.DataFrame], col: str) -> List[tuple]:
+    """~10% central del rango de tiempo de cada fichero"""
+    out = []
+    for df in frames:
+        lo, hi = df[col].min(), df[col].max()
+        span = hi - lo
+        out.append((lo + int(span * 0.45), lo + int(span * 0.55)))
+    return out
+
+def measure(dataset: str, frames: List[pl.DataFrame], combo: Dict, workdir: Path,
+            repeat: int, page_checksum: bool) -> Dict:
+    spec = READ_SPEC[dataset]
+    tables = [df.to_arrow() for df in frames]
+    mem_bytes = sum(t.nbytes for t in tables)
+    combo = {**combo, **LAYOUT.get(dataset, {})}
+    opts = write_options({**DEFAULT_PROFILE, **combo, "page_checksum": page_checksum})
+    windows = _window(frames, spec["time_col"])
+    columns = [c for c in spec["columns"] if c in frames[0].columns]
+
+    write_s, read_s, pred_s = [], [], []
+    size = 0
+    for r in range(repeat):
+        d = workdir / f"r{r}"
+        d.mkdir(parents=True, exist_ok=True)
+        paths = [str(d / f"f{i:05d}.parquet") for i in range(len(tables))]
+        t0 = time.perf_counter()
+        for table, path in zip(tables, paths):
+            pq.write_table(table, path, **opts)
+        write_s.append(time.perf_counter() - t0)
+        size = sum(os.path.getsize(p) for p in paths)
+
+        t0 = time.perf_counter()
+        for path in paths:
+            pl.read_parquet(path)
+        read_s.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        for path, (lo, hi) in zip(paths, windows):
+            (pl.scan_parquet(path)
+               .filter(pl.col(spec["time_col"]).is_between(lo, hi))
+               .select(columns)
+               .collect())
+        pred_s.append(time.perf_counter() - t0)
+        shutil.rmtree(d, ignore_errors=True)
+
+    return {
+        "dataset": dataset, "profile": profile_key(combo),
+        **{k: combo[k] for k in ("compression", "compression_level", "row_group_size", "dictionary", "statistics")},
+        "files": len(frames), "rows": sum(df.height for df in frames),
+        "bytes": size, "ratio": round(mem_bytes / max(size, 1), 2),
+        "write_s": min(write_s), "write_mb_s": round(mem_bytes / 1024**2 / max(min(write_s), 1e-9), 1),
+        "read_s": min(read_s), "pred_s": min(pred_s),
+    }
+
+def choose(df: pl.DataFrame, weights: Sequence[float], allow_no_stats: bool = False) -> pl.DataFrame:
+    """Combinaciones ordenadas por score dentro de cada dataset (la primera es la elegida)"""
+    wb, ww, wp = weights
+    if not allow_no_stats:
+        df = df.filter(pl.col("statistics"))
+    return (
+        df.with_columns(
+            (wb * pl.col("bytes") / pl.col("bytes").min().over("dataset")
+             + ww * pl.col("write_s") / pl.col("write_s").min().over("dataset")
+             + wp * pl.col("pred_s") / pl.col("pred_s").min().over("dataset")).round(3).alias("score"))
+          .sort(["dataset", "score"])
+    )
+
+def emit(path: Path, best: pl.DataFrame, page_checksum: bool) -> None:
+    """Actualiza el JSON de perfiles (los datasets no medidos se conservan)"""
+    try:
+        config = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        config = {}
+    profiles = config.setdefault("profiles", {})
+    datasets = config.setdefault("datasets", {})
+    if "default" not in datasets:
+        name = profile_key(DEFAULT_PROFILE)
+        profiles.setdefault(name, dict(DEFAULT_PROFILE))
+        datasets["default"] = name
+    for r in best.iter_rows(named=True):
+        name = r["profile"]
+        profiles[name] = {"compression": r["compression"], "compression_level": r["compression_level"],
+                          "row_group_size": r["row_group_size"], "dictionary": r["dictionary"],
+                          "statistics": r["statistics"], "page_checksum": page_checksum,
+                          **LAYOUT.get(r["dataset"], {})}
+        datasets[r["dataset"]] = name
+    # Perfiles que ya no usa ningún dataset
+    config["profiles"] = {k: v for k, v in sorted(profiles.items()) if k in datasets.values()}
+    config["generated_by"] = f"bench_write_profiles.py {dt.datetime.now():%Y-%m-%d}"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(config, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+def finish(results: pl.DataFrame, args) -> int:
+    """Ranking por dataset, resumen y --emit"""
+    df = choose(results, args.weights, args.allow_no_stats)
+    best = df.group_by("dataset", maintain_order=True).first()
+    with pl.Config(tbl_rows=40, tbl_cols=12, tbl_width_chars=160):
+        for dataset in df["dataset"].unique(maintain_order=True):
+            print()
+            print(df.filter(pl.col("dataset") == dataset)
+                    .select(["profile", "bytes", "ratio", "write_mb_s", "read_s", "pred_s", "score"]).head(8))
+        print()
+        print(best.select(["dataset", "profile", "bytes", "write_mb_s", "pred_s", "score"]))
+    if args.emit:
+        emit(Path(args.emit), best, not args.no_page_checksum)
+        log(f"Perfiles: {args.emit}")
+    return 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de opciones de escritura parquet por dataset")
+    ap.add_argument("--datasets", nargs="*", default=sorted(READ_SPEC), choices=sorted(READ_SPEC))
+    ap.add_argument("--sample", type=int, default=0, help="Además, N ficheros reales por dataset")
+    ap.add_argument("--root", action="append", default=[], metavar="DATASET=PATH",
+                    help="Raíz de un store para --sample (default: TSIS_ROOT_<DATASET> / DEFAULT_ROOTS)")
+    ap.add_argument("--no-synthetic", action="store_true", help="Solo datos reales (--sample)")
+    ap.add_argument("--codecs", nargs="*", default=CODECS)
+    ap.add_argument("--levels", nargs="*", type=int, default=ZSTD_LEVELS, help="Niveles zstd")
+    ap.add_argument("--row-groups", nargs="*", type=int, default=ROW_GROUPS)
+    ap.add_argument("--dictionary", nargs="*", type=int, default=[1, 0], help="1 = diccionario, 0 = sin")
+    ap.add_argument("--statistics", nargs="*", type=int, default=[1, 0], help="1 = estadísticas, 0 = sin")
+    ap.add_argument("--no-page-checksum", action="store_true", help="Perfiles sin CRC de página")
+    ap.add_argument("--weights", nargs=3, type=float, default=[2.0, 0.5, 1.0],
+                    metavar=("BYTES", "WRITE", "PRED"), help="Pesos del score (default: 2 0.5 1)")
+    ap.add_argument("--from-csv", help="Elegir sobre un --report-csv anterior (sin medir)")
+    ap.add_argument("--allow-no-stats", action="store_true",
+                    help="Permitir elegir perfiles sin estadísticas de columna")
+    ap.add_argument("--repeat", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workdir", help="Directorio temporal (mismo disco que el store para medir E/S real)")
+    ap.add_argument("--report-csv", help="CSV con todas las combinaciones")
+    ap.add_argument("--emit", nargs="?", const=str(config_path()), default=None,
+                    help=f"Escribir los perfiles elegidos (default: {config_path()})")
+    args = ap.parse_args()
+
+    if args.from_csv:
+        return finish(pl.read_csv(args.from_csv), args)
+
+    roots = dict(r.split("=", 1) for r in args.root)
+    combos = matrix(args.codecs, args.levels, args.row_groups,
+                    [bool(x) for x in args.dictionary], [bool(x) for x in args.statistics])
+    page_checksum = not args.no_page_checksum
+    rng = np.random.default_rng(args.seed)
+
+    print("=" * 80)
+    print(f"BENCHMARK ESCRITURA PARQUET | {', '.join(args.datasets)} | {len(combos)} combinaciones")
+    print("=" * 80)
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_write_", dir=args.workdir))
+    results = []
+    try:
+        for dataset in args.datasets:
+            frames = []
+            if not args.no_synthetic:
+                fn, files = SYNTHETIC[dataset]
+                frames.extend(fn(rng, files))
+            if args.sample:
+                root = dataset_root(dataset, roots.get(dataset))
+                real = sample_real(dataset, root, args.sample, args.seed) if root.exists() else []
+                log(f"{dataset}: {len(real)} ficheros reales de {root}")
+                frames.extend(real)
+            if not frames:
+                log(f"{dataset}: sin datos, se omite")
+                continue
+            # Mismo esquema en todos los ficheros (sintéticos + reales pueden diferir)
+            common = [c for c in frames[0].columns if all(c in f.columns for f in frames)]
+            frames = [f.select(common) for f in frames]
+            log(f"{dataset}: {len(frames)} ficheros, {sum(f.height for f in frames):,} filas")
+            for i, combo in enumerate(combos, 1):
+                results.append(measure(dataset, frames, combo, workdir / dataset, args.repeat, page_checksum))
+                if i % 20 == 0:
+                    log(f"  {i}/{len(combos)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if not results:
+        return 1
+    if args.report_csv:
+        pl.DataFrame(results).write_csv(args.report_csv)
+        log(f"Reporte: {args.report_csv}")
+    return finish(pl.DataFrame(results), args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+compact_small_files.py - Compactación de ficheros pequeños en los stores Hive
+
+Los stores acumulan millones de ficheros de pocos KB (un daily.parquet por
+ticker-año, un minute.parquet por ticker-mes, tres sesiones por ticker-día en
+trades). Este servicio los fusiona en ficheros de tamaño objetivo:
+
+    ohlcv_daily   TICKER/year=*/daily.parquet          -> TICKER/daily.parquet
+    ohlcv_1m      TICKER/year=*/month=*/minute.parquet -> TICKER/minute.parquet
+    trades        .../month=MM/day=*/{sesión}.parquet  -> .../month=MM/trades.parquet
+                  (+ columnas date y session)
+    quotes        .../month=MM/day=*/quotes.parquet    -> .../month=MM/quotes.parquet
+                  (idem nbbo*.parquet; + columna date)
+
+- Orden: barras por fecha / timestamp, ticks por timestamp
+- Dedupe: barras por clave (date / t; gana el fichero más reciente);
+  ticks por día (day=DD y day=YYYY-MM-DD del mismo día: gana el más reciente)
+- Swap atómico: se escribe a .tmp, se comprueba que ninguna fuente cambió
+  durante la lectura (tamaño + mtime), os.replace y solo entonces se borran
+  las fuentes. En ticks, _COMPACTED.json del mes lista los días fusionados
+  (store_query los ignora aunque sigan en disco; la siguiente pasada los borra)
+- Convivencia con ingesta en curso: solo días completos (_SUCCESS en trades,
+  sin _parts) y ficheros con más de --min-age-hours; el mes en curso nunca
+  se compacta. Los ingestores de ticks (ingest_trades_ticks,
+  ingest_missing_ticks, download_quotes_ultra_fast) no re-descargan los días
+  del manifest
+- Throttle: --workers procesos y --max-mb-per-s de E/S en total
+- Unidades que ya superan --target-mb se dejan como están
+
+Lectores que entienden el layout compactado: store_query.load/scan (y el
+catálogo), daily_panel, minute_cache, volume_sketch, audit_store,
+repair_planner, verify_minute_vs_daily, verify_daily_download,
+verify_daily_vs_ping, verify_all_intraday_1m, show_trading_days,
+show_intraday_1m_days, resample_intraday_sessions, generate_quotes_dates,
+identify_high_priority_quotes, quotes_phased_strategy,
+verify_intraday_improved, compact_quotes_nbbo, sign_trades y los ingestores
+(ingest_intraday_ultra_fast no re-descarga los meses de TICKER/minute.parquet).
+Cualquier script nuevo con glob de year=*/... no ve los datos compactados:
+debe pasar por store_query (resolve_files / packed_files / compacted_days)
+antes de usarse sobre un store compactado.
+
+Uso:
+    python scripts/utils/compact_small_files.py --dataset trades \
+        --root C:/TSIS_Data/trades_ticks_2019_2025 --workers 4 --max-mb-per-s 200
+    python scripts/utils/compact_small_files.py --dataset ohlcv_daily --dry-run
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing as mp
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+from store_query import DATASETS, MANIFEST, compact_names, dataset_root, read_manifest
+from dataset_catalog import CatalogWriter, default_catalog_dir
+from hive_layout import ticker_dir, ticker_names
+from write_profiles import write_parquet
+
+TARGET_MB = 256
+MIN_AGE_HOURS = 6
+TICKERS_PER_TASK = 20
+
+Source = Tuple[str, int, int]  # path, bytes, mtime_ns
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def _scandir(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []
+
+def _source(path: str) -> Optional[Source]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_size, st.st_mtime_ns)
+
+def _unchanged(sources: Sequence[Source]) -> bool:
+    return all(_source(p) == (p, b, m) for p, b, m in sources)
+
+def _write_manifest(month_dir: Path, manifest: Dict) -> None:
+    target = month_dir / MANIFEST
+    tmp = target.with_name(MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, target)
+
+def _normalize(df: pl.DataFrame, dataset: str) -> pl.DataFrame:
+    renames = {old: new for old, new in DATASETS[dataset]["aliases"].items()
+               if old in df.columns and new not in df.columns}
+    return df.rename(renames) if renames else df
+
+def _time_col(df: pl.DataFrame, dataset: str) -> Optional[str]:
+    spec = DATASETS[dataset]
+    for c in (spec["time_col"], *spec["aliases"], "t", "timestamp"):
+        if c and c in df.columns:
+            return c
+    return None
+
+def _result(ticker: str, unit: str, status: str, before: Sequence[Source] = (),
+            after: Sequence[str] = (), rows: int = 0, removed: Sequence[str] = ()) -> Dict:
+    return {"ticker": ticker, "unit": unit, "status": status,
+            "files_before": len(before), "bytes_before": sum(b for _, b, _ in before),
+            "files_after": len(after), "bytes_after": sum(os.path.getsize(p) for p in after if os.path.exists(p)),
+            "rows": rows, "written": list(after), "removed": list(removed)}
+
+# --------------------------------------------------------------------------
+# Barras: un fichero por ticker
+# --------------------------------------------------------------------------
+
+def _bar_sources(ticker_dir: str, levels: Sequence[str], name: str) -> List[Source]:
+    out = []
+    for y in _scandir(ticker_dir):
+        if not (y.is_dir() and y.name.startswith("year=")):
+            continue
+        dirs = [y.path] if len(levels) == 1 else \
+            [m.path for m in _scandir(y.path) if m.is_dir() and m.name.startswith("month=")]
+        for d in dirs:
+            src = _source(os.path.join(d, name))
+            if src:
+                out.append(src)
+    return sorted(out)
+
+def compact_bars(dataset: str, root: Path, ticker: str, cutoff_ns: int, target_bytes: int,
+                 dry_run: bool) -> List[Dict]:
+    spec = DATASETS[dataset]
+    name = spec["files"][0]
+    base = ticker_dir(root, ticker)
+    target = base / name
+    packed = _source(str(target))
+    loose = _bar_sources(str(base), spec["levels"], name)
+    if not loose:
+        return []
+    recent = [s for s in loose if s[2] > cutoff_ns]
+    loose = [s for s in loose if s[2] <= cutoff_ns]
+    sources = ([packed] if packed else []) + loose
+    if len(sources) < 2:
+        return [_result(ticker, ticker, "reciente" if recent else "sin_cambios")]
+    if sum(b for _, b, _ in sources) > target_bytes:
+        return [_result(ticker, ticker, "grande", sources)]
+    if dry_run:
+        return [_result(ticker, ticker, "dry_run", sources)]
+
+    # Compactado primero: los sueltos (más nuevos) ganan en el dedupe
+    frames = [_normalize(pl.read_parquet(p), dataset) for p, _, _ in sources]
+    frames = [f for f in frames if f.width]
+    if not frames:
+        return [_result(ticker, ticker, "sin_cambios")]
+    if len({tuple(sorted(f.columns)) for f in frames}) > 1:
+        return [_result(ticker, ticker, "esquema", sources)]
+    cols = frames[0].columns
+    df = pl.concat([f.select(cols) for f in frames], how="vertical_relaxed")
+    key = spec["key"]
+    order = [c for c in (key, spec["time_col"]) if c and c in df.columns]
+    df = df.unique(subset=[key], keep="last", maintain_order=True).sort(order)
+
+    tmp = target.with_name(target.name + ".tmp")
+    write_parquet(df, tmp, dataset)
+    if not _unchanged(sources):
+        tmp.unlink(missing_ok=True)
+        return [_result(ticker, ticker, "cambiado", sources)]
+    os.replace(tmp, target)
+
+    removed = []
+    for p, _, _ in loose:
+        Path(p).unlink(missing_ok=True)
+        removed.append(p)
+        # year= / month= vacíos
+        for d in list(Path(p).parents)[:len(spec["levels"])]:
+            try:
+                d.rmdir()
+            except OSError:
+                break
+    return [_result(ticker, ticker, "compactado", sources, [str(target)], df.height, removed)]
+
+# --------------------------------------------------------------------------
+# Ticks: un fichero por ticker-mes (y nombre de fichero)
+# --------------------------------------------------------------------------
+
+def _day_complete(dataset: str, entries: List[os.DirEntry]) -> bool:
+    names = {e.name for e in entries}
+    if "_parts" in names:
+        return False
+    if dataset == "trades":
+        return "_SUCCESS" in names
+    return "quotes.parquet" in names
+
+def _tick_days(dataset: str, month_dir: str, year: int, month: int,
+               cutoff_ns: int) -> Tuple[Dict[str, Tuple[str, List[Source]]], List[str], int]:
+    """
+    Días fusionables del mes: {fecha: (day_dir, ficheros)}, day_dirs duplicados
+    (mismo día con el otro formato, más antiguo) y nº de días aún no fusionables
+    """
+    candidates: Dict[str, List[Tuple[int, str, List[Source]]]] = {}
+    pending = 0
+    for d in _scandir(month_dir):
+        if not (d.is_dir() and d.name.startswith("day=")):
+            continue
+        try:
+            iso = dt.date(year, month, int(d.name[-2:])).isoformat()
+        except ValueError:
+            continue
+        entries = _scandir(d.path)
+        files = [_source(e.path) for e in entries
+                 if e.is_file() and e.name.endswith(".parquet") and not e.name.startswith(("_", "."))]
+        files = [f for f in files if f]
+        newest = max((m for _, _, m in files), default=0)
+        if not _day_complete(dataset, entries) or newest > cutoff_ns:
+            pending += 1
+            continue
+        candidates.setdefault(iso, []).append((newest, d.path, files))
+    days, stale = {}, []
+    for iso, found in candidates.items():
+        found.sort()
+        _, path, files = found[-1]
+        days[iso] = (path, files)
+        stale.extend(p for _, p, _ in found[:-1])
+    return days, stale, pending
+
+def _read_day(dataset: str, iso: str, files: List[Source]) -> Dict[str, pl.DataFrame]:
+    """Frames de un día por fichero de salida (trades: sesiones -> trades.parquet)"""
+    out: Dict[str, List[pl.DataFrame]] = {}
+    for path, _, _ in files:
+        df = pl.read_parquet(path)
+        if not df.width:
+            continue  # día vacío escrito como parquet sin columnas
+        df = _normalize(df, dataset)
+        stem = Path(path).stem
+        if dataset == "trades":
+            df = df.with_columns(pl.lit(stem).alias("session"))
+            name = compact_names(dataset, None)[0]
+        else:
+            name = Path(path).name
+        out.setdefault(name, []).append(df.with_columns(pl.lit(iso).alias("date")))
+    return {n: pl.concat(f, how="diagonal_relaxed") for n, f in out.items()}
+
+def compact_month(dataset: str, ticker: str, month_dir: Path, year: int, month: int, cutoff_ns: int,
+                  target_bytes: int, dry_run: bool) -> Optional[Dict]:
+    unit = f"{year:04d}-{month:02d}"
+    manifest = read_manifest(month_dir)
+    done = set(manifest.get("days", []))
+    days, stale, pending = _tick_days(dataset, str(month_dir), year, month, cutoff_ns)
+
+    # Restos de una pasada anterior interrumpida (días ya fusionados aún en
+    # disco) y duplicados day=DD / day=YYYY-MM-DD más antiguos: se borran
+    obsolete = [path for iso, (path, _) in days.items() if iso in done] + stale
+    obsolete_sources = [s for p in obsolete for s in (_source(e.path) for e in _scandir(p)) if s]
+    days = {iso: v for iso, v in days.items() if iso not in done}
+
+    loose = [s for _, files in days.values() for s in files]
+    # Sin ganancia si cada fichero suelto acabaría en su propio fichero de mes
+    outputs = {compact_names(dataset, [Path(p).name])[0] for p, _, _ in loose}
+    # Ficheros de mes ya compactados, incluidos los derivados que otros jobs
+    # escriben directamente a nivel de mes (nbbo*.parquet de compact_quotes_nbbo)
+    names = set(manifest.get("files", [])) | (outputs if done else set())
+    packed = {n: _source(str(month_dir / n)) for n in names}
+    packed = {n: s for n, s in packed.items() if s}
+    if not days or (len(loose) <= len(outputs) and not packed):
+        if obsolete and not dry_run:
+            for p in obsolete:
+                shutil.rmtree(p, ignore_errors=True)
+            return _result(ticker, unit, "limpieza", obsolete_sources,
+                           removed=[s[0] for s in obsolete_sources])
+        return _result(ticker, unit, "pendiente") if pending else None
+    sources = list(packed.values()) + loose
+    if sum(b for _, b, _ in sources) > target_bytes:
+        return _result(ticker, unit, "grande", sources)
+    if dry_run:
+        return _result(ticker, unit, "dry_run", sources + obsolete_sources)
+
+    new: Dict[str, List[pl.DataFrame]] = {}
+    day_rows = {}
+    for iso in sorted(days):
+        for name, df in _read_day(dataset, iso, days[iso][1]).items():
+            new.setdefault(name, []).append(df)
+            if name == compact_names(dataset, DATASETS[dataset]["files"])[0]:
+                day_rows[iso] = df.height
+        day_rows.setdefault(iso, 0)
+
+    written, tmps = [], []
+    for name in sorted(set(new) | set(packed)):
+        frames = new.get(name, [])
+        if name in packed:
+            # Días re-fusionados sustituyen a los del fichero compactado
+            old = pl.read_parquet(packed[name][0]).filter(~pl.col("date").is_in(list(day_rows)))
+            frames = [old] + frames
+        df = pl.concat(frames, how="diagonal_relaxed")
+        tcol = _time_col(df, dataset)
+        df = df.sort(["date", tcol] if tcol else ["date"], maintain_order=True)
+        tmp = month_dir / f"{name}.tmp"
+        write_parquet(df, tmp, dataset)
+        tmps.append((tmp, month_dir / name))
+    if not _unchanged(sources):
+        for tmp, _ in tmps:
+            tmp.unlink(missing_ok=True)
+        return _result(ticker, unit, "cambiado", sources)
+
+    for tmp, target in tmps:
+        os.replace(tmp, target)
+        written.append(str(target))
+    manifest = {
+        "dataset": dataset,
+        "files": sorted(Path(p).name for p in written),
+        "days": sorted(done | set(day_rows)),
+        "rows": {**manifest.get("rows", {}), **day_rows},
+        "updated_at": dt.datetime.now().isoformat(timespec="seconds"),
+    }
+    _write_manifest(month_dir, manifest)
+
+    for p in [path for path, _ in days.values()] + obsolete:
+        shutil.rmtree(p, ignore_errors=True)
+    return _result(ticker, unit, "compactado", sources + obsolete_sources, written,
+                   sum(day_rows.values()), [s[0] for s in loose + obsolete_sources])
+
+def compact_ticks(dataset: str, root: Path, ticker: str, cutoff_ns: int, target_bytes: int,
+                  dry_run: bool) -> List[Dict]:
+    today = dt.date.today()
+    out = []
+    for y in _scandir(str(ticker_dir(root, ticker))):
+        if not (y.is_dir() and y.name.startswith("year=")):
+            continue
+        for m in _scandir(y.path):
+            if not (m.is_dir() and m.name.startswith("month=")):
+                continue
+            try:
+                year, month = int(y.name[5:]), int(m.name[6:])
+            except ValueError:
+                continue
+            if (year, month) >= (today.year, today.month):
+                continue  # mes en curso: la ingesta sigue escribiendo
+            r = compact_month(dataset, ticker, Path(m.path), year, month, cutoff_ns, target_bytes, dry_run)
+            if r:
+                out.append(r)
+    return out
+
+# --------------------------------------------------------------------------
+
+def compact_tickers(dataset: str, root: str, tickers: List[str], cutoff_ns: int, target_bytes: int,
+                    bytes_per_s: float, dry_run: bool) -> List[Dict]:
+    """Worker: compacta un lote de tickers respetando su cuota de MB/s"""
+    fn = compact_bars if DATASETS[dataset]["compact_level"] == "ticker" else compact_ticks
+    out = []
+    for ticker in tickers:
+        t0 = time.monotonic()
+        try:
+            results = fn(dataset, Path(root), ticker, cutoff_ns, target_bytes, dry_run)
+        except Exception as e:
+            results = [_result(ticker, ticker, f"error: {e!r}")]
+        out.extend(results)
+        if bytes_per_s and not dry_run:
+            moved = sum(r["bytes_before"] + r["bytes_after"] for r in results if r["status"] == "compactado")
+            wait = moved / bytes_per_s - (time.monotonic() - t0)
+            if wait > 0:
+                time.sleep(wait)
+    return out
+
+def report(df: pl.DataFrame, elapsed: float) -> None:
+    by_status = df.group_by("status").agg([pl.len().alias("units"), pl.col("files_before").sum(),
+                                           pl.col("bytes_before").sum()]).sort("status")
+    print()
+    print(by_status)
+    done = df.filter(pl.col("status").is_in(["compactado", "limpieza"]))
+    fb, bb = int(done["files_before"].sum() or 0), int(done["bytes_before"].sum() or 0)
+    fa, ba = int(done["files_after"].sum() or 0), int(done["bytes_after"].sum() or 0)
+    print()
+    print("=" * 80)
+    print(f"Unidades compactadas: {done.height:,}")
+    print(f"Ficheros: {fb:,} -> {fa:,}" + (f" ({fb / fa:.1f}x menos)" if fa else ""))
+    print(f"Bytes:    {bb / 1e6:,.1f} MB -> {ba / 1e6:,.1f} MB")
+    print(f"Tiempo:   {elapsed:.1f}s" + (f" | {(bb + ba) / 1e6 / elapsed:.1f} MB/s" if elapsed else ""))
+    print("=" * 80)
+
+def main():
+    ap = argparse.ArgumentParser(description="Compactación de ficheros pequeños en los stores Hive")
+    ap.add_argument("--dataset", required=True, choices=sorted(DATASETS))
+    ap.add_argument("--root", help="Raíz del store (default: TSIS_ROOT_<DATASET> / DEFAULT_ROOTS)")
+    ap.add_argument("--tickers", nargs="*", help="Solo estos tickers (default: todos)")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--max-mb-per-s", type=float, default=0,
+                    help="Límite de E/S (lectura + escritura) entre todos los workers (0 = sin límite)")
+    ap.add_argument("--target-mb", type=float, default=TARGET_MB,
+                    help=f"Unidades que ya superan este tamaño no se tocan (default: {TARGET_MB})")
+    ap.add_argument("--min-age-hours", type=float, default=MIN_AGE_HOURS,
+                    help=f"Ignorar ficheros modificados hace menos de N horas (default: {MIN_AGE_HOURS})")
+    ap.add_argument("--dry-run", action="store_true", help="Solo listar lo que se compactaría")
+    ap.add_argument("--report-csv", help="CSV con el resultado por unidad")
+    ap.add_argument("--catalog-dir", help="Catálogo a actualizar (default: TSIS_CATALOG_DIR o <root>/_catalog si existe)")
+    ap.add_argument("--no-catalog", action="store_true", help="No actualizar el catálogo")
+    args = ap.parse_args()
+
+    root = dataset_root(args.dataset, args.root)
+    tickers = args.tickers or ticker_names(root)
+    cutoff_ns = time.time_ns() - int(args.min_age_hours * 3600 * 1e9)
+    target_bytes = int(args.target_mb * 1024 * 1024)
+    bytes_per_s = args.max_mb_per_s * 1024 * 1024 / max(args.workers, 1)
+
+    catalog = None
+    catalog_dir = Path(args.catalog_dir) if args.catalog_dir else default_catalog_dir(root)
+    if not args.no_catalog and not args.dry_run and catalog_dir.exists():
+        catalog = CatalogWriter(catalog_dir, args.dataset, root, run_id=f"compact-{os.getpid()}", checksum=False)
+
+    print("=" * 80)
+    print(f"COMPACTACIÓN {args.dataset} | {len(tickers):,} tickers | {root}")
+    print(f"workers={args.workers} | max {args.max_mb_per_s or '-'} MB/s | target {args.target_mb} MB | "
+          f"min-age {args.min_age_hours} h" + (" | DRY RUN" if args.dry_run else ""))
+    print("=" * 80)
+
+    t0 = time.time()
+    results: List[Dict] = []
+    batches = [tickers[i:i + TICKERS_PER_TASK] for i in range(0, len(tickers), TICKERS_PER_TASK)]
+
+    def collect(batch_results: List[Dict]) -> None:
+        results.extend(batch_results)
+        if catalog is not None:
+            for r in batch_results:
+                for p in r["removed"]:
+                    catalog.forget(p)
+                for p in r["written"]:
+                    catalog.record(p)
+
+    if args.workers > 1 and len(batches) > 1:
+        # 'spawn': fork con polars ya inicializado puede bloquearse
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as ex:
+            futures = [ex.submit(compact_tickers, args.dataset, str(root), b, cutoff_ns, target_bytes,
+                                 bytes_per_s, args.dry_run) for b in batches]
+            for i, fut in enumerate(as_completed(futures), 1):
+                collect(fut.result())
+                if i % 50 == 0:
+                    log(f"  {i * TICKERS_PER_TASK:,}/{len(tickers):,} tickers")
+    else:
+        for b in batches:
+            collect(compact_tickers(args.dataset, str(root), b, cutoff_ns, target_bytes,
+                                    bytes_per_s, args.dry_run))
+    if catalog is not None:
+        catalog.close()
+
+    if not results:
+        log("Nada que compactar")
+        return 0
+    df = pl.DataFrame(results).drop(["written", "removed"])
+    errors = df.filter(pl.col("status").str.starts_with("error"))
+    for row in errors.head(20).iter_rows(named=True):
+        log(f"  {row['ticker']} {row['unit']}: {row['status']}")
+    report(df, time.time() - t0)
+    if args.report_csv:
+        df.write_csv(args.report_csv)
+        log(f"Reporte: {args.report_csv}")
+    return 1 if errors.height else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
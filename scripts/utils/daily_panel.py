@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+daily_panel.py - Panel diario transversal particionado por mes
+
+El store daily está particionado por ticker (TICKER/year=YYYY/daily.parquet):
+cualquier pregunta transversal (top gappers de un día, percentiles de volumen
+del universo, umbrales de quotes_phased_strategy.py) abre miles de ficheros.
+El panel guarda los mismos datos transpuestos, todos los tickers por mes:
+
+    panel_dir/year=YYYY/month=MM/panel.parquet   ticker, date, t, o, h, l, c, v, n, vw
+                                                 (orden ticker, date; ticker y date
+                                                 con dictionary encoding)
+    panel_dir/_tickers.parquet                   ticker, signature, min_date, max_date, rows
+
+Construcción (transposición en paralelo, memoria acotada):
+  1. Stage: cada worker lee un lote de tickers (store_query.load) y escribe un
+     fichero por mes en _staging/month=YYYY-MM/
+  2. Merge: cada worker reescribe un mes = panel actual sin los tickers
+     recalculados + ficheros de staging de ese mes
+
+update() es incremental: la firma de un ticker es el hash de (ruta, bytes,
+mtime) de sus ficheros daily (del catálogo si existe, si no os.scandir); solo
+se re-transponen los tickers con firma nueva, y solo se reescriben los meses
+que tocan. _tickers.parquet se escribe al final: una actualización
+interrumpida se repite entera en la siguiente.
+
+Uso:
+    panel = DailyPanel(panel_dir)
+    panel.update(daily_root, workers=8)
+    df = panel.load("2024-05-17", "2024-05-17", columns=["ticker", "o", "c", "v"])
+    top = panel.top_gappers("2024-05-17", n=20)
+
+CLI:
+    python scripts/utils/daily_panel.py --daily-root D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily update --workers 8
+    python scripts/utils/daily_panel.py --daily-root D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily gappers --date 2024-05-17
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import multiprocessing as mp
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from store_query import DateLike, _as_date, load as load_store
+from dataset_catalog import default_catalog_dir, read_catalog
+from hive_layout import ticker_dir, ticker_names
+
+PANEL_FILE = "panel.parquet"
+STATE_FILE = "_tickers.parquet"
+STAGING_DIR = "_staging"
+LOCK_FILE = "_update.lock"
+
+PANEL_SCHEMA = {"ticker": pl.Utf8, "date": pl.Utf8, "t": pl.Int64, "o": pl.Float64, "h": pl.Float64,
+                "l": pl.Float64, "c": pl.Float64, "v": pl.Float64, "n": pl.Int64, "vw": pl.Float64}
+STATE_SCHEMA = {"ticker": pl.Utf8, "signature": pl.Utf8, "min_date": pl.Utf8,
+                "max_date": pl.Utf8, "rows": pl.Int64}
+
+TICKERS_PER_TASK = 200
+ROW_GROUP_ROWS = 256_000
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def default_panel_dir(daily_root: Union[str, Path]) -> Path:
+    """TSIS_DAILY_PANEL_DIR o <daily_root>/../daily_panel"""
+    env = os.getenv("TSIS_DAILY_PANEL_DIR")
+    return Path(env) if env else Path(daily_root).parent / "daily_panel"
+
+def _months(min_date: str, max_date: str) -> List[str]:
+    """YYYY-MM de cada mes entre dos fechas (inclusive)"""
+    y, m = int(min_date[:4]), int(min_date[5:7])
+    y1, m1 = int(max_date[:4]), int(max_date[5:7])
+    out = []
+    while (y, m) <= (y1, m1):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+def _month_file(panel_dir: Path, month: str) -> Path:
+    return panel_dir / f"year={month[:4]}" / f"month={month[5:7]}" / PANEL_FILE
+
+# --------------------------------------------------------------------------
+# Firmas de los ficheros fuente
+# --------------------------------------------------------------------------
+
+def _walk_sources(daily_root: Path) -> List[Tuple[str, str, int, int]]:
+    """(ticker, path, bytes, mtime_ns) de cada daily.parquet (suelto o compactado)"""
+    def one(ticker: str) -> List[Tuple[str, str, int, int]]:
+        out = []
+        base = ticker_dir(daily_root, ticker)
+        candidates = [base / "daily.parquet"]
+        try:
+            with os.scandir(base) as it:
+                candidates += [Path(e.path) / "daily.parquet" for e in it
+                               if e.is_dir() and e.name.startswith("year=")]
+        except OSError:
+            return out
+        for f in candidates:
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            out.append((ticker, os.path.relpath(f, daily_root).replace("\\", "/"), st.st_size, st.st_mtime_ns))
+        return out
+
+    tickers = ticker_names(daily_root)
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        return [row for rows in ex.map(one, tickers) for row in rows]
+
+def source_signatures(daily_root: Union[str, Path],
+                      catalog_dir: Optional[Union[str, Path]] = None) -> pl.DataFrame:
+    """ticker, signature: hash de (ruta, bytes, mtime) de los ficheros daily del ticker"""
+    daily_root = Path(daily_root)
+    cdir = Path(catalog_dir) if catalog_dir else default_catalog_dir(daily_root)
+    files = None
+    if cdir.exists():
+        files = (read_catalog(cdir, root=daily_root)
+                   .filter(pl.col("file") == "daily.parquet")
+                   .select(["ticker", "path", "bytes", "mtime_ns"]).collect())
+        files = files if files.height else None
+    if files is None:
+        files = pl.DataFrame(_walk_sources(daily_root), orient="row",
+                             schema={"ticker": pl.Utf8, "path": pl.Utf8, "bytes": pl.Int64, "mtime_ns": pl.Int64})
+    grouped = (
+        files.with_columns(pl.format("{}:{}:{}", "path", "bytes", "mtime_ns").alias("_sig"))
+             .group_by("ticker").agg(pl.col("_sig").sort())
+    )
+    return pl.DataFrame(
+        [(t, hashlib.blake2b("|".join(sig).encode(), digest_size=8).hexdigest())
+         for t, sig in grouped.iter_rows()],
+        schema={"ticker": pl.Utf8, "signature": pl.Utf8}, orient="row",
+    )
+
+# --------------------------------------------------------------------------
+# Workers de la transposición
+# --------------------------------------------------------------------------
+
+def _to_panel(df: pl.DataFrame) -> pl.DataFrame:
+    """Columnas y tipos del panel (el store mezcla Utf8/Date en date e int/float en v)"""
+    if df.is_empty():
+        return pl.DataFrame(schema=PANEL_SCHEMA)
+    def col(c: str, dtype) -> pl.Expr:
+        if c not in df.columns:
+            return pl.lit(None, dtype=dtype).alias(c)
+        if c == "date":
+            return pl.col(c).cast(pl.Utf8).str.slice(0, 10)
+        return pl.col(c).cast(dtype, strict=False)
+
+    return (
+        df.select([col(c, dtype) for c, dtype in PANEL_SCHEMA.items()])
+        .drop_nulls(["ticker", "date"])
+        .unique(subset=["ticker", "date"], keep="last", maintain_order=True)
+    )
+
+def _stage_tickers(daily_root: str, tickers: List[str], staging: str, batch: int,
+                   catalog_dir: Optional[str]) -> List[Dict]:
+    """Stage: lee un lote de tickers y lo reparte en un fichero por mes"""
+    df = _to_panel(load_store("ohlcv_daily", tickers, root=daily_root, catalog_dir=catalog_dir))
+    stats = (df.group_by("ticker")
+               .agg([pl.col("date").min().alias("min_date"), pl.col("date").max().alias("max_date"),
+                     pl.len().cast(pl.Int64).alias("rows")]))
+    for (month,), part in df.with_columns(pl.col("date").str.slice(0, 7).alias("_month")) \
+                            .partition_by("_month", as_dict=True).items():
+        out = Path(staging) / f"month={month}"
+        out.mkdir(parents=True, exist_ok=True)
+        part.drop("_month").write_parquet(out / f"batch-{batch:05d}.parquet", compression="lz4")
+    return stats.to_dicts()
+
+def _write_month(df: pl.DataFrame, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(PANEL_FILE + ".tmp")
+    pq.write_table(df.to_arrow(), tmp, compression="zstd", use_dictionary=["ticker", "date"],
+                   row_group_size=ROW_GROUP_ROWS, write_statistics=True)
+    os.replace(tmp, target)
+
+def _merge_month(panel_dir: str, month: str, staged: List[str], replaced: List[str]) -> int:
+    """Merge: panel del mes sin los tickers recalculados + su staging, ordenado por ticker"""
+    target = _month_file(Path(panel_dir), month)
+    frames = []
+    if target.exists():
+        frames.append(pl.read_parquet(target).filter(~pl.col("ticker").is_in(replaced)))
+    frames.extend(pl.read_parquet(f) for f in staged)
+    df = pl.concat(frames, how="vertical_relaxed").sort(["ticker", "date"]) if frames else None
+    if df is None or df.is_empty():
+        target.unlink(missing_ok=True)
+        return 0
+    _write_month(df, target)
+    return df.height
+
+def _run(fn, tasks: List[Tuple], workers: int, label: str) -> List:
+    """Ejecuta fn(*task) por tarea, en procesos si hay más de una tarea y workers > 1"""
+    if workers <= 1 or len(tasks) <= 1:
+        return [fn(*t) for t in tasks]
+    out = []
+    # 'spawn': fork con polars ya inicializado puede bloquearse
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as ex:
+        futures = [ex.submit(fn, *t) for t in tasks]
+        for i, fut in enumerate(futures, 1):
+            out.append(fut.result())
+            if i % 50 == 0:
+                log(f"  {label} {i:,}/{len(futures):,}")
+    return out
+
+# --------------------------------------------------------------------------
+
+class DailyPanel:
+    def __init__(self, panel_dir: Union[str, Path]):
+        self.root = Path(panel_dir)
+        f = self.root / STATE_FILE
+        self.state = pl.read_parquet(f) if f.exists() else pl.DataFrame(schema=STATE_SCHEMA)
+
+    def _lock(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock = self.root / LOCK_FILE
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Lock huérfano de más de 6 horas: se libera
+            if time.time() - lock.stat().st_mtime < 6 * 3600:
+                raise RuntimeError(f"Actualización del panel en curso ({lock})")
+            lock.unlink(missing_ok=True)
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        return lock
+
+    def update(self, daily_root: Union[str, Path], workers: int = 1,
+               catalog_dir: Optional[Union[str, Path]] = None, full: bool = False) -> int:
+        """Re-transpone los tickers nuevos, modificados o borrados; devuelve cuántos"""
+        daily_root = Path(daily_root)
+        sources = source_signatures(daily_root, catalog_dir)
+        old = self.state if not full else self.state.clear()
+        changed = sources.join(old.select(["ticker", "signature"]), on=["ticker", "signature"], how="anti")
+        removed = old.join(sources.select("ticker"), on="ticker", how="anti")
+        if changed.height == 0 and removed.height == 0:
+            return 0
+
+        lock = self._lock()
+        staging = self.root / STAGING_DIR
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            if full:
+                for d in self.root.glob("year=*"):
+                    shutil.rmtree(d, ignore_errors=True)
+            tickers = changed["ticker"].sort().to_list()
+            batches = [tickers[i:i + TICKERS_PER_TASK] for i in range(0, len(tickers), TICKERS_PER_TASK)]
+            cdir = str(catalog_dir) if catalog_dir else None
+            log(f"Panel: {len(tickers):,} tickers a transponer, {removed.height:,} eliminados "
+                f"({len(batches)} lotes)")
+
+            stats: List[Dict] = []
+            for out in _run(_stage_tickers, [(str(daily_root), b, str(staging), i, cdir)
+                                             for i, b in enumerate(batches)], workers, "stage"):
+                stats.extend(out)
+
+            # Meses a reescribir: los del staging + los que cubrían antes los tickers tocados
+            staged: Dict[str, List[str]] = {}
+            for d in staging.glob("month=*"):
+                staged[d.name[6:]] = sorted(str(f) for f in d.glob("*.parquet"))
+            touched = pl.concat([changed.select("ticker"), removed.select("ticker")])
+            affected = old.join(touched, on="ticker", how="semi").drop_nulls(["min_date", "max_date"])
+            months: Set[str] = set(staged)
+            for lo, hi in affected.select(["min_date", "max_date"]).iter_rows():
+                months.update(_months(lo, hi))
+            replaced = touched["ticker"].unique().sort().to_list()
+            rows = sum(_run(_merge_month, [(str(self.root), m, staged.get(m, []), replaced)
+                                           for m in sorted(months)], workers, "merge"))
+            log(f"Panel: {len(months):,} meses reescritos ({rows:,} filas)")
+
+            stats_schema = {k: v for k, v in STATE_SCHEMA.items() if k != "signature"}
+            new = (changed.join(pl.DataFrame(stats, schema=stats_schema), on="ticker", how="left")
+                          .select(list(STATE_SCHEMA)))
+            self.state = pl.concat([old.join(touched, on="ticker", how="anti"), new]).sort("ticker")
+            f = self.root / STATE_FILE
+            tmp = f.with_name(STATE_FILE + ".tmp")
+            self.state.write_parquet(tmp, compression="zstd")
+            os.replace(tmp, f)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            lock.unlink(missing_ok=True)
+        return len(tickers) + removed.height
+
+    def files(self, start: DateLike = None, end: DateLike = None) -> List[str]:
+        """panel.parquet de los meses que cortan [start, end]"""
+        d0 = _as_date(start, dt.date(1900, 1, 1))
+        d1 = _as_date(end, dt.date(2999, 12, 31))
+        out = []
+        for y in sorted(self.root.glob("year=*")):
+            try:
+                year = int(y.name[5:])
+            except ValueError:
+                continue
+            if not d0.year <= year <= d1.year:
+                continue
+            for m in sorted(y.glob("month=*")):
+                try:
+                    month = int(m.name[6:])
+                except ValueError:
+                    continue
+                f = m / PANEL_FILE
+                if (d0.year, d0.month) <= (year, month) <= (d1.year, d1.month) and f.exists():
+                    out.append(str(f))
+        return out
+
+    def scan(self, start: DateLike = None, end: DateLike = None, columns: Optional[Sequence[str]] = None,
+             tickers: Optional[Sequence[str]] = None) -> pl.LazyFrame:
+        files = self.files(start, end)
+        if not files:
+            return pl.LazyFrame(schema={c: PANEL_SCHEMA[c] for c in (columns or PANEL_SCHEMA)})
+        lf = pl.scan_parquet(files, hive_partitioning=False)
+        if start is not None:
+            lf = lf.filter(pl.col("date") >= _as_date(start, None).isoformat())
+        if end is not None:
+            lf = lf.filter(pl.col("date") <= _as_date(end, None).isoformat())
+        if tickers is not None:
+            lf = lf.filter(pl.col("ticker").is_in(list(tickers)))
+        return lf.select(list(columns)) if columns else lf
+
+    def load(self, start: DateLike = None, end: DateLike = None, columns: Optional[Sequence[str]] = None,
+             tickers: Optional[Sequence[str]] = None) -> pl.DataFrame:
+        return self.scan(start, end, columns, tickers).collect()
+
+    def top_gappers(self, date: DateLike, n: int = 20, min_price: float = 0.0,
+                    lookback_days: int = 10) -> pl.DataFrame:
+        """Top n por gap (apertura vs cierre previo del ticker) en una fecha"""
+        day = _as_date(date, None)
+        df = self.scan(day - dt.timedelta(days=lookback_days), day, ["ticker", "date", "o", "c", "v"])
+        return (
+            df.sort(["ticker", "date"])
+              .with_columns(pl.col("c").shift(1).over("ticker").alias("prev_c"))
+              .filter((pl.col("date") == day.isoformat()) & (pl.col("prev_c") > 0) & (pl.col("o") >= min_price))
+              .with_columns(((pl.col("o") / pl.col("prev_c") - 1) * 100).alias("gap_pct"))
+              .sort("gap_pct", descending=True)
+              .head(n)
+              .collect()
+        )
+
+def main():
+    ap = argparse.ArgumentParser(description="Panel diario transversal particionado por mes")
+    ap.add_argument("--daily-root", required=True, help="Store daily por ticker (TICKER/year=YYYY/daily.parquet)")
+    ap.add_argument("--panel-dir", help="Directorio del panel (default: TSIS_DAILY_PANEL_DIR o <daily-root>/../daily_panel)")
+    ap.add_argument("--catalog-dir", help="Catálogo del store daily (default: TSIS_CATALOG_DIR o <daily-root>/_catalog)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    u = sub.add_parser("update", help="Construye / actualiza el panel (incremental)")
+    u.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    u.add_argument("--full", action="store_true", help="Reconstruir desde cero")
+
+    g = sub.add_parser("gappers", help="Top gappers de una fecha")
+    g.add_argument("--date", required=True)
+    g.add_argument("--top", type=int, default=20)
+    g.add_argument("--min-price", type=float, default=0.0)
+    args = ap.parse_args()
+
+    panel = DailyPanel(args.panel_dir or default_panel_dir(args.daily_root))
+    t0 = time.time()
+    if args.cmd == "update":
+        print("=" * 80)
+        print(f"PANEL DIARIO - {args.daily_root} -> {panel.root}")
+        print("=" * 80)
+        n = panel.update(args.daily_root, args.workers, args.catalog_dir, args.full)
+        log(f"Panel actualizado: {n:,} tickers en {time.time() - t0:.1f}s "
+            f"({panel.state.height:,} tickers, {len(panel.files()):,} meses)")
+    else:
+        with pl.Config(tbl_rows=args.top):
+            print(panel.top_gappers(args.date, args.top, args.min_price))
+        log(f"Consulta en {(time.time() - t0) * 1000:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,43 @@
 #!/usr/bin/env python3
 """
 Inventario completo de data descargada de Polygon
+
+Con --catalog las cifras salen del catálogo de ficheros (dataset_catalog.py)
+en vez de un rglob por carpeta; carpetas sin catalogar se recorren igual.
 """
 
-import os
+import argparse
 from pathlib import Path
 from datetime import datetime
 
-def get_folder_stats(path: Path) -> tuple:
+import polars as pl
+
+from dataset_catalog import default_catalog_dir, read_catalog
+
+def get_catalog_stats(path: Path, catalog_dir: Path = None) -> tuple:
+    """Como get_folder_stats() pero desde el catálogo; None si la carpeta no está catalogada"""
+    catalog_dir = catalog_dir or default_catalog_dir(path)
+    if not catalog_dir.exists():
+        return None
+    row = read_catalog(catalog_dir, root=path).select([
+        pl.len().alias("files"),
+        pl.col("bytes").sum(),
+        pl.col("ticker").n_unique().alias("tickers"),
+    ]).collect().row(0, named=True)
+    if row["files"] == 0:
+        return None
+    return row["files"], (row["bytes"] or 0) / (1024**3), row["tickers"]
+
+def get_folder_stats(path: Path, use_catalog: bool = False, catalog_dir: Path = None) -> tuple:
     """Obtiene estadísticas de una carpeta"""
     if not path.exists():
         return 0, 0, 0
 
+    if use_catalog:
+        stats = get_catalog_stats(path, catalog_dir)
+        if stats is not None:
+            return stats
+
     total_size = 0
     file_count = 0
     ticker_count = 0
@@ -34,6 +60,12 @@ def get_folder_stats(path: Path) -> tuple:
     return file_count, total_size / (1024**3), ticker_count
 
 def main():
+    ap = argparse.ArgumentParser(description="Inventario de data descargada de Polygon")
+    ap.add_argument("--catalog", action="store_true", help="Usar el catálogo de ficheros en vez de rglob")
+    ap.add_argument("--catalog-dir", help="Catálogo (default: TSIS_CATALOG_DIR o <carpeta>/_catalog)")
+    args = ap.parse_args()
+    catalog_dir = Path(args.catalog_dir) if args.catalog_dir else None
+
     print("=" * 90)
     print("INVENTARIO COMPLETO DE DATA POLYGON")
     print(f"Fecha: {datetime.now():%Y-%m-%d %H:%M}")
@@ -64,14 +96,15 @@ def main():
 
     for dirname, desc in c_data:
         path = Path(f"C:/TSIS_Data/{dirname}")
-        files, size, tickers = get_folder_stats(path)
+        files, size, tickers = get_folder_stats(path, args.catalog, catalog_dir)
         if files > 0 or path.exists():
             print(f"{desc:<35} {files:>12,} {size:>10.2f} GB {tickers:>10,}")
             total_c_files += files
             total_c_size += size
 
     print("-" * 90)
-    print(f"{'SUBTOTAL C:\\TSIS_Data':<35} {total_c_files:>12,} {total_c_size:>10.2f} GB")
+    label = "SUBTOTAL C:\\TSIS_Data"
+    print(f"{label:<35} {total_c_files:>12,} {total_c_size:>10.2f} GB")
 
     # ===== D:\TSIS_SmallCaps\raw\polygon =====
     print("\n" + "=" * 90)
@@ -95,14 +128,15 @@ def main():
 
     for dirname, desc in d_data:
         path = Path(f"D:/TSIS_SmallCaps/raw/polygon/{dirname}")
-        files, size, tickers = get_folder_stats(path)
+        files, size, tickers = get_folder_stats(path, args.catalog, catalog_dir)
         if files > 0 or path.exists():
             print(f"{desc:<35} {files:>12,} {size:>10.2f} GB {tickers:>10,}")
             total_d_files += files
             total_d_size += size
 
     print("-" * 90)
-    print(f"{'SUBTOTAL D:\\raw\\polygon':<35} {total_d_files:>12,} {total_d_size:>10.2f} GB")
+    label = "SUBTOTAL D:\\raw\\polygon"
+    print(f"{label:<35} {total_d_files:>12,} {total_d_size:>10.2f} GB")
 
     # ===== RESUMEN FINAL =====
     print("\n" + "=" * 90)
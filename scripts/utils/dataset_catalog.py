@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+dataset_catalog.py - Catálogo de ficheros de partición del store (una fila por fichero)
+
+Los ingestores registran cada fichero al confirmarlo (tras el os.replace) y
+las herramientas de inventario / auditoría / resume consultan el catálogo en
+vez de recorrer millones de ficheros con rglob / os.walk.
+
+Columnas:
+    dataset, root       nombre lógico y raíz absoluta del store (varios stores
+                        del mismo dataset pueden compartir catálogo)
+    path, ticker, year, month, day, file   (path relativo a root)
+    rows, bytes, mtime_ns
+    min_ts, max_ts      epoch en ns (columna t / timestamp / sip_timestamp / date)
+    schema_hash         hash de nombres + tipos de columnas
+    checksum            blake2b-64 del contenido (None si no se calculó)
+    run_id, written_at  proceso que escribió la fila
+
+Layout (mismo patrón que utils/liquidity_summary.py):
+    catalog_dir/catalog.parquet          tabla compactada (root, path únicos)
+    catalog_dir/_parts/part-*.parquet    filas añadidas por cada proceso escritor
+
+Cada proceso escribe sus propios part files, así que varios ingestores pueden
+registrar a la vez; compact() (con lock) los fusiona. read_catalog() ve tabla +
+parts pendientes, con el último valor por fichero.
+
+Ruta por defecto: variable TSIS_CATALOG_DIR o <raíz del dataset>/_catalog
+
+Uso en un ingestor:
+    catalog = CatalogWriter(default_catalog_dir(outdir), "trades", outdir)
+    ... os.replace(tmp, target)
+    catalog.record(target, df)          # stats del DataFrame aún en memoria
+    catalog.forget(old_path)            # fichero borrado / fusionado
+    catalog.close()
+
+CLI:
+    python scripts/utils/dataset_catalog.py --catalog-dir D:/catalog build --dataset trades --root D:/trades
+    python scripts/utils/dataset_catalog.py --catalog-dir D:/catalog report
+    python scripts/utils/dataset_catalog.py --catalog-dir D:/catalog compact
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import hashlib
+import argparse
+import threading
+import datetime as dt
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Union
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+TABLE_FILE = "catalog.parquet"
+PARTS_DIR = "_parts"
+LOCK_FILE = "_compact.lock"
+CATALOG_DIRNAME = "_catalog"
+
+SCHEMA = {
+    "dataset": pl.Utf8,
+    "root": pl.Utf8,
+    "path": pl.Utf8,
+    "ticker": pl.Utf8,
+    "year": pl.Int16,
+    "month": pl.Int8,
+    "day": pl.Int8,
+    "file": pl.Utf8,
+    "rows": pl.Int64,
+    "bytes": pl.Int64,
+    "mtime_ns": pl.Int64,
+    "min_ts": pl.Int64,
+    "max_ts": pl.Int64,
+    "schema_hash": pl.Utf8,
+    "checksum": pl.Utf8,
+    "run_id": pl.Utf8,
+    "written_at": pl.Utf8,
+}
+
+KEY = ["root", "path"]
+
+# Columnas de tiempo por orden de preferencia
+TS_COLUMNS = ("t", "timestamp", "sip_timestamp", "participant_timestamp", "date")
+
+_PART_RE = re.compile(r"^(year|month|day)=(.+)$")
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def default_catalog_dir(root: Union[str, Path]) -> Path:
+    """TSIS_CATALOG_DIR si está definida (un catálogo para todo), si no <root>/_catalog"""
+    env = os.getenv("TSIS_CATALOG_DIR")
+    return Path(env) if env else Path(root) / CATALOG_DIRNAME
+
+def root_key(root: Union[str, Path]) -> str:
+    """Raíz normalizada tal y como se guarda en la columna root"""
+    return Path(root).resolve().as_posix()
+
+def default_run_id() -> str:
+    return os.getenv("TSIS_RUN_ID") or f"{socket.gethostname()}-{os.getpid()}-{dt.datetime.now():%Y%m%d%H%M%S}"
+
+def parse_partition(rel_path: str) -> Dict:
+    """ticker/year=YYYY/month=MM/day=DD|YYYY-MM-DD/file -> claves de partición"""
+    parts = rel_path.replace("\\", "/").split("/")
+    # Layout Hive: ticker=X/year=...
+    ticker = parts[0][len("ticker="):] if parts[0].startswith("ticker=") else parts[0]
+    out = {"ticker": ticker if len(parts) > 1 else None, "year": None, "month": None,
+           "day": None, "file": parts[-1]}
+    for p in parts[1:-1]:
+        m = _PART_RE.match(p)
+        if not m:
+            continue
+        key, val = m.groups()
+        try:
+            out[key] = int(val[-2:]) if key == "day" else int(val)
+        except ValueError:
+            pass
+    return out
+
+def schema_hash(schema: Dict) -> str:
+    text = ";".join(f"{k}:{v}" for k, v in schema.items())
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def file_checksum(path: Union[str, Path], chunk: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _to_epoch_ns(value, dtype=None) -> Optional[int]:
+    """Normaliza un extremo de la columna de tiempo a epoch ns"""
+    if value is None:
+        return None
+    if isinstance(value, dt.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=dt.timezone.utc)
+        return int(value.timestamp() * 1_000_000) * 1000
+    if isinstance(value, dt.date):
+        return int(dt.datetime(value.year, value.month, value.day, tzinfo=dt.timezone.utc).timestamp()) * 10**9
+    if isinstance(value, str):
+        try:
+            return _to_epoch_ns(dt.date.fromisoformat(value[:10]))
+        except ValueError:
+            return None
+    v = int(value)
+    # Enteros: unidad por magnitud (s / ms / us / ns)
+    if abs(v) >= 10**17:
+        return v
+    if abs(v) >= 10**14:
+        return v * 1000
+    if abs(v) >= 10**11:
+        return v * 10**6
+    return v * 10**9
+
+def frame_stats(df: pl.DataFrame) -> Dict:
+    """rows, min_ts, max_ts, schema_hash de un DataFrame"""
+    out = {"rows": df.height, "min_ts": None, "max_ts": None, "schema_hash": schema_hash(df.schema)}
+    col = next((c for c in TS_COLUMNS if c in df.columns), None)
+    if col and df.height:
+        s = df[col]
+        out["min_ts"] = _to_epoch_ns(s.min())
+        out["max_ts"] = _to_epoch_ns(s.max())
+    return out
+
+def parquet_stats(path: Union[str, Path]) -> Dict:
+    """Como frame_stats pero solo con el footer del parquet (sin leer datos)"""
+    import pyarrow.parquet as pq
+    md = pq.ParquetFile(path).metadata
+    arrow_schema = md.schema.to_arrow_schema()
+    out = {"rows": md.num_rows, "min_ts": None, "max_ts": None,
+           "schema_hash": schema_hash(pl.from_arrow(arrow_schema.empty_table()).schema)}
+    names = arrow_schema.names
+    col = next((c for c in TS_COLUMNS if c in names), None)
+    if col is None:
+        return out
+    idx = names.index(col)
+    lo = hi = None
+    for rg in range(md.num_row_groups):
+        st = md.row_group(rg).column(idx).statistics
+        if st is None or not st.has_min_max:
+            # Sin estadísticas: leer solo esa columna
+            s = pl.read_parquet(path, columns=[col])[col]
+            return {**out, "min_ts": _to_epoch_ns(s.min()), "max_ts": _to_epoch_ns(s.max())}
+        lo = st.min if lo is None else min(lo, st.min)
+        hi = st.max if hi is None else max(hi, st.max)
+    out["min_ts"], out["max_ts"] = _to_epoch_ns(lo), _to_epoch_ns(hi)
+    return out
+
+class CatalogWriter:
+    """Registra ficheros confirmados de un dataset (part file por flush)"""
+
+    def __init__(self, catalog_dir: Union[str, Path], dataset: str, root: Union[str, Path],
+                 run_id: Optional[str] = None, checksum: bool = True, flush_every: int = 500):
+        self.catalog_dir = Path(catalog_dir)
+        self.parts_dir = self.catalog_dir / PARTS_DIR
+        self.dataset = dataset
+        self.root = Path(root)
+        self.root_key = root_key(root)
+        self.run_id = run_id or default_run_id()
+        self.checksum = checksum
+        self.flush_every = flush_every
+        self.rows: List[Dict] = []
+        self._seq = 0
+        self._lock = threading.Lock()  # ingestores que escriben desde un thread pool
+
+    def make_row(self, path: Union[str, Path], df: Optional[pl.DataFrame] = None,
+                 checksum: Optional[bool] = None) -> Dict:
+        path = Path(path)
+        st = os.stat(path)
+        rel = os.path.relpath(path, self.root).replace("\\", "/")
+        row = {"dataset": self.dataset, "root": self.root_key, "path": rel, **parse_partition(rel),
+               "bytes": st.st_size, "mtime_ns": st.st_mtime_ns,
+               "run_id": self.run_id, "written_at": dt.datetime.now().isoformat(timespec="seconds")}
+        row.update(frame_stats(df) if df is not None else parquet_stats(path))
+        do_checksum = self.checksum if checksum is None else checksum
+        row["checksum"] = file_checksum(path) if do_checksum else None
+        return row
+
+    def record(self, path: Union[str, Path], df: Optional[pl.DataFrame] = None) -> None:
+        """Registra un fichero recién confirmado (df: contenido aún en memoria)"""
+        try:
+            row = self.make_row(path, df)
+        except Exception as e:
+            # El catálogo nunca debe tumbar una descarga: build lo reconcilia después
+            log(f"catalog: no se pudo registrar {path}: {e}")
+            return
+        with self._lock:
+            self.rows.append(row)
+            full = len(self.rows) >= self.flush_every
+        if full:
+            self.flush()
+
+    def forget(self, path: Union[str, Path]) -> None:
+        """Baja de un fichero borrado (p.ej. fusionado por compact_small_files.py)"""
+        rel = os.path.relpath(Path(path), self.root).replace("\\", "/")
+        row = {"dataset": self.dataset, "root": self.root_key, "path": rel, **parse_partition(rel),
+               "rows": None, "run_id": self.run_id,
+               "written_at": dt.datetime.now().isoformat(timespec="seconds")}
+        with self._lock:
+            self.rows.append(row)
+            full = len(self.rows) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self) -> Optional[Path]:
+        with self._lock:
+            rows, self.rows = self.rows, []
+            self._seq += 1
+            seq = self._seq
+        if not rows:
+            return None
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{dt.datetime.now():%Y%m%d%H%M%S%f}-{os.getpid()}-{seq:05d}.parquet"
+        target = self.parts_dir / name
+        tmp = target.with_name(name + ".tmp")
+        pl.DataFrame(rows, schema=SCHEMA).write_parquet(tmp, compression="zstd")
+        os.replace(tmp, target)
+        return target
+
+    def close(self) -> None:
+        self.flush()
+
+def _sources(catalog_dir: Path) -> List[Path]:
+    sources = []
+    if (catalog_dir / TABLE_FILE).exists():
+        sources.append(catalog_dir / TABLE_FILE)
+    if (catalog_dir / PARTS_DIR).exists():
+        sources.extend(sorted((catalog_dir / PARTS_DIR).glob("part-*.parquet")))
+    return sources
+
+def read_catalog(catalog_dir: Union[str, Path], dataset: Optional[str] = None,
+                 root: Optional[Union[str, Path]] = None) -> pl.LazyFrame:
+    """Tabla compactada + parts pendientes (último valor por fichero)"""
+    sources = _sources(Path(catalog_dir))
+    if not sources:
+        return pl.LazyFrame(schema=SCHEMA)
+    lf = (
+        pl.concat([pl.scan_parquet(f) for f in sources], how="diagonal_relaxed")
+          .unique(subset=KEY, keep="last", maintain_order=True)
+          # rows nulo = fichero dado de baja con forget()
+          .filter(pl.col("rows").is_not_null())
+    )
+    if dataset:
+        lf = lf.filter(pl.col("dataset") == dataset)
+    if root:
+        lf = lf.filter(pl.col("root") == root_key(root))
+    return lf
+
+def compact(catalog_dir: Union[str, Path], replace_root: Optional[str] = None,
+            replacement: Optional[pl.DataFrame] = None, since: Optional[str] = None) -> int:
+    """
+    Fusiona tabla + parts y borra los parts fusionados. Con replace_root, las
+    filas de ese store se sustituyen por `replacement` (resultado de build);
+    las registradas por ingestores después de `since` se conservan.
+    """
+    catalog_dir = Path(catalog_dir)
+    catalog_dir.mkdir(parents=True, exist_ok=True)
+    lock = catalog_dir / LOCK_FILE
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Lock huérfano de más de una hora: se libera
+        if time.time() - lock.stat().st_mtime < 3600:
+            raise RuntimeError(f"Compactación en curso ({lock})")
+        lock.unlink(missing_ok=True)
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    os.close(fd)
+    try:
+        parts = sorted((catalog_dir / PARTS_DIR).glob("part-*.parquet")) \
+            if (catalog_dir / PARTS_DIR).exists() else []
+        df = read_catalog(catalog_dir).collect()
+        if replace_root is not None:
+            # Ficheros registrados durante el build ganan a la foto del crawl
+            newer = df.filter((pl.col("root") == replace_root) &
+                              (pl.col("written_at") >= (since or "9999")))
+            df = pl.concat([df.filter(pl.col("root") != replace_root),
+                            replacement.select(list(SCHEMA)).cast(SCHEMA), newer], how="vertical")
+            df = df.unique(subset=KEY, keep="last", maintain_order=True)
+        df = df.sort(["dataset", "root", "ticker", "path"])
+        table = catalog_dir / TABLE_FILE
+        tmp = table.with_name(TABLE_FILE + ".tmp")
+        df.write_parquet(tmp, compression="zstd", statistics=True)
+        os.replace(tmp, table)
+        for p in parts:
+            p.unlink(missing_ok=True)
+        return df.height
+    finally:
+        lock.unlink(missing_ok=True)
+
+def relocate(catalog_dir: Union[str, Path], root: Union[str, Path],
+             mapping: Dict[str, Optional[str]]) -> int:
+    """
+    Reescribe las rutas de un store cuyos ficheros se movieron (mapping: ruta
+    relativa vieja -> nueva, None = baja) sin releer footers; el resto de
+    columnas (filas, rango, checksum) se conserva. Devuelve filas reubicadas.
+    """
+    since = dt.datetime.now().isoformat(timespec="seconds")
+    df = read_catalog(catalog_dir, root=root).collect()
+    if df.height == 0:
+        return 0
+    paths = df["path"].to_list()
+    moved = [mapping.get(p, p) for p in paths]
+    changed = sum(1 for a, b in zip(paths, moved) if a != b)
+    if not changed:
+        return 0
+    df = df.with_columns(pl.Series("path", moved, dtype=pl.Utf8)).filter(pl.col("path").is_not_null())
+    keys = pl.DataFrame([parse_partition(p) for p in df["path"]],
+                        schema={k: SCHEMA[k] for k in ("ticker", "year", "month", "day", "file")})
+    df = df.with_columns(keys)
+    compact(catalog_dir, replace_root=root_key(root), replacement=df, since=since)
+    return changed
+
+def iter_files(root: Path, suffix: str = ".parquet") -> Iterable[str]:
+    """Ficheros de datos bajo root (os.scandir; ignora _*, .* y temporales)"""
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.name.startswith(("_", ".")):
+                    continue
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.endswith(suffix):
+                    yield e.path
+
+def build(catalog_dir: Union[str, Path], dataset: str, root: Union[str, Path],
+          workers: int = 8, checksum: bool = False) -> pl.DataFrame:
+    """
+    Crawl completo de un dataset (backfill / reconciliación): una sola vez en vez
+    de en cada herramienta. Reutiliza las filas de ficheros sin cambios
+    (mismo bytes + mtime_ns) y descarta las de ficheros que ya no existen.
+    """
+    root = Path(root)
+    started = dt.datetime.now().isoformat(timespec="seconds")
+    writer = CatalogWriter(catalog_dir, dataset, root, run_id=f"build-{default_run_id()}",
+                           checksum=checksum)
+    known = {r["path"]: r for r in read_catalog(catalog_dir, root=root).collect().iter_rows(named=True)}
+
+    files = list(iter_files(root))
+    log(f"{dataset}: {len(files):,} ficheros bajo {root}")
+
+    def one(path: str) -> Optional[Dict]:
+        try:
+            st = os.stat(path)
+            rel = os.path.relpath(path, root).replace("\\", "/")
+            prev = known.get(rel)
+            if prev and prev["dataset"] == dataset and prev["bytes"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns \
+                    and (prev["checksum"] or not checksum):
+                return prev
+            return writer.make_row(path)
+        except Exception as e:
+            log(f"  ERROR {path}: {e}")
+            return None
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for i, r in enumerate(ex.map(one, files), 1):
+            if r is not None:
+                rows.append(r)
+            if i % 50000 == 0:
+                log(f"  {i:,}/{len(files):,}")
+    df = pl.DataFrame(rows, schema=SCHEMA)
+    compact(catalog_dir, replace_root=writer.root_key, replacement=df, since=started)
+    return df
+
+def catalog_tickers(catalog_dir: Union[str, Path], dataset: str, root: Optional[Union[str, Path]] = None,
+                    files: Optional[Sequence[str]] = None) -> Set[str]:
+    """Tickers con al menos un fichero catalogado (opcionalmente solo esos nombres de fichero)"""
+    lf = read_catalog(catalog_dir, dataset, root)
+    if files:
+        lf = lf.filter(pl.col("file").is_in(list(files)))
+    return set(lf.select(pl.col("ticker").drop_nulls().unique()).collect()["ticker"].to_list())
+
+def coverage(catalog_dir: Union[str, Path], dataset: Optional[str] = None) -> pl.DataFrame:
+    """Resumen por store: ficheros, tickers, filas, GB y rango temporal"""
+    return (
+        read_catalog(catalog_dir, dataset)
+          .group_by(["dataset", "root"])
+          .agg([
+              pl.len().alias("files"),
+              pl.col("ticker").n_unique().alias("tickers"),
+              pl.col("rows").sum(),
+              (pl.col("bytes").sum() / 1024**3).alias("gb"),
+              pl.from_epoch(pl.col("min_ts").min(), time_unit="ns").dt.date().alias("first_date"),
+              pl.from_epoch(pl.col("max_ts").max(), time_unit="ns").dt.date().alias("last_date"),
+          ])
+          .sort(["dataset", "root"])
+          .collect()
+    )
+
+def main():
+    ap = argparse.ArgumentParser(description="Catálogo de ficheros de partición del store")
+    ap.add_argument("--catalog-dir", required=True)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Crawl de un dataset (backfill / reconciliación)")
+    b.add_argument("--dataset", required=True, help="Nombre lógico (ohlcv_daily, ohlcv_1m, trades, quotes, ...)")
+    b.add_argument("--root", required=True, help="Raíz del dataset (TICKER/year=/...)")
+    b.add_argument("--workers", type=int, default=8)
+    b.add_argument("--checksum", action="store_true", help="Calcular checksum del contenido (lee cada fichero)")
+
+    r = sub.add_parser("report", help="Resumen por dataset / store")
+    r.add_argument("--dataset")
+
+    sub.add_parser("compact", help="Fusiona los part files pendientes")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        t0 = time.time()
+        df = build(args.catalog_dir, args.dataset, args.root, args.workers, args.checksum)
+        log(f"{args.dataset}: {df.height:,} ficheros catalogados en {time.time() - t0:.1f}s")
+    elif args.cmd == "compact":
+        log(f"Catálogo compactado: {compact(args.catalog_dir):,} filas")
+    else:
+        t0 = time.time()
+        with pl.Config(tbl_rows=100, tbl_cols=20):
+            print(coverage(args.catalog_dir, args.dataset))
+        log(f"Consulta en {(time.time() - t0) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    sys.exit(main())
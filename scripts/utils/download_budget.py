@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+download_budget.py - Presupuesto de una sesión de descarga (requests, GB, horas)
+
+El downloader carga cada request HTTP y cada byte escrito; entre batches
+pregunta exhausted() y para limpiamente cuando se agota cualquiera de los
+límites. Con la cola de prioridad (state_store.claim) lo descargado hasta
+ese momento son siempre los ticker-días de mayor prioridad.
+
+Uso:
+    budget = DownloadBudget(max_requests=200_000, max_gb=50, max_hours=6)
+    budget.charge(requests=1)
+    budget.charge(bytes=output_file.stat().st_size)
+    if budget.exhausted():
+        ...
+"""
+
+import time
+from typing import Optional
+
+class DownloadBudget:
+    def __init__(self, max_requests: Optional[int] = None, max_gb: Optional[float] = None,
+                 max_hours: Optional[float] = None):
+        self.max_requests = max_requests
+        self.max_bytes = int(max_gb * 1024**3) if max_gb else None
+        self.max_seconds = max_hours * 3600 if max_hours else None
+        self.requests = 0
+        self.bytes = 0
+        self.start_time = time.time()
+
+    def charge(self, requests: int = 0, bytes: int = 0) -> None:
+        self.requests += requests
+        self.bytes += bytes
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    def remaining_requests(self) -> Optional[int]:
+        if self.max_requests is None:
+            return None
+        return max(self.max_requests - self.requests, 0)
+
+    def exhausted(self) -> Optional[str]:
+        """Motivo si se ha agotado algún límite, None si queda presupuesto"""
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            return f"requests ({self.requests:,}/{self.max_requests:,})"
+        if self.max_bytes is not None and self.bytes >= self.max_bytes:
+            return f"GB ({self.bytes / 1024**3:.2f}/{self.max_bytes / 1024**3:.2f})"
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return f"tiempo ({self.elapsed() / 3600:.2f}/{self.max_seconds / 3600:.2f} h)"
+        return None
+
+    def summary(self) -> str:
+        return (f"{self.requests:,} requests | {self.bytes / 1024**3:.2f} GB | "
+                f"{self.elapsed() / 3600:.2f} h")
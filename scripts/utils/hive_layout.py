@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+hive_layout.py - Rutas de partición del layout Hive (ticker=X/year=YYYY/month=MM/...)
+
+Los stores históricos usan TICKER/year=YYYY/... sin clave ticker= y con
+month=5 o month=05 según el escritor, así que Polars / DuckDB / pyarrow no
+pueden descubrir ni podar particiones por sí solos. El layout Hive normaliza:
+
+    ticker=AAPL/year=2024/month=05/day=2024-05-14/market.parquet
+    ticker=AAPL/year=2024/month=05/minute.parquet
+    ticker=AAPL/year=2024/daily.parquet
+    ticker=AAPL/daily.parquet                      (compactado por ticker)
+
+Un store migrado con migrate_hive_layout.py lleva el marcador _HIVE_LAYOUT.json
+en la raíz: los ingestores escriben en layout Hive si se les pasa
+--hive-layout o si la raíz ya tiene el marcador (use_hive), y los lectores
+aceptan ambos layouts (ticker_dir / ticker_dirs).
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from hive_layout import partition_dir, use_hive
+
+    hive = use_hive(outdir, args.hive_layout)
+    pdir = partition_dir(outdir, ticker, year, f"{month:02d}", date, hive=hive)
+"""
+
+import os
+import datetime as dt
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+MARKER = "_HIVE_LAYOUT.json"
+TICKER_KEY = "ticker="
+
+DateLike = Union[str, dt.date]
+
+def is_hive(root: Union[str, Path]) -> bool:
+    """True si el store ya está migrado (marcador en la raíz)"""
+    return os.path.exists(os.path.join(root, MARKER))
+
+def use_hive(root: Union[str, Path], flag: bool = False) -> bool:
+    """Layout de escritura: Hive si se pide o si el store ya está migrado"""
+    return bool(flag) or is_hive(root)
+
+def ticker_name(dirname: str) -> str:
+    """Nombre del directorio de ticker (AAPL o ticker=AAPL) -> AAPL"""
+    return dirname[len(TICKER_KEY):] if dirname.startswith(TICKER_KEY) else dirname
+
+def ticker_dir(root: Union[str, Path], ticker: str, hive: Optional[bool] = None) -> Path:
+    """
+    Directorio de un ticker. hive=None (lectores) detecta el layout: gana
+    ticker=X si existe (durante una migración conviven ambos), si no X/
+    """
+    root = Path(root)
+    if hive is None:
+        hive = (root / f"{TICKER_KEY}{ticker}").is_dir()
+    return root / (f"{TICKER_KEY}{ticker}" if hive else ticker)
+
+def ticker_dirs(root: Union[str, Path]) -> List[Tuple[str, str]]:
+    """(ticker, path) de cada ticker de la raíz, en cualquiera de los dos layouts"""
+    found = {}
+    try:
+        with os.scandir(root) as it:
+            entries = [e for e in it if e.is_dir() and not e.name.startswith(("_", "."))]
+    except OSError:
+        return []
+    for e in entries:
+        name = ticker_name(e.name)
+        if e.name.startswith(TICKER_KEY) or name not in found:
+            found[name] = e.path
+    return sorted(found.items())
+
+def ticker_names(root: Union[str, Path]) -> List[str]:
+    return [t for t, _ in ticker_dirs(root)]
+
+def day_value(year: int, month: int, day: Union[DateLike, int]) -> str:
+    """Valor de day= normalizado (YYYY-MM-DD) a partir de DD o de la fecha"""
+    if isinstance(day, dt.date):
+        return day.isoformat()
+    text = str(day)
+    if len(text) <= 2:
+        return f"{int(year):04d}-{int(month):02d}-{int(text):02d}"
+    return text[:10]
+
+def partition_dir(root: Union[str, Path], ticker: str, year, month=None, day=None,
+                  hive: bool = False) -> Path:
+    """
+    Directorio de partición de un fichero. En layout antiguo respeta el
+    formato que pase el llamador (month=5 / month=05, day=DD / day=YYYY-MM-DD);
+    en Hive normaliza month a dos dígitos y day a YYYY-MM-DD.
+    """
+    base = ticker_dir(root, ticker, hive)
+    if not hive:
+        out = base / f"year={year}"
+        if month is not None:
+            out = out / f"month={month}"
+        if day is not None:
+            out = out / f"day={day}"
+        return out
+    out = base / f"year={int(year)}"
+    if month is not None:
+        out = out / f"month={int(month):02d}"
+    if day is not None:
+        out = out / f"day={day_value(year, month, day)}"
+    return out
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ingest_metrics.py - Métricas de ingesta en vivo (formato Prometheus / OpenMetrics, sin dependencias)
+
+Cada ingestor publica sus contadores mientras corre, en vez de reconstruir el
+throughput después con audit_download_speed.py sobre los mtime:
+
+    tsis_ingest_requests_total{endpoint,status}        requests por código HTTP
+    tsis_ingest_request_seconds{endpoint}              histograma de latencia
+    tsis_ingest_retries_total{endpoint,reason}         reintentos (status / excepción)
+    tsis_ingest_rate_limited_total{endpoint}           respuestas 429
+    tsis_ingest_rows_total, tsis_ingest_bytes_total    filas descargadas / bytes escritos
+    tsis_ingest_rows_per_second, ..._bytes_per_second, ..._requests_per_second
+                                                       ritmo de los últimos 60 s
+    tsis_ingest_queue_depth{queue}                     pendientes (cola del state store, tickers)
+    tsis_ingest_writer_backlog                         escrituras pendientes del writer
+
+Todas llevan las etiquetas dataset y worker (TSIS_METRICS_WORKER o el pid;
+los wrappers de batches pasan el slot con slot_env, así un batch nuevo
+reutiliza la serie y el puerto de su slot).
+
+Publicación (se pueden combinar; sin ninguna las métricas solo alimentan rates()):
+    --metrics-port N   HTTP en http://0.0.0.0:N/metrics (TSIS_METRICS_PORT); si
+                       el puerto está ocupado se avisa y se sigue sin HTTP
+    --metrics-dir D    <D>/<dataset>-<worker>.prom reescrito cada 15 s de forma
+                       atómica (TSIS_METRICS_DIR; textfile collector de node_exporter)
+
+Uso en un ingestor:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from ingest_metrics import add_metrics_args, metrics_from_args
+
+    add_metrics_args(parser)
+    metrics = metrics_from_args(args, "trades")
+    t0 = time.perf_counter()
+    resp = session.get(url)
+    metrics.observe_response("v3/trades", resp, time.perf_counter() - t0)
+    metrics.add_rows(n); metrics.add_bytes(path.stat().st_size)
+    log(f"{metrics.rates()['mb_s']:.2f} MB/s")
+    metrics.close()
+"""
+
+import os
+import time
+import bisect
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+PREFIX = "tsis_ingest"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Latencias de Polygon: de decenas de ms (páginas vacías) a minutos (páginas de 50k)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_WINDOW = 60.0
+TEXTFILE_INTERVAL = 15.0
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class IngestMetrics:
+    """Registro de métricas de un proceso ingestor (thread-safe)"""
+
+    def __init__(self, dataset: str, worker: Optional[str] = None, port: Optional[int] = None,
+                 metrics_dir: Optional[Union[str, Path]] = None, interval: float = TEXTFILE_INTERVAL):
+        self.dataset = dataset
+        self.worker = str(worker or os.getenv("TSIS_METRICS_WORKER") or os.getpid())
+        self.base: Labels = (("dataset", dataset), ("worker", self.worker))
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self.help: Dict[str, str] = {}
+        self.samples = deque()  # (t, requests, rows, bytes) para los ritmos de la ventana
+        self.totals = {"requests": 0, "rows": 0, "bytes": 0}
+        self.server = None
+        self.textfile = Path(metrics_dir) / f"{dataset}-{self.worker}.prom" if metrics_dir else None
+        self._stop = threading.Event()
+        self._writer = None
+
+        if port:
+            self._serve(int(port))
+        if self.textfile is not None:
+            self.textfile.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = threading.Thread(target=self._write_loop, args=(interval,), daemon=True)
+            self._writer.start()
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return self.base + tuple((k, str(v)) for k, v in sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, help: str = "", **labels) -> None:
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + value
+            self.help.setdefault(name, help)
+
+    def set(self, name: str, value: float, help: str = "", **labels) -> None:
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._key(labels)] = value
+            self.help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS,
+                help: str = "", **labels) -> None:
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            key = self._key(labels)
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+            self.help.setdefault(name, help)
+
+    # ------------------------------------------------------------------
+    # API de los ingestores
+    # ------------------------------------------------------------------
+
+    def observe_request(self, endpoint: str, status, seconds: float) -> None:
+        """Un request terminado: status es el código HTTP o un nombre de excepción"""
+        status = str(status)
+        self.inc("requests_total", help="Requests HTTP por endpoint y status", endpoint=endpoint, status=status)
+        self.observe("request_seconds", seconds, help="Latencia de requests HTTP", endpoint=endpoint)
+        if status == "429":
+            self.inc("rate_limited_total", help="Respuestas 429", endpoint=endpoint)
+        with self.lock:
+            self.totals["requests"] += 1
+
+    def observe_response(self, endpoint: str, response, seconds: float) -> None:
+        """
+        requests.Response: status final más los reintentos internos de urllib3
+        (Retry del HTTPAdapter), que no se ven desde fuera
+        """
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        for h in getattr(retries, "history", None) or ():
+            reason = str(h.status) if h.status else type(h.error).__name__ if h.error else "redirect"
+            self.retry(endpoint, reason)
+            if h.status == 429:
+                self.inc("rate_limited_total", help="Respuestas 429", endpoint=endpoint)
+        self.observe_request(endpoint, response.status_code, seconds)
+
+    def retry(self, endpoint: str, reason) -> None:
+        self.inc("retries_total", help="Reintentos por endpoint y motivo", endpoint=endpoint, reason=str(reason))
+
+    def add_rows(self, n: int) -> None:
+        self.inc("rows_total", n, help="Filas descargadas")
+        with self.lock:
+            self.totals["rows"] += n
+
+    def add_bytes(self, n: int) -> None:
+        self.inc("bytes_total", n, help="Bytes escritos a disco")
+        with self.lock:
+            self.totals["bytes"] += n
+
+    def queue_depth(self, queue: str, n: int) -> None:
+        self.set("queue_depth", n, help="Elementos pendientes por cola", queue=queue)
+
+    def writer_backlog(self, n: int) -> None:
+        self.set("writer_backlog", n, help="Escrituras pendientes del writer")
+
+    def rates(self) -> Dict[str, float]:
+        """req/s, rows/s y MB/s de la última ventana (RATE_WINDOW s) y desde el inicio"""
+        now = time.time()
+        with self.lock:
+            req, rows, nbytes = self.totals["requests"], self.totals["rows"], self.totals["bytes"]
+            self.samples.append((now, req, rows, nbytes))
+            while len(self.samples) > 2 and now - self.samples[1][0] >= RATE_WINDOW:
+                self.samples.popleft()
+            t0, req0, rows0, bytes0 = self.samples[0]
+        span = now - t0
+        if span < 1.0:
+            # Primera muestra: ritmo medio desde el arranque
+            t0, req0, rows0, bytes0 = self.started, 0, 0, 0
+            span = now - t0
+        span = max(span, 1e-9)
+        elapsed = max(now - self.started, 1e-9)
+        return {
+            "req_s": (req - req0) / span,
+            "rows_s": (rows - rows0) / span,
+            "mb_s": (nbytes - bytes0) / span / 1e6,
+            "avg_req_s": req / elapsed,
+            "avg_rows_s": rows / elapsed,
+            "avg_mb_s": nbytes / elapsed / 1e6,
+            "requests": req, "rows": rows, "bytes": nbytes, "elapsed": elapsed,
+        }
+
+    # ------------------------------------------------------------------
+    # Exposición
+    # ------------------------------------------------------------------
+
+    def render(self) -> str:
+        r = self.rates()
+        self.set("requests_per_second", r["req_s"], help=f"Requests/s (últimos {RATE_WINDOW:.0f} s)")
+        self.set("rows_per_second", r["rows_s"], help=f"Filas/s (últimos {RATE_WINDOW:.0f} s)")
+        self.set("bytes_per_second", r["mb_s"] * 1e6, help=f"Bytes escritos/s (últimos {RATE_WINDOW:.0f} s)")
+        self.set("uptime_seconds", r["elapsed"], help="Segundos desde el arranque del ingestor")
+        lines = []
+        with self.lock:
+            for kind, families in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted(families):
+                    full = f"{PREFIX}_{name}"
+                    lines.append(f"# HELP {full} {self.help.get(name, '')}")
+                    lines.append(f"# TYPE {full} {kind}")
+                    for labels, value in sorted(families[name].items()):
+                        lines.append(f"{full}{_fmt_labels(labels)} {_fmt_value(value)}")
+            for name in sorted(self.histograms):
+                full = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full} {self.help.get(name, '')}")
+                lines.append(f"# TYPE {full} histogram")
+                for labels, h in sorted(self.histograms[name].items()):
+                    acc = 0
+                    for le, c in zip(h.buckets + (float("inf"),), h.counts):
+                        acc += c
+                        lines.append(f"{full}_bucket{_fmt_labels(labels + (('le', _fmt_value(le)),))} {acc}")
+                    lines.append(f"{full}_sum{_fmt_labels(labels)} {_fmt_value(h.sum)}")
+                    lines.append(f"{full}_count{_fmt_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def _serve(self, port: int) -> None:
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        except OSError as e:
+            print(f"[metrics] puerto {port} no disponible ({e}): sin endpoint HTTP", flush=True)
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def write_textfile(self) -> None:
+        if self.textfile is None:
+            return
+        tmp = self.textfile.with_name(self.textfile.name + ".tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, self.textfile)
+
+    def _write_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.write_textfile()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Última escritura del textfile y parada del endpoint"""
+        self._stop.set()
+        try:
+            self.write_textfile()
+        except OSError:
+            pass
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+def add_metrics_args(parser) -> None:
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Endpoint Prometheus en http://0.0.0.0:PORT/metrics (default: TSIS_METRICS_PORT)")
+    parser.add_argument("--metrics-dir", default=None,
+                        help="Directorio de textfiles .prom (default: TSIS_METRICS_DIR)")
+    parser.add_argument("--metrics-worker", default=None,
+                        help="Etiqueta worker (default: TSIS_METRICS_WORKER o el pid)")
+
+def metrics_from_args(args, dataset: str) -> IngestMetrics:
+    port = getattr(args, "metrics_port", None) or os.getenv("TSIS_METRICS_PORT")
+    metrics_dir = getattr(args, "metrics_dir", None) or os.getenv("TSIS_METRICS_DIR")
+    return IngestMetrics(dataset, worker=getattr(args, "metrics_worker", None),
+                         port=int(port) if port else None, metrics_dir=metrics_dir)
+
+def slot_env(env: Dict[str, str], slot: int, metrics_dir: Optional[Union[str, Path]] = None,
+             port_base: Optional[int] = None) -> Dict[str, str]:
+    """
+    Entorno de un subproceso lanzado por un wrapper de batches: worker = slot
+    fijo (no el pid del batch) y, con port_base, un puerto por slot
+    """
+    env = dict(env)
+    env["TSIS_METRICS_WORKER"] = f"slot{slot:02d}"
+    if metrics_dir:
+        env["TSIS_METRICS_DIR"] = str(Path(metrics_dir).resolve())
+    if port_base:
+        env["TSIS_METRICS_PORT"] = str(port_base + slot)
+    return env
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+liquidity_summary.py - Resumen de liquidez por ticker-día calculado al descargar quotes
+
+Los downloaders de quotes llaman a summarize_quotes() con el DataFrame que
+acaban de escribir (todavía en memoria) y añaden la fila a una tabla diaria
+compacta. Así los screens de spread / intensidad de quotes no vuelven a
+escanear los quotes crudos.
+
+Métricas (sobre quotes con bid > 0 y ask > 0, ponderadas por tiempo hasta
+el siguiente quote):
+- n_quotes, first_ts, last_ts
+- tw_spread, tw_spread_bps        spread medio ponderado por tiempo (no cruzado)
+- median_spread_bps               mediana por quote (no cruzado)
+- pct_time_locked, pct_time_crossed
+- avg_bid_size, avg_ask_size      profundidad media ponderada por tiempo
+
+Layout de la tabla:
+    liquidity_dir/liquidity_daily.parquet        tabla compactada (ticker, date únicos)
+    liquidity_dir/_parts/part-*.parquet          filas añadidas pendientes de compactar
+    liquidity_dir/_compact.lock                  compactación en curso (O_EXCL, como dataset_catalog)
+
+Uso:
+    table = LiquidityTable(liquidity_dir)
+    table.add(summarize_quotes(df, ticker, date))
+    table.flush()            # un part file por batch
+    table.compact()          # al final de la descarga
+    lf = read_liquidity(liquidity_dir)
+"""
+
+import os
+import time
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import polars as pl
+
+TABLE_FILE = "liquidity_daily.parquet"
+PARTS_DIR = "_parts"
+LOCK_FILE = "_compact.lock"
+
+SCHEMA = {
+    "ticker": pl.Utf8,
+    "date": pl.Utf8,
+    "n_quotes": pl.Int64,
+    "first_ts": pl.Int64,
+    "last_ts": pl.Int64,
+    "tw_spread": pl.Float64,
+    "tw_spread_bps": pl.Float64,
+    "median_spread_bps": pl.Float64,
+    "pct_time_locked": pl.Float64,
+    "pct_time_crossed": pl.Float64,
+    "avg_bid_size": pl.Float64,
+    "avg_ask_size": pl.Float64,
+}
+
+def summarize_quotes(df: pl.DataFrame, ticker: str, date: str) -> Dict:
+    """Fila de resumen para un ticker-día (df con timestamp/bid/ask price y size)"""
+    row = {k: None for k in SCHEMA}
+    row.update({"ticker": ticker, "date": date, "n_quotes": 0})
+
+    if df.height == 0 or not all(c in df.columns for c in
+                                 ("timestamp", "bid_price", "ask_price", "bid_size", "ask_size")):
+        return row
+
+    q = (
+        df.select([
+            pl.col("timestamp").cast(pl.Int64),
+            pl.col("bid_price").cast(pl.Float64),
+            pl.col("ask_price").cast(pl.Float64),
+            pl.col("bid_size").cast(pl.Float64),
+            pl.col("ask_size").cast(pl.Float64),
+        ])
+        .drop_nulls("timestamp")
+        .sort("timestamp")
+    )
+    row["n_quotes"] = q.height
+    if q.height == 0:
+        return row
+    row["first_ts"] = q["timestamp"][0]
+    row["last_ts"] = q["timestamp"][-1]
+
+    # Duración de cada estado hasta el siguiente quote (el último no pondera)
+    q = q.with_columns(
+        (pl.col("timestamp").shift(-1) - pl.col("timestamp")).fill_null(0).cast(pl.Float64).alias("dur")
+    ).filter((pl.col("bid_price") > 0) & (pl.col("ask_price") > 0))
+    if q.height == 0:
+        return row
+
+    q = q.with_columns([
+        (pl.col("ask_price") - pl.col("bid_price")).alias("spread"),
+        ((pl.col("ask_price") + pl.col("bid_price")) / 2).alias("mid"),
+    ]).with_columns((pl.col("spread") / pl.col("mid") * 1e4).alias("spread_bps"))
+
+    total = q["dur"].sum()
+    not_crossed = q.filter(pl.col("spread") >= 0)
+    nc_total = not_crossed["dur"].sum()
+
+    row["median_spread_bps"] = not_crossed["spread_bps"].median() if not_crossed.height else None
+    if nc_total > 0:
+        row["tw_spread"] = (not_crossed["spread"] * not_crossed["dur"]).sum() / nc_total
+        row["tw_spread_bps"] = (not_crossed["spread_bps"] * not_crossed["dur"]).sum() / nc_total
+    if total > 0:
+        row["pct_time_locked"] = q.filter(pl.col("spread") == 0)["dur"].sum() / total * 100
+        row["pct_time_crossed"] = q.filter(pl.col("spread") < 0)["dur"].sum() / total * 100
+        row["avg_bid_size"] = (q["bid_size"] * q["dur"]).sum() / total
+        row["avg_ask_size"] = (q["ask_size"] * q["dur"]).sum() / total
+    return row
+
+class LiquidityTable:
+    """Tabla diaria append-only: part files por batch + compactación"""
+
+    def __init__(self, liquidity_dir: Union[str, Path]):
+        self.root = Path(liquidity_dir)
+        self.parts_dir = self.root / PARTS_DIR
+        self.rows: List[Dict] = []
+        self._seq = 0
+
+    def add(self, row: Dict) -> None:
+        self.rows.append(row)
+
+    def flush(self) -> Optional[Path]:
+        """Escribe las filas pendientes como un part file (atómico)"""
+        if not self.rows:
+            return None
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        name = f"part-{dt.datetime.now():%Y%m%d%H%M%S%f}-{os.getpid()}-{self._seq:05d}.parquet"
+        target = self.parts_dir / name
+        tmp = target.with_name(name + ".tmp")
+        pl.DataFrame(self.rows, schema=SCHEMA).write_parquet(tmp, compression="zstd")
+        os.replace(tmp, target)
+        self.rows = []
+        return target
+
+    def compact(self) -> int:
+        """
+        Fusiona tabla + parts (último valor por ticker-día) y borra los parts
+        fusionados. Si otro proceso está compactando devuelve 0: los parts
+        quedan para la siguiente pasada (read_liquidity ya los incluye).
+        """
+        self.flush()
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock = self.root / LOCK_FILE
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Lock huérfano de más de una hora: se libera
+            try:
+                if time.time() - lock.stat().st_mtime < 3600:
+                    return 0
+            except FileNotFoundError:
+                pass
+            lock.unlink(missing_ok=True)
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return 0
+        os.close(fd)
+        try:
+            # Parts listados con el lock: otro compact no puede borrarlos a medias
+            parts = sorted(self.parts_dir.glob("part-*.parquet")) if self.parts_dir.exists() else []
+            if not parts:
+                return 0
+            table = self.root / TABLE_FILE
+            sources = ([table] if table.exists() else []) + parts
+            df = (
+                pl.concat([pl.read_parquet(f) for f in sources], how="diagonal_relaxed")
+                  .unique(subset=["ticker", "date"], keep="last", maintain_order=True)
+                  .sort(["date", "ticker"])
+            )
+            tmp = table.with_name(f"{TABLE_FILE}.{os.getpid()}.tmp")
+            df.write_parquet(tmp, compression="zstd", statistics=True)
+            os.replace(tmp, table)
+            for p in parts:
+                p.unlink(missing_ok=True)
+            return df.height
+        finally:
+            lock.unlink(missing_ok=True)
+
+def read_liquidity(liquidity_dir: Union[str, Path]) -> pl.LazyFrame:
+    """Tabla compactada + parts pendientes (último valor por ticker-día)"""
+    root = Path(liquidity_dir)
+    sources = []
+    if (root / TABLE_FILE).exists():
+        sources.append(root / TABLE_FILE)
+    if (root / PARTS_DIR).exists():
+        sources.extend(sorted((root / PARTS_DIR).glob("part-*.parquet")))
+    if not sources:
+        return pl.LazyFrame(schema=SCHEMA)
+    return (
+        pl.concat([pl.scan_parquet(f) for f in sources], how="diagonal_relaxed")
+          .unique(subset=["ticker", "date"], keep="last", maintain_order=True)
+    )
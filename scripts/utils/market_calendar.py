@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+market_calendar.py - Calendario de sesiones NYSE/NASDAQ sin dependencias externas
+
+Calcula por reglas:
+- Festivos de mercado (incluye Good Friday, Juneteenth desde 2022 y cierres
+  especiales: funerales de estado, huracán Sandy)
+- Cierres anticipados (13:00 ET): 3 de julio, viernes después de Thanksgiving
+  y 24 de diciembre cuando caen en lunes-jueves
+- Ventanas de sesión en minutos desde medianoche ET:
+    premarket  04:00 - 09:30
+    regular    09:30 - 16:00  (13:00 en cierre anticipado)
+    afterhours 16:00 - 20:00  (13:00 - 17:00 en cierre anticipado)
+
+Uso como módulo (desde otro directorio de scripts/):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from market_calendar import sessions_frame, trading_days
+"""
+
+import datetime as dt
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+import polars as pl
+
+MARKET_TZ = "America/New_York"
+
+PREMARKET_OPEN = 4 * 60          # 04:00
+REGULAR_OPEN = 9 * 60 + 30       # 09:30
+REGULAR_CLOSE = 16 * 60          # 16:00
+EARLY_CLOSE = 13 * 60            # 13:00
+AFTERHOURS_CLOSE = 20 * 60       # 20:00
+EARLY_AFTERHOURS_CLOSE = 17 * 60 # 17:00
+
+# Cierres no recurrentes (duelos nacionales, clima)
+SPECIAL_CLOSURES = {
+    dt.date(2004, 6, 11),   # Ronald Reagan
+    dt.date(2007, 1, 2),    # Gerald Ford
+    dt.date(2012, 10, 29),  # Huracán Sandy
+    dt.date(2012, 10, 30),  # Huracán Sandy
+    dt.date(2018, 12, 5),   # George H.W. Bush
+    dt.date(2025, 1, 9),    # Jimmy Carter
+}
+
+def _easter(year: int) -> dt.date:
+    """Domingo de Pascua (algoritmo gregoriano anónimo)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return dt.date(year, month, day + 1)
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> dt.date:
+    """n-ésimo día de la semana del mes (weekday: 0=lunes)"""
+    first = dt.date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + dt.timedelta(days=offset + 7 * (n - 1))
+
+def _last_weekday(year: int, month: int, weekday: int) -> dt.date:
+    """Último día de la semana del mes (weekday: 0=lunes)"""
+    if month == 12:
+        last = dt.date(year, 12, 31)
+    else:
+        last = dt.date(year, month + 1, 1) - dt.timedelta(days=1)
+    return last - dt.timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day: dt.date) -> dt.date:
+    """Regla NYSE: sábado -> viernes anterior, domingo -> lunes siguiente"""
+    if day.weekday() == 5:
+        return day - dt.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + dt.timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> Set[dt.date]:
+    """Festivos de mercado del año (fechas observadas)"""
+    holidays = set()
+
+    # Año nuevo: si cae en sábado NO se observa el viernes anterior
+    new_year = dt.date(year, 1, 1)
+    if new_year.weekday() == 6:
+        holidays.add(new_year + dt.timedelta(days=1))
+    elif new_year.weekday() < 5:
+        holidays.add(new_year)
+
+    if year >= 1998:
+        holidays.add(_nth_weekday(year, 1, 0, 3))     # Martin Luther King Jr.
+    holidays.add(_nth_weekday(year, 2, 0, 3))         # Presidents Day
+    holidays.add(_easter(year) - dt.timedelta(days=2))  # Good Friday
+    holidays.add(_last_weekday(year, 5, 0))           # Memorial Day
+    if year >= 2022:
+        holidays.add(_observed(dt.date(year, 6, 19)))  # Juneteenth
+    holidays.add(_observed(dt.date(year, 7, 4)))      # Independence Day
+    holidays.add(_nth_weekday(year, 9, 0, 1))         # Labor Day
+    holidays.add(_nth_weekday(year, 11, 3, 4))        # Thanksgiving
+    holidays.add(_observed(dt.date(year, 12, 25)))    # Christmas
+
+    holidays.update(d for d in SPECIAL_CLOSURES if d.year == year)
+    return holidays
+
+@lru_cache(maxsize=None)
+def early_closes(year: int) -> Set[dt.date]:
+    """Días con cierre anticipado a las 13:00 ET"""
+    closes = set()
+
+    july_3 = dt.date(year, 7, 3)
+    if july_3.weekday() < 4:  # lunes-jueves (si es viernes es el festivo observado)
+        closes.add(july_3)
+
+    closes.add(_nth_weekday(year, 11, 3, 4) + dt.timedelta(days=1))  # Black Friday
+
+    christmas_eve = dt.date(year, 12, 24)
+    if christmas_eve.weekday() < 4:
+        closes.add(christmas_eve)
+
+    return closes - nyse_holidays(year)
+
+def is_trading_day(day: dt.date) -> bool:
+    return day.weekday() < 5 and day not in nyse_holidays(day.year)
+
+def trading_days(start: dt.date, end: dt.date) -> List[dt.date]:
+    """Días hábiles de mercado en [start, end]"""
+    days = []
+    d = start
+    while d <= end:
+        if is_trading_day(d):
+            days.append(d)
+        d += dt.timedelta(days=1)
+    return days
+
+def session_bounds(day: dt.date) -> Dict[str, Tuple[int, int]]:
+    """Ventanas [inicio, fin) de cada sesión en minutos desde medianoche ET"""
+    if day in early_closes(day.year):
+        return {
+            "premarket": (PREMARKET_OPEN, REGULAR_OPEN),
+            "regular": (REGULAR_OPEN, EARLY_CLOSE),
+            "afterhours": (EARLY_CLOSE, EARLY_AFTERHOURS_CLOSE),
+        }
+    return {
+        "premarket": (PREMARKET_OPEN, REGULAR_OPEN),
+        "regular": (REGULAR_OPEN, REGULAR_CLOSE),
+        "afterhours": (REGULAR_CLOSE, AFTERHOURS_CLOSE),
+    }
+
+def sessions_frame(start: dt.date, end: dt.date) -> pl.DataFrame:
+    """
+    Tabla de sesiones por día hábil para joins vectorizados.
+
+    Columnas: date, early_close, pre_open, reg_open, reg_close, post_close,
+    regular_minutes (todas las horas en minutos desde medianoche ET)
+    """
+    rows = []
+    for day in trading_days(start, end):
+        bounds = session_bounds(day)
+        rows.append({
+            "date": day,
+            "early_close": day in early_closes(day.year),
+            "pre_open": bounds["premarket"][0],
+            "reg_open": bounds["regular"][0],
+            "reg_close": bounds["regular"][1],
+            "post_close": bounds["afterhours"][1],
+            "regular_minutes": bounds["regular"][1] - bounds["regular"][0],
+        })
+
+    schema = {"date": pl.Date, "early_close": pl.Boolean, "pre_open": pl.Int32,
+              "reg_open": pl.Int32, "reg_close": pl.Int32, "post_close": pl.Int32,
+              "regular_minutes": pl.Int32}
+    return pl.DataFrame(rows, schema=schema)
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Muestra el calendario de sesiones de un año")
+    ap.add_argument("year", type=int)
+    args = ap.parse_args()
+
+    print(f"Festivos {args.year}:")
+    for d in sorted(nyse_holidays(args.year)):
+        print(f"  {d} ({d:%A})")
+    print(f"Cierres anticipados {args.year}:")
+    for d in sorted(early_closes(args.year)):
+        print(f"  {d} ({d:%A})")
+    n = len(trading_days(dt.date(args.year, 1, 1), dt.date(args.year, 12, 31)))
+    print(f"Días hábiles: {n}")
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+migrate_hive_layout.py - Migración de un store a layout Hive con hardlinks
+
+Reescribe TICKER/year=YYYY/month=M/day=D/... como
+ticker=TICKER/year=YYYY/month=MM/day=YYYY-MM-DD/... (ver hive_layout.py)
+sin copiar un byte: cada fichero nuevo es un hardlink del viejo (mismo inodo).
+Se migra todo lo que cuelga de cada ticker, incluidos _SUCCESS,
+_COMPACTED.json y los compactados por ticker / ticker-mes.
+
+Fases (cada una es un subcomando; el estado queda en <root>/_migration/):
+
+    link      Crea el árbol ticker=X/ con hardlinks y escribe journal.csv
+              (ticker, src, dst, bytes, mtime_ns, status). El árbol viejo no se toca,
+              así que los lectores siguen funcionando (y ven el nuevo en
+              cuanto existe: ticker_dir prefiere ticker=X). Repetible.
+    verify    Cada dst existe y es el mismo fichero que su src; ficheros por
+              ticker en journal == ficheros en el árbol viejo.
+    commit    verify + nada nuevo en el árbol viejo desde link, reubica las
+              rutas del catálogo, escribe _HIVE_LAYOUT.json (los ingestores
+              pasan a escribir en Hive) y borra los directorios viejos.
+    rollback  Rehace el árbol viejo desde el journal (hardlinks de vuelta,
+              también los ficheros escritos ya en Hive), borra ticker=X/,
+              el marcador y devuelve el catálogo a las rutas viejas.
+
+Conflictos de normalización (month=5 y month=05 con el mismo fichero, day=14
+y day=2024-05-14): gana el de mtime más reciente; el perdedor se enlaza en
+_migration/conflicts/<ruta vieja> (sigue disponible para revisar y para el
+rollback) y se lista con status=conflict. Los .tmp de escrituras a medias no
+se migran (status=skipped).
+
+Los hardlinks exigen que ambos árboles estén en el mismo volumen (lo están:
+el nuevo cuelga de la misma raíz) y NTFS / ext4 / xfs. Con ingesta en curso
+sobre el árbol viejo, link puede repetirse justo antes de commit.
+
+Uso:
+    python scripts/utils/migrate_hive_layout.py link --root C:/TSIS_Data/trades_ticks_2019_2025
+    python scripts/utils/migrate_hive_layout.py verify --root C:/TSIS_Data/trades_ticks_2019_2025
+    python scripts/utils/migrate_hive_layout.py commit --root C:/TSIS_Data/trades_ticks_2019_2025
+    python scripts/utils/migrate_hive_layout.py rollback --root C:/TSIS_Data/trades_ticks_2019_2025
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import errno
+import shutil
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from dataset_catalog import CatalogWriter, default_catalog_dir, read_catalog, relocate
+from hive_layout import MARKER, TICKER_KEY, day_value
+
+MIGRATION_DIR = "_migration"
+JOURNAL_FILE = "journal.csv"
+STATE_FILE = "state.json"
+CONFLICTS_DIR = "conflicts"
+
+JOURNAL_SCHEMA = {"ticker": pl.Utf8, "src": pl.Utf8, "dst": pl.Utf8, "bytes": pl.Int64,
+                  "mtime_ns": pl.Int64, "status": pl.Utf8}
+
+_KEY_RE = re.compile(r"^(year|month|day)=(.+)$")
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+# --------------------------------------------------------------------------
+# Rutas
+# --------------------------------------------------------------------------
+
+def hive_path(rel: str) -> str:
+    """TICKER/year=2024/month=5/day=14/x.parquet -> ticker=TICKER/year=2024/month=05/day=2024-05-14/x.parquet"""
+    parts = rel.split("/")
+    out = [TICKER_KEY + parts[0]]
+    year = month = None
+    for p in parts[1:-1]:
+        m = _KEY_RE.match(p)
+        if m:
+            key, val = m.groups()
+            try:
+                if key == "year":
+                    year = int(val)
+                    p = f"year={year}"
+                elif key == "month":
+                    month = int(val)
+                    p = f"month={month:02d}"
+                elif year is not None and month is not None:
+                    p = f"day={day_value(year, month, val)}"
+            except ValueError:
+                pass
+        out.append(p)
+    out.append(parts[-1])
+    return "/".join(out)
+
+def legacy_path(rel: str) -> str:
+    """Ruta vieja por defecto de un fichero Hive sin entrada en el journal"""
+    head, _, rest = rel.partition("/")
+    return head[len(TICKER_KEY):] + "/" + rest
+
+def _walk(base: str) -> List[Tuple[str, int, int]]:
+    """(path, bytes, mtime_ns) de todos los ficheros bajo base"""
+    out, stack = [], [base]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.is_file(follow_symlinks=False):
+                    st = e.stat()
+                    out.append((e.path, st.st_size, st.st_mtime_ns))
+    return out
+
+def _rel(path: str, root: Path) -> str:
+    return os.path.relpath(path, root).replace("\\", "/")
+
+def legacy_tickers(root: Path) -> List[str]:
+    with os.scandir(root) as it:
+        return sorted(e.name for e in it if e.is_dir()
+                      and not e.name.startswith(("_", ".")) and not e.name.startswith(TICKER_KEY))
+
+def hive_tickers(root: Path) -> List[str]:
+    with os.scandir(root) as it:
+        return sorted(e.name for e in it if e.is_dir() and e.name.startswith(TICKER_KEY))
+
+# --------------------------------------------------------------------------
+# Estado y journal
+# --------------------------------------------------------------------------
+
+def migration_dir(root: Path) -> Path:
+    return root / MIGRATION_DIR
+
+def read_state(root: Path) -> Dict:
+    try:
+        with open(migration_dir(root) / STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_state(root: Path, **changes) -> Dict:
+    state = {**read_state(root), **changes, "updated_at": dt.datetime.now().isoformat(timespec="seconds")}
+    target = migration_dir(root) / STATE_FILE
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, target)
+    return state
+
+def read_journal(root: Path) -> pl.DataFrame:
+    path = migration_dir(root) / JOURNAL_FILE
+    if not path.exists():
+        return pl.DataFrame(schema=JOURNAL_SCHEMA)
+    return pl.read_csv(path, schema=JOURNAL_SCHEMA)
+
+def write_journal(root: Path, df: pl.DataFrame) -> None:
+    target = migration_dir(root) / JOURNAL_FILE
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(JOURNAL_FILE + ".tmp")
+    df.write_csv(tmp)
+    os.replace(tmp, target)
+
+# --------------------------------------------------------------------------
+# link
+# --------------------------------------------------------------------------
+
+def _link(src: Path, dst: Path) -> str:
+    """Hardlink dst -> src; 'exists' si ya es el mismo fichero"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+        return "link"
+    except FileExistsError:
+        if os.path.samefile(src, dst):
+            return "exists"
+        # Un ingestor con --hive-layout ya escribió ahí: se sustituye por el
+        # viejo solo si este es más reciente
+        if os.stat(src).st_mtime_ns <= os.stat(dst).st_mtime_ns:
+            return "kept"
+        tmp = dst.with_name(dst.name + ".migrate.tmp")
+        tmp.unlink(missing_ok=True)
+        os.link(src, tmp)
+        os.replace(tmp, dst)
+        return "link"
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            raise RuntimeError(f"{src} y {dst} están en volúmenes distintos: no se pueden crear hardlinks")
+        raise
+
+def link_ticker(root: Path, ticker: str, previous: Sequence[Tuple[str, str, int]] = ()) -> List[Dict]:
+    """Enlaza todos los ficheros de un ticker en su ruta Hive (previous: src, dst, mtime de un link anterior)"""
+    for src, dst, mtime_ns in previous:
+        # Origen borrado desde el link anterior (p.ej. compactado): fuera su enlace
+        # huérfano, salvo que un ingestor lo haya reescrito ya en Hive (otro mtime)
+        try:
+            if not (root / src).exists() and os.stat(root / dst).st_mtime_ns == mtime_ns:
+                os.unlink(root / dst)
+        except OSError:
+            pass
+    if previous:
+        _remove_empty_dirs(root / (TICKER_KEY + ticker))
+    files = _walk(str(root / ticker))
+    by_dst: Dict[str, List[Tuple[str, int, int]]] = {}
+    rows = []
+    for path, size, mtime_ns in files:
+        rel = _rel(path, root)
+        if path.endswith(".tmp"):
+            rows.append({"ticker": ticker, "src": rel, "dst": None, "bytes": size,
+                         "mtime_ns": mtime_ns, "status": "skipped"})
+            continue
+        by_dst.setdefault(hive_path(rel), []).append((rel, size, mtime_ns))
+    for dst, group in by_dst.items():
+        # Conflicto de normalización: gana el más reciente (y, a igualdad, el ya normalizado)
+        group.sort(key=lambda s: (s[2], hive_path(s[0]) == TICKER_KEY + s[0]), reverse=True)
+        (rel, size, mtime_ns), losers = group[0], group[1:]
+        status = _link(root / rel, root / dst)
+        rows.append({"ticker": ticker, "src": rel, "dst": dst, "bytes": size,
+                     "mtime_ns": mtime_ns, "status": status})
+        for lrel, lsize, lmtime_ns in losers:
+            parked = f"{MIGRATION_DIR}/{CONFLICTS_DIR}/{lrel}"
+            _link(root / lrel, root / parked)
+            rows.append({"ticker": ticker, "src": lrel, "dst": parked, "bytes": lsize,
+                         "mtime_ns": lmtime_ns, "status": "conflict"})
+    return rows
+
+def cmd_link(root: Path, tickers: Optional[Sequence[str]], workers: int) -> int:
+    state = read_state(root)
+    if state.get("phase") == "committed":
+        log("El store ya está migrado (commit hecho); nada que enlazar")
+        return 0
+    tickers = list(tickers or legacy_tickers(root))
+    log(f"link: {len(tickers):,} tickers en {root}")
+    t0 = time.time()
+    old = read_journal(root)
+    previous: Dict[str, List[Tuple[str, str, int]]] = {}
+    for ticker, src, dst, mtime_ns in old.filter(pl.col("status").is_in(["link", "exists"])) \
+                                        .select(["ticker", "src", "dst", "mtime_ns"]).iter_rows():
+        previous.setdefault(ticker, []).append((src, dst, mtime_ns))
+    rows: List[Dict] = []
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        tasks = ex.map(lambda t: link_ticker(root, t, previous.get(t, ())), tickers)
+        for i, ticker_rows in enumerate(tasks, 1):
+            rows.extend(ticker_rows)
+            if i % 500 == 0:
+                log(f"  {i:,}/{len(tickers):,} tickers")
+    df = pl.DataFrame(rows, schema=JOURNAL_SCHEMA)
+    # Una pasada parcial (--tickers) conserva las filas de los demás tickers
+    if old.height:
+        df = pl.concat([old.filter(~pl.col("ticker").is_in(tickers)), df])
+    write_journal(root, df.sort(["ticker", "src"]))
+    write_state(root, phase="linked", linked_at=dt.datetime.now().isoformat(timespec="seconds"))
+    summary(df)
+    log(f"link completado en {time.time() - t0:.1f}s (0 bytes copiados)")
+    conflicts = df.filter(pl.col("status") == "conflict")
+    for row in conflicts.head(20).iter_rows(named=True):
+        log(f"  conflicto: {row['src']} -> {row['dst']}")
+    return 0
+
+def summary(df: pl.DataFrame) -> None:
+    by_status = df.group_by("status").agg([pl.len().alias("files"), pl.col("bytes").sum()]).sort("status")
+    print()
+    print(by_status)
+    print()
+
+# --------------------------------------------------------------------------
+# verify / commit
+# --------------------------------------------------------------------------
+
+def verify(root: Path, journal: pl.DataFrame, committed: bool = False) -> List[str]:
+    """Lista de problemas (vacía = migración consistente)"""
+    problems = []
+    for row in journal.filter(pl.col("status") != "skipped").iter_rows(named=True):
+        src, dst = root / row["src"], root / row["dst"]
+        try:
+            st = os.stat(dst)
+        except OSError:
+            problems.append(f"falta {row['dst']}")
+            continue
+        if row["status"] == "kept":
+            continue
+        if committed:
+            if st.st_size != row["bytes"]:
+                problems.append(f"tamaño distinto en {row['dst']}")
+        elif not src.exists():
+            problems.append(f"falta el origen {row['src']}")
+        elif not os.path.samefile(src, dst):
+            problems.append(f"{row['dst']} no es el mismo fichero que {row['src']}")
+    if committed:
+        return problems
+    # Ficheros por ticker: árbol viejo == journal
+    in_journal = journal.group_by("ticker").agg(pl.len().alias("n"))
+    expected = dict(in_journal.iter_rows())
+    for ticker in legacy_tickers(root):
+        n = len(_walk(str(root / ticker)))
+        if n != expected.get(ticker, 0):
+            problems.append(f"{ticker}: {n} ficheros en el árbol viejo, {expected.get(ticker, 0)} en el journal")
+    return problems
+
+def cmd_verify(root: Path) -> int:
+    journal = read_journal(root)
+    if journal.height == 0:
+        log("Sin journal: ejecuta primero link")
+        return 1
+    state = read_state(root)
+    problems = verify(root, journal, committed=state.get("phase") == "committed")
+    summary(journal)
+    for p in problems[:50]:
+        log(f"  {p}")
+    if problems:
+        log(f"verify: {len(problems):,} problemas")
+        return 1
+    n_tickers = journal["ticker"].n_unique()
+    log(f"verify OK: {journal.height:,} ficheros de {n_tickers:,} tickers")
+    return 0
+
+def _catalog(root: Path, catalog_dir: Optional[str]) -> Optional[Path]:
+    cdir = Path(catalog_dir) if catalog_dir else default_catalog_dir(root)
+    return cdir if cdir.exists() else None
+
+def _remove_empty_dirs(base: Path) -> None:
+    for d, _, _ in sorted(os.walk(base), key=lambda w: len(w[0]), reverse=True):
+        try:
+            os.rmdir(d)
+        except OSError:
+            pass
+
+def cmd_commit(root: Path, catalog_dir: Optional[str]) -> int:
+    state = read_state(root)
+    if state.get("phase") == "committed":
+        log("Commit ya hecho")
+        return 0
+    journal = read_journal(root)
+    if journal.height == 0:
+        log("Sin journal: ejecuta primero link")
+        return 1
+    problems = verify(root, journal)
+    if problems:
+        for p in problems[:50]:
+            log(f"  {p}")
+        log(f"commit abortado: {len(problems):,} problemas (repite link y verify)")
+        return 1
+
+    cdir = _catalog(root, catalog_dir)
+    if cdir is not None:
+        mapping = {r["src"]: (r["dst"] if r["status"] != "conflict" else None)
+                   for r in journal.filter(pl.col("status") != "skipped").iter_rows(named=True)}
+        n = relocate(cdir, root, mapping)
+        log(f"Catálogo: {n:,} rutas reubicadas ({cdir})")
+
+    with open(root / MARKER, "w", encoding="utf-8") as f:
+        json.dump({"layout": "hive", "migrated_at": dt.datetime.now().isoformat(timespec="seconds"),
+                   "files": journal.height}, f, indent=2)
+    # Los datos siguen en el árbol nuevo (mismo inodo): borrar el viejo solo
+    # baja el contador de enlaces
+    tickers = sorted(journal["ticker"].unique().to_list())
+    for ticker in tickers:
+        shutil.rmtree(root / ticker, ignore_errors=True)
+    write_state(root, phase="committed", committed_at=dt.datetime.now().isoformat(timespec="seconds"))
+    log(f"commit: {len(tickers):,} tickers en layout Hive; marcador {root / MARKER}")
+    return 0
+
+# --------------------------------------------------------------------------
+# rollback
+# --------------------------------------------------------------------------
+
+def cmd_rollback(root: Path, catalog_dir: Optional[str]) -> int:
+    journal = read_journal(root)
+    back = {r["dst"]: r["src"] for r in journal.iter_rows(named=True) if r["dst"]}
+    restored = 0
+    # Todo lo que hay en ticker=X/ (migrado o escrito ya en Hive) vuelve al árbol viejo
+    pending = []
+    for name in hive_tickers(root):
+        for path, _, _ in _walk(str(root / name)):
+            rel = _rel(path, root)
+            src = back.get(rel) or legacy_path(rel)
+            pending.append((rel, src))
+    parked = journal.filter(pl.col("status") == "conflict").select(["dst", "src"]).rows()
+    for dst, src in pending + parked:
+        if not (root / dst).exists():
+            log(f"rollback abortado: no se puede restaurar {src}, falta {dst}")
+            return 1
+        # Si ambos existen y difieren gana el más reciente (como en link)
+        if _link(root / dst, root / src) == "link":
+            restored += 1
+
+    cdir = _catalog(root, catalog_dir)
+    if cdir is not None:
+        n = relocate(cdir, root, {dst: src for dst, src in pending})
+        log(f"Catálogo: {n:,} rutas devueltas al layout viejo")
+        # Los perdedores de conflicto se dieron de baja en commit: vuelven al catálogo
+        datasets = read_catalog(cdir, root=root).select("dataset").unique().collect()["dataset"].to_list()
+        restored_parquets = [src for _, src in parked if src.endswith(".parquet")]
+        if len(datasets) == 1 and restored_parquets:
+            writer = CatalogWriter(cdir, datasets[0], root, run_id=f"hive-rollback-{os.getpid()}", checksum=False)
+            for src in restored_parquets:
+                writer.record(root / src)
+            writer.close()
+    (root / MARKER).unlink(missing_ok=True)
+    for name in hive_tickers(root):
+        shutil.rmtree(root / name, ignore_errors=True)
+    shutil.rmtree(migration_dir(root) / CONFLICTS_DIR, ignore_errors=True)
+    for ticker in legacy_tickers(root):
+        _remove_empty_dirs(root / ticker)
+    write_state(root, phase="rolled_back", rolled_back_at=dt.datetime.now().isoformat(timespec="seconds"))
+    log(f"rollback: {restored:,} ficheros re-enlazados, {len(pending):,} rutas Hive retiradas")
+    return 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Migración a layout Hive (ticker=X/...) con hardlinks")
+    ap.add_argument("phase", choices=["link", "verify", "commit", "rollback"])
+    ap.add_argument("--root", required=True, help="Raíz del store")
+    ap.add_argument("--tickers", nargs="*", help="Solo estos tickers (link)")
+    ap.add_argument("--workers", type=int, default=8, help="Threads de link (default: 8)")
+    ap.add_argument("--catalog-dir", help="Catálogo a reubicar (default: TSIS_CATALOG_DIR o <root>/_catalog si existe)")
+    args = ap.parse_args()
+
+    root = Path(args.root)
+    if not root.is_dir():
+        log(f"No existe {root}")
+        return 1
+    print("=" * 80)
+    print(f"MIGRACIÓN HIVE {args.phase} | {root} | fase actual: {read_state(root).get('phase', '-')}")
+    print("=" * 80)
+    if args.phase == "link":
+        return cmd_link(root, args.tickers, args.workers)
+    if args.phase == "verify":
+        return cmd_verify(root)
+    if args.phase == "commit":
+        return cmd_commit(root, args.catalog_dir)
+    return cmd_rollback(root, args.catalog_dir)
+
+if __name__ == "__main__":
+    sys.exit(main())
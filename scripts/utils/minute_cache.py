@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+minute_cache.py - Caché caliente de barras de 1 minuto de los últimos N días (Arrow IPC mapeado)
+
+Research y el screening de premarket recargan una y otra vez las últimas
+sesiones de todo el universo desde TICKER/year=YYYY/month=MM/minute.parquet:
+miles de ficheros, descompresión y concat -> minutos por carga. La caché
+guarda esa ventana ya transpuesta, sin comprimir, un fichero por día:
+
+    cache_dir/YYYY-MM-DD.<versión>.arrow   ticker, date, t, o, h, l, c, v, vw, n
+                                           (todo el universo, orden ticker, t)
+    cache_dir/_cache.json                  ventana y fichero vigente de cada día
+    cache_dir/_sources.parquet             ticker, path, year, month, bytes, mtime_ns
+                                           de los minute.parquet de los meses de la ventana
+
+Lectura: pyarrow.memory_map + pl.from_arrow sin copia; cargar la ventana
+entera de ~5.000 tickers es abrir 20 ficheros (milisegundos), las páginas
+las trae el sistema operativo al tocarlas.
+
+update() es incremental: solo se recargan (store_query.load) los tickers
+cuyos minute.parquet de los meses de la ventana cambiaron (ruta, bytes,
+mtime; del catálogo si existe, si no os.scandir). Un día solo se reescribe
+si sus filas cambian, con nombre nuevo: un lector con el fichero anterior
+mapeado no bloquea la actualización (Windows no deja reemplazar un fichero
+mapeado); las versiones viejas se borran cuando ya nadie las tiene abiertas.
+Los días que salen de la ventana se eliminan. Ventana = últimos N días
+hábiles NYSE (market_calendar.py) hasta as_of (hoy por defecto); ampliarla
+recarga todo.
+
+Uso:
+    cache = MinuteHotCache(cache_dir)
+    cache.update(minute_root, days=20, workers=8)
+    df = cache.load()                                       # ventana completa
+    df = cache.load("2026-10-15", tickers=["AAPL"], columns=["ticker", "t", "c", "v"])
+
+CLI:
+    python scripts/utils/minute_cache.py --minute-root D:/TSIS_SmallCaps/raw/polygon/ohlcv_intraday_1m update --days 20
+    python scripts/utils/minute_cache.py --minute-root D:/TSIS_SmallCaps/raw/polygon/ohlcv_intraday_1m load
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+import pyarrow as pa
+
+from store_query import DateLike, _as_date, load as load_store
+from dataset_catalog import default_catalog_dir, read_catalog
+from hive_layout import ticker_dir, ticker_names
+from market_calendar import MARKET_TZ, trading_days
+from daily_panel import _run
+
+MANIFEST_FILE = "_cache.json"
+SOURCES_FILE = "_sources.parquet"
+STAGING_DIR = "_staging"
+LOCK_FILE = "_update.lock"
+
+DEFAULT_DAYS = 20
+TICKERS_PER_TASK = 200
+
+CACHE_SCHEMA = {"ticker": pl.Utf8, "date": pl.Date, "t": pl.Int64, "o": pl.Float64, "h": pl.Float64,
+                "l": pl.Float64, "c": pl.Float64, "v": pl.Float64, "vw": pl.Float64, "n": pl.Int64}
+SOURCES_SCHEMA = {"ticker": pl.Utf8, "path": pl.Utf8, "year": pl.Int16, "month": pl.Int8,
+                  "bytes": pl.Int64, "mtime_ns": pl.Int64}
+
+# Los ingestores escriben dos esquemas distintos (o/h/l/c vs open/high/...)
+COLUMN_ALIASES = {"open": "o", "high": "h", "low": "l", "close": "c", "volume": "v",
+                  "vwap": "vw", "transactions": "n"}
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def default_cache_dir(minute_root: Union[str, Path]) -> Path:
+    """TSIS_MINUTE_CACHE_DIR o <minute_root>/../minute_hot_cache"""
+    env = os.getenv("TSIS_MINUTE_CACHE_DIR")
+    return Path(env) if env else Path(minute_root).parent / "minute_hot_cache"
+
+def _today_et() -> dt.date:
+    now = pl.lit(dt.datetime.now(dt.timezone.utc)).dt.convert_time_zone(MARKET_TZ)
+    return pl.select(now.dt.date()).item()
+
+def window_days(days: int, as_of: DateLike = None) -> List[dt.date]:
+    """Últimos `days` días hábiles hasta as_of (hoy en ET por defecto)"""
+    end = _as_date(as_of, None) if as_of is not None else _today_et()
+    return trading_days(end - dt.timedelta(days=2 * days + 10), end)[-days:]
+
+# --------------------------------------------------------------------------
+# Ficheros fuente de los meses de la ventana
+# --------------------------------------------------------------------------
+
+def _walk_sources(minute_root: Path, months: Set[Tuple[int, int]]) -> List[Tuple]:
+    """(ticker, path, year, month, bytes, mtime_ns) de cada minute.parquet de esos meses (+ compactado)"""
+    def one(ticker: str) -> List[Tuple]:
+        out = []
+        base = ticker_dir(minute_root, ticker)
+        candidates = [(base / "minute.parquet", None, None)]
+        candidates += [(base / f"year={y}" / f"month={m:02d}" / "minute.parquet", y, m) for y, m in sorted(months)]
+        for f, y, m in candidates:
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            out.append((ticker, os.path.relpath(f, minute_root).replace("\\", "/"), y, m, st.st_size, st.st_mtime_ns))
+        return out
+
+    tickers = ticker_names(minute_root)
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        return [row for rows in ex.map(one, tickers) for row in rows]
+
+def source_files(minute_root: Union[str, Path], months: Set[Tuple[int, int]],
+                 catalog_dir: Optional[Union[str, Path]] = None) -> pl.DataFrame:
+    """minute.parquet de los meses dados y compactados por ticker (year / month nulos)"""
+    minute_root = Path(minute_root)
+    cdir = Path(catalog_dir) if catalog_dir else default_catalog_dir(minute_root)
+    files = None
+    if cdir.exists():
+        files = (read_catalog(cdir, root=minute_root)
+                   .filter(pl.col("file") == "minute.parquet")
+                   .select(list(SOURCES_SCHEMA)).collect()
+                   .cast(SOURCES_SCHEMA))
+        files = files if files.height else None
+    if files is None:
+        files = pl.DataFrame(_walk_sources(minute_root, months), schema=SOURCES_SCHEMA, orient="row")
+    return _in_months(files, months)
+
+def _in_months(files: pl.DataFrame, months: Set[Tuple[int, int]]) -> pl.DataFrame:
+    keys = pl.DataFrame(sorted(months), schema={"year": pl.Int16, "month": pl.Int8}, orient="row")
+    return pl.concat([files.filter(pl.col("year").is_null()),
+                      files.join(keys, on=["year", "month"], how="semi")]).sort(["ticker", "path"])
+
+def _signatures(files: pl.DataFrame) -> Dict[str, str]:
+    """ticker -> hash de (ruta, bytes, mtime) de sus ficheros"""
+    grouped = (files.with_columns(pl.format("{}:{}:{}", "path", "bytes", "mtime_ns").alias("_sig"))
+                    .group_by("ticker").agg(pl.col("_sig").sort()))
+    return {t: hashlib.blake2b("|".join(sig).encode(), digest_size=8).hexdigest()
+            for t, sig in grouped.iter_rows()}
+
+# --------------------------------------------------------------------------
+# Workers
+# --------------------------------------------------------------------------
+
+def _to_cache(df: pl.DataFrame) -> pl.DataFrame:
+    """Columnas y tipos de la caché; date = fecha ET de t (el store mezcla Date/Utf8 y UTC/ET)"""
+    if df.is_empty():
+        return pl.DataFrame(schema=CACHE_SCHEMA)
+    # Lotes con los dos esquemas: el scan une o y open (nulos en los ficheros del otro)
+    names = {short: [c for c in (short, full) if c in df.columns] for full, short in COLUMN_ALIASES.items()}
+    if "t" not in df.columns and "timestamp" in df.columns:
+        df = df.with_columns(pl.col("timestamp").dt.epoch("ms").alias("t"))
+    exprs = []
+    for c, dtype in CACHE_SCHEMA.items():
+        found = names.get(c, [c] if c in df.columns else [])
+        if c == "date":
+            exprs.append(pl.from_epoch(pl.col("t").cast(pl.Int64), time_unit="ms").dt.replace_time_zone("UTC")
+                           .dt.convert_time_zone(MARKET_TZ).dt.date().alias("date"))
+        elif found:
+            exprs.append(pl.coalesce([pl.col(f).cast(dtype, strict=False) for f in found]).alias(c))
+        else:
+            exprs.append(pl.lit(None, dtype=dtype).alias(c))
+    return (df.select(exprs)
+              .drop_nulls(["ticker", "t"])
+              .unique(subset=["ticker", "t"], keep="last", maintain_order=True))
+
+def _stage_tickers(minute_root: str, tickers: List[str], first: dt.date, last: dt.date, staging: str,
+                   batch: int, catalog_dir: Optional[str]) -> int:
+    """Stage: barras de la ventana de un lote de tickers, un fichero por día"""
+    # Un día de margen: la columna date del store no siempre es la fecha ET
+    df = load_store("ohlcv_1m", tickers, first - dt.timedelta(days=1), last + dt.timedelta(days=1),
+                    root=minute_root, catalog_dir=catalog_dir)
+    df = _to_cache(df).filter(pl.col("date").is_between(first, last))
+    for (day,), part in df.partition_by("date", as_dict=True).items():
+        out = Path(staging) / f"date={day}"
+        out.mkdir(parents=True, exist_ok=True)
+        part.write_ipc(out / f"batch-{batch:05d}.arrow", compression="lz4")
+    return df.height
+
+def map_ipc(path: Union[str, Path]) -> pl.DataFrame:
+    """Fichero Arrow IPC sin comprimir -> DataFrame sin copia (memory map)"""
+    with pa.memory_map(str(path)) as src:
+        table = pa.ipc.open_file(src).read_all()
+    return pl.from_arrow(table, rechunk=False)
+
+def _merge_day(cache_dir: str, day: str, current: Optional[str], staged: List[str],
+               replaced: List[str], version: str) -> Tuple[str, Optional[str], int]:
+    """Día = fichero vigente sin los tickers recargados + su staging; None si se queda vacío"""
+    old = map_ipc(Path(cache_dir) / current) if current else pl.DataFrame(schema=CACHE_SCHEMA)
+    keep = old.filter(~pl.col("ticker").is_in(replaced))
+    new = (pl.concat([pl.read_ipc(f) for f in staged], how="vertical_relaxed") if staged
+           else pl.DataFrame(schema=CACHE_SCHEMA)).sort(["ticker", "t"])
+    if current and new.equals(old.filter(pl.col("ticker").is_in(replaced)).sort(["ticker", "t"])):
+        return day, current, old.height
+    df = pl.concat([keep, new]).sort(["ticker", "t"])
+    if df.is_empty():
+        return day, None, 0
+    name = f"{day}.{version}.arrow"
+    tmp = Path(cache_dir) / (name + ".tmp")
+    df.write_ipc(tmp, compression="uncompressed")
+    os.replace(tmp, Path(cache_dir) / name)
+    return day, name, df.height
+
+# --------------------------------------------------------------------------
+
+class MinuteHotCache:
+    def __init__(self, cache_dir: Union[str, Path]):
+        self.root = Path(cache_dir)
+        try:
+            self.manifest = json.loads((self.root / MANIFEST_FILE).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.manifest = {"window": DEFAULT_DAYS, "days": {}}
+        f = self.root / SOURCES_FILE
+        self.sources = pl.read_parquet(f) if f.exists() else pl.DataFrame(schema=SOURCES_SCHEMA)
+
+    @property
+    def days(self) -> List[str]:
+        return sorted(self.manifest["days"])
+
+    def _lock(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock = self.root / LOCK_FILE
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Lock huérfano de más de 6 horas: se libera
+            if time.time() - lock.stat().st_mtime < 6 * 3600:
+                raise RuntimeError(f"Actualización de la caché en curso ({lock})")
+            lock.unlink(missing_ok=True)
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        return lock
+
+    def _save(self) -> None:
+        f = self.root / MANIFEST_FILE
+        tmp = f.with_name(MANIFEST_FILE + ".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, f)
+        f = self.root / SOURCES_FILE
+        tmp = f.with_name(SOURCES_FILE + ".tmp")
+        self.sources.write_parquet(tmp, compression="zstd")
+        os.replace(tmp, f)
+
+    def _cleanup(self) -> int:
+        """Borra versiones que ya no están en el manifest (las mapeadas en Windows se reintentan después)"""
+        live = set(self.manifest["days"].values())
+        n = 0
+        for f in self.root.glob("*.arrow*"):
+            if f.name not in live:
+                try:
+                    f.unlink()
+                    n += 1
+                except OSError:
+                    pass
+        return n
+
+    def update(self, minute_root: Union[str, Path], days: Optional[int] = None, as_of: DateLike = None,
+               workers: int = 1, catalog_dir: Optional[Union[str, Path]] = None, full: bool = False) -> int:
+        """Recarga los tickers con ficheros nuevos / modificados / borrados en la ventana; devuelve cuántos"""
+        days = days or self.manifest.get("window", DEFAULT_DAYS)
+        window = [d.isoformat() for d in window_days(days, as_of)]
+        cached = self.manifest["days"]
+        # Días de la ventana anteriores al último cacheado y que faltan: ampliación -> recarga completa
+        if cached and any(d < max(cached) and d not in cached for d in window):
+            full = True
+
+        months = {(int(d[:4]), int(d[5:7])) for d in window}
+        sources = source_files(minute_root, months, catalog_dir)
+        old = _in_months(self.sources, months) if not full else self.sources.clear()
+        new_sig, old_sig = _signatures(sources), _signatures(old)
+        changed = sorted(t for t, s in new_sig.items() if old_sig.get(t) != s)
+        removed = sorted(set(self.sources["ticker"].unique()) - set(new_sig)) if not full else []
+        dropped = [d for d in cached if d not in window]
+        if not changed and not removed and not dropped:
+            return 0
+
+        lock = self._lock()
+        staging = self.root / STAGING_DIR
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            batches = [changed[i:i + TICKERS_PER_TASK] for i in range(0, len(changed), TICKERS_PER_TASK)]
+            cdir = str(catalog_dir) if catalog_dir else None
+            first, last = dt.date.fromisoformat(window[0]), dt.date.fromisoformat(window[-1])
+            log(f"Caché 1m: {len(changed):,} tickers a recargar, {len(removed):,} eliminados, "
+                f"{len(dropped):,} días fuera de ventana ({window[0]} -> {window[-1]})")
+            rows = sum(_run(_stage_tickers, [(str(minute_root), b, first, last, str(staging), i, cdir)
+                                             for i, b in enumerate(batches)], workers, "stage"))
+
+            staged: Dict[str, List[str]] = {}
+            for d in staging.glob("date=*"):
+                staged[d.name[5:]] = sorted(str(f) for f in d.glob("*.arrow"))
+            replaced = changed + removed
+            version = f"{time.time_ns():x}"
+            current = {} if full else cached
+            todo = [d for d in window if d in staged or (d in current and replaced)]
+            merged = _run(_merge_day, [(str(self.root), d, current.get(d), staged.get(d, []), replaced, version)
+                                       for d in todo], workers, "merge")
+
+            days_map = {d: f for d, f in current.items() if d in window}
+            for d, name, _ in merged:
+                if name:
+                    days_map[d] = name
+                else:
+                    days_map.pop(d, None)
+            written = sum(1 for d, name, _ in merged if name and name != current.get(d))
+            log(f"Caché 1m: {rows:,} filas recargadas, {written:,} días reescritos")
+
+            self.manifest = {"window": days, "as_of": window[-1], "days": dict(sorted(days_map.items())),
+                             "updated": dt.datetime.now().isoformat(timespec="seconds")}
+            self.sources = sources
+            self._save()
+            self._cleanup()
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            lock.unlink(missing_ok=True)
+        return len(replaced)
+
+    def files(self, start: DateLike = None, end: DateLike = None) -> List[str]:
+        """Ficheros vigentes de los días en [start, end]"""
+        d0 = _as_date(start, dt.date(1900, 1, 1)).isoformat()
+        d1 = _as_date(end, dt.date(2999, 12, 31)).isoformat()
+        return [str(self.root / f) for d, f in sorted(self.manifest["days"].items()) if d0 <= d <= d1]
+
+    def load(self, start: DateLike = None, end: DateLike = None, tickers: Optional[Sequence[str]] = None,
+             columns: Optional[Sequence[str]] = None) -> pl.DataFrame:
+        """Barras de la ventana (mapeadas sin copia; con tickers, solo las filas de esos tickers)"""
+        frames = [map_ipc(f) for f in self.files(start, end)]
+        if not frames:
+            return pl.DataFrame(schema={c: CACHE_SCHEMA[c] for c in (columns or CACHE_SCHEMA)})
+        df = pl.concat(frames, rechunk=False)
+        if tickers is not None:
+            df = df.filter(pl.col("ticker").is_in(list(tickers)))
+        return df.select(list(columns)) if columns else df
+
+def main():
+    ap = argparse.ArgumentParser(description="Caché caliente de barras 1m de los últimos N días (Arrow IPC)")
+    ap.add_argument("--minute-root", required=True, help="Store 1m (TICKER/year=YYYY/month=MM/minute.parquet)")
+    ap.add_argument("--cache-dir", help="Directorio de la caché (default: TSIS_MINUTE_CACHE_DIR o <minute-root>/../minute_hot_cache)")
+    ap.add_argument("--catalog-dir", help="Catálogo del store 1m (default: TSIS_CATALOG_DIR o <minute-root>/_catalog)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    u = sub.add_parser("update", help="Construye / actualiza la caché (incremental)")
+    u.add_argument("--days", type=int, default=None, help=f"Días hábiles de la ventana (default: el actual o {DEFAULT_DAYS})")
+    u.add_argument("--as-of", default=None, help="Último día de la ventana (default: hoy)")
+    u.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    u.add_argument("--full", action="store_true", help="Reconstruir desde cero")
+
+    r = sub.add_parser("load", help="Carga la ventana y mide el tiempo")
+    r.add_argument("--start", default=None)
+    r.add_argument("--end", default=None)
+    r.add_argument("--tickers", nargs="+", default=None)
+    args = ap.parse_args()
+
+    cache = MinuteHotCache(args.cache_dir or default_cache_dir(args.minute_root))
+    t0 = time.time()
+    if args.cmd == "update":
+        print("=" * 80)
+        print(f"CACHÉ 1m - {args.minute_root} -> {cache.root}")
+        print("=" * 80)
+        n = cache.update(args.minute_root, args.days, args.as_of, args.workers, args.catalog_dir, args.full)
+        log(f"Caché actualizada: {n:,} tickers en {time.time() - t0:.1f}s "
+            f"({len(cache.days):,} días, {cache.manifest.get('as_of')})")
+    else:
+        df = cache.load(args.start, args.end, args.tickers)
+        log(f"{df.height:,} filas | {df['ticker'].n_unique() if df.height else 0:,} tickers | "
+            f"{len(cache.files(args.start, args.end))} días | {(time.time() - t0) * 1000:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
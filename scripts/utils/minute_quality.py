@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+minute_quality.py - Calidad de ficheros de barras 1m sin leerlos enteros
+
+verify_intraday_improved leía cada minute.parquet completo y contaba las
+barras de sesión regular cortando la columna 'minute' (hora UTC, no ET) con
+390 minutos esperados por día. Aquí cada fichero cuesta:
+
+    footer      filas (metadata) y min/max de t (estadísticas de row group)
+    scan        solo la columna t (scan lazy con proyección): barras
+                regulares por día ET frente al calendario de market_calendar
+                (390 minutos, 210 en cierre anticipado; festivos y fines de
+                semana con barras cuentan como off_days)
+
+Caché por checksum: una fila por fichero con bytes, mtime_ns y blake2b del
+contenido. Con bytes + mtime iguales no se abre el fichero; si cambiaron
+(touch, copia, migración hive con hardlinks) se recalcula el checksum y, si
+coincide con uno ya verificado, se reutiliza el resultado sin parsear. Solo
+los ficheros con contenido nuevo pasan por footer + scan.
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from minute_quality import QualityIndex, check_file, merge_cache, read_cache, write_cache
+
+    cache = read_cache(cache_path)
+    index = QualityIndex(cache)
+    rows = [check_file(root, path, index) for path in files]
+    write_cache(cache_path, merge_cache(cache, rows))
+
+Un fichero que no se puede abrir (bloqueado por otro proceso) queda como
+UNREADABLE y se reintenta en la siguiente pasada, igual que en
+scan_parquet_integrity.
+"""
+
+import os
+import datetime as dt
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import polars as pl
+
+from dataset_catalog import file_checksum, parquet_stats, parse_partition
+from market_calendar import MARKET_TZ, sessions_frame
+
+QUALITY_DIR = "_quality"
+CACHE_NAME = "minute_quality.parquet"
+
+DAY_SCHEMA = pl.Struct({"date": pl.Date, "bars": pl.Int32, "regular_bars": pl.Int32,
+                        "expected_minutes": pl.Int32})
+
+SCHEMA = {
+    "path": pl.Utf8,             # relativo a la raíz del store
+    "ticker": pl.Utf8,
+    "bytes": pl.Int64,
+    "mtime_ns": pl.Int64,
+    "checksum": pl.Utf8,
+    "status": pl.Utf8,           # OK / EMPTY / CORRUPT / UNREADABLE
+    "error": pl.Utf8,
+    "rows": pl.Int64,            # footer
+    "min_ts": pl.Int64,          # epoch ns (estadísticas)
+    "max_ts": pl.Int64,
+    "days": pl.Int32,            # días ET con barras
+    "off_days": pl.Int32,        # de ellos, sin sesión (festivo / fin de semana)
+    "regular_bars": pl.Int64,
+    "expected_minutes": pl.Int64,
+    "completeness_pct": pl.Float64,
+    "daily": pl.List(DAY_SCHEMA),
+    "checked_at": pl.Utf8,
+}
+
+def default_cache_path(root: Union[str, Path]) -> Path:
+    return Path(root) / QUALITY_DIR / CACHE_NAME
+
+def read_cache(path: Union[str, Path]) -> pl.DataFrame:
+    path = Path(path)
+    if path.exists():
+        try:
+            return pl.read_parquet(path).select(list(SCHEMA)).cast(SCHEMA)
+        except Exception:
+            pass
+    return pl.DataFrame(schema=SCHEMA)
+
+def write_cache(path: Union[str, Path], rows: pl.DataFrame) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    rows.unique("path", keep="last").sort("path").write_parquet(tmp, compression="zstd")
+    os.replace(tmp, path)
+
+def merge_cache(cache: pl.DataFrame, rows: Iterable[Dict]) -> pl.DataFrame:
+    """Caché con las filas nuevas (la última por path gana)"""
+    new = pl.DataFrame(list(rows), schema=SCHEMA)
+    return pl.concat([cache, new]).unique("path", keep="last")
+
+class QualityIndex:
+    """Consulta de la caché por path y por checksum"""
+
+    def __init__(self, cache: Optional[pl.DataFrame] = None):
+        self.by_path: Dict[str, Dict] = {}
+        self.by_checksum: Dict[str, Dict] = {}
+        if cache is not None:
+            for row in cache.iter_rows(named=True):
+                self.by_path[row["path"]] = row
+                if row["checksum"] and row["status"] in ("OK", "EMPTY"):
+                    self.by_checksum[row["checksum"]] = row
+
+def day_counts(path: Union[str, Path], min_ts: int, max_ts: int) -> pl.DataFrame:
+    """date, bars, regular_bars, expected_minutes por día ET (solo lee la columna t)"""
+    d0 = pl.from_epoch(pl.Series([min_ts, max_ts]), time_unit="ns").dt.replace_time_zone("UTC")\
+           .dt.convert_time_zone(MARKET_TZ).dt.date()
+    sessions = sessions_frame(d0[0], d0[1]).select(["date", "reg_open", "reg_close", "regular_minutes"])
+    ts_et = pl.from_epoch(pl.col("t"), time_unit="ms").dt.replace_time_zone("UTC")\
+              .dt.convert_time_zone(MARKET_TZ)
+    regular = (pl.col("mod") >= pl.col("reg_open")) & (pl.col("mod") < pl.col("reg_close"))
+    return (pl.scan_parquet(path)
+              .select(pl.col("t").cast(pl.Int64))
+              .with_columns([ts_et.dt.date().alias("date"),
+                             (ts_et.dt.hour().cast(pl.Int32) * 60 + ts_et.dt.minute().cast(pl.Int32)).alias("mod")])
+              .join(sessions.lazy(), on="date", how="left")
+              .group_by("date")
+              .agg([pl.col("t").n_unique().cast(pl.Int32).alias("bars"),
+                    # Barras duplicadas (merges antiguos) cuentan una vez
+                    pl.col("t").filter(regular).n_unique().cast(pl.Int32).alias("regular_bars"),
+                    pl.col("regular_minutes").first().fill_null(0).cast(pl.Int32).alias("expected_minutes")])
+              .sort("date")
+              .collect())
+
+def measure(path: Union[str, Path]) -> Dict:
+    """Métricas de un fichero: footer + scan de t (sin caché)"""
+    try:
+        stats = parquet_stats(path)
+        if not stats["rows"]:
+            return {"status": "EMPTY", "rows": 0, "days": 0, "off_days": 0, "regular_bars": 0,
+                    "expected_minutes": 0, "completeness_pct": 0.0, "daily": []}
+        if stats["min_ts"] is None:
+            raise ValueError("sin columna t")
+        per_day = day_counts(path, stats["min_ts"], stats["max_ts"])
+    except Exception as e:
+        return {"status": "CORRUPT", "error": " ".join(str(e).split())[:300]}
+    expected = int(per_day["expected_minutes"].sum())
+    regular = int(per_day["regular_bars"].sum())
+    return {
+        "status": "OK",
+        "rows": stats["rows"],
+        "min_ts": stats["min_ts"],
+        "max_ts": stats["max_ts"],
+        "days": per_day.height,
+        "off_days": per_day.filter(pl.col("expected_minutes") == 0).height,
+        "regular_bars": regular,
+        "expected_minutes": expected,
+        "completeness_pct": round(regular / expected * 100, 1) if expected else 0.0,
+        "daily": per_day.to_dicts(),
+    }
+
+def check_file(root: Union[str, Path], path: Union[str, Path], index: QualityIndex,
+               rescan: bool = False) -> Dict:
+    """
+    Fila de caché de un fichero: reutiliza la anterior si bytes + mtime o el
+    checksum no cambiaron; si no, footer + scan de t
+    """
+    path = Path(path)
+    rel = os.path.relpath(path, root).replace("\\", "/")
+    st = path.stat()
+    prev = index.by_path.get(rel)
+    now = dt.datetime.now().isoformat(timespec="seconds")
+    base = {**{k: None for k in SCHEMA}, "path": rel, "ticker": parse_partition(rel)["ticker"],
+            "bytes": st.st_size, "mtime_ns": st.st_mtime_ns, "checked_at": now}
+    if (prev and not rescan and prev["bytes"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns
+            and prev["status"] != "UNREADABLE"):
+        return prev
+    try:
+        checksum = file_checksum(path)
+    except OSError as e:
+        return {**base, "status": "UNREADABLE", "error": " ".join(str(e).split())[:300]}
+    same = index.by_checksum.get(checksum)
+    if same and not rescan:
+        return {**same, "path": rel, "ticker": base["ticker"], "bytes": st.st_size,
+                "mtime_ns": st.st_mtime_ns, "checksum": checksum}
+    row = {**base, "checksum": checksum, **measure(path)}
+    if row["status"] in ("OK", "EMPTY"):
+        index.by_checksum[checksum] = row
+    return row
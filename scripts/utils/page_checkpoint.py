@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+page_checkpoint.py - Checkpoint por PÁGINA para descargas paginadas de un día
+
+Los días pesados de trades/quotes tienen decenas de páginas de 50K filas.
+En vez de acumular todo en RAM, cada página se escribe como part file y el
+cursor (next_url sin apiKey) se persiste después. Un reintento continúa
+desde la última página confirmada y el día solo se da por completo cuando
+llega la última página (next_url vacío).
+
+Layout dentro del directorio del día:
+    day_dir/_parts/page_00000.parquet.part
+    day_dir/_parts/page_00001.parquet.part
+    day_dir/_parts/_cursor.json   {"next_url": ..., "pages": N, "rows": R, "done": bool}
+
+La extensión .part evita que los escaneos *.parquet del store lean páginas sueltas.
+
+Uso:
+    ckpt = PageCheckpoint(day_dir)
+    next_url, page = ckpt.resume()
+    while True:
+        data = fetch(next_url)
+        next_url = data.get("next_url")
+        ckpt.write_page(pl.DataFrame(data["results"]), next_url)
+        if not next_url:
+            break
+    df = ckpt.read_all()          # escribir el fichero final
+    ckpt.clear()                  # y solo entonces borrar los parts
+"""
+
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import polars as pl
+
+PARTS_DIR = "_parts"
+CURSOR_FILE = "_cursor.json"
+
+def strip_api_key(url: Optional[str]) -> Optional[str]:
+    """Quita apiKey de una URL para no persistir la key en disco"""
+    if not url:
+        return url
+    url = re.sub(r"([?&])apiKey=[^&]*&?", r"\1", url)
+    return url.rstrip("?&")
+
+class PageCheckpoint:
+    def __init__(self, day_dir: Union[str, Path]):
+        self.day_dir = Path(day_dir)
+        self.parts_dir = self.day_dir / PARTS_DIR
+        self.cursor_file = self.parts_dir / CURSOR_FILE
+        self.state = self._load()
+
+    def _load(self) -> dict:
+        if self.cursor_file.exists():
+            try:
+                with open(self.cursor_file, "r") as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {"next_url": None, "pages": 0, "rows": 0, "done": False}
+
+    def _page_path(self, page: int) -> Path:
+        return self.parts_dir / f"page_{page:05d}.parquet.part"
+
+    @property
+    def pages(self) -> int:
+        return self.state["pages"]
+
+    @property
+    def rows(self) -> int:
+        return self.state["rows"]
+
+    def has_progress(self) -> bool:
+        return self.state["pages"] > 0
+
+    def is_complete(self) -> bool:
+        return bool(self.state.get("done"))
+
+    def resume(self) -> Tuple[Optional[str], int]:
+        """
+        Devuelve (next_url, páginas ya confirmadas).
+
+        next_url es None si no hay progreso (empezar desde la primera página).
+        Los parts sin confirmar en el cursor (crash entre escribir la página y
+        el cursor) se descartan.
+        """
+        if self.parts_dir.exists():
+            for p in self.parts_dir.glob("page_*.parquet.part*"):
+                m = re.match(r"page_(\d+)\.parquet\.part$", p.name)
+                if m is None or int(m.group(1)) >= self.state["pages"]:
+                    p.unlink(missing_ok=True)
+        return self.state["next_url"], self.state["pages"]
+
+    def write_page(self, df: pl.DataFrame, next_url: Optional[str]) -> None:
+        """Escribe la página actual y luego avanza el cursor (ambos atómicos)"""
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        page = self.state["pages"]
+
+        if df.height > 0:
+            target = self._page_path(page)
+            tmp = target.with_name(target.name + ".tmp")
+            df.write_parquet(tmp, compression="zstd", compression_level=1, statistics=False)
+            os.replace(tmp, target)
+
+        self.state = {
+            "next_url": strip_api_key(next_url),
+            "pages": page + 1,
+            "rows": self.state["rows"] + df.height,
+            "done": not next_url,
+        }
+        tmp = self.cursor_file.with_name(CURSOR_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.cursor_file)
+
+    def part_files(self) -> List[Path]:
+        if not self.parts_dir.exists():
+            return []
+        return sorted(self.parts_dir.glob("page_*.parquet.part"))
+
+    def read_all(self) -> pl.DataFrame:
+        """Concatena las páginas confirmadas en orden (esquemas distintos -> diagonal)"""
+        files = self.part_files()
+        if not files:
+            return pl.DataFrame()
+        return pl.concat([pl.read_parquet(f) for f in files], how="diagonal_relaxed")
+
+    def clear(self) -> None:
+        """Borra parts y cursor; llamar SOLO tras escribir el fichero final"""
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        self.state = {"next_url": None, "pages": 0, "rows": 0, "done": False}
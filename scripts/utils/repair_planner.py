@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+repair_planner.py - Planificador de reparaciones: huecos de cobertura -> cola de descarga
+
+Cierra el ciclo verificador -> CSV -> ingestor a mano: compara la cobertura
+esperada (barras del store daily en días hábiles de market_calendar) con la
+presente y encola los huecos directamente en la cola del state store que
+consume el downloader del dataset. Un ciclo de reparación es un comando.
+
+    trades / quotes   días presentes por listado del árbol (o --ticks-catalog),
+                      ver tick_coverage.py; hueco = día sin market / quotes.parquet
+    ohlcv_1m          barras por día ET de cada minute.parquet (minute_quality.py,
+                      con su caché por checksum; también el TICKER/minute.parquet
+                      de compact_small_files.py); hueco = día sin barras
+                      regulares o por debajo de --min-day-pct de los minutos
+                      de sesión
+
+Los huecos de cada ticker se agrupan en ventanas sobre días hábiles al menor
+número de requests: un hueco se une a la ventana anterior si es contiguo o
+si ampliarla cuesta menos requests que abrir otra. Coste por ventana:
+ceil(días / días por request), con 1 día por request en ticks (la API pagina
+por día) y 50000 // 960 días en agregados 1m (límite de barras por respuesta,
+sesión extendida 04:00-20:00); volver a bajar días ya presentes dentro de una
+ventana 1m es gratis en requests.
+
+Cola (StateStore.enqueue, la mayor prioridad gana si ya estaba en cola):
+    trades     (ticker, YYYY-MM-DD)          ingest_missing_ticks.py --queue
+    quotes     (ticker, YYYY-MM-DD)          download_quotes_ultra_fast.py --queue
+    ohlcv_1m   (ticker, YYYY-MM-DD:YYYY-MM-DD) ingest_ohlcv_intraday_minute.py --queue
+
+Un día marcado done en el state store pero ausente en disco (borrado,
+cuarentena) pasa a 'missing' para poder encolarlo. Una ventana 1m ya
+descargada (done) que sigue incompleta no se vuelve a pedir: queda en el plan
+como 'irreparable' (Polygon no tiene esas barras) salvo con --retry-done.
+
+Salida: <root>/_repair/repair_plan.parquet (ventanas del ciclo: ticker,
+start, end, trading_days, missing_days, requests, period, state). En ticks
+las ventanas son tramos contiguos de días faltantes y solo informan: la cola
+recibe un item por día.
+
+Uso:
+    python scripts/utils/repair_planner.py --dataset trades \
+        --root C:/TSIS_Data/trades_ticks_2004_2018 --daily-root D:/ohlcv_daily \
+        --start 2004-01-01 --end 2018-12-31 --workers 16 --download
+
+    python scripts/utils/repair_planner.py --dataset ohlcv_1m --root D:/ohlcv_intraday_1m \
+        --daily-root D:/ohlcv_daily --min-day-pct 20 --dry-run
+"""
+
+import sys
+import shlex
+import argparse
+import subprocess
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import polars as pl
+
+from daily_panel import _run
+from hive_layout import ticker_dir, ticker_names
+from market_calendar import trading_days
+from minute_quality import QualityIndex, check_file, default_cache_path, merge_cache, read_cache, write_cache
+from state_store import DONE, StateStore, default_state_db
+from store_query import packed_files
+from tick_coverage import Range, coverage_batch, expected_days
+
+SCRIPTS = Path(__file__).resolve().parents[1]
+
+# Consumidor de la cola de cada dataset (script, argumentos para --root / --state-db)
+CONSUMERS = {
+    "trades": (SCRIPTS / "01_agregation_OHLCV" / "ingest_missing_ticks.py", "--outdir"),
+    "quotes": (SCRIPTS / "02_final" / "download_quotes_ultra_fast.py", "--output"),
+    "ohlcv_1m": (SCRIPTS / "01_agregation_OHLCV" / "ingest_ohlcv_intraday_minute.py", "--outdir"),
+}
+# Días hábiles que cubre un request (ver docstring)
+DAYS_PER_REQUEST = {"trades": 1, "quotes": 1, "ohlcv_1m": 50000 // 960}
+MAX_WINDOW = 366
+
+REPAIR_DIR = "_repair"
+PLAN_FILE = "repair_plan.parquet"
+TICKERS_PER_TASK = 200
+# Estado del state store para días done que ya no están en disco (no final)
+STATE_MISSING = "missing"
+UNREPAIRABLE = "irreparable"
+
+GAPS_SCHEMA = {"ticker": pl.Utf8, "date": pl.Utf8}
+PLAN_SCHEMA = {"ticker": pl.Utf8, "start": pl.Utf8, "end": pl.Utf8, "trading_days": pl.Int32,
+               "missing_days": pl.Int32, "requests": pl.Int32, "period": pl.Utf8, "state": pl.Utf8}
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+# --------------------------------------------------------------------------
+# Huecos por lote de tickers (workers)
+# --------------------------------------------------------------------------
+
+def _on_calendar(df: pl.DataFrame, start: str, end: str) -> pl.DataFrame:
+    """Filas (ticker, date) en días hábiles de [start, end]"""
+    days = [d.isoformat() for d in trading_days(dt.date.fromisoformat(start), dt.date.fromisoformat(end))]
+    return df.filter(pl.col("date").is_in(days))
+
+def tick_gaps(ranges: Sequence[Range], daily_root: str, root: str, catalog_dir: Optional[str] = None,
+              ticks_catalog: Optional[str] = None) -> pl.DataFrame:
+    """ticker, date con barra daily y sin fichero de ticks del día"""
+    days = coverage_batch(daily_root, root, ranges, catalog_dir, ticks_catalog)
+    return days.filter(pl.col("daily") & ~pl.col("market")).select(list(GAPS_SCHEMA))
+
+def minute_gaps(ranges: Sequence[Range], daily_root: str, root: str, catalog_dir: Optional[str] = None,
+                cache_path: Optional[str] = None, min_day_pct: float = 0.0
+                ) -> Tuple[pl.DataFrame, List[Dict]]:
+    """
+    ticker, date con barra daily y sin barras regulares suficientes en el
+    minute.parquet del mes (o en el compactado del ticker), más las filas
+    nuevas de la caché de calidad
+    """
+    expected = expected_days(daily_root, ranges, catalog_dir)
+    tickers = [r[0] for r in ranges]
+    cache = (pl.scan_parquet(cache_path).filter(pl.col("ticker").is_in(tickers)).collect()
+             if cache_path and Path(cache_path).exists() else None)
+    index = QualityIndex(cache)
+    rows, present = [], []
+    # Compactado por ticker: un check_file cubre todos sus meses; los meses
+    # sueltos posteriores se miden aparte y un día basta con estar en uno
+    files = [(ticker, Path(f)) for ticker, (f, _) in packed_files("ohlcv_1m", root, tickers).items()]
+    months = expected.select(["ticker", pl.col("date").str.slice(0, 7).alias("ym")]).unique()
+    for ticker, ym in months.iter_rows():
+        path = ticker_dir(root, ticker) / f"year={ym[:4]}" / f"month={ym[5:]}" / "minute.parquet"
+        if path.exists():
+            files.append((ticker, path))
+    for ticker, path in files:
+        row = check_file(root, path, index)
+        rows.append(row)
+        for day in row["daily"] or []:
+            if day["expected_minutes"] and day["regular_bars"] > 0 \
+                    and day["regular_bars"] * 100 >= min_day_pct * day["expected_minutes"]:
+                present.append((ticker, day["date"].isoformat()))
+    found = pl.DataFrame(present, schema=GAPS_SCHEMA, orient="row")
+    return expected.join(found, on=["ticker", "date"], how="anti"), rows
+
+def plan_batch(dataset: str, ranges: Sequence[Range], daily_root: str, root: str,
+               catalog_dir: Optional[str], ticks_catalog: Optional[str], cache_path: Optional[str],
+               min_day_pct: float) -> Tuple[pl.DataFrame, List[Dict]]:
+    """Worker: huecos (ticker, date) de un lote en días hábiles"""
+    start = min(r[1] for r in ranges)
+    end = max(r[2] for r in ranges)
+    if dataset == "ohlcv_1m":
+        gaps, rows = minute_gaps(ranges, daily_root, root, catalog_dir, cache_path, min_day_pct)
+    else:
+        gaps, rows = tick_gaps(ranges, daily_root, root, catalog_dir, ticks_catalog), []
+    return _on_calendar(gaps, start, end).sort(["ticker", "date"]), rows
+
+# --------------------------------------------------------------------------
+# Ventanas
+# --------------------------------------------------------------------------
+
+def _cost(days: int, per_request: int) -> int:
+    return -(-days // per_request)
+
+def coalesce(idxs: Sequence[int], per_request: int, max_window: int) -> List[Tuple[int, int, int]]:
+    """
+    (primero, último, huecos) sobre índices de días hábiles ordenados: añade
+    cada hueco a la ventana abierta si es contiguo o si la ventana ampliada
+    cuesta menos requests que abrir otra
+    """
+    windows: List[List[int]] = []
+    for i in idxs:
+        if windows:
+            a, b, n = windows[-1]
+            span = i - a + 1
+            if span <= max_window and (i == b + 1 or
+                                       _cost(span, per_request) < _cost(b - a + 1, per_request) + 1):
+                windows[-1] = [a, i, n + 1]
+                continue
+        windows.append([i, i, 1])
+    return [tuple(w) for w in windows]
+
+def build_plan(gaps: pl.DataFrame, dataset: str, max_window: int) -> pl.DataFrame:
+    """Ventanas por ticker (sin estado de cola)"""
+    if gaps.height == 0:
+        return pl.DataFrame(schema=PLAN_SCHEMA)
+    lo, hi = gaps["date"].min(), gaps["date"].max()
+    calendar = [d.isoformat() for d in trading_days(dt.date.fromisoformat(lo), dt.date.fromisoformat(hi))]
+    position = {d: i for i, d in enumerate(calendar)}
+    per_request = DAYS_PER_REQUEST[dataset]
+    rows = []
+    for (ticker,), g in gaps.group_by("ticker", maintain_order=True):
+        idxs = sorted(position[d] for d in g["date"].to_list())
+        for a, b, n in coalesce(idxs, per_request, max_window):
+            start, end = calendar[a], calendar[b]
+            rows.append((ticker, start, end, b - a + 1, n, _cost(b - a + 1, per_request),
+                          f"{start}:{end}", None))
+    return pl.DataFrame(rows, schema=PLAN_SCHEMA, orient="row").sort(["ticker", "start"])
+
+# --------------------------------------------------------------------------
+# Cola
+# --------------------------------------------------------------------------
+
+def enqueue_plan(store: StateStore, dataset: str, plan: pl.DataFrame, gaps: pl.DataFrame,
+                 priority: float, retry_done: bool) -> pl.DataFrame:
+    """
+    Encola el plan y devuelve su columna state (queued / irreparable). Ticks:
+    un item por día con hueco; 1m: un item por ventana.
+    """
+    done = store.keys(dataset, [DONE])
+    source = f"repair_{dt.date.today():%Y%m%d}"
+    if DAYS_PER_REQUEST[dataset] == 1:
+        keys = list(gaps.select(["ticker", "date"]).iter_rows())
+        stale = [k for k in keys if k in done]
+        # Done en el state store pero ausente en disco: vuelve a ser descargable
+        store.mark_many({"dataset": dataset, "ticker": t, "period": d, "status": STATE_MISSING,
+                         "meta": {"source": source}} for t, d in stale)
+        if stale:
+            log(f"  {len(stale):,} días done sin fichero -> '{STATE_MISSING}'")
+        n = store.enqueue(dataset, ((t, d, priority) for t, d in keys), source=source)
+        log(f"  Encolados/actualizados: {n:,} días")
+        return plan.with_columns(pl.lit("queued").alias("state"))
+
+    repeated = {k for k in plan.select(["ticker", "period"]).iter_rows() if k in done}
+    if retry_done and repeated:
+        store.mark_many({"dataset": dataset, "ticker": t, "period": p, "status": STATE_MISSING,
+                         "meta": {"source": source}} for t, p in repeated)
+        repeated = set()
+    items = [(t, p, priority) for t, p in plan.select(["ticker", "period"]).iter_rows()
+             if (t, p) not in repeated]
+    n = store.enqueue(dataset, items, source=source)
+    log(f"  Encoladas/actualizadas: {n:,} ventanas | ya descargadas e incompletas: {len(repeated):,}")
+    state = [UNREPAIRABLE if k in repeated else "queued" for k in plan.select(["ticker", "period"]).iter_rows()]
+    return plan.with_columns(pl.Series("state", state, dtype=pl.Utf8))
+
+def run_consumer(dataset: str, root: str, state_db: Path, extra: str) -> int:
+    """Lanza el downloader del dataset consumiendo la cola (bloquea hasta que termina)"""
+    script, root_flag = CONSUMERS[dataset]
+    cmd = [sys.executable, str(script), "--queue", root_flag, str(root), "--state-db", str(state_db),
+           *shlex.split(extra or "")]
+    log(f"Descarga: {' '.join(cmd)}")
+    return subprocess.run(cmd).returncode
+
+# --------------------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------------------
+
+def load_tickers(args) -> List[str]:
+    if args.tickers_csv:
+        df = pl.read_parquet(args.tickers_csv) if args.tickers_csv.endswith(".parquet") \
+            else pl.read_csv(args.tickers_csv)
+        return sorted(df["ticker"].drop_nulls().unique().to_list())
+    return ticker_names(args.daily_root)
+
+def main():
+    ap = argparse.ArgumentParser(description="Planifica y encola reparaciones de cobertura")
+    ap.add_argument("--dataset", required=True, choices=sorted(CONSUMERS))
+    ap.add_argument("--root", required=True, help="Raíz del store a reparar")
+    ap.add_argument("--daily-root", required=True, help="Store daily (días esperados)")
+    ap.add_argument("--tickers-csv", help="CSV/Parquet con columna ticker (default: tickers del daily)")
+    ap.add_argument("--start", default="2004-01-01", help="Primer día (default: 2004-01-01)")
+    ap.add_argument("--end", help="Último día (default: hoy - --settle-days)")
+    ap.add_argument("--settle-days", type=int, default=1,
+                    help="Días recientes que no se reparan todavía (default: 1)")
+    ap.add_argument("--catalog-dir", help="Catálogo del store daily (sin listar su árbol)")
+    ap.add_argument("--ticks-catalog", help="Catálogo del store de ticks (sin listar su árbol)")
+    ap.add_argument("--quality-cache", help="Caché de minute_quality (default: <root>/_quality/minute_quality.parquet)")
+    ap.add_argument("--min-day-pct", type=float, default=0.0,
+                    help="ohlcv_1m: %% mínimo de minutos regulares con barra para dar el día por presente")
+    ap.add_argument("--max-window", type=int, help=f"Días hábiles máximos por ventana (default: {MAX_WINDOW})")
+    ap.add_argument("--state-db", help="SQLite de estado (default: TSIS_STATE_DB o <root>/_state.sqlite)")
+    ap.add_argument("--priority", type=float, default=100.0, help="Prioridad en cola (default: 100)")
+    ap.add_argument("--retry-done", action="store_true",
+                    help="ohlcv_1m: volver a encolar ventanas ya descargadas que siguen incompletas")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--out", help=f"Plan en parquet (default: <root>/{REPAIR_DIR}/{PLAN_FILE})")
+    ap.add_argument("--dry-run", action="store_true", help="Solo calcular y escribir el plan")
+    ap.add_argument("--download", action="store_true", help="Lanzar el downloader sobre la cola al terminar")
+    ap.add_argument("--download-args", default="", help="Argumentos extra del downloader (entre comillas)")
+    args = ap.parse_args()
+
+    end = args.end or (dt.date.today() - dt.timedelta(days=args.settle_days)).isoformat()
+    state_db = Path(args.state_db) if args.state_db else default_state_db(args.root)
+    cache_path = Path(args.quality_cache) if args.quality_cache else default_cache_path(args.root)
+    max_window = args.max_window or MAX_WINDOW
+    t0 = dt.datetime.now()
+
+    log("=" * 80)
+    log(f"PLAN DE REPARACIÓN {args.dataset}: {args.start} -> {end}")
+    log("=" * 80)
+
+    tickers = load_tickers(args)
+    log(f"Tickers: {len(tickers):,}")
+    tasks = [(args.dataset, [(t, args.start, end) for t in tickers[i:i + TICKERS_PER_TASK]],
+              args.daily_root, args.root, args.catalog_dir, args.ticks_catalog,
+              str(cache_path) if args.dataset == "ohlcv_1m" else None, args.min_day_pct)
+             for i in range(0, len(tickers), TICKERS_PER_TASK)]
+    results = _run(plan_batch, tasks, args.workers, "lotes")
+
+    gaps = pl.concat([r[0] for r in results]) if results else pl.DataFrame(schema=GAPS_SCHEMA)
+    quality_rows = [row for r in results for row in r[1]]
+    if quality_rows:
+        write_cache(cache_path, merge_cache(read_cache(cache_path), quality_rows))
+
+    plan = build_plan(gaps, args.dataset, max_window)
+    log(f"Huecos: {gaps.height:,} ticker-días en {gaps['ticker'].n_unique() if gaps.height else 0:,} tickers "
+        f"-> {plan.height:,} ventanas, {int(plan['requests'].sum() or 0):,} requests estimados")
+
+    if not args.dry_run and plan.height:
+        store = StateStore(state_db)
+        try:
+            plan = enqueue_plan(store, args.dataset, plan, gaps, args.priority, args.retry_done)
+            counts = store.queue_counts(args.dataset)
+            log(f"Cola '{args.dataset}' en {store.path}: {counts['pending']:,} pendientes, "
+                f"{counts['leased']:,} reclamados")
+        finally:
+            store.close()
+
+    out = Path(args.out) if args.out else Path(args.root) / REPAIR_DIR / PLAN_FILE
+    out.parent.mkdir(parents=True, exist_ok=True)
+    plan.write_parquet(out)
+    log(f"Plan: {out}")
+    log(f"Tiempo: {(dt.datetime.now() - t0).total_seconds():.1f}s")
+
+    if args.download and not args.dry_run:
+        code = run_consumer(args.dataset, args.root, state_db, args.download_args)
+        if code:
+            sys.exit(code)
+
+if __name__ == "__main__":
+    main()
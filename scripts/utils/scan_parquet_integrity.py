@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+scan_parquet_integrity.py - Escaneo paralelo de integridad de los parquet de un store
+
+verify_ticks_vs_daily, quotes_phased_strategy, identify_high_priority_quotes
+y compañía capturan CRC / PermissionError al leer y hacen `continue`: un
+fichero truncado o corrupto reduce la cobertura sin que nadie se entere.
+Este escáner los localiza sin leer datos:
+
+    magic     > 12 bytes, 'PAR1' al principio y al final, footer dentro del fichero
+    footer    thrift del footer (row groups y column chunks dentro del fichero,
+              suma de filas de los row groups = filas del fichero)
+    pages     (--pages) descomprime todas las páginas de cada row group y
+              verifica su CRC si el writer lo guardó
+    checksum  (--checksum) blake2b del contenido frente al checksum del
+              catálogo (solo ficheros con el mismo bytes + mtime catalogados)
+
+Por defecto solo magic + footer: una apertura y dos lecturas pequeñas por
+fichero, así que el coste lo pone el listado de directorios (repartido por
+ticker entre --workers threads; pyarrow suelta el GIL). Los ficheros sin
+cambios (bytes + mtime) desde el último escaneo no se vuelven a abrir salvo
+con --rescan.
+
+Los ficheros que no se pueden abrir (PermissionError, bloqueados por otro
+proceso en Windows) quedan como 'ilegible' y se reintentan en la siguiente
+pasada; no se consideran corruptos. Los modificados hace menos de
+--min-age-minutes se ignoran (escritura en curso).
+
+Salida en <root>/_integrity/:
+    scan.parquet     último resultado por fichero (path relativo, bytes, mtime_ns,
+                     rows, status, error, pages, checksum, checked_at)
+    quarantine.csv   corruptos del último escaneo: dataset, ticker, date, period,
+                     path, bytes, status, error, detected_at, moved_to, priority_score
+                     (ticker,date,priority_score: entra tal cual en enqueue_quotes.py --csv)
+
+--quarantine mueve los corruptos a <root>/_quarantine/<run>/<ruta relativa>
+para que los ingestores los vuelvan a descargar (sin el fichero y, en trades,
+sin _SUCCESS del día), los da de baja en el catálogo y, en quotes, marca el
+día como 'corrupt' en el state store y lo encola con --priority. Un fichero
+compactado del mes (compact_small_files.py) arrastra al resto de compactados
+del mes y a su _COMPACTED.json: todos sus días vuelven a descargarse.
+
+Uso:
+    python scripts/utils/scan_parquet_integrity.py --dataset trades \
+        --root C:/TSIS_Data/trades_ticks_2019_2025 --workers 32
+    python scripts/utils/scan_parquet_integrity.py --dataset quotes --quarantine --priority 500
+    python scripts/utils/scan_parquet_integrity.py --dataset ohlcv_daily --pages --checksum --rescan
+"""
+
+import os
+import sys
+import time
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from store_query import DATASETS, MANIFEST, compact_names, dataset_root, is_compacted, read_manifest
+from dataset_catalog import (CatalogWriter, default_catalog_dir, file_checksum, parse_partition,
+                             read_catalog)
+from state_store import StateStore, default_state_db
+from hive_layout import ticker_dir, ticker_names
+
+MAGIC = b"PAR1"
+INTEGRITY_DIR = "_integrity"
+QUARANTINE_DIR = "_quarantine"
+SCAN_FILE = "scan.parquet"
+QUARANTINE_FILE = "quarantine.csv"
+MIN_AGE_MINUTES = 30
+PRIORITY = 500.0  # por encima de cualquier fase de quotes_phased_strategy (P99 = 400 + 100)
+
+OK = "ok"
+UNREADABLE = "ilegible"
+# Estados que van a cuarentena
+CORRUPT = ("vacio", "magic", "truncado", "footer", "paginas", "checksum")
+# Estado del state store para días en cuarentena (no final: done_keys() no lo incluye)
+STATE_CORRUPT = "corrupt"
+
+SCAN_SCHEMA = {
+    "path": pl.Utf8,
+    "bytes": pl.Int64,
+    "mtime_ns": pl.Int64,
+    "rows": pl.Int64,
+    "status": pl.Utf8,
+    "error": pl.Utf8,
+    "pages": pl.Boolean,
+    "checksum": pl.Boolean,
+    "checked_at": pl.Utf8,
+}
+
+Entry = Tuple[str, int, int]  # path, bytes, mtime_ns
+
+def log(msg):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def _err(e: Exception) -> str:
+    return " ".join(str(e).split())[:300] or type(e).__name__
+
+def check_file(path: str, size: int, pages: bool = False,
+               expected_checksum: Optional[str] = None) -> Tuple[str, Optional[str], Optional[int]]:
+    """(status, error, rows) de un parquet; solo lee cabecera y footer salvo pages / checksum"""
+    if size == 0:
+        return "vacio", "0 bytes", None
+    if size <= 12:
+        return "truncado", f"{size} bytes", None
+    try:
+        with open(path, "rb") as f:
+            head = f.read(4)
+            f.seek(-8, os.SEEK_END)
+            tail = f.read(8)
+            if head != MAGIC:
+                return "magic", f"cabecera {head!r}", None
+            if tail[4:] != MAGIC:
+                return "truncado", "sin PAR1 final (escritura incompleta)", None
+            footer_len = int.from_bytes(tail[:4], "little")
+            if footer_len + 12 > size:
+                return "truncado", f"footer de {footer_len:,} bytes en fichero de {size:,}", None
+            f.seek(0)
+            try:
+                md = pq.read_metadata(f)
+            except Exception as e:
+                return "footer", _err(e), None
+    except OSError as e:
+        # PermissionError / fichero bloqueado: se reintenta en la siguiente pasada
+        return UNREADABLE, _err(e), None
+
+    data_end = size - 8 - footer_len
+    rg_rows = 0
+    for i in range(md.num_row_groups):
+        rg = md.row_group(i)
+        rg_rows += rg.num_rows
+        for j in range(rg.num_columns):
+            col = rg.column(j)
+            start = col.data_page_offset
+            if col.has_dictionary_page and col.dictionary_page_offset:
+                start = min(start, col.dictionary_page_offset)
+            if start < 4 or start + col.total_compressed_size > data_end:
+                return "footer", f"row group {i} columna {col.path_in_schema} fuera del fichero", md.num_rows
+    if rg_rows != md.num_rows:
+        return "footer", f"row groups suman {rg_rows:,} filas, footer dice {md.num_rows:,}", md.num_rows
+
+    if pages:
+        try:
+            pf = pq.ParquetFile(path, page_checksum_verification=True)
+            for i in range(pf.num_row_groups):
+                pf.read_row_group(i)
+        except PermissionError as e:
+            return UNREADABLE, _err(e), md.num_rows
+        except Exception as e:
+            return "paginas", _err(e), md.num_rows
+
+    if expected_checksum:
+        try:
+            actual = file_checksum(path)
+        except OSError as e:
+            return UNREADABLE, _err(e), md.num_rows
+        if actual != expected_checksum:
+            return "checksum", f"blake2b {actual} != catálogo {expected_checksum}", md.num_rows
+    return OK, None, md.num_rows
+
+def _walk(base: str) -> List[Entry]:
+    """Parquets bajo un ticker (os.scandir; ignora _*, .* y temporales)"""
+    out, stack = [], [base]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.name.startswith(("_", ".")):
+                    continue
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.name.endswith(".parquet"):
+                        st = e.stat()
+                        out.append((e.path, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+    return out
+
+def scan_ticker(root: Path, ticker: str, previous: Dict[str, Dict], checksums: Dict[str, Tuple[int, int, str]],
+                pages: bool, checksum: bool, rescan: bool, cutoff_ns: int) -> List[Dict]:
+    """Resultado por fichero de un ticker (reutiliza el escaneo anterior si no cambió)"""
+    out = []
+    now = dt.datetime.now().isoformat(timespec="seconds")
+    for path, size, mtime_ns in _walk(str(ticker_dir(root, ticker))):
+        if mtime_ns > cutoff_ns:
+            continue
+        rel = os.path.relpath(path, root).replace("\\", "/")
+        prev = previous.get(rel)
+        # Sin cambios: un corrupto lo sigue siendo; un ok vale si se verificó al mismo nivel
+        if (prev and not rescan and prev["bytes"] == size and prev["mtime_ns"] == mtime_ns
+                and (prev["status"] in CORRUPT
+                     or (prev["status"] == OK and (prev["pages"] or not pages)
+                         and (prev["checksum"] or not checksum)))):
+            out.append(prev)
+            continue
+        expected = None
+        if checksum:
+            cat = checksums.get(rel)
+            if cat and cat[0] == size and cat[1] == mtime_ns:
+                expected = cat[2]
+        status, error, rows = check_file(path, size, pages, expected)
+        out.append({"path": rel, "bytes": size, "mtime_ns": mtime_ns, "rows": rows, "status": status,
+                    "error": error, "pages": pages, "checksum": expected is not None, "checked_at": now})
+    return out
+
+def _period(rel: str) -> Dict:
+    """ticker, date (YYYY-MM-DD si es un día) y period según la partición del fichero"""
+    p = parse_partition(rel)
+    year, month, day = p["year"], p["month"], p["day"]
+    date = f"{year:04d}-{month:02d}-{day:02d}" if year and month and day else None
+    if date:
+        period = date
+    elif year and month:
+        period = f"{year:04d}-{month:02d}"
+    else:
+        period = str(year) if year else ""
+    return {"ticker": p["ticker"], "date": date, "period": period}
+
+def quarantine_rows(dataset: str, root: Path, corrupt: pl.DataFrame, priority: float) -> List[Dict]:
+    """Filas de quarantine.csv; un compactado de mes se expande a los días de su manifiesto"""
+    rows = []
+    now = dt.datetime.now().isoformat(timespec="seconds")
+    for r in corrupt.iter_rows(named=True):
+        base = {"dataset": dataset, "path": r["path"], "bytes": r["bytes"], "status": r["status"],
+                "error": r["error"], "detected_at": now, "moved_to": None, "priority_score": priority}
+        key = _period(r["path"])
+        days = []
+        if is_compacted(dataset, r["path"]) and DATASETS[dataset]["compact_level"] == "month":
+            days = sorted(read_manifest((root / r["path"]).parent).get("days", []))
+        for day in days or [key["date"]]:
+            rows.append({**base, "ticker": key["ticker"], "date": day,
+                         "period": day or key["period"]})
+    return rows
+
+def move_to_quarantine(dataset: str, root: Path, rel: str, dest_root: Path) -> List[str]:
+    """Mueve un fichero corrupto (y lo que arrastra) bajo dest_root; devuelve las rutas movidas"""
+    src = root / rel
+    group = [src]
+    if is_compacted(dataset, rel) and DATASETS[dataset]["compact_level"] == "month":
+        # El mes compactado va entero: sin manifiesto sus días vuelven a descargarse
+        names = set(compact_names(dataset, DATASETS[dataset]["files"]))
+        group = [p for p in src.parent.iterdir()
+                 if p.name == MANIFEST or p.name in names or (dataset == "quotes" and p.name.startswith("nbbo"))]
+    moved = []
+    for p in group:
+        if not p.exists():
+            continue
+        dest = dest_root / os.path.relpath(p, root)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(p, dest)
+        moved.append(str(p))
+    # Trades: sin _SUCCESS el ingestor re-descarga el día
+    success = src.parent / "_SUCCESS"
+    if dataset == "trades" and success.exists():
+        success.unlink()
+    return moved
+
+def report(df: pl.DataFrame, elapsed: float, reused: int) -> None:
+    print()
+    print("=" * 80)
+    print("RESUMEN")
+    print("=" * 80)
+    summary = (
+        df.group_by("status")
+          .agg([pl.len().alias("files"), (pl.col("bytes").sum() / 1024**3).round(2).alias("gb")])
+          .sort("files", descending=True)
+    )
+    with pl.Config(tbl_rows=20):
+        print(summary)
+    gb = df["bytes"].sum() / 1024**3
+    log(f"{df.height:,} ficheros ({gb:,.1f} GB) en {elapsed:.1f}s | {df.height / max(elapsed, 1e-9):,.0f} ficheros/s "
+        f"| {reused:,} sin cambios desde el último escaneo")
+
+def main():
+    ap = argparse.ArgumentParser(description="Escaneo paralelo de integridad de los parquet de un store")
+    ap.add_argument("--dataset", required=True, choices=sorted(DATASETS))
+    ap.add_argument("--root", help="Raíz del store (default: TSIS_ROOT_<DATASET> / DEFAULT_ROOTS)")
+    ap.add_argument("--tickers", nargs="*", help="Solo estos tickers (default: todos)")
+    ap.add_argument("--workers", type=int, default=32, help="Threads (listado + lectura de footers)")
+    ap.add_argument("--pages", action="store_true", help="Descomprimir todas las páginas (lee los datos)")
+    ap.add_argument("--checksum", action="store_true", help="Comparar con el checksum del catálogo (lee los datos)")
+    ap.add_argument("--rescan", action="store_true", help="Volver a abrir también los ficheros sin cambios")
+    ap.add_argument("--min-age-minutes", type=float, default=MIN_AGE_MINUTES,
+                    help=f"Ignorar ficheros modificados hace menos de N minutos (default: {MIN_AGE_MINUTES})")
+    ap.add_argument("--quarantine", action="store_true",
+                    help="Mover los corruptos a <root>/_quarantine y devolverlos a la cola de descarga")
+    ap.add_argument("--priority", type=float, default=PRIORITY,
+                    help=f"priority_score de los días en cuarentena (default: {PRIORITY:g})")
+    ap.add_argument("--state-db", help="SQLite de estado de quotes (default: TSIS_STATE_DB o <root>/_state.sqlite)")
+    ap.add_argument("--catalog-dir", help="Catálogo (default: TSIS_CATALOG_DIR o <root>/_catalog si existe)")
+    ap.add_argument("--no-catalog", action="store_true", help="No usar ni actualizar el catálogo")
+    args = ap.parse_args()
+
+    root = dataset_root(args.dataset, args.root)
+    out_dir = root / INTEGRITY_DIR
+    scan_file = out_dir / SCAN_FILE
+    catalog_dir = Path(args.catalog_dir) if args.catalog_dir else default_catalog_dir(root)
+    use_catalog = not args.no_catalog and catalog_dir.exists()
+    tickers = args.tickers or ticker_names(root)
+
+    previous: Dict[str, Dict] = {}
+    if scan_file.exists():
+        previous = {r["path"]: r for r in pl.read_parquet(scan_file).iter_rows(named=True)}
+    checksums: Dict[str, Tuple[int, int, str]] = {}
+    if args.checksum and use_catalog:
+        cat = (read_catalog(catalog_dir, args.dataset, root)
+               .filter(pl.col("checksum").is_not_null())
+               .select(["path", "bytes", "mtime_ns", "checksum"]).collect())
+        checksums = {p: (b, m, c) for p, b, m, c in cat.iter_rows()}
+    elif args.checksum:
+        log("AVISO: --checksum sin catálogo: no hay checksums con los que comparar")
+
+    print("=" * 80)
+    print(f"INTEGRIDAD {args.dataset} | {len(tickers):,} tickers | {root}")
+    print(f"workers={args.workers} | footer" + (" + páginas" if args.pages else "")
+          + (f" + checksum ({len(checksums):,} catalogados)" if args.checksum else "")
+          + f" | escaneo previo: {len(previous):,} ficheros" + (" | CUARENTENA" if args.quarantine else ""))
+    print("=" * 80)
+
+    t0 = time.time()
+    cutoff_ns = time.time_ns() - int(args.min_age_minutes * 60 * 1e9)
+    results: List[Dict] = []
+
+    def one(ticker: str) -> List[Dict]:
+        return scan_ticker(root, ticker, previous, checksums, args.pages, args.checksum, args.rescan, cutoff_ns)
+
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as ex:
+        for i, rows in enumerate(ex.map(one, tickers), 1):
+            results.extend(rows)
+            if i % 1000 == 0:
+                log(f"  {i:,}/{len(tickers):,} tickers | {len(results):,} ficheros")
+
+    df = pl.DataFrame(results, schema=SCAN_SCHEMA)
+    reused = sum(1 for r in results if previous.get(r["path"]) is r)
+    if args.tickers and previous:
+        # Escaneo parcial: conservar el resto de tickers del escaneo anterior
+        scanned = set(tickers)
+        rest = pl.DataFrame([r for p, r in previous.items() if p.split("/", 1)[0] not in scanned],
+                            schema=SCAN_SCHEMA)
+        merged = pl.concat([rest, df])
+    else:
+        merged = df
+
+    # La lista cubre todo el store conocido; solo se mueve lo verificado en esta pasada
+    corrupt = df.filter(pl.col("status").is_in(CORRUPT)).sort("path")
+    qrows = quarantine_rows(args.dataset, root, merged.filter(pl.col("status").is_in(CORRUPT)).sort("path"),
+                            args.priority)
+
+    if args.quarantine and corrupt.height:
+        dest_root = root / QUARANTINE_DIR / dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+        catalog = CatalogWriter(catalog_dir, args.dataset, root, run_id=f"integrity-{os.getpid()}",
+                                checksum=False) if use_catalog else None
+        moved: Dict[str, str] = {}
+        for rel in corrupt["path"].to_list():
+            if str(root / rel) in moved:
+                continue
+            try:
+                for p in move_to_quarantine(args.dataset, root, rel, dest_root):
+                    moved[p] = str(dest_root / os.path.relpath(p, root))
+                    if catalog is not None:
+                        catalog.forget(p)
+            except OSError as e:
+                log(f"  No se pudo mover {rel}: {e}")
+        if catalog is not None:
+            catalog.close()
+        for r in qrows:
+            r["moved_to"] = moved.get(str(root / r["path"]))
+        moved_rels = {os.path.relpath(p, root).replace("\\", "/") for p in moved}
+        merged = merged.filter(~pl.col("path").is_in(list(moved_rels)))
+        log(f"Cuarentena: {len(moved):,} ficheros movidos a {dest_root}")
+
+        if args.dataset == "quotes":
+            days = [r for r in qrows if r["moved_to"] and r["date"]]
+            store = StateStore(Path(args.state_db) if args.state_db else default_state_db(root))
+            try:
+                store.mark_many({"dataset": args.dataset, "ticker": r["ticker"], "period": r["date"],
+                                 "status": STATE_CORRUPT, "error": f"{r['status']}: {r['error']}"} for r in days)
+                n = store.enqueue(args.dataset, [(r["ticker"], r["date"], r["priority_score"]) for r in days],
+                                  source="integrity")
+                log(f"Cola '{args.dataset}': {n:,} ticker-días re-encolados en {store.path}")
+            finally:
+                store.close()
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = scan_file.with_suffix(".parquet.tmp")
+    merged.sort("path").write_parquet(tmp, compression="zstd")
+    os.replace(tmp, scan_file)
+    qcols = ["dataset", "ticker", "date", "period", "path", "bytes", "status", "error", "detected_at",
+             "moved_to", "priority_score"]
+    pl.DataFrame(qrows, schema={c: pl.Float64 if c == "priority_score" else pl.Int64 if c == "bytes"
+                                else pl.Utf8 for c in qcols}).write_csv(out_dir / QUARANTINE_FILE)
+
+    for row in corrupt.head(20).iter_rows(named=True):
+        log(f"  {row['status']:<9} {row['path']}: {row['error']}")
+    report(df, time.time() - t0, reused)
+    log(f"Escaneo: {scan_file} | cuarentena: {out_dir / QUARANTINE_FILE} ({len(qrows):,} filas)")
+    return 1 if corrupt.height else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
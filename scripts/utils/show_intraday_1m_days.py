@@ -17,95 +17,88 @@ from datetime import datetime
 from collections import defaultdict
 from typing import Set, Dict, List
 import sys
+import calendar
+
+from hive_layout import ticker_dir
+from store_query import load as load_store
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
 
+def period_bounds(year: int, month: int = None) -> tuple:
+    """(primer, último) día YYYY-MM-DD del año o del mes pedido"""
+    if month:
+        last = calendar.monthrange(year, month)[1]
+        return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{last:02d}"
+    return f"{year:04d}-01-01", f"{year:04d}-12-31"
+
+
 def get_downloaded_days(data_dir: Path, ticker: str, year: int, month: int = None) -> Set[str]:
     """
-    Obtiene las fechas que tienen datos descargados para un ticker/año/mes.
+    Obtiene las fechas que tienen datos descargados para un ticker/año/mes
+    (minute.parquet por mes, TICKER/minute.parquet compactado o layout Hive,
+    vía store_query).
 
     Returns:
         Set de fechas en formato 'YYYY-MM-DD'
     """
     downloaded = set()
-    ticker_path = data_dir / ticker
+    start, end = period_bounds(year, month)
 
-    if not ticker_path.exists():
+    try:
+        df = load_store("ohlcv_1m", [ticker], start, end, root=data_dir)
+    except Exception as e:
+        print(f"  [WARNING] Error leyendo {ticker_dir(data_dir, ticker)}: {e}")
         return downloaded
 
-    # Determinar qué meses revisar
-    if month:
-        months_to_check = [month]
+    # La columna puede ser 'date' o 'timestamp'
+    if 'date' in df.columns:
+        # Filtrar valores nulos y convertir
+        dates = df.filter(pl.col('date').is_not_null())['date'].unique().to_list()
+    elif 'timestamp' in df.columns:
+        # Filtrar timestamps nulos/inválidos y extraer fecha
+        dates = (df
+                .filter(pl.col('timestamp').is_not_null())
+                .select(pl.col('timestamp').dt.date().alias('date'))
+                .unique()['date']
+                .to_list())
     else:
-        months_to_check = range(1, 13)
-
-    for m in months_to_check:
-        month_dir = ticker_path / f"year={year}" / f"month={m:02d}"
-        minute_file = month_dir / "minute.parquet"
-
-        if minute_file.exists():
-            try:
-                df = pl.read_parquet(minute_file)
-
-                # La columna puede ser 'date' o 'timestamp'
-                if 'date' in df.columns:
-                    # Filtrar valores nulos y convertir
-                    dates = df.filter(pl.col('date').is_not_null())['date'].unique().to_list()
-                elif 'timestamp' in df.columns:
-                    # Filtrar timestamps nulos/inválidos y extraer fecha
-                    dates = (df
-                            .filter(pl.col('timestamp').is_not_null())
-                            .select(pl.col('timestamp').dt.date().alias('date'))
-                            .unique()['date']
-                            .to_list())
-                else:
-                    continue
-
-                # Convertir a strings y filtrar fechas inválidas (epoch)
-                for d in dates:
-                    if d is None:
-                        continue
-
-                    date_str = str(d) if not isinstance(d, str) else d
-
-                    # Skip fechas inválidas (epoch = 1970-01-01)
-                    if date_str.startswith('1970'):
-                        continue
-
-                    # Solo incluir fechas del año correcto
-                    if date_str.startswith(str(year)):
-                        downloaded.add(date_str)
-
-            except Exception as e:
-                print(f"  [WARNING] Error leyendo {minute_file}: {e}")
-                continue
+        return downloaded
+
+    # Convertir a strings y filtrar fechas inválidas (epoch)
+    for d in dates:
+        if d is None:
+            continue
+
+        date_str = str(d) if not isinstance(d, str) else d
+
+        # Skip fechas inválidas (epoch = 1970-01-01)
+        if date_str.startswith('1970'):
+            continue
+
+        # Solo incluir fechas del periodo pedido
+        if start <= date_str[:10] <= end:
+            downloaded.add(date_str[:10])
 
     return downloaded
 
 
 def get_expected_trading_days(daily_root: Path, ticker: str, year: int, month: int = None) -> Set[str]:
     """
-    Obtiene las fechas esperadas desde los datos daily.
+    Obtiene las fechas esperadas desde los datos daily (vía store_query).
 
     Returns:
         Set de fechas en formato 'YYYY-MM-DD'
     """
     expected = set()
-    daily_file = daily_root / ticker / f"year={year}" / "daily.parquet"
-
-    if not daily_file.exists():
-        return expected
+    start, end = period_bounds(year, month)
 
     try:
-        df = pl.read_parquet(daily_file)
-
-        # Filtrar por mes si se especifica
-        if month:
-            month_str = f"{year:04d}-{month:02d}"
-            df = df.filter(pl.col('date').str.starts_with(month_str))
+        df = load_store("ohlcv_daily", [ticker], start, end, columns=["date"], root=daily_root)
+        if df.is_empty():
+            return expected
 
         dates = df['date'].unique().to_list()
         expected = {str(d) if not isinstance(d, str) else d for d in dates}
@@ -159,7 +152,7 @@ def print_report(ticker: str, year: int, month: int,
     print(f"Año         : {year}")
     if month:
         print(f"Mes         : {month:02d}")
-    print(f"Directorio  : {data_dir / ticker}")
+    print(f"Directorio  : {ticker_dir(data_dir, ticker)}")
     print()
 
     # Estadísticas
@@ -271,7 +264,7 @@ Ejemplos:
         return 1
 
     # Obtener días descargados
-    print(f"Escaneando {data_dir / args.ticker}...")
+    print(f"Escaneando {ticker_dir(data_dir, args.ticker)}...")
     downloaded = get_downloaded_days(data_dir, args.ticker, args.year, args.month)
 
     # Obtener días esperados (si daily data existe)
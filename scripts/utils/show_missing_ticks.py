@@ -2,6 +2,9 @@ import polars as pl
 import sys
 import os
 
+from hive_layout import ticker_dir
+from store_query import compacted_days, load as load_store
+
 if len(sys.argv) < 3:
     print("Uso: python show_missing_ticks.py <ticker> <year>")
     print("Ejemplo: python show_missing_ticks.py RNVA 2016")
@@ -10,17 +13,20 @@ if len(sys.argv) < 3:
 ticker = sys.argv[1]
 year = int(sys.argv[2])
 
-daily_path = f'D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily/{ticker}/year={year}/daily.parquet'
+daily_root = 'D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily'
 
-# Determinar path de ticks según año
+# Determinar path de ticks según año (TICKER/ o ticker=TICKER/ en layout Hive)
 if year <= 2018:
-    ticks_root = f'C:\\TSIS_Data\\trades_ticks_2004_2018_v2\\{ticker}\\'
+    ticks_root = ticker_dir('C:/TSIS_Data/trades_ticks_2004_2018_v2', ticker)
 else:
-    ticks_root = f'C:\\TSIS_Data\\trades_ticks_2019_2025\\{ticker}\\'
+    ticks_root = ticker_dir('C:/TSIS_Data/trades_ticks_2019_2025', ticker)
 
 try:
-    # Leer fechas del daily
-    df = pl.read_parquet(daily_path)
+    # Leer fechas del daily (year=*, TICKER/daily.parquet compactado o Hive, vía store_query)
+    df = load_store('ohlcv_daily', [ticker], f'{year}-01-01', f'{year}-12-31', columns=['date'], root=daily_root)
+    if df.is_empty():
+        raise FileNotFoundError(f'sin daily de {ticker} en {year} ({daily_root})')
+    df = df.with_columns(pl.col('date').cast(pl.Utf8).str.slice(0, 10)).sort('date')
 
     # Extraer mes y día
     df = df.with_columns([
@@ -43,10 +49,11 @@ try:
         m = date_obj[1]
         d = date_str
 
-        market_file = f'{ticks_root}year={y}\\month={m}\\day={d}\\market.parquet'
+        month_dir = ticks_root / f'year={y}' / f'month={m}'
+        market_file = month_dir / f'day={d}' / 'market.parquet'
 
-        # Verificar si existe
-        if not os.path.exists(market_file):
+        # Verificar si existe (suelto o ya fusionado en el trades.parquet del mes)
+        if not os.path.exists(market_file) and d not in compacted_days(month_dir):
             if month not in missing_by_month:
                 missing_by_month[month] = []
             missing_by_month[month].append(day)
@@ -1,6 +1,7 @@
 import polars as pl
 import sys
-from pathlib import Path
+
+from store_query import load as load_store
 
 if len(sys.argv) < 3:
     print("Uso: python show_trading_days.py <ticker> <year>")
@@ -10,8 +11,7 @@ if len(sys.argv) < 3:
 ticker = sys.argv[1]
 year = int(sys.argv[2])
 
-daily_path_year = f'D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily/{ticker}/year={year}/daily.parquet'
-daily_root = Path(f'D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily/{ticker}')
+daily_root = 'D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily'
 
 # Determinar path de ticks según año
 if year <= 2018:
@@ -20,21 +20,15 @@ else:
     ticks_path = f'C:\\TSIS_Data\\trades_ticks_2019_2025\\{ticker}\\'
 
 try:
-    # 1. Leer TODOS los años para obtener rango completo
-    all_dfs = []
-    year_dirs = [d for d in daily_root.iterdir() if d.is_dir() and d.name.startswith('year=')]
-
-    for year_dir in sorted(year_dirs):
-        daily_file = year_dir / 'daily.parquet'
-        if daily_file.exists():
-            all_dfs.append(pl.read_parquet(daily_file))
+    # 1. Leer TODOS los años para obtener rango completo (year=*, TICKER/daily.parquet
+    #    compactado o layout Hive, vía store_query)
+    df_all = load_store('ohlcv_daily', [ticker], columns=['date'], root=daily_root)
 
-    if not all_dfs:
+    if df_all.is_empty():
         print(f'ERROR: No se encontraron datos para {ticker}', file=sys.stderr)
         sys.exit(1)
 
-    # Concatenar todos los años para estadísticas generales
-    df_all = pl.concat(all_dfs)
+    df_all = df_all.with_columns(pl.col('date').cast(pl.Utf8).str.slice(0, 10))
     first_date_all = df_all['date'].min()
     last_date_all = df_all['date'].max()
     total_days_all = len(df_all)
@@ -45,7 +39,10 @@ try:
     year_max = years_all['year'].max()
 
     # 2. Leer el año específico para la tabla de meses
-    df_year = pl.read_parquet(daily_path_year)
+    df_year = df_all.filter(pl.col('date').str.starts_with(f'{year:04d}-'))
+    if df_year.is_empty():
+        print(f'ERROR: No hay datos daily de {ticker} en {year}', file=sys.stderr)
+        sys.exit(1)
     total_days_year = len(df_year)
 
     # Extraer mes y día del año específico
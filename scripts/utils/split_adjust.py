@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+split_adjust.py - Ajuste por split en LECTURA (lazy) sobre datos sin ajustar
+
+Los ingestores con --unadjusted guardan OHLCV crudo y dejan un marcador
+_UNADJUSTED en la raíz del store. Los ticks (/v3/trades, /v3/quotes) siempre
+vienen sin ajustar. Este módulo aplica los factores acumulados de
+build_split_factors.py con un join_asof lazy, sin reescribir el store.
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from split_adjust import load_split_factors, apply_split_adjustment
+
+    factors = load_split_factors("raw/polygon/reference/split_factors/split_factors.parquet")
+    lf = pl.scan_parquet("raw/polygon/ohlcv_daily_raw/AAPL/year=*/daily.parquet")
+    df = apply_split_adjustment(lf, factors).collect()
+
+    # O vía store_query: solo ajusta si la raíz lleva el marcador _UNADJUSTED
+    df = load("ohlcv_daily", ["AAPL"], root="raw/polygon/ohlcv_daily_raw", adjust=True,
+              factors="raw/polygon/reference/split_factors/split_factors.parquet")
+"""
+
+from pathlib import Path
+from typing import List, Optional, Union
+
+import polars as pl
+
+UNADJUSTED_MARKER = "_UNADJUSTED"
+
+# Columnas de precio y de cantidad en los distintos esquemas del repo
+PRICE_COLUMNS = ["o", "h", "l", "c", "vw", "open", "high", "low", "close", "vwap",
+                 "p", "price", "bid_price", "ask_price"]
+VOLUME_COLUMNS = ["v", "volume", "s", "size", "bid_size", "ask_size"]
+
+def mark_unadjusted(root: Union[str, Path]) -> None:
+    """Marca la raíz de un store como descargado con adjusted=false"""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / UNADJUSTED_MARKER).touch()
+
+def is_unadjusted_store(root: Union[str, Path]) -> bool:
+    return (Path(root) / UNADJUSTED_MARKER).exists()
+
+def load_split_factors(path: Union[str, Path]) -> pl.DataFrame:
+    """Carga la tabla de factores (ticker, adj_until, price_factor, volume_factor)"""
+    return pl.read_parquet(path, columns=["ticker", "adj_until", "price_factor", "volume_factor"])\
+             .sort(["ticker", "adj_until"])
+
+def apply_split_adjustment(lf: pl.LazyFrame,
+                           factors: pl.DataFrame,
+                           date_expr: Optional[pl.Expr] = None,
+                           ticker: Optional[str] = None,
+                           price_cols: Optional[List[str]] = None,
+                           volume_cols: Optional[List[str]] = None) -> pl.LazyFrame:
+    """
+    Ajusta precios (x price_factor) y cantidades (x volume_factor) de forma lazy.
+
+    Args:
+        lf: datos sin ajustar
+        factors: tabla de load_split_factors()
+        date_expr: expresión que da la fecha de negociación (pl.Date). Default:
+                   columna 'date' (string YYYY-MM-DD o Date)
+        ticker: si lf no tiene columna 'ticker' (p.ej. ticks), ticker constante
+        price_cols / volume_cols: columnas a ajustar (default: las conocidas presentes)
+
+    Returns:
+        LazyFrame con las mismas columnas, ajustadas
+    """
+    cols = lf.collect_schema().names()
+    price_cols = [c for c in (price_cols or PRICE_COLUMNS) if c in cols]
+    volume_cols = [c for c in (volume_cols or VOLUME_COLUMNS) if c in cols]
+
+    if date_expr is None:
+        schema = lf.collect_schema()
+        date_expr = pl.col("date").str.to_date("%Y-%m-%d") if schema["date"] == pl.Utf8 \
+            else pl.col("date").cast(pl.Date)
+
+    factors = factors.select(["ticker", "adj_until", "price_factor", "volume_factor"])
+
+    add_ticker = "ticker" not in cols
+    if add_ticker:
+        if ticker is None:
+            raise ValueError("lf sin columna 'ticker': indica ticker=...")
+        lf = lf.with_columns(pl.lit(ticker).alias("ticker"))
+        factors = factors.filter(pl.col("ticker") == ticker)
+
+    # Orden estable por fecha: dentro de cada día se conserva el orden original
+    lf = lf.with_columns(date_expr.alias("_adj_date")).sort("_adj_date", maintain_order=True)
+
+    adjusted = lf.join_asof(
+        factors.lazy().rename({"adj_until": "_adj_date"}).sort("_adj_date"),
+        on="_adj_date",
+        by="ticker",
+        strategy="forward",
+        check_sortedness=False,  # ambos lados ya ordenados por _adj_date
+    ).with_columns([
+        pl.col("price_factor").fill_null(1.0),
+        pl.col("volume_factor").fill_null(1.0),
+    ])
+
+    adjusted = adjusted.with_columns(
+        [(pl.col(c) * pl.col("price_factor")).alias(c) for c in price_cols] +
+        [(pl.col(c) * pl.col("volume_factor")).alias(c) for c in volume_cols]
+    )
+
+    drop = ["_adj_date", "price_factor", "volume_factor"] + (["ticker"] if add_ticker else [])
+    return adjusted.drop(drop)
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+state_store.py - Estado unificado de descargas/verificaciones (SQLite en modo WAL)
+
+Sustituye los JSON ad-hoc (.cache_intraday.json, .quotes_cache.json,
+.checkpoint.json, ticker_ranges.json, quotes_download_checkpoint.json,
+{prefix}_cache.json) que se reescribían completos en cada guardado y, en el
+caso del checkpoint de quotes, guardaban un contador posicional.
+
+Una fila por (dataset, ticker, period):
+    status      done | empty | error | running | low_volume | ...
+    pages, rows, bytes, attempts, last_error
+    meta        JSON libre (rangos de ticker, resultado de verificación, ...)
+    updated_at
+
+- WAL + busy_timeout: muchos procesos pueden escribir a la vez
+- Cada mark() es una transacción corta; mark_many() agrupa en una sola
+- keys()/done_keys() cargan un set en memoria -> skip O(1) sin stat de ficheros
+- import_legacy_json(): migra un JSON antiguo una sola vez (queda registrado)
+
+Cola de prioridad persistente (tabla queue, misma base de datos):
+- enqueue(): añade/actualiza claves con su prioridad (se puede llamar desde
+  otro proceso mientras un downloader consume la cola)
+- claim(): reserva las N claves de mayor prioridad con un lease temporal;
+  excluye las ya terminadas y las que agotaron max_attempts
+- mark() con estado final borra la clave de la cola en la misma transacción;
+  con error libera el lease para reintentarla más tarde
+
+Ruta por defecto: variable TSIS_STATE_DB o <dir de salida>/_state.sqlite
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from state_store import StateStore, default_state_db
+
+    store = StateStore(default_state_db(outdir))
+    done = store.done_keys("quotes")                 # {(ticker, date), ...}
+    store.mark("quotes", "AAPL", "2024-01-02", "done", pages=3, rows=120000, bytes=2_000_000)
+
+    store.enqueue("quotes", [("AAPL", "2024-01-03", 350.0)], source="high_priority")
+    for ticker, date, priority in store.claim("quotes", 500):
+        ...
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import datetime as dt
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+DONE = "done"
+EMPTY = "empty"
+ERROR = "error"
+RUNNING = "running"
+
+# Estados que cuentan como "no volver a descargar"
+FINAL_STATUSES = (DONE, EMPTY)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    dataset    TEXT NOT NULL,
+    ticker     TEXT NOT NULL,
+    period     TEXT NOT NULL DEFAULT '',
+    status     TEXT NOT NULL,
+    pages      INTEGER,
+    rows       INTEGER,
+    bytes      INTEGER,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    meta       TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (dataset, ticker, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS state_dataset_status ON state (dataset, status);
+CREATE TABLE IF NOT EXISTS queue (
+    dataset      TEXT NOT NULL,
+    ticker       TEXT NOT NULL,
+    period       TEXT NOT NULL DEFAULT '',
+    priority     REAL NOT NULL DEFAULT 0,
+    source       TEXT,
+    enqueued_at  TEXT NOT NULL,
+    leased_until REAL,
+    PRIMARY KEY (dataset, ticker, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS queue_dataset_priority ON queue (dataset, priority DESC);
+CREATE TABLE IF NOT EXISTS kv (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT = """
+INSERT INTO state (dataset, ticker, period, status, pages, rows, bytes, attempts, last_error, meta, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dataset, ticker, period) DO UPDATE SET
+    status     = excluded.status,
+    pages      = COALESCE(excluded.pages, state.pages),
+    rows       = COALESCE(excluded.rows, state.rows),
+    bytes      = COALESCE(excluded.bytes, state.bytes),
+    attempts   = state.attempts + excluded.attempts,
+    last_error = excluded.last_error,
+    meta       = COALESCE(excluded.meta, state.meta),
+    updated_at = excluded.updated_at
+"""
+
+# No encola claves ya terminadas; si ya estaba en cola se queda con la mayor prioridad
+ENQUEUE = """
+INSERT INTO queue (dataset, ticker, period, priority, source, enqueued_at, leased_until)
+SELECT ?1, ?2, ?3, ?4, ?5, ?6, NULL
+WHERE NOT EXISTS (
+    SELECT 1 FROM state s
+    WHERE s.dataset = ?1 AND s.ticker = ?2 AND s.period = ?3 AND s.status IN ('done', 'empty')
+)
+ON CONFLICT (dataset, ticker, period) DO UPDATE SET
+    priority = MAX(queue.priority, excluded.priority),
+    source   = COALESCE(excluded.source, queue.source)
+"""
+
+COLUMNS = ["dataset", "ticker", "period", "status", "pages", "rows", "bytes",
+           "attempts", "last_error", "meta", "updated_at"]
+
+def default_state_db(fallback_dir: Union[str, Path]) -> Path:
+    """TSIS_STATE_DB si está definida (un solo store para todo), si no <dir>/_state.sqlite"""
+    env = os.getenv("TSIS_STATE_DB")
+    if env:
+        return Path(env)
+    return Path(fallback_dir) / "_state.sqlite"
+
+class StateStore:
+    def __init__(self, path: Union[str, Path], timeout: float = 60.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: transacciones explícitas (BEGIN IMMEDIATE) en escrituras
+        self.conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        self.lock = threading.Lock()
+        self._write(lambda c: c.executescript(SCHEMA), transaction=False)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any], transaction: bool = True,
+               retries: int = 5) -> Any:
+        """Ejecuta fn en una transacción corta; reintenta si otro proceso tiene el lock"""
+        with self.lock:
+            for attempt in range(retries):
+                try:
+                    if not transaction:
+                        return fn(self.conn)
+                    self.conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        result = fn(self.conn)
+                        self.conn.execute("COMMIT")
+                        return result
+                    except Exception:
+                        self.conn.execute("ROLLBACK")
+                        raise
+                except sqlite3.OperationalError as e:
+                    if "locked" not in str(e) or attempt == retries - 1:
+                        raise
+                    time.sleep(0.2 * (attempt + 1))
+
+    @staticmethod
+    def _row(dataset: str, ticker: str, period: str, status: str,
+             pages: Optional[int] = None, rows: Optional[int] = None, bytes: Optional[int] = None,
+             error: Optional[str] = None, meta: Optional[dict] = None) -> tuple:
+        return (
+            dataset, ticker, period or "", status, pages, rows, bytes,
+            0 if status == RUNNING else 1,
+            str(error)[:2000] if error else None,
+            json.dumps(meta, default=str) if meta is not None else None,
+            dt.datetime.now().isoformat(timespec="seconds"),
+        )
+
+    @staticmethod
+    def _sync_queue(c: sqlite3.Connection, rows: List[tuple]) -> None:
+        """Estado final -> fuera de la cola; error -> lease liberado para reintento"""
+        final = [r[:3] for r in rows if r[3] in FINAL_STATUSES]
+        failed = [r[:3] for r in rows if r[3] == ERROR]
+        if final:
+            c.executemany("DELETE FROM queue WHERE dataset = ? AND ticker = ? AND period = ?", final)
+        if failed:
+            c.executemany("UPDATE queue SET leased_until = NULL "
+                          "WHERE dataset = ? AND ticker = ? AND period = ?", failed)
+
+    def mark(self, dataset: str, ticker: str, period: str, status: str, **kwargs) -> None:
+        """Upsert de una clave (pages/rows/bytes/meta None conservan el valor previo)"""
+        row = self._row(dataset, ticker, period, status, **kwargs)
+
+        def fn(c):
+            c.execute(UPSERT, row)
+            self._sync_queue(c, [row])
+        self._write(fn)
+
+    def mark_many(self, records: Iterable[dict]) -> int:
+        """Upsert de muchas claves en una sola transacción"""
+        rows = [self._row(**r) for r in records]
+
+        def fn(c):
+            c.executemany(UPSERT, rows)
+            self._sync_queue(c, rows)
+        if rows:
+            self._write(fn)
+        return len(rows)
+
+    def delete(self, dataset: str, ticker: Optional[str] = None, period: Optional[str] = None) -> int:
+        sql, args = "DELETE FROM state WHERE dataset = ?", [dataset]
+        if ticker is not None:
+            sql += " AND ticker = ?"
+            args.append(ticker)
+        if period is not None:
+            sql += " AND period = ?"
+            args.append(period)
+        return self._write(lambda c: c.execute(sql, args).rowcount)
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def get(self, dataset: str, ticker: str, period: str = "") -> Optional[Dict]:
+        with self.lock:
+            r = self.conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM state WHERE dataset = ? AND ticker = ? AND period = ?",
+                (dataset, ticker, period or "")).fetchone()
+        if r is None:
+            return None
+        d = dict(zip(COLUMNS, r))
+        d["meta"] = json.loads(d["meta"]) if d["meta"] else None
+        return d
+
+    def status(self, dataset: str, ticker: str, period: str = "") -> Optional[str]:
+        with self.lock:
+            r = self.conn.execute(
+                "SELECT status FROM state WHERE dataset = ? AND ticker = ? AND period = ?",
+                (dataset, ticker, period or "")).fetchone()
+        return r[0] if r else None
+
+    def keys(self, dataset: str, statuses: Optional[Iterable[str]] = None) -> Set[Tuple[str, str]]:
+        """Set {(ticker, period)} para skips O(1) en memoria"""
+        sql, args = "SELECT ticker, period FROM state WHERE dataset = ?", [dataset]
+        if statuses:
+            statuses = list(statuses)
+            sql += f" AND status IN ({','.join('?' * len(statuses))})"
+            args.extend(statuses)
+        with self.lock:
+            return set(self.conn.execute(sql, args).fetchall())
+
+    def done_keys(self, dataset: str) -> Set[Tuple[str, str]]:
+        return self.keys(dataset, FINAL_STATUSES)
+
+    def records(self, dataset: str, statuses: Optional[Iterable[str]] = None) -> List[Dict]:
+        sql, args = f"SELECT {', '.join(COLUMNS)} FROM state WHERE dataset = ?", [dataset]
+        if statuses:
+            statuses = list(statuses)
+            sql += f" AND status IN ({','.join('?' * len(statuses))})"
+            args.extend(statuses)
+        with self.lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        out = []
+        for r in rows:
+            d = dict(zip(COLUMNS, r))
+            d["meta"] = json.loads(d["meta"]) if d["meta"] else None
+            out.append(d)
+        return out
+
+    def counts(self, dataset: str) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.conn.execute(
+                "SELECT status, COUNT(*) FROM state WHERE dataset = ? GROUP BY status", (dataset,)).fetchall())
+
+    # ------------------------------------------------------------------
+    # Cola de prioridad
+    # ------------------------------------------------------------------
+
+    def enqueue(self, dataset: str, items: Iterable[Tuple[str, str, float]],
+                source: Optional[str] = None) -> int:
+        """
+        Encola (ticker, period, priority). Las claves ya terminadas se ignoran y
+        las que ya están en cola conservan la mayor de las dos prioridades.
+        """
+        now = dt.datetime.now().isoformat(timespec="seconds")
+        rows = [(dataset, ticker, period or "", float(priority or 0), source, now)
+                for ticker, period, priority in items]
+
+        def fn(c):
+            before = c.total_changes
+            c.executemany(ENQUEUE, rows)
+            return c.total_changes - before
+        return self._write(fn) if rows else 0
+
+    def claim(self, dataset: str, n: int, lease_seconds: float = 3600,
+              max_attempts: Optional[int] = 3) -> List[Tuple[str, str, float]]:
+        """
+        Reserva las n claves de mayor prioridad (lease de lease_seconds).
+
+        Varios consumidores pueden reclamar a la vez sin solaparse; si uno
+        muere, sus claves vuelven a estar disponibles al expirar el lease.
+        Las claves con max_attempts errores o más quedan en cola sin reclamar.
+        """
+        now = time.time()
+        sql = """
+            SELECT q.ticker, q.period, q.priority FROM queue q
+            LEFT JOIN state s ON s.dataset = q.dataset AND s.ticker = q.ticker AND s.period = q.period
+            WHERE q.dataset = ? AND (q.leased_until IS NULL OR q.leased_until < ?)
+              AND (s.status IS NULL OR s.status NOT IN ('done', 'empty'))
+        """
+        args: List[Any] = [dataset, now]
+        if max_attempts:
+            sql += " AND (s.status IS NULL OR s.status != 'error' OR s.attempts < ?)"
+            args.append(max_attempts)
+        sql += " ORDER BY q.priority DESC, q.period DESC, q.ticker LIMIT ?"
+        args.append(int(n))
+
+        def fn(c):
+            rows = c.execute(sql, args).fetchall()
+            c.executemany(
+                "UPDATE queue SET leased_until = ? WHERE dataset = ? AND ticker = ? AND period = ?",
+                [(now + lease_seconds, dataset, t, p) for t, p, _ in rows])
+            return rows
+        return self._write(fn) if n > 0 else []
+
+    def release(self, dataset: str, keys: Iterable[Tuple[str, str]]) -> None:
+        """Devuelve claves reclamadas y no procesadas (p. ej. al agotar el presupuesto)"""
+        rows = [(dataset, t, p or "") for t, p in keys]
+
+        def fn(c):
+            c.executemany(
+                "UPDATE queue SET leased_until = NULL WHERE dataset = ? AND ticker = ? AND period = ?",
+                rows)
+            # Las que ya estaban terminadas (skip) salen de la cola
+            c.executemany(
+                "DELETE FROM queue WHERE dataset = ?1 AND ticker = ?2 AND period = ?3 AND EXISTS ("
+                "SELECT 1 FROM state s WHERE s.dataset = ?1 AND s.ticker = ?2 AND s.period = ?3 "
+                "AND s.status IN ('done', 'empty'))", rows)
+        if rows:
+            self._write(fn)
+
+    def queue_counts(self, dataset: str) -> Dict[str, int]:
+        """Claves en cola: pendientes (sin lease vigente) y reclamadas"""
+        now = time.time()
+        with self.lock:
+            pending, leased = self.conn.execute(
+                "SELECT COALESCE(SUM(leased_until IS NULL OR leased_until < ?), 0), "
+                "COALESCE(SUM(leased_until >= ?), 0) FROM queue WHERE dataset = ?",
+                (now, now, dataset)).fetchone()
+        return {"pending": pending, "leased": leased}
+
+    # ------------------------------------------------------------------
+    # Clave-valor y migración de JSON antiguos
+    # ------------------------------------------------------------------
+
+    def get_kv(self, key: str) -> Optional[str]:
+        with self.lock:
+            r = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return r[0] if r else None
+
+    def set_kv(self, key: str, value: str) -> None:
+        self._write(lambda c: c.execute(
+            "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value)))
+
+    def import_legacy_json(self, path: Union[str, Path],
+                           to_records: Callable[[Any], Iterable[dict]]) -> int:
+        """
+        Importa un JSON de estado antiguo una única vez.
+
+        to_records(data) devuelve dicts con los argumentos de mark(). El
+        fichero no se toca; la importación queda registrada en kv.
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        key = f"legacy:{path.resolve()}"
+        if self.get_kv(key):
+            return 0
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            return 0
+        n = self.mark_many(to_records(data))
+        self.set_kv(key, dt.datetime.now().isoformat(timespec="seconds"))
+        return n
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+store_query.py - Consultas sobre los stores Hive (TICKER/year=YYYY/month=MM/...)
+
+El layout histórico no tiene clave ticker= (y mezcla month=5 / month=05), así
+que ni Polars ni DuckDB pueden podar por ticker recorriendo la raíz; los stores
+migrados con migrate_hive_layout.py (ticker=X/..., ver hive_layout.py) se leen
+igual. Este módulo resuelve primero los ficheros con poda
+de particiones (ticker -> year -> month -> day, vía catálogo de ficheros si
+existe o con os.scandir solo de los directorios que entran en el rango) y
+después lanza UN scan lazy sobre esa lista con proyección de columnas y
+filtros de tiempo empujados al lector.
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from store_query import load, scan
+
+    df = load("ohlcv_daily", ["AAPL", "MSFT"], "2023-01-01", "2023-12-31",
+              columns=["ticker", "date", "c", "v"])
+    lf = scan("trades", ["AAPL"], "2024-05-01", "2024-05-31", columns=["t", "p", "s"],
+              root="C:/TSIS_Data/trades_ticks_2019_2025")
+    for batch in load("ohlcv_1m", tickers, "2024-01-01", "2024-06-30", batch_size=50):
+        ...                                   # un DataFrame cada 50 tickers
+
+Raíz de cada dataset: argumento root, variable TSIS_ROOT_<DATASET> (p.ej.
+TSIS_ROOT_TRADES) o DEFAULT_ROOTS.
+
+start / end: fecha (YYYY-MM-DD / date) -> poda de particiones + filtro por la
+columna de fecha; datetime (UTC) -> además filtro por la columna de tiempo
+en ticks (trades, quotes).
+
+Ficheros compactados (compact_small_files.py): TICKER/daily.parquet y
+TICKER/minute.parquet por ticker (si conviven con ficheros sueltos nuevos,
+ganan los sueltos para la misma fecha / timestamp) y trades.parquet /
+quotes.parquet por ticker-mes, con los días que cubren en _COMPACTED.json
+(esos day= se ignoran aunque sigan en disco). En ticks se añaden las columnas
+date y, en trades, session (premarket / market / afterhours).
+
+adjust=True: ajuste por split en lectura (split_adjust.py) si la raíz lleva
+el marcador _UNADJUSTED de los ingestores con --unadjusted; los ticks vienen
+siempre sin ajustar. Factores: argumento factors (ruta o DataFrame de
+load_split_factors), variable TSIS_SPLIT_FACTORS o DEFAULT_SPLIT_FACTORS.
+El ajuste se aplica antes de la proyección de columns, por fecha ET.
+"""
+
+import os
+import re
+import json
+import datetime as dt
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from dataset_catalog import default_catalog_dir, parquet_stats, read_catalog
+from hive_layout import ticker_dir, ticker_names
+from market_calendar import MARKET_TZ
+from split_adjust import apply_split_adjustment, is_unadjusted_store, load_split_factors
+
+DateLike = Union[str, dt.date, dt.datetime, None]
+Factors = Union[str, Path, pl.DataFrame, None]
+
+# Layout por dataset: niveles de partición bajo TICKER/, ficheros de datos,
+# columna de fecha (YYYY-MM-DD o Date), columna de tiempo en ticks (epoch),
+# nombres antiguos que se renombran al leer (solo si falta el nombre actual),
+# clave única por ticker (barras) y dónde quedan los ficheros compactados
+# ("ticker" o "month"; compact_files None = mismos nombres que los sueltos)
+DATASETS: Dict[str, Dict] = {
+    "ohlcv_daily": {"levels": ("year",), "files": ("daily.parquet",),
+                    "date_col": "date", "time_col": None, "time_unit": None,
+                    "aliases": {"volume": "v"}, "key": "date",
+                    "compact_level": "ticker", "compact_files": None},
+    "ohlcv_1m": {"levels": ("year", "month"), "files": ("minute.parquet",),
+                 "date_col": "date", "time_col": "t", "time_unit": "ms", "aliases": {},
+                 "key": "t", "compact_level": "ticker", "compact_files": None},
+    "trades": {"levels": ("year", "month", "day"), "files": None,
+               "date_col": "date", "time_col": "t", "time_unit": "ns", "aliases": {},
+               "key": None, "compact_level": "month", "compact_files": ("trades.parquet",)},
+    "quotes": {"levels": ("year", "month", "day"), "files": ("quotes.parquet",),
+               "date_col": "date", "time_col": "timestamp", "time_unit": "ns",
+               "aliases": {"sip_timestamp": "timestamp"}, "key": None,
+               "compact_level": "month", "compact_files": None},
+}
+
+DEFAULT_ROOTS = {
+    "ohlcv_daily": "D:/TSIS_SmallCaps/raw/polygon/ohlcv_daily",
+    "ohlcv_1m": "D:/TSIS_SmallCaps/raw/polygon/ohlcv_intraday_1m",
+    "trades": "C:/TSIS_Data/trades_ticks_2019_2025",
+    "quotes": "C:/TSIS_Data/quotes_p95_2019_2025",
+}
+
+# Ticker = directorio inmediatamente anterior a year= o, en barras compactadas
+# (TICKER/daily.parquet), al fichero (sin el ticker= del layout Hive)
+TICKER_FROM_PATH = r"(?:ticker=)?([^/\\=]+)[/\\](?:year=|[^/\\]+$)"
+# Fecha de un fichero de ticks suelto: year=YYYY/month=M|MM/day=DD|YYYY-MM-DD
+# (month=5 del layout antiguo: cada pieza se rellena a 2 dígitos al componer la fecha)
+DAY_FROM_PATH = (r"year=(\d{4})", r"month=(\d{1,2})[/\\]", r"day=(?:\d{4}-\d{2}-)?(\d{2})[/\\]")
+# Sesión de trades = nombre del fichero del día (premarket/market/afterhours)
+SESSION_FROM_PATH = r"([^/\\]+)\.parquet$"
+
+# Días cubiertos por un fichero compactado de ticker-mes
+MANIFEST = "_COMPACTED.json"
+
+DEFAULT_SPLIT_FACTORS = "D:/TSIS_SmallCaps/raw/polygon/reference/split_factors/split_factors.parquet"
+
+_DAY_RE = re.compile(r"^day=(?:(\d{4})-(\d{2})-)?(\d{2})$")
+
+def dataset_root(dataset: str, root: Optional[Union[str, Path]] = None) -> Path:
+    if root:
+        return Path(root)
+    return Path(os.getenv(f"TSIS_ROOT_{dataset.upper()}", DEFAULT_ROOTS[dataset]))
+
+def read_manifest(directory: Union[str, Path]) -> Dict:
+    """_COMPACTED.json de un directorio ({} si no hay)"""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def compacted_days(month_dir: Union[str, Path]) -> Set[str]:
+    """Fechas YYYY-MM-DD ya fusionadas en los ficheros de ticker-mes"""
+    return set(read_manifest(month_dir).get("days", []))
+
+def compact_names(dataset: str, names: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Nombres de los ficheros compactados que sustituyen a `names`"""
+    spec = DATASETS[dataset]
+    return tuple(spec["compact_files"] or names or spec["files"] or ())
+
+def _as_date(value: DateLike, default: dt.date) -> dt.date:
+    if value is None:
+        return default
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    return dt.date.fromisoformat(str(value)[:10])
+
+def _epoch(value: dt.datetime, unit: str) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt.timezone.utc)
+    us = int(value.timestamp() * 1_000_000)
+    return {"ns": us * 1000, "us": us, "ms": us // 1000, "s": us // 1_000_000}[unit]
+
+def _scandir(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []
+
+def _files_in(day_or_leaf: str, names: Optional[Sequence[str]]) -> List[Tuple[str, int]]:
+    if names:
+        out = []
+        for n in names:
+            p = os.path.join(day_or_leaf, n)
+            try:
+                out.append((p, os.stat(p).st_size))
+            except OSError:
+                pass
+        return out
+    return [(e.path, e.stat().st_size) for e in _scandir(day_or_leaf)
+            if e.is_file() and e.name.endswith(".parquet") and not e.name.startswith(("_", "."))]
+
+def _walk_partitions(root: Path, ticker: str, levels: Sequence[str], names: Optional[Sequence[str]],
+                     d0: dt.date, d1: dt.date, compact_level: Optional[str] = None,
+                     packed: Sequence[str] = ()) -> List[Tuple[str, int]]:
+    """Ficheros de un ticker bajando solo por las particiones que cortan [d0, d1]"""
+    out = []
+    base = str(ticker_dir(root, ticker))
+    if compact_level == "ticker":
+        out.extend(_files_in(base, packed))
+    for y in _scandir(base):
+        if not (y.is_dir() and y.name.startswith("year=")):
+            continue
+        try:
+            year = int(y.name[5:])
+        except ValueError:
+            continue
+        if not d0.year <= year <= d1.year:
+            continue
+        if len(levels) == 1:
+            out.extend(_files_in(y.path, names))
+            continue
+        for m in _scandir(y.path):
+            if not (m.is_dir() and m.name.startswith("month=")):
+                continue
+            try:
+                month = int(m.name[6:])
+            except ValueError:
+                continue
+            if not (d0.year, d0.month) <= (year, month) <= (d1.year, d1.month):
+                continue
+            if len(levels) == 2:
+                out.extend(_files_in(m.path, names))
+                continue
+            entries = _scandir(m.path)
+            skip = set()
+            if compact_level == "month" and any(e.name == MANIFEST for e in entries):
+                out.extend(_files_in(m.path, packed))
+                skip = compacted_days(m.path)
+            for d in entries:
+                match = _DAY_RE.match(d.name) if d.is_dir() else None
+                if not match:
+                    continue
+                try:
+                    day = dt.date(year, month, int(match.group(3)))
+                except ValueError:
+                    continue
+                if d0 <= day <= d1 and day.isoformat() not in skip:
+                    out.extend(_files_in(d.path, names))
+    return out
+
+def _from_catalog(catalog_dir: Path, root: Path, tickers: Optional[Sequence[str]],
+                  names: Optional[Sequence[str]], d0: dt.date, d1: dt.date) -> Optional[List[Tuple[str, int]]]:
+    """Misma poda sobre el catálogo; None si el store no está catalogado"""
+    lf = read_catalog(catalog_dir, root=root)
+    if tickers is not None:
+        lf = lf.filter(pl.col("ticker").is_in(list(tickers)))
+    if names:
+        lf = lf.filter(pl.col("file").is_in(list(names)))
+    # Cada fichero cubre [lo, hi] en YYYYMMDD; un nivel nulo (fichero compactado
+    # por ticker o por mes) cubre todo el rango de ese nivel
+    y, m, d = (pl.col(c).cast(pl.Int32) for c in ("year", "month", "day"))
+    lo = y.fill_null(0) * 10000 + m.fill_null(0) * 100 + d.fill_null(0)
+    hi = y.fill_null(9999) * 10000 + m.fill_null(99) * 100 + d.fill_null(99)
+    q0 = d0.year * 10000 + d0.month * 100 + d0.day
+    q1 = d1.year * 10000 + d1.month * 100 + d1.day
+    df = (lf.filter((lo <= q1) & (hi >= q0))
+            .select(["path", "ticker", "year", "month", "day", "bytes", "rows"]).collect())
+    if df.height == 0 and read_catalog(catalog_dir, root=root).select(pl.len()).collect().item() == 0:
+        return None
+    packed = df.filter(pl.col("day").is_null() & pl.col("month").is_not_null())
+    if packed.height:
+        # Días ya fusionados en un fichero de ticker-mes que sigan catalogados sueltos
+        covered = set()
+        for rel, ticker in packed.select(["path", "ticker"]).iter_rows():
+            month_dir = (root / rel).parent
+            covered.update((ticker, day) for day in compacted_days(month_dir))
+        if covered:
+            iso = pl.format("{}-{}-{}", pl.col("year"), pl.col("month").cast(pl.Utf8).str.zfill(2),
+                            pl.col("day").cast(pl.Utf8).str.zfill(2))
+            done = pl.DataFrame(sorted(covered), schema={"ticker": pl.Utf8, "_iso": pl.Utf8}, orient="row")
+            df = (df.with_columns(iso.alias("_iso"))
+                    .join(done.with_columns(pl.lit(True).alias("_done")), on=["ticker", "_iso"], how="left")
+                    .filter(pl.col("_done").is_null()).drop(["_iso", "_done"]))
+    # Ficheros vacíos (días sin datos) no aportan filas
+    df = df.filter(pl.col("rows") > 0)
+    return [(str(root / p), b) for p, b in df.select(["path", "bytes"]).iter_rows()]
+
+def resolve_files(dataset: str, tickers: Optional[Sequence[str]] = None, start: DateLike = None,
+                  end: DateLike = None, root: Optional[Union[str, Path]] = None,
+                  files: Optional[Sequence[str]] = None, catalog_dir: Optional[Union[str, Path]] = None,
+                  use_catalog: bool = True) -> List[Tuple[str, int]]:
+    """(path, bytes) de los ficheros que cortan el rango, con poda por ticker / partición"""
+    spec = DATASETS[dataset]
+    root = dataset_root(dataset, root)
+    names = files or spec["files"]
+    packed = compact_names(dataset, names)
+    d0 = _as_date(start, dt.date(1900, 1, 1))
+    d1 = _as_date(end, dt.date(2999, 12, 31))
+
+    if use_catalog:
+        cdir = Path(catalog_dir) if catalog_dir else default_catalog_dir(root)
+        if cdir.exists():
+            wanted = list(dict.fromkeys(list(names) + list(packed))) if names else None
+            found = _from_catalog(cdir, root, tickers, wanted, d0, d1)
+            if found is not None:
+                return found
+
+    if tickers is None:
+        tickers = ticker_names(root)
+    out = []
+    for ticker in tickers:
+        out.extend(_walk_partitions(root, ticker, spec["levels"], names, d0, d1,
+                                    spec["compact_level"], packed))
+    return out
+
+def packed_files(dataset: str, root: Optional[Union[str, Path]] = None,
+                 tickers: Optional[Sequence[str]] = None) -> Dict[str, Tuple[str, bool]]:
+    """
+    {ticker: (fichero compactado por ticker, hay ficheros sueltos year= a su
+    lado)} de un dataset de barras; para lectores que no pasan por load/scan
+    """
+    spec = DATASETS[dataset]
+    if spec["compact_level"] != "ticker":
+        return {}
+    root = dataset_root(dataset, root)
+    names = compact_names(dataset, None)
+    out = {}
+    for ticker in (ticker_names(root) if tickers is None else tickers):
+        base = str(ticker_dir(root, ticker))
+        found = _files_in(base, names)
+        if found:
+            loose = any(e.is_dir() and e.name.startswith("year=") for e in _scandir(base))
+            out[ticker] = (found[0][0], loose)
+    return out
+
+def packed_span(path: Union[str, Path]) -> Optional[Tuple[dt.date, dt.date]]:
+    """
+    (primera, última) fecha UTC de un fichero compactado por ticker según las
+    estadísticas del footer (None si está vacío o no tiene columna de tiempo)
+    """
+    st = parquet_stats(path)
+    if st["min_ts"] is None or st["max_ts"] is None:
+        return None
+    lo, hi = (dt.datetime.fromtimestamp(st[k] // 10**9, tz=dt.timezone.utc).date() for k in ("min_ts", "max_ts"))
+    return lo, hi
+
+def packed_months(path: Union[str, Path]) -> Set[str]:
+    """Meses YYYY-MM (UTC de t) con barras en un fichero compactado de minutos (solo lee t)"""
+    return set(pl.scan_parquet(str(path)).select(
+        pl.from_epoch(pl.col("t").cast(pl.Int64), time_unit="ms").dt.strftime("%Y-%m").unique()
+    ).collect().to_series().drop_nulls().to_list())
+
+def is_compacted(dataset: str, path: str) -> bool:
+    """True si la ruta es un fichero compactado (por ticker o por ticker-mes)"""
+    path = path.replace("\\", "/")
+    if DATASETS[dataset]["compact_level"] == "ticker":
+        return "/year=" not in path
+    return "/day=" not in path
+
+def _aliases(dataset: str, schema: Dict) -> Dict[str, str]:
+    return {old: new for old, new in DATASETS[dataset]["aliases"].items()
+            if old in schema and new not in schema}
+
+def _predicates(dataset: str, schema: Dict, start: DateLike, end: DateLike) -> List[pl.Expr]:
+    spec = DATASETS[dataset]
+    preds = []
+    date_col = spec["date_col"]
+    if date_col and date_col in schema and (start is not None or end is not None):
+        # Fecha como texto YYYY-MM-DD (el store mezcla Utf8 y Date)
+        d = pl.col(date_col) if schema[date_col] == pl.Utf8 else pl.col(date_col).cast(pl.Utf8)
+        if start is not None:
+            preds.append(d >= _as_date(start, None).isoformat())
+        if end is not None:
+            preds.append(d <= _as_date(end, None).isoformat())
+    time_col, unit = spec["time_col"], spec["time_unit"]
+    if time_col and time_col in schema and schema[time_col].is_integer():
+        if isinstance(start, dt.datetime):
+            preds.append(pl.col(time_col) >= _epoch(start, unit))
+        if isinstance(end, dt.datetime):
+            preds.append(pl.col(time_col) <= _epoch(end, unit))
+    return preds
+
+def _sessions(dataset: str, files: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """Sesiones pedidas vía files= (el fichero compactado de trades las lleva todas)"""
+    if dataset != "trades" or not files:
+        return None
+    return [Path(f).stem for f in files]
+
+def _finish(lf: pl.LazyFrame, dataset: str, schema: Dict, start: DateLike, end: DateLike,
+            files: Optional[Sequence[str]] = None) -> pl.LazyFrame:
+    spec = DATASETS[dataset]
+    renames = _aliases(dataset, schema)
+    if renames:
+        lf = lf.rename(renames)
+        schema = {renames.get(k, k): v for k, v in schema.items()}
+    preds = _predicates(dataset, schema, start, end)
+    if preds:
+        lf = lf.filter(pl.all_horizontal(preds))
+    derived = []
+    if "ticker" not in schema:
+        # Ticks sin columna ticker: se deriva de la ruta
+        derived.append(pl.col("_path").str.extract(TICKER_FROM_PATH, 1).alias("ticker"))
+    if spec["compact_level"] == "month" and "date" not in schema:
+        derived.append(pl.concat_str([pl.col("_path").str.extract(r, 1).str.zfill(2) for r in DAY_FROM_PATH],
+                                     separator="-").alias("date"))
+    if dataset == "trades" and "session" not in schema:
+        derived.append(pl.col("_path").str.extract(SESSION_FROM_PATH, 1).alias("session"))
+    if spec["key"]:
+        # Barras: suelto = bajo year=, compactado = directamente bajo TICKER/
+        derived.append(pl.col("_path").str.contains(r"[/\\]year=").alias("_loose"))
+    if derived:
+        lf = lf.with_columns(derived)
+    sessions = _sessions(dataset, files)
+    if sessions:
+        lf = lf.filter(pl.col("session").is_in(sessions))
+    return lf.drop("_path")
+
+def _has_overlay(dataset: str, paths: List[Tuple[str, int]]) -> bool:
+    """Algún ticker con fichero compactado y ficheros sueltos a la vez"""
+    if not DATASETS[dataset]["key"]:
+        return False
+    depth = len(DATASETS[dataset]["levels"])
+    packed = {Path(p).parent.name for p, _ in paths if is_compacted(dataset, p)}
+    loose = {Path(p).parents[depth].name for p, _ in paths if not is_compacted(dataset, p)}
+    return bool(packed & loose)
+
+def _overlay(lf: pl.LazyFrame, dataset: str, paths: List[Tuple[str, int]]) -> pl.LazyFrame:
+    """
+    Barras: si un ticker tiene fichero compactado y ficheros sueltos posteriores,
+    las filas sueltas sustituyen a las compactadas con la misma clave.
+    """
+    key = DATASETS[dataset]["key"]
+    if not key:
+        return lf
+    if _has_overlay(dataset, paths):
+        on = ["ticker", key]
+        newer = lf.filter(pl.col("_loose"))
+        lf = pl.concat([lf.filter(~pl.col("_loose")).join(newer.select(on), on=on, how="anti"), newer],
+                       how="vertical_relaxed")
+    return lf.drop("_loose")
+
+def _split_factors(dataset: str, root: Optional[Union[str, Path]], adjust: bool,
+                   factors: Factors) -> Optional[pl.DataFrame]:
+    """Factores de split a aplicar (None si no se pide ajuste o el store ya viene ajustado)"""
+    if not adjust:
+        return None
+    if isinstance(factors, pl.DataFrame):
+        return factors
+    if DATASETS[dataset]["compact_level"] != "month" and not is_unadjusted_store(dataset_root(dataset, root)):
+        return None
+    return load_split_factors(factors or os.getenv("TSIS_SPLIT_FACTORS", DEFAULT_SPLIT_FACTORS))
+
+def _adjust(lf: pl.LazyFrame, dataset: str, factors: Optional[pl.DataFrame]) -> pl.LazyFrame:
+    """apply_split_adjustment por fecha ET (columna de tiempo si la hay), conservando el orden"""
+    if factors is None:
+        return lf
+    spec = DATASETS[dataset]
+    schema = lf.collect_schema()
+    time_col = spec["time_col"]
+    date_expr = None
+    if time_col in schema and schema[time_col].is_integer():
+        date_expr = pl.from_epoch(pl.col(time_col), time_unit=spec["time_unit"])\
+                      .dt.replace_time_zone("UTC").dt.convert_time_zone(MARKET_TZ).dt.date()
+    lf = apply_split_adjustment(lf.with_row_index("_row"), factors, date_expr)
+    return lf.sort("_row").drop("_row")
+
+def scan(dataset: str, tickers: Optional[Sequence[str]] = None, start: DateLike = None, end: DateLike = None,
+         columns: Optional[Sequence[str]] = None, root: Optional[Union[str, Path]] = None,
+         files: Optional[Sequence[str]] = None, catalog_dir: Optional[Union[str, Path]] = None,
+         adjust: bool = False, factors: Factors = None,
+         paths: Optional[List[Tuple[str, int]]] = None) -> pl.LazyFrame:
+    """
+    LazyFrame sobre los ficheros podados (un único scan_parquet con el esquema
+    del fichero más grande). Si los ficheros no comparten esquema el collect()
+    falla: load() lo detecta y agrupa por esquema.
+    """
+    if paths is None:
+        paths = resolve_files(dataset, tickers, start, end, root, files, catalog_dir)
+    if not paths:
+        return pl.LazyFrame(schema={c: pl.Null for c in columns} if columns else {})
+    largest = max(paths, key=lambda p: p[1])[0]
+    schema = dict(pl.read_parquet_schema(largest))
+    lf = pl.scan_parquet([p for p, _ in paths], schema=schema, hive_partitioning=False,
+                         include_file_paths="_path")
+    lf = _overlay(_finish(lf, dataset, schema, start, end, files), dataset, paths)
+    lf = _adjust(lf, dataset, _split_factors(dataset, root, adjust, factors))
+    return lf.select(list(columns)) if columns else lf
+
+def _scan_relaxed(dataset: str, paths: List[Tuple[str, int]], start: DateLike, end: DateLike,
+                  columns: Optional[Sequence[str]], files: Optional[Sequence[str]] = None,
+                  factors: Optional[pl.DataFrame] = None) -> pl.LazyFrame:
+    """Esquemas distintos entre ficheros (v/volume, Utf8/Date, vacíos): un scan por esquema"""
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        schemas = list(ex.map(lambda p: dict(pl.read_parquet_schema(p[0])), paths))
+    groups: Dict[Tuple, List[str]] = {}
+    for (p, _), schema in zip(paths, schemas):
+        if schema:  # días vacíos escritos como parquet sin columnas
+            groups.setdefault(tuple(schema.items()), []).append(p)
+    frames = []
+    for key, group in groups.items():
+        schema = dict(key)
+        lf = pl.scan_parquet(group, schema=schema, hive_partitioning=False, include_file_paths="_path")
+        frames.append(_finish(lf, dataset, schema, start, end, files))
+    if not frames:
+        return pl.LazyFrame()
+    lf = _adjust(_overlay(pl.concat(frames, how="diagonal_relaxed"), dataset, paths), dataset, factors)
+    return lf.select(list(columns)) if columns else lf
+
+def _collect(dataset: str, paths: List[Tuple[str, int]], start: DateLike, end: DateLike,
+             columns: Optional[Sequence[str]], engine: str,
+             files: Optional[Sequence[str]] = None, factors: Optional[pl.DataFrame] = None) -> pl.DataFrame:
+    if engine == "duckdb":
+        if factors is None:
+            return _load_duckdb(dataset, paths, start, end, columns, files)
+        # Ajuste en polars sobre todas las columnas (fecha / tiempo / ticker) y después la proyección
+        df = _adjust(_load_duckdb(dataset, paths, start, end, None, files).lazy(), dataset, factors).collect()
+        return df.select(list(columns)) if columns else df
+    packed = sum(is_compacted(dataset, p) for p, _ in paths)
+    if DATASETS[dataset]["compact_level"] == "month" and 0 < packed < len(paths):
+        # Ticks compactados (con date/session) junto a días sueltos: esquemas distintos
+        return _scan_relaxed(dataset, paths, start, end, columns, files, factors).collect()
+    try:
+        return scan(dataset, start=start, end=end, columns=columns, files=files,
+                    adjust=factors is not None, factors=factors, paths=paths).collect()
+    except (pl.exceptions.SchemaError, pl.exceptions.ColumnNotFoundError,
+            pl.exceptions.ComputeError, pl.exceptions.InvalidOperationError):
+        return _scan_relaxed(dataset, paths, start, end, columns, files, factors).collect()
+
+def _load_duckdb(dataset: str, paths: List[Tuple[str, int]], start: DateLike, end: DateLike,
+                 columns: Optional[Sequence[str]], files: Optional[Sequence[str]] = None) -> pl.DataFrame:
+    """Mismo plan con DuckDB: read_parquet(lista, union_by_name) + WHERE + proyección"""
+    import duckdb
+
+    if not paths:
+        return pl.DataFrame()
+    spec = DATASETS[dataset]
+    file_list = "[" + ", ".join("'" + p.replace("\\", "/").replace("'", "''") + "'" for p, _ in paths) + "]"
+    con = duckdb.connect()
+    try:
+        rel = f"read_parquet({file_list}, union_by_name = true, filename = true, hive_partitioning = false)"
+        cols = [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {rel}").fetchall()]
+
+        # Normalización: nombres antiguos, ticker / fecha / sesión desde la ruta si no hay columna
+        exclude, exprs = ["filename"], []
+        for old, new in spec["aliases"].items():
+            if old in cols:
+                exclude.append(old)
+                if new in cols:
+                    exclude.append(new)
+                    exprs.append(f'COALESCE("{new}", "{old}") AS "{new}"')
+                else:
+                    exprs.append(f'"{old}" AS "{new}"')
+                    cols.append(new)
+        if "ticker" not in cols:
+            exprs.append(f"regexp_extract(filename, '{TICKER_FROM_PATH}', 1) AS ticker")
+        if spec["compact_level"] == "month":
+            day = " || '-' || ".join(f"lpad(regexp_extract(filename, '{r}', 1), {n}, '0')"
+                                     for r, n in zip(DAY_FROM_PATH, (4, 2, 2)))
+            if "date" in cols:
+                exclude.append("date")
+                exprs.append(f"COALESCE(CAST(date AS VARCHAR), {day}) AS date")
+            else:
+                exprs.append(f"{day} AS date")
+                cols.append("date")
+        if dataset == "trades":
+            stem = f"regexp_extract(filename, '{SESSION_FROM_PATH}', 1)"
+            if "session" in cols:
+                exclude.append("session")
+                exprs.append(f"COALESCE(session, {stem}) AS session")
+            else:
+                exprs.append(f"{stem} AS session")
+        overlay = _has_overlay(dataset, paths)
+        if overlay:
+            exprs.append("regexp_matches(filename, '[/\\\\]year=') AS _loose")
+        inner = f"SELECT * EXCLUDE ({', '.join(exclude)}){''.join(', ' + e for e in exprs)} FROM {rel}"
+
+        where = []
+        if spec["date_col"] in cols:
+            if start is not None:
+                where.append(f"CAST({spec['date_col']} AS VARCHAR) >= '{_as_date(start, None).isoformat()}'")
+            if end is not None:
+                where.append(f"CAST({spec['date_col']} AS VARCHAR) <= '{_as_date(end, None).isoformat()}'")
+        if spec["time_col"] in cols:
+            if isinstance(start, dt.datetime):
+                where.append(f"{spec['time_col']} >= {_epoch(start, spec['time_unit'])}")
+            if isinstance(end, dt.datetime):
+                where.append(f"{spec['time_col']} <= {_epoch(end, spec['time_unit'])}")
+        sessions = _sessions(dataset, files)
+        if sessions:
+            where.append("session IN (" + ", ".join(f"'{x}'" for x in sessions) + ")")
+        base = f"({inner})" + (" WHERE " + " AND ".join(where) if where else "")
+        if overlay:
+            # Compactado + sueltos del mismo ticker: gana la fila suelta por clave
+            base = (f"(SELECT * EXCLUDE (_loose) FROM {base} QUALIFY row_number() OVER "
+                    f"(PARTITION BY ticker, \"{spec['key']}\" ORDER BY _loose DESC) = 1)")
+        select = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        return con.execute(f"SELECT {select} FROM {base}").pl()
+    finally:
+        con.close()
+
+def load(dataset: str, tickers: Optional[Sequence[str]] = None, start: DateLike = None, end: DateLike = None,
+         columns: Optional[Sequence[str]] = None, root: Optional[Union[str, Path]] = None,
+         files: Optional[Sequence[str]] = None, catalog_dir: Optional[Union[str, Path]] = None,
+         engine: str = "polars", batch_size: Optional[int] = None,
+         adjust: bool = False, factors: Factors = None
+         ) -> Union[pl.DataFrame, Iterator[pl.DataFrame]]:
+    """
+    Carga (dataset, tickers, [start, end], columns) en un DataFrame, o con
+    batch_size un iterador de DataFrames de batch_size tickers cada uno.
+
+    engine: "polars" (scan_parquet lazy) o "duckdb" (read_parquet + .pl())
+    adjust: ajuste por split en lectura si el store está sin ajustar
+    """
+    if engine not in ("polars", "duckdb"):
+        raise ValueError(f"engine desconocido: {engine}")
+    factors = _split_factors(dataset, root, adjust, factors)
+    if batch_size:
+        return _iter_batches(dataset, tickers, start, end, columns, root, files, catalog_dir, engine, batch_size,
+                             factors)
+    paths = resolve_files(dataset, tickers, start, end, root, files, catalog_dir)
+    return _collect(dataset, paths, start, end, columns, engine, files, factors)
+
+def _iter_batches(dataset, tickers, start, end, columns, root, files, catalog_dir, engine,
+                  batch_size, factors=None) -> Iterator[pl.DataFrame]:
+    if tickers is None:
+        tickers = ticker_names(dataset_root(dataset, root))
+    tickers = list(tickers)
+    for i in range(0, len(tickers), batch_size):
+        chunk = tickers[i:i + batch_size]
+        paths = resolve_files(dataset, chunk, start, end, root, files, catalog_dir)
+        if paths:
+            yield _collect(dataset, paths, start, end, columns, engine, files, factors)
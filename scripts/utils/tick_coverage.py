@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tick_coverage.py - Cobertura de días de ticks vs daily por listado de directorios
+
+Verificar un store de ticks fecha a fecha (Path.exists() de market.parquet /
+_SUCCESS por cada barra daily) son decenas de millones de stat() sobre un
+disco lento. Aquí los días presentes salen de listar el árbol del ticker una
+vez (os.scandir por directorio, podando year= / month= fuera de rango; los
+meses compactados aportan sus días del _COMPACTED.json) o del catálogo de
+ficheros, y se cruzan con los días esperados (barras del store daily) con un
+join por lotes de tickers:
+
+    ticker, date, daily, success, market, parquet
+
+    daily    el día tiene barra daily (si no, es un día de ticks sin referencia)
+    success  _SUCCESS escrito (o día ya fusionado en un fichero compactado)
+    market   market.parquet presente (trades) / quotes.parquet (quotes)
+    parquet  algún .parquet en el directorio del día
+
+Con catálogo no hay _SUCCESS (solo se catalogan .parquet): success queda a
+nulo y solo sirve para las comprobaciones de market / parquet.
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from tick_coverage import coverage_batch
+
+    days = coverage_batch(daily_root, ticks_root, [("AAPL", "2004-01-01", "2018-12-31")])
+    missing = days.filter(pl.col("daily") & ~pl.col("market"))
+"""
+
+import datetime as dt
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+
+import polars as pl
+
+from store_query import MANIFEST, _DAY_RE, _as_date, _scandir, compacted_days, load as load_store
+from dataset_catalog import read_catalog
+from hive_layout import ticker_dir
+
+DAYS_SCHEMA = {"ticker": pl.Utf8, "date": pl.Utf8, "success": pl.Boolean,
+               "market": pl.Boolean, "parquet": pl.Boolean}
+COVERAGE_SCHEMA = {"ticker": pl.Utf8, "date": pl.Utf8, "daily": pl.Boolean, **{
+                   k: v for k, v in DAYS_SCHEMA.items() if k not in ("ticker", "date")}}
+
+# Fichero que cuenta como "día descargado" en cada store
+MARKET_FILES = ("market.parquet", "quotes.parquet")
+
+Range = Tuple[str, Optional[str], Optional[str]]  # ticker, primer día, último día
+
+def scan_ticker_days(root: Union[str, Path], ticker: str, start=None, end=None) -> pl.DataFrame:
+    """Días presentes de un ticker en [start, end] listando su árbol (un scandir por directorio)"""
+    d0 = _as_date(start, dt.date(1900, 1, 1))
+    d1 = _as_date(end, dt.date(2999, 12, 31))
+    rows = {}
+    for y in _scandir(str(ticker_dir(root, ticker))):
+        if not (y.is_dir() and y.name.startswith("year=")):
+            continue
+        try:
+            year = int(y.name[5:])
+        except ValueError:
+            continue
+        if not d0.year <= year <= d1.year:
+            continue
+        for m in _scandir(y.path):
+            if not (m.is_dir() and m.name.startswith("month=")):
+                continue
+            try:
+                month = int(m.name[6:])
+            except ValueError:
+                continue
+            if not (d0.year, d0.month) <= (year, month) <= (d1.year, d1.month):
+                continue
+            entries = _scandir(m.path)
+            if any(e.name == MANIFEST for e in entries):
+                # Solo se compactan días completos: cuentan como _SUCCESS + market
+                for iso in compacted_days(m.path):
+                    rows[iso] = [True, True, True]
+            for d in entries:
+                match = _DAY_RE.match(d.name) if d.is_dir() else None
+                if not match:
+                    continue
+                try:
+                    day = dt.date(year, month, int(match.group(3)))
+                except ValueError:
+                    continue
+                if not d0 <= day <= d1:
+                    continue
+                names = {e.name for e in _scandir(d.path)}
+                found = ["_SUCCESS" in names,
+                         any(n in names for n in MARKET_FILES),
+                         any(n.endswith(".parquet") and not n.startswith(("_", ".")) for n in names)]
+                # day=DD y day=YYYY-MM-DD del mismo día: basta con uno
+                prev = rows.get(day.isoformat(), [False, False, False])
+                rows[day.isoformat()] = [a or b for a, b in zip(prev, found)]
+    return pl.DataFrame([(ticker, iso, *flags) for iso, flags in rows.items()],
+                        schema=DAYS_SCHEMA, orient="row")
+
+def catalog_days(catalog_dir: Union[str, Path], root: Union[str, Path], tickers: Sequence[str],
+                 start=None, end=None) -> pl.DataFrame:
+    """Días presentes según el catálogo (sin disco; success nulo salvo días compactados)"""
+    root = Path(root)
+    d0 = _as_date(start, dt.date(1900, 1, 1)).isoformat()
+    d1 = _as_date(end, dt.date(2999, 12, 31)).isoformat()
+    df = (read_catalog(catalog_dir, root=root)
+            .filter(pl.col("ticker").is_in(list(tickers)) & pl.col("year").is_not_null()
+                    & pl.col("month").is_not_null())
+            .select(["ticker", "path", "file", "year", "month", "day"]).collect())
+    packed = df.filter(pl.col("day").is_null())
+    loose = (df.filter(pl.col("day").is_not_null())
+               .with_columns(pl.format("{}-{}-{}", pl.col("year"),
+                                       pl.col("month").cast(pl.Utf8).str.zfill(2),
+                                       pl.col("day").cast(pl.Utf8).str.zfill(2)).alias("date"))
+               .group_by(["ticker", "date"])
+               .agg([pl.lit(None, dtype=pl.Boolean).alias("success"),
+                     pl.col("file").is_in(list(MARKET_FILES)).any().alias("market"),
+                     pl.lit(True).alias("parquet")]))
+    done = []
+    for ticker, rel in packed.select(["ticker", "path"]).unique().iter_rows():
+        done.extend((ticker, iso, True, True, True) for iso in compacted_days((root / rel).parent))
+    out = pl.concat([loose.select(list(DAYS_SCHEMA)).cast(DAYS_SCHEMA),
+                     pl.DataFrame(done, schema=DAYS_SCHEMA, orient="row")])
+    # Un día ya compactado que siga catalogado suelto: gana el compactado
+    return (out.sort("success", nulls_last=True)
+               .unique(["ticker", "date"], keep="first")
+               .filter(pl.col("date").is_between(pl.lit(d0), pl.lit(d1))))
+
+def _span(ranges: Sequence[Range]) -> Tuple[Optional[str], Optional[str]]:
+    """Rango que cubre todos los del lote (None = sin límite)"""
+    lo = None if any(not r[1] for r in ranges) else min((r[1] for r in ranges), default=None)
+    hi = None if any(not r[2] for r in ranges) else max((r[2] for r in ranges), default=None)
+    return lo, hi
+
+def _in_ranges(df: pl.DataFrame, ranges: Sequence[Range]) -> pl.DataFrame:
+    """Filas (ticker, date) dentro del rango de su ticker"""
+    bounds = pl.DataFrame([(t, str(a)[:10] if a else "0000-00-00", str(b)[:10] if b else "9999-99-99")
+                           for t, a, b in ranges], schema=["ticker", "_lo", "_hi"], orient="row")
+    return (df.join(bounds, on="ticker")
+              .filter(pl.col("date").is_between(pl.col("_lo"), pl.col("_hi")))
+              .drop(["_lo", "_hi"]))
+
+def expected_days(daily_root: Union[str, Path], ranges: Sequence[Range],
+                  catalog_dir: Optional[Union[str, Path]] = None) -> pl.DataFrame:
+    """(ticker, date) con barra daily dentro del rango de cada ticker, en un solo scan"""
+    lo, hi = _span(ranges)
+    df = load_store("ohlcv_daily", [r[0] for r in ranges], lo, hi, columns=["ticker", "date"],
+                    root=daily_root, catalog_dir=catalog_dir)
+    if df.height == 0:
+        return pl.DataFrame(schema={"ticker": pl.Utf8, "date": pl.Utf8})
+    df = df.select([pl.col("ticker"), pl.col("date").cast(pl.Utf8).str.slice(0, 10)]).unique()
+    return _in_ranges(df, ranges)
+
+def coverage_batch(daily_root: str, ticks_root: str, ranges: Sequence[Range],
+                   catalog_dir: Optional[str] = None, ticks_catalog: Optional[str] = None) -> pl.DataFrame:
+    """
+    Worker: cobertura día a día de un lote de tickers (esperados full-join
+    presentes, con daily=False para días de ticks sin barra daily)
+    """
+    expected = expected_days(daily_root, ranges, catalog_dir)
+    if ticks_catalog:
+        present = _in_ranges(catalog_days(ticks_catalog, ticks_root, [r[0] for r in ranges], *_span(ranges)),
+                             ranges)
+    else:
+        frames = [scan_ticker_days(ticks_root, t, a, b) for t, a, b in ranges]
+        present = pl.concat(frames) if frames else pl.DataFrame(schema=DAYS_SCHEMA)
+    return (expected.with_columns(pl.lit(True).alias("daily"))
+                    .join(present, on=["ticker", "date"], how="full", coalesce=True)
+                    .with_columns([pl.col("daily").fill_null(False),
+                                   pl.col("market").fill_null(False),
+                                   pl.col("parquet").fill_null(False),
+                                   # Catálogo: success desconocido salvo en días sin ficheros
+                                   pl.when(pl.col("parquet")).then(pl.col("success"))
+                                     .otherwise(pl.col("success").fill_null(False)).alias("success")])
+                    .select(list(COVERAGE_SCHEMA))
+                    .cast(COVERAGE_SCHEMA)
+                    .sort(["ticker", "date"]))
+
+def summarize(days: pl.DataFrame) -> pl.DataFrame:
+    """Resumen por ticker de coverage_batch (solo días con barra daily)"""
+    d = days.filter(pl.col("daily"))
+    found = pl.col("success").fill_null(False) | pl.col("parquet")
+    return (d.group_by("ticker")
+             .agg([pl.len().alias("days_expected"),
+                   pl.col("date").min().alias("daily_first"),
+                   pl.col("date").max().alias("daily_last"),
+                   pl.col("market").sum().alias("days_market"),
+                   pl.col("success").fill_null(False).sum().alias("days_with_success"),
+                   (pl.col("parquet") & ~pl.col("success").fill_null(False)).sum()
+                     .alias("days_with_parquet_no_success"),
+                   (~found).sum().alias("days_missing"),
+                   pl.col("date").filter(found).min().alias("first_day_found"),
+                   pl.col("date").filter(found).max().alias("last_day_found")])
+             .sort("ticker"))
+
@@ -0,0 +1,636 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tick_window.py - Ventanas de tiempo sobre ficheros de ticks leyendo solo las páginas necesarias
+
+Los ficheros de trades / quotes se escriben ordenados por tiempo (SORT_BY en
+write_profiles.py), con row groups de 64k filas, páginas de 64 KiB e índice de
+páginas (ColumnIndex = min/max por página, OffsetIndex = posición y primera
+fila de cada página). Ni pyarrow, ni Polars, ni DuckDB usan ese índice al leer:
+con un filtro de tiempo descomprimen el row group entero. Para extraer
++-2 min alrededor de miles de eventos eso es leer el día completo por evento.
+
+TickWindowReader lo hace a mano sobre un fichero:
+    1. footer decodificado una vez (thrift compact) y cacheado
+    2. row groups cuyo min/max de tiempo corta la ventana
+    3. páginas de la columna de tiempo que la cortan (ColumnIndex) ->
+       se decodifican y searchsorted da las filas exactas [r0, r1)
+    4. del resto de columnas, solo las páginas (OffsetIndex) que cubren
+       [r0, r1), más la página de diccionario si la hay
+
+Las páginas elegidas se copian a un parquet mínimo en memoria (PAR1 +
+páginas tal cual + footer reescrito con un row group y una columna) que
+decodifica pyarrow, así que codecs, encodings, nulos y listas (conditions)
+son los del lector normal. La E/S por ventana queda acotada por el tamaño de
+la ventana (una página de más por extremo), no por el del fichero.
+
+Sin índice de páginas (ficheros anteriores al perfil con page_index), sin
+orden declarado o con columnas anidadas de varias hojas se cae a leer los row
+groups que cortan la ventana y filtrar: mismo resultado, más bytes.
+
+extract_windows() resuelve los ficheros de cada evento (store_query, incluidos
+los compactados de ticker-mes) y lee en paralelo por fichero.
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from tick_window import TickWindowReader, extract_windows
+
+    with TickWindowReader(path) as r:
+        df = r.read(t0_ns, t1_ns, columns=["t", "p", "s"])
+
+    events = pl.DataFrame({"ticker": [...], "ts": [...]})     # ts: Datetime UTC o epoch ns
+    win = extract_windows("trades", events, before=dt.timedelta(minutes=2),
+                          after=dt.timedelta(minutes=2), columns=["t", "p", "s"])
+
+    python scripts/utils/tick_window.py --dataset quotes --events events.csv \
+        --before 120 --after 120 --out windows.parquet
+"""
+
+import os
+import sys
+import time
+import bisect
+import struct
+import argparse
+import datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from store_query import DATASETS, dataset_root, resolve_files
+from dataset_catalog import parse_partition
+
+MAGIC = b"PAR1"
+# Columnas de tiempo candidatas si el fichero no declara sorting_columns
+TIME_COLUMNS = ("t", "timestamp", "sip_timestamp", "participant_timestamp")
+MARKET_TZ = "America/New_York"
+
+# ----------------------------------------------------------------------
+# Thrift compact protocol (lo justo para el footer y el índice de páginas)
+# ----------------------------------------------------------------------
+
+T_STOP, T_TRUE, T_FALSE, T_BYTE, T_I16, T_I32, T_I64, T_DOUBLE, T_BINARY, T_LIST, T_SET, T_MAP, T_STRUCT = range(13)
+# Un struct decodificado es {field_id: (tipo, valor)}; bool -> (T_TRUE, bool)
+
+def _uvarint(buf, pos: int) -> Tuple[int, int]:
+    out = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        out |= (b & 0x7F) << shift
+        if b < 0x80:
+            return out, pos
+        shift += 7
+
+def _varint(buf, pos: int) -> Tuple[int, int]:
+    n, pos = _uvarint(buf, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+def _value(buf, pos: int, ttype: int):
+    if ttype in (T_I16, T_I32, T_I64):
+        return _varint(buf, pos)
+    if ttype == T_BINARY:
+        n, pos = _uvarint(buf, pos)
+        return bytes(buf[pos:pos + n]), pos + n
+    if ttype == T_STRUCT:
+        return decode_struct(buf, pos)
+    if ttype in (T_LIST, T_SET):
+        head = buf[pos]
+        pos += 1
+        n, etype = head >> 4, head & 0x0F
+        if n == 15:
+            n, pos = _uvarint(buf, pos)
+        items = []
+        for _ in range(n):
+            if etype in (T_TRUE, T_FALSE):
+                items.append(buf[pos] == T_TRUE)
+                pos += 1
+            else:
+                v, pos = _value(buf, pos, etype)
+                items.append(v)
+        return (etype, items), pos
+    if ttype == T_BYTE:
+        return struct.unpack_from("b", buf, pos)[0], pos + 1
+    if ttype == T_DOUBLE:
+        return struct.unpack_from("<d", buf, pos)[0], pos + 8
+    if ttype == T_MAP:
+        n, pos = _uvarint(buf, pos)
+        if n == 0:
+            return (0, 0, []), pos
+        kv = buf[pos]
+        pos += 1
+        items = []
+        for _ in range(n):
+            k, pos = _value(buf, pos, kv >> 4)
+            v, pos = _value(buf, pos, kv & 0x0F)
+            items.append((k, v))
+        return (kv >> 4, kv & 0x0F, items), pos
+    raise ValueError(f"tipo thrift desconocido {ttype}")
+
+def decode_struct(buf, pos: int = 0) -> Tuple[Dict[int, tuple], int]:
+    """Struct thrift compact en buf[pos:] -> ({id: (tipo, valor)}, posición final)"""
+    fields, last = {}, 0
+    while True:
+        head = buf[pos]
+        pos += 1
+        ttype = head & 0x0F
+        if ttype == T_STOP:
+            return fields, pos
+        delta = head >> 4
+        if delta:
+            fid = last + delta
+        else:
+            fid, pos = _varint(buf, pos)
+        if ttype in (T_TRUE, T_FALSE):
+            fields[fid] = (T_TRUE, ttype == T_TRUE)
+        else:
+            value, pos = _value(buf, pos, ttype)
+            fields[fid] = (ttype, value)
+        last = fid
+
+def _put_uvarint(out: bytearray, n: int) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _put_value(out: bytearray, ttype: int, value) -> None:
+    if ttype in (T_I16, T_I32, T_I64):
+        _put_uvarint(out, (value << 1) ^ (value >> 63))
+    elif ttype == T_BINARY:
+        _put_uvarint(out, len(value))
+        out += value
+    elif ttype == T_STRUCT:
+        out += encode_struct(value)
+    elif ttype in (T_LIST, T_SET):
+        etype, items = value
+        if len(items) < 15:
+            out.append(len(items) << 4 | etype)
+        else:
+            out.append(0xF0 | etype)
+            _put_uvarint(out, len(items))
+        for v in items:
+            if etype in (T_TRUE, T_FALSE):
+                out.append(T_TRUE if v else T_FALSE)
+            else:
+                _put_value(out, etype, v)
+    elif ttype == T_BYTE:
+        out += struct.pack("b", value)
+    elif ttype == T_DOUBLE:
+        out += struct.pack("<d", value)
+    elif ttype == T_MAP:
+        ktype, vtype, items = value
+        _put_uvarint(out, len(items))
+        if items:
+            out.append(ktype << 4 | vtype)
+            for k, v in items:
+                _put_value(out, ktype, k)
+                _put_value(out, vtype, v)
+    else:
+        raise ValueError(f"tipo thrift desconocido {ttype}")
+
+def encode_struct(fields: Dict[int, tuple]) -> bytes:
+    out, last = bytearray(), 0
+    for fid in sorted(fields):
+        ttype, value = fields[fid]
+        ctype = (T_TRUE if value else T_FALSE) if ttype == T_TRUE else ttype
+        delta = fid - last
+        if 0 < delta <= 15:
+            out.append(delta << 4 | ctype)
+        else:
+            out.append(ctype)
+            _put_uvarint(out, (fid << 1) ^ (fid >> 63))
+        if ttype != T_TRUE:
+            _put_value(out, ttype, value)
+        last = fid
+    out.append(T_STOP)
+    return bytes(out)
+
+def _get(fields: Dict[int, tuple], fid: int, default=None):
+    return fields[fid][1] if fid in fields else default
+
+# Ids de campo del footer (parquet.thrift)
+# FileMetaData: 1 version, 2 schema, 3 num_rows, 4 row_groups, 5 key_value_metadata, 6 created_by, 7 column_orders
+# RowGroup: 1 columns, 2 total_byte_size, 3 num_rows, 4 sorting_columns
+# ColumnChunk: 3 meta_data, 4/5 offset_index offset/length, 6/7 column_index offset/length
+# ColumnMetaData: 5 num_values, 6/7 total un/compressed, 9 data_page_offset, 11 dictionary_page_offset, 12 statistics
+# SchemaElement: 4 name, 5 num_children
+# PageHeader: 1 type, 2 uncompressed, 3 compressed, 5 data_page_header, 8 data_page_header_v2 (1 num_values)
+_CMETA_DROP = (8, 10, 12, 13, 14, 15, 16, 17)
+PAGE_DATA, PAGE_DICT, PAGE_DATA_V2 = 0, 2, 3
+ASCENDING = 1
+
+# ----------------------------------------------------------------------
+# Lector de ventanas de un fichero
+# ----------------------------------------------------------------------
+
+class TickWindowReader:
+    """Ventanas [start, end] (epoch de la columna de tiempo, ambos incluidos) de un parquet ordenado"""
+
+    def __init__(self, path: Union[str, Path], time_col: Optional[str] = None):
+        self.path = str(path)
+        self._f = open(self.path, "rb")
+        self.file_bytes = os.fstat(self._f.fileno()).st_size
+        self.bytes_read = 0
+        self._read_footer()
+        self._pf: Optional[pq.ParquetFile] = None
+        self._oidx: Dict[Tuple[int, int], List[Tuple[int, int, int]]] = {}
+        self._cidx: Dict[Tuple[int, int], Dict[int, tuple]] = {}
+
+        self.arrow_schema = pq.read_schema(pa.BufferReader(self._footer_file()))
+        names = self.arrow_schema.names
+        sorted_col = self._declared_sort()
+        self.time_col = time_col or sorted_col or next((c for c in TIME_COLUMNS if c in names), None)
+        if self.time_col not in self._columns:
+            raise ValueError(f"{self.path}: sin columna de tiempo ({self.time_col})")
+        self.sorted = sorted_col == self.time_col
+        self._time_leaf = self._columns[self.time_col][1][0]
+        self._rg_ranges = [self._rg_range(i) for i in range(len(self._row_groups))]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._f.close()
+
+    # ------------------------------------------------------------ footer
+
+    def _pread(self, offset: int, length: int) -> bytes:
+        self._f.seek(offset)
+        data = self._f.read(length)
+        self.bytes_read += len(data)
+        return data
+
+    def _read_footer(self) -> None:
+        tail = self._pread(self.file_bytes - 8, 8)
+        if tail[4:] != MAGIC:
+            raise ValueError(f"{self.path}: no es parquet")
+        n = struct.unpack("<I", tail[:4])[0]
+        self._footer_raw = self._pread(self.file_bytes - 8 - n, n)
+        self._meta, _ = decode_struct(self._footer_raw)
+        self._row_groups = list(_get(self._meta, 4, (T_STRUCT, []))[1])
+        # Columna de primer nivel -> (rango en el schema, hojas)
+        schema = self._schema = _get(self._meta, 2)[1]
+        self._columns: Dict[str, Tuple[Tuple[int, int], List[int]]] = {}
+        i, leaf = 1, 0
+        for _ in range(_get(schema[0], 5, 0)):
+            start = i
+            i, leaves = self._subtree(i)
+            name = _get(schema[start], 4).decode()
+            self._columns[name] = ((start, i), list(range(leaf, leaf + leaves)))
+            leaf += leaves
+
+    def _subtree(self, i: int) -> Tuple[int, int]:
+        """Fin del subárbol que empieza en schema[i] y nº de hojas"""
+        children = _get(self._schema[i], 5)
+        if children is None:
+            return i + 1, 1
+        i, leaves = i + 1, 0
+        for _ in range(children):
+            i, n = self._subtree(i)
+            leaves += n
+        return i, leaves
+
+    def _footer_file(self) -> bytes:
+        return MAGIC + self._footer_raw + struct.pack("<I", len(self._footer_raw)) + MAGIC
+
+    def _declared_sort(self) -> Optional[str]:
+        if not self._row_groups:
+            return None
+        sorting = _get(self._row_groups[0], 4)
+        if not sorting or not sorting[1]:
+            return None
+        leaf = _get(sorting[1][0], 1)
+        return next((name for name, (_, leaves) in self._columns.items() if leaves == [leaf]), None)
+
+    def _chunk(self, rg: int, leaf: int) -> Dict[int, tuple]:
+        return _get(self._row_groups[rg], 1)[1][leaf]
+
+    def _rg_rows(self, rg: int) -> int:
+        return _get(self._row_groups[rg], 3)
+
+    def _rg_range(self, rg: int) -> Optional[Tuple[int, int]]:
+        """(min, max) de la columna de tiempo en el row group (None = sin estadísticas)"""
+        stats = _get(_get(self._chunk(rg, self._time_leaf), 3), 12)
+        if not stats:
+            return None
+        lo = _get(stats, 6, _get(stats, 2))
+        hi = _get(stats, 5, _get(stats, 1))
+        if lo is None or hi is None or len(lo) != 8:
+            return None
+        return struct.unpack("<q", lo)[0], struct.unpack("<q", hi)[0]
+
+    # ------------------------------------------------------ page index
+
+    def _offset_index(self, rg: int, leaf: int) -> Optional[List[Tuple[int, int, int]]]:
+        """[(offset, bytes, primera fila)] de las páginas de datos del column chunk"""
+        key = (rg, leaf)
+        if key not in self._oidx:
+            cc = self._chunk(rg, leaf)
+            if 4 not in cc:
+                self._oidx[key] = None
+            else:
+                idx, _ = decode_struct(self._pread(_get(cc, 4), _get(cc, 5)))
+                self._oidx[key] = [(_get(p, 1), _get(p, 2), _get(p, 3)) for p in _get(idx, 1)[1]]
+        return self._oidx[key]
+
+    def _column_index(self, rg: int, leaf: int) -> Optional[Dict[int, tuple]]:
+        key = (rg, leaf)
+        if key not in self._cidx:
+            cc = self._chunk(rg, leaf)
+            self._cidx[key] = decode_struct(self._pread(_get(cc, 6), _get(cc, 7)))[0] if 6 in cc else None
+        return self._cidx[key]
+
+    # ------------------------------------------------------------ lectura
+
+    def _pages(self, rg: int, name: str, locs: List[Tuple[int, int, int]], k0: int, k1: int) -> Tuple[bytes, int]:
+        """Parquet mínimo con las páginas k0..k1 (+ diccionario) del column chunk y su primera fila"""
+        (a, b), (leaf,) = self._columns[name]
+        cc = self._chunk(rg, leaf)
+        meta = _get(cc, 3)
+        first = locs[0][0]
+        dict_off = _get(meta, 11)
+        if dict_off is None and _get(meta, 9) < first:
+            dict_off = _get(meta, 9)
+        head = self._pread(dict_off, first - dict_off) if dict_off is not None and dict_off < first else b""
+        start, end = locs[k0][0], locs[k1][0] + locs[k1][1]
+        body = self._pread(start, end - start)
+
+        # num_values y tamaño sin comprimir de lo copiado (cabeceras de página)
+        values = uncompressed = 0
+        for buf in (head, body):
+            pos = 0
+            while pos < len(buf):
+                hdr, data = decode_struct(buf, pos)
+                uncompressed += data - pos + _get(hdr, 2)
+                if _get(hdr, 1) == PAGE_DATA:
+                    values += _get(_get(hdr, 5), 1)
+                elif _get(hdr, 1) == PAGE_DATA_V2:
+                    values += _get(_get(hdr, 8), 1)
+                pos = data + _get(hdr, 3)
+
+        s0 = locs[k0][2]
+        s1 = locs[k1 + 1][2] if k1 + 1 < len(locs) else self._rg_rows(rg)
+        cmeta = {k: v for k, v in meta.items() if k not in _CMETA_DROP}
+        cmeta[5] = (T_I64, values)
+        cmeta[6] = (T_I64, uncompressed)
+        cmeta[7] = (T_I64, len(head) + len(body))
+        cmeta[9] = (T_I64, len(MAGIC) + len(head))
+        if head:
+            cmeta[11] = (T_I64, len(MAGIC))
+        else:
+            cmeta.pop(11, None)
+        chunk = {2: (T_I64, len(MAGIC) + len(head) + len(body)), 3: (T_STRUCT, cmeta)}
+        group = {1: (T_LIST, (T_STRUCT, [chunk])), 2: (T_I64, uncompressed), 3: (T_I64, s1 - s0)}
+
+        root = dict(self._schema[0])
+        root[5] = (T_I32, 1)
+        fmeta = {1: self._meta[1], 2: (T_LIST, (T_STRUCT, [root] + self._schema[a:b])),
+                 3: (T_I64, s1 - s0), 4: (T_LIST, (T_STRUCT, [group]))}
+        if 6 in self._meta:
+            fmeta[6] = self._meta[6]
+        if 7 in self._meta:
+            etype, orders = self._meta[7][1]
+            fmeta[7] = (T_LIST, (etype, orders[leaf:leaf + 1]))
+        footer = encode_struct(fmeta)
+        return MAGIC + head + body + footer + struct.pack("<I", len(footer)) + MAGIC, s0
+
+    def _decode(self, mini: bytes, name: str) -> pa.ChunkedArray:
+        col = pq.ParquetFile(pa.BufferReader(mini)).read().column(0)
+        target = self.arrow_schema.field(name).type
+        return col if col.type == target else col.cast(target)
+
+    def _read_span(self, rg: int, name: str, r0: int, r1: int) -> pa.ChunkedArray:
+        """Filas [r0, r1) del row group para una columna de primer nivel"""
+        _, leaves = self._columns[name]
+        locs = self._offset_index(rg, leaves[0]) if len(leaves) == 1 else None
+        if not locs:
+            return self._parquet().read_row_group(rg, columns=[name]).column(0).slice(r0, r1 - r0)
+        firsts = [loc[2] for loc in locs]
+        k0 = bisect.bisect_right(firsts, r0) - 1
+        k1 = bisect.bisect_left(firsts, r1) - 1
+        mini, s0 = self._pages(rg, name, locs, k0, k1)
+        return self._decode(mini, name).slice(r0 - s0, r1 - r0)
+
+    def _parquet(self) -> pq.ParquetFile:
+        if self._pf is None:
+            self._pf = pq.ParquetFile(self.path)
+        return self._pf
+
+    def _time_span(self, rg: int, lo: int, hi: int) -> Optional[Tuple[int, int, pa.ChunkedArray]]:
+        """Filas [r0, r1) del row group con lo <= tiempo <= hi (solo páginas que la cortan)"""
+        locs = self._offset_index(rg, self._time_leaf)
+        cidx = self._column_index(rg, self._time_leaf)
+        if not locs or not cidx or _get(cidx, 4) != ASCENDING:
+            return None
+        nulls = _get(cidx, 1)[1]
+        mins, maxs = _get(cidx, 2)[1], _get(cidx, 3)[1]
+        hit = [k for k in range(len(locs))
+               if not nulls[k] and struct.unpack("<q", maxs[k])[0] >= lo and struct.unpack("<q", mins[k])[0] <= hi]
+        if not hit:
+            return 0, 0, None
+        mini, s0 = self._pages(rg, self.time_col, locs, hit[0], hit[-1])
+        times = self._decode(mini, self.time_col)
+        # Nulos al principio (orden de Polars): no entran en ninguna ventana
+        ns = times.cast(pa.int64())
+        if ns.null_count:
+            ns = pc.fill_null(ns, np.iinfo(np.int64).min)
+        ns = ns.to_numpy()
+        i0 = int(np.searchsorted(ns, lo, "left"))
+        i1 = int(np.searchsorted(ns, hi, "right"))
+        return s0 + i0, s0 + i1, times.slice(i0, i1 - i0)
+
+    def _read_rg(self, rg: int, lo: int, hi: int, columns: List[str]) -> Optional[pa.Table]:
+        span = self._time_span(rg, lo, hi) if self.sorted else None
+        if span is None:
+            # Sin índice de páginas / sin orden: row group entero y filtro
+            wanted = list(dict.fromkeys(columns + [self.time_col]))
+            table = self._parquet().read_row_group(rg, columns=wanted)
+            self.bytes_read += sum(_get(_get(self._chunk(rg, leaf), 3), 7)
+                                   for c in wanted for leaf in self._columns[c][1])
+            t = table.column(self.time_col).cast(pa.int64())
+            table = table.filter(pc.and_(pc.greater_equal(t, lo), pc.less_equal(t, hi)))
+            return table.select(columns) if table.num_rows else None
+        r0, r1, times = span
+        if r1 <= r0:
+            return None
+        arrays = [times if c == self.time_col else self._read_span(rg, c, r0, r1) for c in columns]
+        return pa.Table.from_arrays(arrays, schema=pa.schema([self.arrow_schema.field(c) for c in columns]))
+
+    def read_arrow(self, start: int, end: int, columns: Optional[Sequence[str]] = None) -> pa.Table:
+        columns = list(columns) if columns else list(self.arrow_schema.names)
+        missing = [c for c in columns if c not in self._columns]
+        if missing:
+            raise KeyError(f"{self.path}: columnas inexistentes {missing}")
+        parts = []
+        for rg, rng in enumerate(self._rg_ranges):
+            if rng is not None and (rng[1] < start or rng[0] > end):
+                continue
+            part = self._read_rg(rg, start, end, columns)
+            if part is not None:
+                parts.append(part)
+        if not parts:
+            return pa.schema([self.arrow_schema.field(c) for c in columns]).empty_table()
+        return pa.concat_tables(parts)
+
+    def read(self, start: int, end: int, columns: Optional[Sequence[str]] = None) -> pl.DataFrame:
+        """Filas con start <= tiempo <= end (epoch en la unidad de la columna)"""
+        return pl.from_arrow(self.read_arrow(start, end, columns))
+
+# ----------------------------------------------------------------------
+# Ventanas de muchos eventos sobre el store
+# ----------------------------------------------------------------------
+
+def log(msg):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+def _ticks(value: Union[dt.timedelta, float, int], unit: str) -> int:
+    seconds = value.total_seconds() if isinstance(value, dt.timedelta) else float(value)
+    return int(round(seconds * {"ns": 1e9, "us": 1e6, "ms": 1e3, "s": 1.0}[unit]))
+
+def _windows(events: pl.DataFrame, ts_col: str, before: int, after: int, unit: str) -> pl.DataFrame:
+    """event_id, ticker, ts, lo, hi (epoch en la unidad del dataset) y días de mercado que toca"""
+    if "event_id" not in events.columns:
+        events = events.with_row_index("event_id")
+    ts = pl.col(ts_col)
+    dtype = events.schema[ts_col]
+    if dtype == pl.Utf8:
+        events = events.with_columns(ts.str.to_datetime())
+        dtype = events.schema[ts_col]
+    if isinstance(dtype, pl.Datetime):
+        if dtype.time_zone is None:
+            ts = ts.dt.replace_time_zone("UTC")
+        ts = ts.dt.epoch(unit)
+    out = events.select("event_id", "ticker", ts.cast(pl.Int64).alias("ts")).with_columns(
+        (pl.col("ts") - before).alias("lo"), (pl.col("ts") + after).alias("hi"))
+    day = lambda c: pl.from_epoch(c, time_unit=unit).dt.replace_time_zone("UTC").dt.convert_time_zone(MARKET_TZ).dt.date()
+    return out.with_columns(day("lo").alias("d0"), day("hi").alias("d1"))
+
+def _partition(path: str, root: Path) -> Tuple:
+    part = parse_partition(os.path.relpath(path, root))
+    return part["year"], part["month"], part["day"]
+
+def _covers(part: Tuple, day: dt.date) -> bool:
+    return all(v is None or v == w for v, w in zip(part, (day.year, day.month, day.day)))
+
+def plan(dataset: str, windows: pl.DataFrame, root: Optional[Union[str, Path]] = None,
+         catalog_dir: Optional[Union[str, Path]] = None) -> Dict[str, List[Tuple[int, int, int]]]:
+    """Fichero -> [(event_id, lo, hi)] ordenadas por lo"""
+    base = dataset_root(dataset, root)
+    tasks: Dict[str, List[Tuple[int, int, int]]] = {}
+    for (ticker,), group in windows.group_by(["ticker"], maintain_order=True):
+        paths = resolve_files(dataset, [ticker], group["d0"].min(), group["d1"].max(),
+                              root=base, catalog_dir=catalog_dir)
+        parts = [(p, _partition(p, base)) for p, _ in paths]
+        for eid, lo, hi, d0, d1 in group.select("event_id", "lo", "hi", "d0", "d1").iter_rows():
+            for path, part in parts:
+                if _covers(part, d0) or _covers(part, d1):
+                    tasks.setdefault(path, []).append((eid, lo, hi))
+    return {p: sorted(w, key=lambda x: x[1]) for p, w in tasks.items()}
+
+def _read_file(dataset: str, path: str, windows: List[Tuple[int, int, int]],
+               columns: Optional[Sequence[str]]) -> Tuple[List[pl.DataFrame], int, int]:
+    aliases = DATASETS[dataset]["aliases"]
+    with TickWindowReader(path) as reader:
+        names = reader.arrow_schema.names
+        # Alias de columnas antiguas (sip_timestamp -> timestamp)
+        inverse = {new: old for old, new in aliases.items() if old in names and new not in names}
+        cols = [inverse.get(c, c) for c in columns] if columns else list(names)
+        rename = {old: new for new, old in inverse.items() if old in cols}
+        tcol = reader.time_col
+        frames = []
+        for lo, hi, group in _clusters(windows):
+            # Ventanas solapadas: se lee la unión una vez y se corta por evento
+            df = reader.read(lo, hi, list(dict.fromkeys(cols + [tcol])))
+            for eid, wlo, whi in group:
+                part = df.filter(pl.col(tcol).is_between(wlo, whi)) if len(group) > 1 else df
+                if part.height:
+                    frames.append(part.select(cols).rename(rename)
+                                      .with_columns(pl.lit(eid, pl.UInt32).alias("event_id")))
+        return frames, reader.bytes_read, reader.file_bytes
+
+def _clusters(windows: List[Tuple[int, int, int]]) -> List[Tuple[int, int, List[Tuple[int, int, int]]]]:
+    """Agrupa ventanas (ordenadas por lo) que se solapan"""
+    out = []
+    for w in windows:
+        if out and w[1] <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], w[2])
+            out[-1][2].append(w)
+        else:
+            out.append([w[1], w[2], [w]])
+    return [tuple(c) for c in out]
+
+def extract_windows(dataset: str, events: pl.DataFrame, before: Union[dt.timedelta, float],
+                    after: Union[dt.timedelta, float], columns: Optional[Sequence[str]] = None,
+                    ts_col: str = "ts", root: Optional[Union[str, Path]] = None,
+                    catalog_dir: Optional[Union[str, Path]] = None, workers: int = 8,
+                    stats: Optional[Dict] = None) -> pl.DataFrame:
+    """
+    Ticks de [ts - before, ts + after] para cada evento (ticker, ts_col).
+    before / after: timedelta o segundos. Devuelve event_id + ticker + columnas,
+    ordenado por evento y tiempo; stats (dict) recibe ficheros y bytes leídos.
+    """
+    unit = DATASETS[dataset]["time_unit"]
+    windows = _windows(events, ts_col, _ticks(before, unit), _ticks(after, unit), unit)
+    tasks = plan(dataset, windows, root, catalog_dir)
+
+    frames, read_bytes, file_bytes = [], 0, 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks) or 1))) as pool:
+        for part, nread, nfile in pool.map(lambda kv: _read_file(dataset, kv[0], kv[1], columns), tasks.items()):
+            frames.extend(part)
+            read_bytes += nread
+            file_bytes += nfile
+    if stats is not None:
+        stats.update(files=len(tasks), windows=windows.height, bytes_read=read_bytes, file_bytes=file_bytes)
+
+    if not frames:
+        return pl.DataFrame(schema={"event_id": pl.UInt32, "ticker": pl.Utf8})
+    out = pl.concat(frames, how="diagonal_relaxed")
+    out = out.join(windows.select(pl.col("event_id").cast(pl.UInt32), "ticker"), on="event_id", how="left")
+    time_col = DATASETS[dataset]["time_col"]
+    order = ["event_id"] + ([time_col] if time_col in out.columns else [])
+    return out.select("event_id", "ticker", pl.exclude("event_id", "ticker")).sort(order, maintain_order=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ventanas de ticks alrededor de eventos (solo páginas necesarias)")
+    parser.add_argument("--dataset", choices=["trades", "quotes"], required=True)
+    parser.add_argument("--events", required=True, help="CSV / parquet con ticker y ts (Datetime UTC o epoch)")
+    parser.add_argument("--ts-col", default="ts")
+    parser.add_argument("--before", type=float, default=120, help="Segundos antes del evento")
+    parser.add_argument("--after", type=float, default=120, help="Segundos después del evento")
+    parser.add_argument("--columns", nargs="+", default=None)
+    parser.add_argument("--root", default=None)
+    parser.add_argument("--catalog-dir", default=None)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--out", default=None, help="Parquet de salida")
+    args = parser.parse_args()
+
+    events = (pl.read_parquet(args.events) if args.events.endswith(".parquet")
+              else pl.read_csv(args.events, try_parse_dates=True))
+    print("=" * 80)
+    print(f"VENTANAS DE TICKS | {args.dataset} | {events.height:,} eventos | -{args.before:g}s / +{args.after:g}s")
+    print("=" * 80)
+
+    t0 = time.time()
+    stats: Dict = {}
+    out = extract_windows(args.dataset, events, args.before, args.after, args.columns, args.ts_col,
+                          args.root, args.catalog_dir, args.workers, stats)
+    elapsed = time.time() - t0
+    log(f"{out.height:,} filas | {stats['files']:,} ficheros | "
+        f"{stats['bytes_read'] / 1024**2:,.1f} MB leídos de {stats['file_bytes'] / 1024**2:,.1f} MB | {elapsed:.1f}s")
+    if args.out:
+        out.write_parquet(args.out)
+        log(f"Escrito {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,8 @@ import sys
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
+from store_query import load as load_store
+
 # Fix Windows console encoding
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -26,82 +28,74 @@ if sys.platform == 'win32':
 
 def get_ticker_months_downloaded(data_dir: Path, ticker: str, year_min: int, year_max: int) -> Set[Tuple[int, int]]:
     """
-    Obtiene qué meses tienen datos descargados para un ticker.
+    Obtiene qué meses tienen datos descargados para un ticker (minute.parquet
+    por mes, TICKER/minute.parquet compactado o layout Hive, vía store_query).
 
     Returns:
         Set de tuplas (year, month) con datos descargados
     """
     downloaded_months = set()
-    ticker_path = data_dir / ticker
+    start, end = f"{year_min}-01-01", f"{year_max}-12-31"
 
-    if not ticker_path.exists():
+    try:
+        try:
+            df = load_store("ohlcv_1m", [ticker], start, end, columns=["date"], root=data_dir)
+        except Exception:
+            # Ficheros antiguos sin columna date: fecha desde timestamp
+            df = load_store("ohlcv_1m", [ticker], start, end, root=data_dir)
+    except:
         return downloaded_months
 
-    for year in range(year_min, year_max + 1):
-        year_path = ticker_path / f"year={year}"
-        if not year_path.exists():
-            continue
-
-        for month in range(1, 13):
-            month_dir = year_path / f"month={month:02d}"
-            minute_file = month_dir / "minute.parquet"
+    if 'date' in df.columns:
+        dates = df['date'].drop_nulls().unique().to_list()
+    elif 'timestamp' in df.columns:
+        dates = df['timestamp'].dt.date().drop_nulls().unique().to_list()
+    else:
+        return downloaded_months
 
-            if minute_file.exists():
-                try:
-                    # Verificar que el archivo no esté vacío y tenga fechas válidas
-                    df = pl.read_parquet(minute_file)
-
-                    if len(df) > 0:
-                        # Verificar que tenga fechas válidas (no 1970)
-                        if 'date' in df.columns:
-                            dates = df['date'].unique().to_list()
-                            valid_dates = [d for d in dates if str(d).startswith(str(year))]
-                            if valid_dates:
-                                downloaded_months.add((year, month))
-                        elif 'timestamp' in df.columns:
-                            dates = df['timestamp'].dt.date().unique().to_list()
-                            valid_dates = [d for d in dates if str(d).startswith(str(year))]
-                            if valid_dates:
-                                downloaded_months.add((year, month))
-                except:
-                    pass
+    # Solo fechas válidas (no 1970) dentro del rango
+    for d in dates:
+        date_str = str(d)
+        try:
+            y, m = int(date_str[:4]), int(date_str[5:7])
+        except ValueError:
+            continue
+        if year_min <= y <= year_max:
+            downloaded_months.add((y, m))
 
     return downloaded_months
 
 
 def get_ticker_expected_months(daily_root: Path, ticker: str, year_min: int, year_max: int) -> Set[Tuple[int, int]]:
     """
-    Obtiene qué meses deberían tener datos según daily.
+    Obtiene qué meses deberían tener datos según daily (vía store_query).
 
     Returns:
         Set de tuplas (year, month) que deberían existir
     """
     expected_months = set()
 
-    for year in range(year_min, year_max + 1):
-        daily_file = daily_root / ticker / f"year={year}" / "daily.parquet"
-
-        if not daily_file.exists():
-            continue
-
+    try:
+        df = load_store("ohlcv_daily", [ticker], f"{year_min}-01-01", f"{year_max}-12-31",
+                        columns=["date"], root=daily_root)
+    except:
+        return expected_months
+    if df.is_empty():
+        return expected_months
+
+    # Extraer año-mes de cada fecha
+    for date_str in df['date'].unique().to_list():
         try:
-            df = pl.read_parquet(daily_file)
-
-            # Extraer año-mes de cada fecha
-            for date_str in df['date'].unique().to_list():
-                try:
-                    if isinstance(date_str, str):
-                        year_month = date_str[:7]  # 'YYYY-MM'
-                        y, m = int(year_month[:4]), int(year_month[5:7])
-                    else:
-                        y, m = date_str.year, date_str.month
-
-                    if year_min <= y <= year_max:
-                        expected_months.add((y, m))
-                except:
-                    continue
+            if isinstance(date_str, str):
+                year_month = date_str[:7]  # 'YYYY-MM'
+                y, m = int(year_month[:4]), int(year_month[5:7])
+            else:
+                y, m = date_str.year, date_str.month
+
+            if year_min <= y <= year_max:
+                expected_months.add((y, m))
         except:
-            pass
+            continue
 
     return expected_months
 
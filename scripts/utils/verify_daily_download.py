@@ -30,6 +30,8 @@ import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from multiprocessing import cpu_count
 
+from hive_layout import ticker_dir
+
 # Force UTF-8 for stdout/stderr
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
@@ -140,9 +142,9 @@ def ping_polygon_ticker(ticker: str, start_date: str, end_date: str, api_key: st
 
 def check_local_daily(ticker: str, daily_root: Path, period_start: str, period_end: str) -> dict:
     """Verifica qué daily tenemos descargado localmente"""
-    ticker_dir = daily_root / ticker
+    tdir = ticker_dir(daily_root, ticker)  # AAPL/ o ticker=AAPL/ (Hive)
 
-    if not ticker_dir.exists():
+    if not tdir.exists():
         return {
             "local_has_data": False,
             "local_first": None,
@@ -155,7 +157,7 @@ def check_local_daily(ticker: str, daily_root: Path, period_start: str, period_e
     dfs = []
     years_found = []
 
-    for year_dir in ticker_dir.glob("year=*"):
+    for year_dir in tdir.glob("year=*"):
         year_num = year_dir.name.split("=")[1]
         years_found.append(year_num)
 
@@ -167,6 +169,17 @@ def check_local_daily(ticker: str, daily_root: Path, period_start: str, period_e
             except Exception:
                 continue
 
+    # Daily compactado por ticker (compact_small_files.py: TICKER/daily.parquet)
+    packed_file = tdir / "daily.parquet"
+    if packed_file.exists():
+        try:
+            df = pl.read_parquet(packed_file, columns=["date"])
+            dfs.append(df)
+            years_found = sorted(set(years_found) |
+                                 set(df["date"].cast(pl.Utf8).str.slice(0, 4).drop_nulls().to_list()))
+        except Exception:
+            pass
+
     if not dfs:
         return {
             "local_has_data": False,
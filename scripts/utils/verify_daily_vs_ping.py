@@ -22,6 +22,8 @@ from datetime import datetime
 import sys
 import io
 
+from hive_layout import ticker_dir
+
 # Force UTF-8
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
@@ -40,9 +42,9 @@ def parse_args():
 
 def check_local_daily(ticker: str, daily_root: Path, period_start: str, period_end: str) -> dict:
     """Verifica qué daily tenemos localmente"""
-    ticker_dir = daily_root / ticker
+    tdir = ticker_dir(daily_root, ticker)  # AAPL/ o ticker=AAPL/ (Hive)
 
-    if not ticker_dir.exists():
+    if not tdir.exists():
         return {
             "local_has_data": False,
             "local_first": None,
@@ -54,7 +56,7 @@ def check_local_daily(ticker: str, daily_root: Path, period_start: str, period_e
     dfs = []
     years_found = []
 
-    for year_dir in ticker_dir.glob("year=*"):
+    for year_dir in tdir.glob("year=*"):
         year_num = year_dir.name.split("=")[1]
         years_found.append(year_num)
 
@@ -66,6 +68,17 @@ def check_local_daily(ticker: str, daily_root: Path, period_start: str, period_e
             except Exception:
                 continue
 
+    # Daily compactado por ticker (compact_small_files.py: TICKER/daily.parquet)
+    packed_file = tdir / "daily.parquet"
+    if packed_file.exists():
+        try:
+            df = pl.read_parquet(packed_file, columns=["date"])
+            dfs.append(df)
+            years_found = sorted(set(years_found) |
+                                 set(df["date"].cast(pl.Utf8).str.slice(0, 4).drop_nulls().to_list()))
+        except Exception:
+            pass
+
     if not dfs:
         return {
             "local_has_data": False,
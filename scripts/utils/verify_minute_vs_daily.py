@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+verify_minute_vs_daily.py - Consistencia minute vs daily de TODO el universo en un scan
+
+Sustituye los bucles por ticker de verify_all_intraday_1m.py,
+verify_intraday_improved.py y show_intraday_1m_days.py (que solo comparaban
+conteos de días) por un único job columnar en DuckDB:
+
+1. Scan paralelo de todos los minute.parquet del layout Hive
+   (TICKER/year=YYYY/month=MM/minute.parquet y los compactados por ticker
+   TICKER/minute.parquet de compact_small_files.py), leyendo solo t/h/l/v
+2. Agregado por (ticker, día ET): volumen, high, low y número de barras
+3. FULL JOIN contra el daily store (TICKER/year=YYYY/daily.parquet)
+4. Flags por fila: MISSING_MINUTE_DAY, MISSING_DAILY_DAY, VOLUME_MISMATCH,
+   HIGH_MISMATCH, LOW_MISMATCH
+
+Los dos esquemas de minute (o/h/l/c/v y open/high/low/close/volume) se
+leen con union_by_name y se normalizan con COALESCE. Si un ticker compactado
+tiene ficheros sueltos posteriores, la barra suelta sustituye a la compactada
+con el mismo t (fecha en daily), como en store_query.
+
+Salida:
+  {output_prefix}_mismatches.parquet  -> una fila por (ticker, día) con algún flag
+  {output_prefix}_summary.parquet     -> conteos por ticker
+
+Uso:
+    python scripts/utils/verify_minute_vs_daily.py \
+        --daily-root raw/polygon/ohlcv_daily \
+        --minute-root C:\\TSIS_Data\\ohlcv_intraday_1m\\2019_2025 \
+        --output-prefix verify_minute_vs_daily_2019_2025 \
+        --year-min 2019 --year-max 2025
+"""
+
+import os
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import List
+
+import duckdb
+
+from store_query import TICKER_FROM_PATH, packed_files
+
+def log(msg):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {msg}", flush=True)
+
+def sql_path(path: Path) -> str:
+    """Ruta con '/' y comillas escapadas para literales SQL"""
+    return str(path).replace("\\", "/").replace("'", "''")
+
+def pick(columns: List[str], *names: str) -> str:
+    """COALESCE de las columnas que existen (esquemas mezclados)"""
+    present = [f'"{n}"' for n in names if n in columns]
+    if not present:
+        return "NULL"
+    return present[0] if len(present) == 1 else f"COALESCE({', '.join(present)})"
+
+def parquet_source(con, files: str, hive: bool):
+    """
+    read_parquet(files) y su esquema unificado (sin leer datos); (None, [])
+    si no hay ficheros (DuckDB falla con un glob vacío)
+    """
+    if not files:
+        return None, []
+    src = f"read_parquet({files}, union_by_name=true, filename=true{', hive_partitioning=true' if hive else ''})"
+    return src, [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {src}").fetchall()]
+
+def rows_view(con, name: str, loose_sql: str, packed_sql: str, overlay: List[str], key: str) -> None:
+    """
+    Vista con las filas sueltas + las compactadas; en tickers con ambos, las
+    compactadas con una clave ya presente en los sueltos se descartan
+    """
+    if not loose_sql or not packed_sql:
+        con.execute(f"CREATE TEMP VIEW {name} AS {loose_sql or packed_sql}")
+        return
+    con.execute(f"CREATE TEMP VIEW {name}_loose AS {loose_sql}")
+    newer = "false"
+    if overlay:
+        tickers = ", ".join("'" + t.replace("'", "''") + "'" for t in overlay)
+        newer = (f"p.ticker IN ({tickers}) AND EXISTS (SELECT 1 FROM {name}_loose l "
+                 f"WHERE l.ticker = p.ticker AND l.{key} = p.{key})")
+    con.execute(f"""
+        CREATE TEMP VIEW {name} AS
+        SELECT * FROM {name}_loose
+        UNION ALL BY NAME
+        SELECT * FROM ({packed_sql}) p WHERE NOT ({newer})
+    """)
+
+def main():
+    parser = argparse.ArgumentParser(description='Consistencia minute vs daily (un scan columnar con DuckDB)')
+    parser.add_argument('--daily-root', required=True, help='Raíz del daily store')
+    parser.add_argument('--minute-root', required=True, help='Raíz del store 1m')
+    parser.add_argument('--output-prefix', required=True, help='Prefijo de los parquet de salida')
+    parser.add_argument('--year-min', type=int, help='Año mínimo a verificar')
+    parser.add_argument('--year-max', type=int, help='Año máximo a verificar')
+    parser.add_argument('--volume-tolerance', type=float, default=0.05,
+                        help='Diferencia relativa de volumen tolerada (default: 0.05)')
+    parser.add_argument('--price-tolerance', type=float, default=0.005,
+                        help='Diferencia relativa de high/low tolerada (default: 0.005)')
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 4, help='Threads DuckDB')
+    parser.add_argument('--memory-limit', default='8GB', help='Límite de memoria DuckDB (default: 8GB)')
+
+    args = parser.parse_args()
+
+    log("=" * 80)
+    log("CONSISTENCIA MINUTE vs DAILY (scan columnar único)")
+    log("=" * 80)
+
+    con = duckdb.connect()
+    con.execute(f"SET threads = {args.threads}")
+    con.execute(f"SET memory_limit = '{args.memory_limit}'")
+    con.execute("SET TimeZone = 'UTC'")
+
+    year_glob_min = args.year_min or 1900
+    year_glob_max = args.year_max or 2999
+
+    minute_glob = "*/year=*/month=*/minute.parquet"
+    daily_glob = "*/year=*/daily.parquet"
+
+    def loose_files(root: str, pattern: str) -> str:
+        """Literal del glob de ficheros sueltos ('' si no hay ninguno)"""
+        if next(Path(root).glob(pattern), None) is None:
+            return ""
+        return f"'{sql_path(Path(root))}/{pattern}'"
+
+    def packed_list(packed) -> str:
+        """Lista SQL de los ficheros compactados por ticker (sin year=: no hay poda)"""
+        if not packed:
+            return ""
+        return "[" + ", ".join(f"'{sql_path(Path(f))}'" for f, _ in packed.values()) + "]"
+
+    # Esquema unificado de cada fuente para construir los COALESCE
+    minute_packed = packed_files("ohlcv_1m", args.minute_root)
+    daily_packed = packed_files("ohlcv_daily", args.daily_root)
+    minute_src, minute_cols = parquet_source(con, loose_files(args.minute_root, minute_glob), True)
+    daily_src, daily_cols = parquet_source(con, loose_files(args.daily_root, daily_glob), True)
+    minute_packed_src, minute_packed_cols = parquet_source(con, packed_list(minute_packed), False)
+    daily_packed_src, daily_packed_cols = parquet_source(con, packed_list(daily_packed), False)
+    if not (minute_src or minute_packed_src) or not (daily_src or daily_packed_src):
+        log("ERROR: sin ficheros minute o daily en las raíces indicadas")
+        return
+
+    # Ticker = directorio que precede a year=... (o al fichero compactado)
+    ticker_expr = f"regexp_extract(filename, '{TICKER_FROM_PATH}', 1)"
+
+    log(f"Minute: {args.minute_root}/{minute_glob} + {len(minute_packed):,} compactados")
+    log(f"Daily:  {args.daily_root}/{daily_glob} + {len(daily_packed):,} compactados")
+    log(f"Threads: {args.threads} | Años: {args.year_min or 'inicio'} - {args.year_max or 'fin'}")
+
+    def minute_rows(src, cols, tkr, where):
+        return f"""
+            SELECT
+                {tkr} AS ticker,
+                t,
+                {pick(cols, 'volume', 'v')} AS volume,
+                {pick(cols, 'high', 'h')}   AS high,
+                {pick(cols, 'low', 'l')}    AS low
+            FROM {src}
+            WHERE {where} t IS NOT NULL AND t > 0
+        """
+
+    def daily_rows(src, cols, tkr, where):
+        return f"""
+            SELECT
+                COALESCE({pick(cols, 'ticker')}, {tkr}) AS ticker,
+                CAST({pick(cols, 'date')} AS DATE) AS date,
+                {pick(cols, 'volume', 'v')} AS daily_volume,
+                {pick(cols, 'high', 'h')}   AS daily_high,
+                {pick(cols, 'low', 'l')}    AS daily_low
+            FROM {src}
+            {where}
+        """
+
+    years = f"CAST(year AS INTEGER) BETWEEN {year_glob_min} AND {year_glob_max}"
+    rows_view(con, "minute_rows",
+              minute_src and minute_rows(minute_src, minute_cols, ticker_expr, f"{years} AND"),
+              minute_packed_src and minute_rows(minute_packed_src, minute_packed_cols, ticker_expr, ""),
+              [t for t, (_, loose) in minute_packed.items() if loose], "t")
+    rows_view(con, "daily_rows",
+              daily_src and daily_rows(daily_src, daily_cols, ticker_expr, f"WHERE {years}"),
+              daily_packed_src and daily_rows(daily_packed_src, daily_packed_cols, ticker_expr, ""),
+              [t for t, (_, loose) in daily_packed.items() if loose], "date")
+
+    con.execute(f"""
+        CREATE TEMP VIEW minute_days AS
+        SELECT
+            ticker,
+            CAST(timezone('America/New_York', to_timestamp(t / 1000.0)) AS DATE) AS date,
+            SUM(volume)  AS minute_volume,
+            MAX(high)    AS minute_high,
+            MIN(low)     AS minute_low,
+            COUNT(*)     AS minute_bars
+        FROM minute_rows
+        GROUP BY 1, 2
+        HAVING year(date) BETWEEN {year_glob_min} AND {year_glob_max}
+    """)
+
+    con.execute(f"""
+        CREATE TEMP VIEW daily_days AS
+        SELECT * FROM daily_rows
+        WHERE year(date) BETWEEN {year_glob_min} AND {year_glob_max}
+    """)
+
+    vol_tol = args.volume_tolerance
+    px_tol = args.price_tolerance
+
+    # Solo tickers presentes en ambos stores: un ticker sin minute es
+    # cobertura (verify_all_intraday_1m), no inconsistencia de datos
+    con.execute(f"""
+        CREATE TEMP TABLE findings AS
+        WITH tickers AS (
+            SELECT DISTINCT ticker FROM minute_days
+            INTERSECT
+            SELECT DISTINCT ticker FROM daily_days
+        ),
+        joined AS (
+            SELECT
+                COALESCE(m.ticker, d.ticker) AS ticker,
+                COALESCE(m.date, d.date)     AS date,
+                d.daily_volume, m.minute_volume,
+                d.daily_high, m.minute_high,
+                d.daily_low, m.minute_low,
+                m.minute_bars
+            FROM minute_days m
+            FULL OUTER JOIN daily_days d USING (ticker, date)
+        )
+        SELECT
+            j.*,
+            (minute_volume - daily_volume) / NULLIF(daily_volume, 0) AS volume_diff_pct,
+            (minute_high - daily_high) / NULLIF(daily_high, 0)       AS high_diff_pct,
+            (minute_low - daily_low) / NULLIF(daily_low, 0)          AS low_diff_pct,
+            minute_bars IS NULL                                      AS missing_minute_day,
+            daily_volume IS NULL AND daily_high IS NULL              AS missing_daily_day,
+            ABS((minute_volume - daily_volume) / NULLIF(daily_volume, 0)) > {vol_tol} AS volume_mismatch,
+            ABS((minute_high - daily_high) / NULLIF(daily_high, 0)) > {px_tol}        AS high_mismatch,
+            ABS((minute_low - daily_low) / NULLIF(daily_low, 0)) > {px_tol}           AS low_mismatch
+        FROM joined j
+        WHERE j.ticker IN (SELECT ticker FROM tickers)
+    """)
+
+    con.execute("""
+        CREATE TEMP VIEW flagged AS
+        SELECT
+            *,
+            CASE
+                WHEN missing_minute_day THEN 'MISSING_MINUTE_DAY'
+                WHEN missing_daily_day  THEN 'MISSING_DAILY_DAY'
+                ELSE concat_ws('|',
+                    CASE WHEN volume_mismatch THEN 'VOLUME_MISMATCH' END,
+                    CASE WHEN high_mismatch   THEN 'HIGH_MISMATCH' END,
+                    CASE WHEN low_mismatch    THEN 'LOW_MISMATCH' END)
+            END AS issue
+        FROM findings
+        WHERE missing_minute_day OR missing_daily_day
+           OR COALESCE(volume_mismatch, false)
+           OR COALESCE(high_mismatch, false)
+           OR COALESCE(low_mismatch, false)
+    """)
+
+    mismatches_file = f"{args.output_prefix}_mismatches.parquet"
+    summary_file = f"{args.output_prefix}_summary.parquet"
+    Path(mismatches_file).parent.mkdir(parents=True, exist_ok=True)
+
+    con.execute(f"""
+        COPY (SELECT * FROM flagged ORDER BY ticker, date)
+        TO '{sql_path(Path(mismatches_file))}' (FORMAT PARQUET, COMPRESSION ZSTD)
+    """)
+    con.execute(f"""
+        COPY (
+            SELECT
+                ticker,
+                COUNT(*)                                          AS days_total,
+                COUNT(*) FILTER (WHERE missing_minute_day)        AS missing_minute_days,
+                COUNT(*) FILTER (WHERE missing_daily_day)         AS missing_daily_days,
+                COUNT(*) FILTER (WHERE volume_mismatch)           AS volume_mismatches,
+                COUNT(*) FILTER (WHERE high_mismatch)             AS high_mismatches,
+                COUNT(*) FILTER (WHERE low_mismatch)              AS low_mismatches,
+                MIN(date)                                         AS first_date,
+                MAX(date)                                         AS last_date
+            FROM findings
+            GROUP BY ticker
+            ORDER BY ticker
+        ) TO '{sql_path(Path(summary_file))}' (FORMAT PARQUET, COMPRESSION ZSTD)
+    """)
+
+    totals = con.execute("""
+        SELECT
+            COUNT(DISTINCT ticker),
+            COUNT(*),
+            COUNT(*) FILTER (WHERE missing_minute_day),
+            COUNT(*) FILTER (WHERE missing_daily_day),
+            COUNT(*) FILTER (WHERE volume_mismatch),
+            COUNT(*) FILTER (WHERE high_mismatch),
+            COUNT(*) FILTER (WHERE low_mismatch)
+        FROM findings
+    """).fetchone()
+
+    n_tickers, n_days, miss_min, miss_daily, vol_mm, high_mm, low_mm = totals
+
+    log("")
+    log("=" * 80)
+    log("RESULTADOS")
+    log("=" * 80)
+    log(f"Tickers verificados:        {n_tickers:,}")
+    log(f"Ticker-días comparados:     {n_days:,}")
+    log(f"  Días sin minute:          {miss_min:,}")
+    log(f"  Días sin daily:           {miss_daily:,}")
+    log(f"  Volumen fuera de ±{vol_tol:.1%}: {vol_mm:,}")
+    log(f"  High fuera de ±{px_tol:.2%}:  {high_mm:,}")
+    log(f"  Low fuera de ±{px_tol:.2%}:   {low_mm:,}")
+    log("")
+    log(f"  ✅ {mismatches_file}")
+    log(f"  ✅ {summary_file}")
+
+if __name__ == '__main__':
+    main()
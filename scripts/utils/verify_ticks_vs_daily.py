@@ -2,111 +2,82 @@
 """
 Verifica ticks vs daily para todos los tickers en un periodo.
 Usa el daily local como fuente de verdad (ya verificado 100% vs Polygon).
+
+Los días con ticks salen de un listado del árbol de cada ticker (o del
+catálogo con --ticks-catalog), no de un stat() por fecha: ver tick_coverage.py.
+Los tickers se reparten en lotes entre procesos y las fechas faltantes se
+escriben directamente en parquet (<prefix>_missing_dates.parquet, columnas
+ticker, missing_date; ingest_missing_ticks.py --missing-csv lo acepta).
 """
 
 import polars as pl
-import sys
 import os
 import argparse
-from pathlib import Path
 from datetime import datetime
 
+from daily_panel import _run
+from tick_coverage import coverage_batch
+
+TICKERS_PER_TASK = 200
+
 def log(msg):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {msg}", flush=True)
 
-def verify_ticker_ticks(ticker, daily_root, ticks_root, year_min=None, year_max=None):
+def _bounds(year_min=None, year_max=None):
+    return (f"{year_min}-01-01" if year_min else None, f"{year_max}-12-31" if year_max else None)
+
+def verify_tickers(tickers, daily_root, ticks_root, year_min=None, year_max=None,
+                   catalog_dir=None, ticks_catalog=None):
     """
-    Verifica ticks para un ticker específico.
+    Verifica un lote de tickers (worker).
     year_min, year_max: Filtrar solo años en este rango (ej: 2004-2018)
-    Retorna dict con estadísticas.
+    Retorna (resumen por ticker, fechas faltantes).
     """
-    # Encontrar todos los años del ticker en daily
-    ticker_path = Path(daily_root) / ticker
-    if not ticker_path.exists():
-        return None
-
-    year_dirs = [d for d in ticker_path.iterdir() if d.is_dir() and d.name.startswith('year=')]
-
-    if not year_dirs:
-        return None
-
-    total_daily_days = 0
-    total_ticks_days = 0
-    missing_dates = []
-    first_date = None
-    last_date = None
-
-    # Procesar cada año
-    for year_dir in sorted(year_dirs):
-        # Extraer año del nombre del directorio
-        year_str = year_dir.name.replace('year=', '')
-        year_int = int(year_str)
-
-        # Filtrar por rango de años si se especifica
-        if year_min is not None and year_int < year_min:
-            continue
-        if year_max is not None and year_int > year_max:
-            continue
-
-        daily_file = year_dir / 'daily.parquet'
-
-        try:
-            if not daily_file.exists():
-                continue
+    first, last = _bounds(year_min, year_max)
+    days = coverage_batch(daily_root, ticks_root, [(t, first, last) for t in tickers],
+                          catalog_dir, ticks_catalog).filter(pl.col("daily"))
+    summary = (
+        days.group_by("ticker")
+            .agg([pl.col("date").min().alias("daily_first"),
+                  pl.col("date").max().alias("daily_last"),
+                  pl.len().alias("daily_days"),
+                  pl.col("market").sum().alias("ticks_found")])
+            .with_columns((pl.col("daily_days") - pl.col("ticks_found")).alias("ticks_missing"))
+            .with_columns([
+                pl.when(pl.col("ticks_missing") == 0).then(pl.lit("COMPLETE"))
+                  .when(pl.col("ticks_found") == 0).then(pl.lit("MISSING_TICKER"))
+                  .otherwise(pl.lit("MISSING_DAYS")).alias("status"),
+                pl.when(pl.col("ticks_missing") == 0).then(pl.lit(""))
+                  .when(pl.col("ticks_found") == 0).then(pl.lit("No existe carpeta o sin ticks"))
+                  .otherwise(pl.format("Faltan {} días", pl.col("ticks_missing"))).alias("issue"),
+                (pl.col("ticks_found") / pl.col("daily_days") * 100).round(1).alias("completeness_pct"),
+            ])
+            .select(["ticker", "status", "completeness_pct", "daily_first", "daily_last",
+                     "daily_days", "ticks_found", "ticks_missing", "issue"])
+    )
+    missing = days.filter(~pl.col("market")).select(["ticker", pl.col("date").alias("missing_date")])
+    return summary, missing
 
-            # Leer fechas del daily
-            df = pl.read_parquet(daily_file)
-            dates = df.select('date').to_series().to_list()
-
-            total_daily_days += len(dates)
-
-            if first_date is None:
-                first_date = dates[0]
-            last_date = dates[-1]
-
-            # Verificar cada fecha
-            for date_str in dates:
-                # Construir path esperado
-                date_parts = date_str.split('-')
-                y = date_parts[0]
-                m = date_parts[1]
-
-                market_file = Path(ticks_root) / ticker / f'year={y}' / f'month={m}' / f'day={date_str}' / 'market.parquet'
-
-                if market_file.exists():
-                    total_ticks_days += 1
-                else:
-                    missing_dates.append(date_str)
-
-        except (PermissionError, OSError) as e:
-            # Archivo corrupto o error de CRC - skip este año
-            continue
-
-    # Determinar status
-    if total_daily_days == 0:
+def verify_ticker_ticks(ticker, daily_root, ticks_root, year_min=None, year_max=None):
+    """
+    Verifica ticks para un ticker específico.
+    Retorna dict con estadísticas (None si no hay daily en el rango).
+    """
+    summary, missing = verify_tickers([ticker], daily_root, ticks_root, year_min, year_max)
+    if summary.height == 0:
         return None
-
-    if total_ticks_days == total_daily_days:
-        status = "COMPLETE"
-        issue = ""
-    elif total_ticks_days == 0:
-        status = "MISSING_TICKER"
-        issue = "No existe carpeta o sin ticks"
-    else:
-        status = "MISSING_DAYS"
-        issue = f"Faltan {len(missing_dates)} días"
-
+    row = summary.row(0, named=True)
     return {
         'ticker': ticker,
-        'daily_first': first_date,
-        'daily_last': last_date,
-        'daily_days': total_daily_days,
-        'ticks_days': total_ticks_days,
-        'missing_days': len(missing_dates),
-        'status': status,
-        'issue': issue,
-        'missing_dates_list': missing_dates
+        'daily_first': row['daily_first'],
+        'daily_last': row['daily_last'],
+        'daily_days': row['daily_days'],
+        'ticks_days': row['ticks_found'],
+        'missing_days': row['ticks_missing'],
+        'status': row['status'],
+        'issue': row['issue'],
+        'missing_dates_list': missing['missing_date'].to_list()
     }
 
 def main():
@@ -117,6 +88,9 @@ def main():
     parser.add_argument('--output-prefix', required=True, help='Prefix for output files (ej: verify_ticks_2004_2018)')
     parser.add_argument('--year-min', type=int, help='Año mínimo a verificar (ej: 2004)')
     parser.add_argument('--year-max', type=int, help='Año máximo a verificar (ej: 2018)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='Procesos (lotes de tickers)')
+    parser.add_argument('--catalog-dir', help='Catálogo del store daily (default: <daily-root>/_catalog si existe)')
+    parser.add_argument('--ticks-catalog', help='Catálogo del store de ticks: días presentes sin listar el disco')
 
     args = parser.parse_args()
 
@@ -135,44 +109,17 @@ def main():
         year_range = f"{args.year_min or 'inicio'} - {args.year_max or 'fin'}"
         log(f"Filtrando años: {year_range}")
 
-    # Verificar cada ticker
-    log("Verificando tickers...")
-    results = []
-    missing_dates_all = []
-
-    for i, ticker in enumerate(tickers_with_data):
-        if (i + 1) % 500 == 0:
-            log(f"  Progreso: {i+1}/{len(tickers_with_data)} ({(i+1)/len(tickers_with_data)*100:.1f}%)")
-
-        result = verify_ticker_ticks(ticker, args.daily_root, args.ticks_root, args.year_min, args.year_max)
-
-        if result:
-            completeness_pct = (result['ticks_days'] / result['daily_days'] * 100) if result['daily_days'] > 0 else 0
-
-            results.append({
-                'ticker': result['ticker'],
-                'status': result['status'],
-                'completeness_pct': round(completeness_pct, 1),
-                'daily_first': result['daily_first'],
-                'daily_last': result['daily_last'],
-                'daily_days': result['daily_days'],
-                'ticks_found': result['ticks_days'],
-                'ticks_missing': result['missing_days'],
-                'issue': result['issue']
-            })
-
-            # Guardar fechas faltantes
-            for date in result['missing_dates_list']:
-                missing_dates_all.append({
-                    'ticker': ticker,
-                    'missing_date': date
-                })
-
+    # Verificar por lotes de tickers en paralelo
+    batches = [tickers_with_data[i:i + TICKERS_PER_TASK] for i in range(0, len(tickers_with_data), TICKERS_PER_TASK)]
+    log(f"Verificando tickers... ({len(batches)} lotes, {args.workers} workers)")
+    out = _run(verify_tickers, [(b, args.daily_root, args.ticks_root, args.year_min, args.year_max,
+                                 args.catalog_dir, args.ticks_catalog) for b in batches],
+               args.workers, "lotes")
     log(f"  Progreso: {len(tickers_with_data)}/{len(tickers_with_data)} (100.0%)")
     log("")
 
-    # Crear DataFrame de resultados
-    results_df = pl.DataFrame(results)
+    results_df = pl.concat([r for r, _ in out]).sort('ticker') if out else pl.DataFrame()
+    missing_dates_df = pl.concat([m for _, m in out]).sort(['ticker', 'missing_date']) if out else pl.DataFrame()
 
     # Estadísticas
     log("=" * 80)
@@ -205,13 +152,12 @@ def main():
         problems_df.write_csv(problems_csv)
         log(f"  ✅ {problems_csv}")
 
-    # Missing dates
-    if missing_dates_all:
-        missing_dates_df = pl.DataFrame(missing_dates_all)
-        missing_csv = f"{args.output_prefix}_missing_dates.csv"
-        missing_dates_df.write_csv(missing_csv)
-        log(f"  ✅ {missing_csv}")
-        log(f"     Total fechas faltantes: {len(missing_dates_all):,}")
+    # Missing dates (parquet: pueden ser millones de filas)
+    if missing_dates_df.height > 0:
+        missing_file = f"{args.output_prefix}_missing_dates.parquet"
+        missing_dates_df.write_parquet(missing_file, compression="zstd")
+        log(f"  ✅ {missing_file}")
+        log(f"     Total fechas faltantes: {missing_dates_df.height:,}")
 
     log("")
     log("=" * 80)
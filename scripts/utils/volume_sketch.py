@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+volume_sketch.py - Sketches de cuantiles mergeables para el volumen diario
+
+Sketch de buckets logarítmicos (estilo DDSketch): cada volumen v > 0 cae en el
+bucket ceil(log(v) / log(gamma)), gamma = (1 + a) / (1 - a). El valor
+representativo de un bucket está a menos de un error relativo `a` de cualquier
+valor que contenga, así que cualquier cuantil sale con error relativo <= a.
+Los sketches se combinan sumando conteos por bucket: se calculan en paralelo
+por ticker-año y se agregan (por ticker o global) con un group_by.
+
+Persistencia incremental en sketch_dir:
+    buckets.parquet   ticker, year, bucket, count
+    summary.parquet   ticker, year, n, sum, max, signature (de los ficheros fuente)
+
+Ficheros fuente de un ticker-año (store_query.resolve_files, layout Hive
+incluido): su year=YYYY/daily.parquet y, si el ticker está compactado,
+TICKER/daily.parquet (años según min/max del footer). La firma es el hash de
+(ruta, bytes, mtime) de esos ficheros: update() solo recalcula los ticker-años
+cuya firma cambió y elimina los que ya no tienen ficheros fuente.
+
+Uso:
+    store = VolumeSketchStore(sketch_dir)
+    store.update(daily_root, tickers, 2019, 2025, workers=8)
+    store.global_quantiles([0.5, 0.9, 0.99], 2019, 2025)   # {0.5: ..., ...}
+    store.ticker_stats([0.5, 0.9], 2019, 2025)              # DataFrame por ticker
+"""
+
+import os
+import re
+import math
+import hashlib
+import multiprocessing as mp
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import polars as pl
+
+from store_query import TICKER_FROM_PATH, is_compacted, load as load_store, packed_span, resolve_files
+
+RELATIVE_ACCURACY = 0.005
+ZERO_BUCKET = -(2 ** 31)  # volumen 0: siempre el primer bucket
+
+BUCKETS_FILE = "buckets.parquet"
+SUMMARY_FILE = "summary.parquet"
+
+BUCKET_SCHEMA = {"ticker": pl.Utf8, "year": pl.Int32, "bucket": pl.Int32, "count": pl.Int64}
+SUMMARY_SCHEMA = {"ticker": pl.Utf8, "year": pl.Int32, "n": pl.Int64, "sum": pl.Float64,
+                  "max": pl.Float64, "signature": pl.Utf8}
+
+_TICKER_RE = re.compile(TICKER_FROM_PATH)
+_YEAR_RE = re.compile(r"[/\\]year=(\d{4})[/\\]")
+
+def gamma_for(relative_accuracy: float = RELATIVE_ACCURACY) -> float:
+    return (1 + relative_accuracy) / (1 - relative_accuracy)
+
+def bucket_index(values: np.ndarray, gamma: float) -> np.ndarray:
+    """Índice de bucket por valor (ceros al ZERO_BUCKET)"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, ZERO_BUCKET, dtype=np.int64)
+    pos = values > 0
+    out[pos] = np.ceil(np.log(values[pos]) / math.log(gamma))
+    return out.astype(np.int32)
+
+def bucket_value(bucket: pl.Expr, gamma: float) -> pl.Expr:
+    """Valor representativo: 2 * gamma^i / (gamma + 1) (0 para el bucket de ceros)"""
+    return (
+        pl.when(bucket == ZERO_BUCKET)
+          .then(0.0)
+          .otherwise(2 * (bucket.cast(pl.Float64) * math.log(gamma)).exp() / (gamma + 1))
+    )
+
+def sketch_values(values: np.ndarray, gamma: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(buckets, counts) de un array de volúmenes"""
+    values = values[np.isfinite(values) & (values >= 0)]
+    return np.unique(bucket_index(values, gamma), return_counts=True)
+
+def daily_volume_sources(daily_root: Path, tickers: Sequence[str],
+                         year_min: int, year_max: int) -> Dict[Tuple[str, int], str]:
+    """{(ticker, year): firma} de los ficheros daily (sueltos o compactados) de cada ticker-año"""
+    parts: Dict[Tuple[str, int], List[str]] = {}
+    for path, size in resolve_files("ohlcv_daily", tickers, f"{year_min}-01-01", f"{year_max}-12-31",
+                                    root=daily_root):
+        match = _TICKER_RE.search(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if not match:
+            continue
+        if is_compacted("ohlcv_daily", path):
+            try:
+                span = packed_span(path)
+            except Exception:
+                # Footer ilegible: se sketchea (vacío) con todo el rango pedido
+                span = None
+            years = range(max(year_min, span[0].year), min(year_max, span[1].year) + 1) if span else \
+                range(year_min, year_max + 1)
+        else:
+            y = _YEAR_RE.search(path)
+            years = [int(y.group(1))] if y else []
+        for year in years:
+            parts.setdefault((match.group(1), year), []).append(f"{path}:{size}:{mtime_ns}")
+    return {key: hashlib.blake2b("|".join(sorted(p)).encode(), digest_size=8).hexdigest()
+            for key, p in parts.items()}
+
+def _load_volume(daily_root: str, tickers: List[str], year_min: int, year_max: int) -> pl.DataFrame:
+    """ticker, year, v vía store_query (gana el fichero suelto sobre el compactado por fecha)"""
+    df = load_store("ohlcv_daily", tickers, f"{year_min}-01-01", f"{year_max}-12-31", root=daily_root)
+    if df.is_empty():
+        return pl.DataFrame(schema={"ticker": pl.Utf8, "year": pl.Int32, "v": pl.Float64})
+    return df.select([
+        pl.col("ticker").cast(pl.Utf8),
+        pl.col("date").cast(pl.Utf8).str.slice(0, 4).cast(pl.Int32, strict=False).alias("year"),
+        pl.col("v").cast(pl.Float64, strict=False),
+    ]).drop_nulls()
+
+def _sketch_files(daily_root: str, tasks: List[Tuple[str, int, str]],
+                  gamma: float) -> Tuple[List[dict], List[dict]]:
+    """Worker: sketch de un lote de ticker-años (una lectura por lote vía store_query)"""
+    tickers = sorted({t for t, _, _ in tasks})
+    y0, y1 = min(y for _, y, _ in tasks), max(y for _, y, _ in tasks)
+    try:
+        df = _load_volume(daily_root, tickers, y0, y1)
+    except Exception:
+        # Fichero corrupto en el lote: ticker a ticker; los que fallan quedan vacíos
+        # para no reintentarlos hasta que cambie su firma
+        frames = []
+        for ticker in tickers:
+            try:
+                frames.append(_load_volume(daily_root, [ticker], y0, y1))
+            except Exception:
+                continue
+        df = pl.concat(frames) if frames else _load_volume(daily_root, [], y0, y1)
+    groups = {key: part["v"].to_numpy() for key, part in df.partition_by(["ticker", "year"], as_dict=True).items()}
+
+    summaries, buckets = [], []
+    for ticker, year, signature in tasks:
+        vals = groups.get((ticker, year), np.empty(0))
+        b, c = sketch_values(vals, gamma)
+        vals = vals[np.isfinite(vals) & (vals >= 0)]
+        summaries.append({"ticker": ticker, "year": year, "n": int(c.sum()),
+                          "sum": float(vals.sum()) if vals.size else 0.0,
+                          "max": float(vals.max()) if vals.size else None, "signature": signature})
+        buckets.extend({"ticker": ticker, "year": year, "bucket": int(bi), "count": int(ci)}
+                       for bi, ci in zip(b, c))
+    return summaries, buckets
+
+def quantiles_from_buckets(buckets: pl.DataFrame, quantiles: Sequence[float], gamma: float,
+                           by: Optional[List[str]] = None) -> pl.DataFrame:
+    """
+    Cuantiles (rango sorted[int(q * n)], como el cálculo exacto anterior) a
+    partir de conteos por bucket, agregando por `by` (None = global).
+    """
+    by = by or []
+    keys = by + ["bucket"]
+    agg = buckets.group_by(keys).agg(pl.col("count").sum()).sort(keys)
+    over = by or None
+    cum = pl.col("count").cum_sum()
+    total = pl.col("count").sum()
+    agg = agg.with_columns([
+        (cum.over(over) if over else cum).alias("_cum"),
+        (total.over(over) if over else total).alias("_n"),
+    ])
+    out = None
+    for q in quantiles:
+        col = f"p{q * 100:g}".replace(".", "_")
+        sel = agg.filter(pl.col("_cum") > (pl.col("_n") * q).floor())
+        part = (sel.group_by(by, maintain_order=True).agg(pl.col("bucket").first()) if by
+                else sel.select(pl.col("bucket").first()))
+        part = part.with_columns(bucket_value(pl.col("bucket"), gamma).alias(col)).drop("bucket")
+        out = part if out is None else (out.join(part, on=by, how="left") if by
+                                        else pl.concat([out, part], how="horizontal"))
+    return out
+
+class VolumeSketchStore:
+    def __init__(self, sketch_dir: Union[str, Path], relative_accuracy: float = RELATIVE_ACCURACY):
+        self.root = Path(sketch_dir)
+        self.gamma = gamma_for(relative_accuracy)
+        self.buckets = self._read(BUCKETS_FILE, BUCKET_SCHEMA)
+        self.summary = self._read(SUMMARY_FILE, SUMMARY_SCHEMA)
+        if "signature" not in self.summary.columns:
+            # Sketches de la versión por mtime_ns: se recalculan todos
+            self.buckets = pl.DataFrame(schema=BUCKET_SCHEMA)
+            self.summary = pl.DataFrame(schema=SUMMARY_SCHEMA)
+
+    def _read(self, name: str, schema: dict) -> pl.DataFrame:
+        f = self.root / name
+        return pl.read_parquet(f) if f.exists() else pl.DataFrame(schema=schema)
+
+    def _write(self, df: pl.DataFrame, name: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        target = self.root / name
+        tmp = target.with_name(name + ".tmp")
+        df.write_parquet(tmp, compression="zstd")
+        os.replace(tmp, target)
+
+    def update(self, daily_root: Path, tickers: Sequence[str], year_min: int, year_max: int,
+               workers: int = 1, chunk: int = 500) -> int:
+        """
+        Recalcula los ticker-años nuevos o modificados y elimina los que ya no
+        tienen ficheros fuente (dentro de tickers y [year_min, year_max]);
+        devuelve cuántos cambiaron
+        """
+        sources = daily_volume_sources(Path(daily_root), tickers, year_min, year_max)
+        known = {(t, y): sig for t, y, sig in self.summary.select(["ticker", "year", "signature"]).iter_rows()}
+        stale = [(t, y, sig) for (t, y), sig in sorted(sources.items()) if known.get((t, y)) != sig]
+        gone = [key for key in self._filter(self.summary, tickers, year_min, year_max)
+                                    .select(["ticker", "year"]).iter_rows() if key not in sources]
+        if not stale and not gone:
+            return 0
+
+        summaries, buckets = [], []
+        # Lotes por ticker contiguo: cada lote es una sola lectura del store
+        batches = [stale[i:i + chunk] for i in range(0, len(stale), chunk)]
+        root = str(daily_root)
+        if workers > 1 and len(batches) > 1:
+            # 'spawn': fork con polars ya inicializado puede bloquearse
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as ex:
+                for s, b in ex.map(_sketch_files, [root] * len(batches), batches, [self.gamma] * len(batches)):
+                    summaries.extend(s)
+                    buckets.extend(b)
+        else:
+            for batch in batches:
+                s, b = _sketch_files(root, batch, self.gamma)
+                summaries.extend(s)
+                buckets.extend(b)
+
+        keys = pl.DataFrame([(t, y) for t, y, _ in stale] + gone, orient="row",
+                            schema={"ticker": pl.Utf8, "year": pl.Int32})
+        self.summary = pl.concat([
+            self.summary.join(keys, on=["ticker", "year"], how="anti"),
+            pl.DataFrame(summaries, schema=SUMMARY_SCHEMA),
+        ])
+        self.buckets = pl.concat([
+            self.buckets.join(keys, on=["ticker", "year"], how="anti"),
+            pl.DataFrame(buckets, schema=BUCKET_SCHEMA),
+        ])
+        self._write(self.buckets, BUCKETS_FILE)
+        self._write(self.summary, SUMMARY_FILE)
+        return len(stale) + len(gone)
+
+    def _filter(self, df: pl.DataFrame, tickers: Optional[Sequence[str]],
+                year_min: Optional[int], year_max: Optional[int]) -> pl.DataFrame:
+        if tickers is not None:
+            df = df.filter(pl.col("ticker").is_in(list(tickers)))
+        if year_min is not None:
+            df = df.filter(pl.col("year") >= year_min)
+        if year_max is not None:
+            df = df.filter(pl.col("year") <= year_max)
+        return df
+
+    def global_quantiles(self, quantiles: Sequence[float], year_min: Optional[int] = None,
+                         year_max: Optional[int] = None,
+                         tickers: Optional[Sequence[str]] = None) -> Dict[float, float]:
+        b = self._filter(self.buckets, tickers, year_min, year_max)
+        if b.height == 0:
+            return {q: 0.0 for q in quantiles}
+        row = quantiles_from_buckets(b, quantiles, self.gamma).row(0)
+        return dict(zip(quantiles, row))
+
+    def total_days(self, year_min: Optional[int] = None, year_max: Optional[int] = None,
+                   tickers: Optional[Sequence[str]] = None) -> int:
+        return int(self._filter(self.summary, tickers, year_min, year_max)["n"].sum() or 0)
+
+    def ticker_stats(self, quantiles: Sequence[float], year_min: Optional[int] = None,
+                     year_max: Optional[int] = None,
+                     tickers: Optional[Sequence[str]] = None) -> pl.DataFrame:
+        """ticker, n, mean, max y un p<q> por cuantil"""
+        s = (
+            self._filter(self.summary, tickers, year_min, year_max)
+                .group_by("ticker")
+                .agg([pl.col("n").sum(), pl.col("sum").sum(), pl.col("max").max()])
+                .filter(pl.col("n") > 0)
+                .with_columns((pl.col("sum") / pl.col("n")).alias("mean"))
+                .drop("sum")
+        )
+        b = self._filter(self.buckets, tickers, year_min, year_max)
+        if b.height == 0:
+            return s
+        return s.join(quantiles_from_buckets(b, quantiles, self.gamma, by=["ticker"]),
+                      on="ticker", how="left").sort("ticker")
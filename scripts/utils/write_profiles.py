@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+write_profiles.py - Perfiles de escritura parquet por dataset (config compartida)
+
+Cada ingestor elegía codec, nivel, row group y estadísticas a ojo (snappy en
+trades, zstd-1 sin estadísticas en los ultra_fast, zstd-2 en minutos, zstd-3
+en ParallelFileWriter, defaults en daily). Ahora todos leen el perfil de su
+dataset de un único JSON, generado por bench_write_profiles.py:
+
+    {
+      "profiles": {"zstd3-rg128k-dict-stats": {"compression": "zstd", "compression_level": 3,
+                                              "row_group_size": 131072, "dictionary": true,
+                                              "statistics": true, "page_checksum": true}, ...},
+      "datasets": {"trades": "zstd3-rg128k-dict-stats", ..., "default": "..."}
+    }
+
+Dataset sin entrada -> "default"; perfil sin una clave -> DEFAULT_PROFILE.
+Ruta: variable TSIS_WRITE_PROFILES o write_profiles.json junto a este módulo.
+
+Layout de ticks: write_parquet ordena siempre por la columna de tiempo del
+dataset (SORT_BY) y lo declara en sorting_columns. Con "page_index" y
+"page_size" pequeño (64 KiB) los perfiles de trades / quotes dejan en el footer
+min/max por página, que tick_window.py usa para leer solo las páginas de una
+ventana de tiempo. "bloom_filter" ({columna: {"ndv": N, "fpp": 0.05}}) se pasa
+tal cual a pyarrow.
+
+Uso:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+    from write_profiles import write_parquet
+
+    write_parquet(df, tmp, "trades")        # pyarrow con las opciones del perfil
+    os.replace(tmp, target)
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import polars as pl
+import pyarrow.parquet as pq
+
+CONFIG_FILE = Path(__file__).resolve().with_name("write_profiles.json")
+
+# Valores para claves que falten en un perfil (y perfil si no hay config)
+DEFAULT_PROFILE: Dict = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "row_group_size": 128 * 1024,
+    "dictionary": True,
+    "statistics": True,
+    "page_checksum": True,
+    "page_index": False,
+    "page_size": None,          # bytes por página de datos (None = 1 MiB de pyarrow)
+    "bloom_filter": None,
+}
+
+# Columna de tiempo por la que se ordena cada dataset (la primera que exista)
+SORT_BY: Dict[str, Tuple[str, ...]] = {
+    "ohlcv_daily": ("date",),
+    "ohlcv_1m": ("t", "timestamp"),
+    "trades": ("t", "timestamp", "participant_timestamp"),
+    "quotes": ("timestamp", "sip_timestamp"),
+}
+
+_lock = threading.Lock()
+_cache: Dict[str, Dict] = {}
+
+def config_path() -> Path:
+    env = os.getenv("TSIS_WRITE_PROFILES")
+    return Path(env) if env else CONFIG_FILE
+
+def load_config(path: Optional[Union[str, Path]] = None) -> Dict:
+    """JSON de perfiles ({} si no existe); cacheado por ruta"""
+    path = Path(path) if path else config_path()
+    key = str(path)
+    with _lock:
+        if key not in _cache:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    _cache[key] = json.load(f)
+            except FileNotFoundError:
+                _cache[key] = {}
+        return _cache[key]
+
+def profile_name(dataset: str, path: Optional[Union[str, Path]] = None) -> Optional[str]:
+    datasets = load_config(path).get("datasets", {})
+    return datasets.get(dataset, datasets.get("default"))
+
+def profile(dataset: str, path: Optional[Union[str, Path]] = None) -> Dict:
+    """Opciones de escritura del dataset (completadas con DEFAULT_PROFILE)"""
+    name = profile_name(dataset, path)
+    found = load_config(path).get("profiles", {}).get(name, {}) if name else {}
+    return {**DEFAULT_PROFILE, **found}
+
+def write_options(prof: Dict) -> Dict:
+    """Perfil -> kwargs de pyarrow.parquet.write_table"""
+    codec = prof["compression"]
+    level = prof.get("compression_level")
+    return {
+        "compression": codec,
+        # snappy / lz4 no admiten nivel
+        "compression_level": level if codec in ("zstd", "gzip", "brotli") else None,
+        "row_group_size": prof["row_group_size"],
+        "use_dictionary": prof["dictionary"],
+        "write_statistics": prof["statistics"],
+        "write_page_checksum": prof["page_checksum"],
+        "write_page_index": prof["page_index"],
+        "data_page_size": prof["page_size"],
+        "bloom_filter_options": prof["bloom_filter"] or None,
+    }
+
+def sort_column(df: pl.DataFrame, dataset: Optional[str]) -> Optional[str]:
+    return next((c for c in SORT_BY.get(dataset or "", ()) if c in df.columns), None)
+
+def write_parquet(df: pl.DataFrame, path: Union[str, Path], dataset: Optional[str] = None,
+                  prof: Optional[Dict] = None) -> None:
+    """Escribe df con el perfil del dataset (o el perfil explícito prof), ordenado por tiempo"""
+    prof = prof or profile(dataset or "default")
+    opts = write_options(prof)
+    col = sort_column(df, dataset)
+    if col:
+        if not df[col].is_sorted():
+            df = df.sort(col, maintain_order=True)
+        opts["sorting_columns"] = [pq.SortingColumn(df.columns.index(col))]
+    pq.write_table(df.to_arrow(), str(path), **opts)